@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+
+"""
+Benchmark fixtures
+
+The make analysis events lambdas are driven against synthetic catalogs through stubbed orcabus_api_tools clients,
+so the benchmarks measure our pairing and draft logic (and the cost of parsing the catalog),
+not the network.
+
+The stubs are registered in sys.modules before the toolkit or any lambda is imported.
+The library and fastq catalogs and the workflow runs, which the toolkit pages through from the OrcaBus services itself,
+are served a page at a time by transport adapters mounted on the toolkit's pooled session.
+Each stubbed api function and catalog page is counted, so benchmarks can also report the api calls made per subject.
+"""
+
+# Standard imports
+import json
+import sys
+from collections import Counter
+from itertools import count
+from os import environ
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Callable
+from urllib.parse import urlparse, parse_qs, urlencode
+
+import pytest
+import requests
+from requests.adapters import BaseAdapter
+
+# Local imports
+# The orcabus_api_tools stubs are shared with the toolkit's unit tests, see pythonpath in pytest.ini
+from orcabus_api_tools_stubs import (
+    SYNTHETIC_HOSTNAME,
+    Library,
+    WorkflowRunNotFoundError,
+    register_orcabus_api_tools_stubs,
+)
+from synthetic_catalog import SyntheticCatalog
+
+# Globals
+BENCHMARKS_DIR = Path(__file__).parent
+LAMBDAS_DIR = BENCHMARKS_DIR.parent / "lambdas"
+ANALYSIS_TOOL_KIT_SRC_DIR = BENCHMARKS_DIR.parent / "layers" / "analysis_tool_kit" / "src"
+
+CATALOG_SIZES = [1_000, 10_000, 100_000]
+
+# The catalog the stubbed api clients currently serve
+ACTIVE_CATALOG: Optional[SyntheticCatalog] = None
+API_CALL_COUNTER: Counter = Counter()
+PORTAL_RUN_ID_COUNTER = count()
+
+WORKFLOW_OBJECT_SSM_PARAMETER_ENV_VARS = [
+    # WGS
+    'DRAGEN_WGTS_DNA_WORKFLOW_OBJECT_SSM_PARAMETER_NAME',
+    'ONCOANALYSER_WGTS_DNA_WORKFLOW_OBJECT_SSM_PARAMETER_NAME',
+    'SASH_WORKFLOW_OBJECT_SSM_PARAMETER_NAME',
+    # WTS
+    'DRAGEN_WGTS_RNA_WORKFLOW_OBJECT_SSM_PARAMETER_NAME',
+    'ARRIBA_WGTS_RNA_WORKFLOW_OBJECT_SSM_PARAMETER_NAME',
+    'ONCOANALYSER_WGTS_RNA_WORKFLOW_OBJECT_SSM_PARAMETER_NAME',
+    # WGTS post
+    'ONCOANALYSER_WGTS_DNA_RNA_WORKFLOW_OBJECT_SSM_PARAMETER_NAME',
+    'RNASUM_WORKFLOW_OBJECT_SSM_PARAMETER_NAME',
+]
+
+
+def get_active_catalog() -> SyntheticCatalog:
+    if ACTIVE_CATALOG is None:
+        raise ValueError("No synthetic catalog is active, use the catalog fixture")
+    return ACTIVE_CATALOG
+
+
+def counted(func):
+    def counted_func(*args, **kwargs):
+        API_CALL_COUNTER[func.__name__] += 1
+        return func(*args, **kwargs)
+    counted_func.__name__ = func.__name__
+    return counted_func
+
+
+# Stubbed api clients
+@counted
+def get_libraries_list_from_library_id_list(library_id_list: List[str]) -> List[Library]:
+    catalog = get_active_catalog()
+    return list(map(
+        lambda library_id_iter_: dict(catalog.libraries_by_library_id[library_id_iter_]),
+        filter(
+            lambda library_id_iter_: library_id_iter_ in catalog.libraries_by_library_id,
+            library_id_list
+        )
+    ))
+
+
+@counted
+def get_fastqs_in_library(library_id: str) -> List[Dict[str, Any]]:
+    return list(map(dict, get_active_catalog().fastqs_by_library_id.get(library_id, [])))
+
+
+@counted
+def get_fastqs_in_libraries_and_instrument_run_id(
+        instrument_run_id: str,
+        library_id_list: List[str]
+) -> List[Dict[str, Any]]:
+    catalog = get_active_catalog()
+    return list(map(
+        dict,
+        filter(
+            lambda fastq_iter_: fastq_iter_['instrumentRunId'] == instrument_run_id,
+            [
+                fastq_iter_
+                for library_id_iter_ in library_id_list
+                for fastq_iter_ in catalog.fastqs_by_library_id.get(library_id_iter_, [])
+            ]
+        )
+    ))
+
+
+@counted
+def get_libraries_from_instrument_run_id(instrument_run_id: str) -> List[str]:
+    catalog = get_active_catalog()
+    return list(map(
+        lambda library_iter_: library_iter_['libraryId'],
+        filter(
+            lambda library_iter_: any(
+                fastq_iter_['instrumentRunId'] == instrument_run_id
+                for fastq_iter_ in catalog.fastqs_by_library_id.get(library_iter_['libraryId'], [])
+            ),
+            catalog.libraries
+        )
+    ))
+
+
+@counted
+def list_workflows(workflow_name: str, workflow_version: str, **kwargs) -> List[Dict[str, Any]]:
+    return [
+        {
+            "orcabusId": f"wfl.{workflow_name}.{workflow_version}",
+            "name": workflow_name,
+            "version": workflow_version,
+            "codeVersion": kwargs.get("code_version", None) or "0000000",
+            "executionEngine": kwargs.get("execution_engine", None) or "ICA",
+            "executionEnginePipelineId": kwargs.get("execution_engine_pipeline_id", None) or "pipeline",
+            "validationState": kwargs.get("validation_state", None) or "VALIDATED",
+        }
+    ]
+
+
+@counted
+def get_workflow_runs_from_metadata(**kwargs) -> List[Dict[str, Any]]:
+    # No existing workflow runs, so every draft is generated
+    return []
+
+
+@counted
+def get_workflow_run_from_portal_run_id(portal_run_id: str) -> Dict[str, Any]:
+    raise WorkflowRunNotFoundError(f"No workflow run for portal run id {portal_run_id}")
+
+
+def create_portal_run_id() -> str:
+    return f"20260101{next(PORTAL_RUN_ID_COUNTER):08x}"
+
+
+def create_workflow_run_name_from_workflow_name_workflow_version_and_portal_run_id(
+        workflow_name: str,
+        workflow_version: str,
+        portal_run_id: str,
+        workflow_run_prefix: Optional[str] = None,
+) -> str:
+    return "--".join([
+        workflow_run_prefix or "umccr--automated",
+        workflow_name,
+        workflow_version.replace(".", "-"),
+        portal_run_id,
+    ])
+
+
+def get_ssm_value(parameter_name: str) -> str:
+    # The ssm parameter names are the workflow object env var names, i.e. DRAGEN_WGTS_DNA_WORKFLOW_OBJECT...
+    return json.dumps({
+        "name": parameter_name.split("_WORKFLOW_OBJECT_")[0].lower().replace("_", "-"),
+        "version": "1.0.0",
+    })
+
+
+class SyntheticListAdapter(BaseAdapter):
+    """
+    Serve a list endpoint (i.e. the metadata library endpoint) from the active catalog, a page at a time.
+    Server side filters (any query parameter other than the page) are passed to get_rows, and carried in the next link,
+    as the OrcaBus services do.
+    Pages are serialised once per catalog and filter, so the benchmarks don't measure the stub's json encoding
+    """
+    def __init__(
+            self,
+            endpoint_url: str,
+            get_rows: Callable[[SyntheticCatalog, Dict[str, str]], List[Dict[str, Any]]],
+            counter_name: str,
+    ):
+        super().__init__()
+        self.endpoint_url = endpoint_url
+        self.get_rows = get_rows
+        self.counter_name = counter_name
+        self.page_content_cache: Dict[tuple, bytes] = {}
+
+    def get_page_content(self, url: str) -> bytes:
+        catalog = get_active_catalog()
+
+        parsed_url = urlparse(url)
+        query = dict(map(
+            lambda query_item_iter_: (query_item_iter_[0], query_item_iter_[1][0]),
+            parse_qs(parsed_url.query).items()
+        ))
+        page = int(query.pop('page', '1'))
+        rows_per_page = int(query.pop('rowsPerPage', '100'))
+
+        cache_key = (id(catalog), tuple(sorted(query.items())), page, rows_per_page)
+        if cache_key not in self.page_content_cache:
+            rows = self.get_rows(catalog, query)
+            has_next_page = page * rows_per_page < len(rows)
+            self.page_content_cache[cache_key] = json.dumps({
+                "links": {
+                    "next": (
+                        f"{parsed_url.scheme}://{parsed_url.netloc}{parsed_url.path}?" +
+                        urlencode({**query, "page": page + 1, "rowsPerPage": rows_per_page})
+                        if has_next_page else None
+                    ),
+                    "previous": None,
+                },
+                "pagination": {
+                    "page": page,
+                    "rowsPerPage": rows_per_page,
+                    "count": len(rows),
+                },
+                "results": rows[(page - 1) * rows_per_page:page * rows_per_page],
+            }).encode()
+
+        return self.page_content_cache[cache_key]
+
+    def warm(self, rows_per_page: int):
+        """
+        Serialise every (unfiltered) page of the active catalog up front
+        :param rows_per_page:
+        :return:
+        """
+        self.page_content_cache.clear()
+        url = f"{self.endpoint_url}?page=1&rowsPerPage={rows_per_page}"
+        while url is not None:
+            url = json.loads(self.get_page_content(url))['links']['next']
+
+    def send(self, request, **kwargs):
+        API_CALL_COUNTER[self.counter_name] += 1
+
+        response = requests.Response()
+        response.status_code = 200
+        response.url = request.url
+        response.request = request
+        response.headers['Content-Type'] = 'application/json'
+        response._content = self.get_page_content(request.url)
+        return response
+
+    def close(self):
+        pass
+
+
+# Set up the stubs and environment before anything imports the toolkit or a lambda
+register_orcabus_api_tools_stubs(
+    get_libraries_list_from_library_id_list=get_libraries_list_from_library_id_list,
+    get_fastqs_in_library=get_fastqs_in_library,
+    get_fastqs_in_libraries_and_instrument_run_id=get_fastqs_in_libraries_and_instrument_run_id,
+    get_libraries_from_instrument_run_id=get_libraries_from_instrument_run_id,
+    create_portal_run_id=create_portal_run_id,
+    create_workflow_run_name_from_workflow_name_workflow_version_and_portal_run_id=(
+        create_workflow_run_name_from_workflow_name_workflow_version_and_portal_run_id
+    ),
+    list_workflows=list_workflows,
+    get_workflow_runs_from_metadata=get_workflow_runs_from_metadata,
+    get_workflow_run_from_portal_run_id=get_workflow_run_from_portal_run_id,
+    get_ssm_value=get_ssm_value,
+)
+sys.path.insert(0, str(ANALYSIS_TOOL_KIT_SRC_DIR))
+for env_var in WORKFLOW_OBJECT_SSM_PARAMETER_ENV_VARS:
+    environ.setdefault(env_var, env_var)
+# We're measuring our logic, not the api rate limits, so don't throttle the stubbed apis
+environ.setdefault("ORCABUS_API_RATE_LIMITS", json.dumps(dict(map(
+    lambda endpoint_family_iter_: (endpoint_family_iter_, {"rate": 1_000_000, "burst": 1_000_000}),
+    ["metadata", "sequence", "fastq", "workflow"]
+))))
+
+
+def clear_process_caches():
+    """
+    Clear the toolkit's warm-process caches, so each benchmark round is a cold invocation
+    :return:
+    """
+    from analysis_tool_kit.library_helpers import clear_library_cache
+    from analysis_tool_kit.analysis_helpers import WORKFLOW_CACHE
+    from analysis_tool_kit.readset_library_index import clear_readset_library_index
+    from analysis_tool_kit.instrument_run_helpers import clear_instrument_run_library_id_cache
+
+    clear_library_cache()
+    clear_instrument_run_library_id_cache()
+    WORKFLOW_CACHE.clear()
+    # The readset library index persisted to /tmp outlives the process, as it would in a reused lambda sandbox
+    clear_readset_library_index()
+
+
+def mount_synthetic_list_adapters():
+    from analysis_tool_kit.globals import (
+        METADATA_SUBDOMAIN_NAME, LIBRARY_ENDPOINT, LIBRARY_CATALOG_ROWS_PER_PAGE, LIBRARY_SUBJECT_QUERY_PARAMETER_NAME,
+        FASTQ_SUBDOMAIN_NAME, FASTQ_ENDPOINT, FASTQ_CATALOG_ROWS_PER_PAGE,
+        WORKFLOW_SUBDOMAIN_NAME, WORKFLOW_RUN_ENDPOINT, WORKFLOW_RUN_EXISTENCE_ROWS_PER_PAGE,
+    )
+    from analysis_tool_kit.http_client import get_session
+
+    for subdomain_name, endpoint, rows_per_page, get_rows, counter_name in [
+        (
+            METADATA_SUBDOMAIN_NAME, LIBRARY_ENDPOINT, LIBRARY_CATALOG_ROWS_PER_PAGE,
+            lambda catalog_iter_, query_iter_: (
+                catalog_iter_.libraries_by_subject_orcabus_id.get(query_iter_[LIBRARY_SUBJECT_QUERY_PARAMETER_NAME], [])
+                if LIBRARY_SUBJECT_QUERY_PARAMETER_NAME in query_iter_
+                else catalog_iter_.libraries
+            ),
+            'list_library_page'
+        ),
+        (
+            FASTQ_SUBDOMAIN_NAME, FASTQ_ENDPOINT, FASTQ_CATALOG_ROWS_PER_PAGE,
+            lambda catalog_iter_, query_iter_: catalog_iter_.fastqs, 'list_fastq_page'
+        ),
+        # No existing workflow runs, so every draft is generated
+        (
+            WORKFLOW_SUBDOMAIN_NAME, WORKFLOW_RUN_ENDPOINT, WORKFLOW_RUN_EXISTENCE_ROWS_PER_PAGE,
+            lambda catalog_iter_, query_iter_: [], 'list_workflow_run_page'
+        ),
+    ]:
+        synthetic_list_adapter = SyntheticListAdapter(
+            f"https://{subdomain_name}.{SYNTHETIC_HOSTNAME}/{endpoint}",
+            get_rows,
+            counter_name,
+        )
+        synthetic_list_adapter.warm(rows_per_page)
+        get_session().mount(f"https://{subdomain_name}.{SYNTHETIC_HOSTNAME}/", synthetic_list_adapter)
+
+
+def rebuild_readset_library_index():
+    """
+    Build the readset library index of the active catalog, as the scheduled rebuild lambda would
+    :return:
+    """
+    from analysis_tool_kit.readset_library_index import rebuild_readset_library_index as rebuild_index
+
+    rebuild_index()
+
+
+def remove_readset_library_index():
+    """
+    Remove the readset library index (and library misses) persisted to /tmp, so each catalog builds its own
+    :return:
+    """
+    from analysis_tool_kit.globals import READSET_LIBRARY_INDEX_LOCAL_PATH, READSET_LIBRARY_MISS_CACHE_LOCAL_PATH
+
+    Path(READSET_LIBRARY_INDEX_LOCAL_PATH).unlink(missing_ok=True)
+    Path(READSET_LIBRARY_MISS_CACHE_LOCAL_PATH).unlink(missing_ok=True)
+
+
+@pytest.fixture(scope="module", params=CATALOG_SIZES, ids=lambda size_iter_: f"{size_iter_ // 1000}k")
+def catalog(request) -> SyntheticCatalog:
+    global ACTIVE_CATALOG
+
+    ACTIVE_CATALOG = SyntheticCatalog(request.param)
+    clear_process_caches()
+    remove_readset_library_index()
+    mount_synthetic_list_adapters()
+    rebuild_readset_library_index()
+    yield ACTIVE_CATALOG
+    remove_readset_library_index()
+    ACTIVE_CATALOG = None
+
+
+@pytest.fixture
+def api_call_counter() -> Counter:
+    API_CALL_COUNTER.clear()
+    return API_CALL_COUNTER
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+
+"""
+Scaling budgets for the pairing benchmarks
+
+The time and peak memory a lambda needs per subject is fine to grow with the catalog,
+but it shouldn't grow any faster than it does today.
+
+For each lambda we fit the growth exponent of the per-subject cost between the smallest and largest catalog,
+  exponent = log(cost_largest / cost_smallest) / log(size_largest / size_smallest)
+
+so 0 is constant time per subject, 1 is linear in the size of the catalog,
+and fail if it exceeds the lambda's budget in scaling_budgets.json.
+
+Comparing exponents rather than absolute times keeps the gate independent of the speed of the CI runner.
+Costs are floored, so a lambda whose per-subject cost is within noise of zero isn't failed on noise.
+"""
+
+# Standard imports
+import json
+import math
+from pathlib import Path
+from typing import Dict, Any
+
+# Globals
+SCALING_BUDGETS_PATH = Path(__file__).parent / "scaling_budgets.json"
+SECONDS_PER_SUBJECT_FLOOR = 0.002
+PEAK_MEMORY_BYTES_PER_SUBJECT_FLOOR = 2 * 1024 * 1024
+
+METRIC_FLOORS = {
+    "secondsPerSubject": SECONDS_PER_SUBJECT_FLOOR,
+    "peakMemoryBytesPerSubject": PEAK_MEMORY_BYTES_PER_SUBJECT_FLOOR,
+}
+
+# Results by lambda name, then catalog size, filled in by the pairing benchmarks
+SCALING_RESULTS: Dict[str, Dict[int, Dict[str, Any]]] = {}
+
+
+def get_scaling_budgets() -> Dict[str, Dict[str, float]]:
+    with open(SCALING_BUDGETS_PATH) as scaling_budgets_h:
+        return json.load(scaling_budgets_h)
+
+
+def record_scaling_result(lambda_name: str, catalog_size: int, result: Dict[str, Any]):
+    SCALING_RESULTS.setdefault(lambda_name, {})[catalog_size] = result
+
+
+def get_growth_exponent(lambda_name: str, metric: str) -> float:
+    """
+    Get the growth exponent of a per-subject metric between the smallest and largest catalogs
+    :param lambda_name:
+    :param metric:
+    :return:
+    """
+    results_by_size = SCALING_RESULTS[lambda_name]
+    smallest_size, largest_size = min(results_by_size), max(results_by_size)
+
+    smallest_cost = max(results_by_size[smallest_size][metric], METRIC_FLOORS[metric])
+    largest_cost = max(results_by_size[largest_size][metric], METRIC_FLOORS[metric])
+
+    return math.log(largest_cost / smallest_cost) / math.log(largest_size / smallest_size)
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+
+"""
+Synthetic library catalogs for the pairing benchmarks
+
+A catalog is a seeded, reproducible set of subjects, libraries and fastqs,
+with subject profiles, phenotypes and workflows distributed roughly as we see them in production:
+
+  * most subjects are WGTS (tumor/normal WGS plus tumor WTS) or WGS only (tumor/normal)
+  * some subjects are unpairable (a tumor with no normal), WTS only, ctDNA, or germline only
+  * some libraries are topped up or re-sequenced, so a subject can have more than one library of a kind
+  * a small number of negative controls are spread across the instrument runs
+
+Libraries are assigned to instrument runs in the order they are created (oldest first),
+so the last instrument run holds the newest libraries, and orcabusIds increase over time
+just as the pairing lambdas assume.
+"""
+
+# Standard imports
+import random
+from typing import List, Dict, Any, Optional
+
+# Globals
+DEFAULT_SEED = 20240101
+LIBRARIES_PER_INSTRUMENT_RUN = 384
+
+# Subject profiles, the library types and phenotypes each subject starts with, and their weights
+SUBJECT_PROFILES = {
+    "wgts": {
+        "weight": 40,
+        "libraries": [("WGS", "normal"), ("WGS", "tumor"), ("WTS", "tumor")],
+    },
+    "wgs": {
+        "weight": 25,
+        "libraries": [("WGS", "normal"), ("WGS", "tumor")],
+    },
+    "wgsTumorOnly": {
+        "weight": 8,
+        "libraries": [("WGS", "tumor")],
+    },
+    "wts": {
+        "weight": 10,
+        "libraries": [("WTS", "tumor")],
+    },
+    "ctdna": {
+        "weight": 10,
+        "libraries": [("ctDNA", "tumor")],
+    },
+    "germline": {
+        "weight": 5,
+        "libraries": [("WGS", "normal")],
+    },
+    "negativeControl": {
+        "weight": 2,
+        "libraries": [("WGS", "negative-control")],
+    },
+}
+
+WORKFLOW_WEIGHTS = {
+    "clinical": 30,
+    "research": 62,
+    "qc": 8,
+}
+
+TOPUP_PROBABILITY = 0.1
+ACCREDITATION_PROBABILITY = 0.01
+
+
+class SyntheticCatalog:
+    """
+    A synthetic catalog, with the lookups the stubbed api clients need
+    """
+    def __init__(self, library_count: int, seed: int = DEFAULT_SEED):
+        self.library_count = library_count
+        self.random = random.Random(seed)
+
+        self.libraries: List[Dict[str, Any]] = []
+        self.fastqs_by_library_id: Dict[str, List[Dict[str, Any]]] = {}
+        self.profile_by_subject_id: Dict[str, str] = {}
+
+        self.generate()
+
+        self.libraries_by_library_id = {
+            library_iter_['libraryId']: library_iter_
+            for library_iter_ in self.libraries
+        }
+        self.libraries_by_subject_orcabus_id: Dict[str, List[Dict[str, Any]]] = {}
+        for library in self.libraries:
+            self.libraries_by_subject_orcabus_id.setdefault(library['subject']['orcabusId'], []).append(library)
+        self.fastqs = [
+            fastq_iter_
+            for library_iter_ in self.libraries
+            for fastq_iter_ in self.fastqs_by_library_id[library_iter_['libraryId']]
+        ]
+
+    def get_instrument_run_id(self, library_index: int) -> str:
+        return f"260101_A01052_{library_index // LIBRARIES_PER_INSTRUMENT_RUN:04d}_SYNTHETIC"
+
+    def add_library(self, subject: Dict[str, str], library_type: str, phenotype: str, workflow: str):
+        library_index = len(self.libraries)
+        library_id = f"L{library_index:07d}"
+        instrument_run_id = self.get_instrument_run_id(library_index)
+
+        self.libraries.append({
+            "orcabusId": f"lib.{library_index:026d}",
+            "libraryId": library_id,
+            "phenotype": phenotype,
+            "workflow": workflow,
+            "quality": self.random.choice(["good", "good", "good", "borderline", "poor"]),
+            "type": library_type,
+            "assay": {"WGS": "TsqNano", "WTS": "NebRNA", "ctDNA": "ctTSOv2"}[library_type],
+            "coverage": self.random.choice([40.0, 80.0, 100.0]),
+            "overrideCycles": "Y151;I10;I10;Y151",
+            "subject": subject,
+            "projectSet": [
+                {
+                    "orcabusId": "prj.00000000000000000000000001",
+                    "projectId": (
+                        "testing"
+                        if self.random.random() < ACCREDITATION_PROBABILITY
+                        else self.random.choice(["cup", "research", "clinical-genomics"])
+                    ),
+                }
+            ],
+        })
+
+        self.fastqs_by_library_id[library_id] = list(map(
+            lambda lane_iter_: {
+                "id": f"fqr.{library_index:020d}{lane_iter_:06d}",
+                "index": f"{library_index % 10000:04d}ACGT+TGCA{library_index % 10000:04d}",
+                "lane": lane_iter_,
+                "instrumentRunId": instrument_run_id,
+                "library": {"orcabusId": f"lib.{library_index:026d}", "libraryId": library_id},
+            },
+            range(1, self.random.choice([1, 2, 2, 4]) + 1)
+        ))
+
+    def generate(self):
+        profile_names = list(SUBJECT_PROFILES.keys())
+        profile_weights = list(map(
+            lambda profile_iter_: SUBJECT_PROFILES[profile_iter_]['weight'],
+            profile_names
+        ))
+        workflow_names = list(WORKFLOW_WEIGHTS.keys())
+        workflow_weights = list(WORKFLOW_WEIGHTS.values())
+
+        subject_index = 0
+        while len(self.libraries) < self.library_count:
+            profile_name = self.random.choices(profile_names, weights=profile_weights)[0]
+            subject = {
+                "orcabusId": f"sbj.{subject_index:026d}",
+                "subjectId": f"SBJ{subject_index:06d}",
+            }
+            self.profile_by_subject_id[subject['subjectId']] = profile_name
+            subject_index += 1
+
+            workflow = self.random.choices(workflow_names, weights=workflow_weights)[0]
+            if profile_name == "germline":
+                workflow = self.random.choice(["control", "germline"])
+            if profile_name == "negativeControl":
+                workflow = "control"
+
+            for library_type, phenotype in SUBJECT_PROFILES[profile_name]['libraries']:
+                if len(self.libraries) >= self.library_count:
+                    break
+                self.add_library(subject, library_type, phenotype, workflow)
+                # Top ups and re-sequenced libraries
+                if self.random.random() < TOPUP_PROBABILITY and len(self.libraries) < self.library_count:
+                    self.add_library(subject, library_type, phenotype, workflow)
+
+    def get_latest_instrument_run_id(self) -> str:
+        return self.get_instrument_run_id(len(self.libraries) - 1)
+
+    def get_subject_library_id_list_on_instrument_run(
+            self,
+            subject_id: str,
+            instrument_run_id: str,
+            sample_type_list: List[str],
+    ) -> List[str]:
+        """
+        The libraries the step function would pass to a make analysis events lambda for this subject
+        :param subject_id:
+        :param instrument_run_id:
+        :param sample_type_list:
+        :return:
+        """
+        return sorted(map(
+            lambda library_iter_: library_iter_['libraryId'],
+            filter(
+                lambda library_iter_: (
+                    library_iter_['subject']['subjectId'] == subject_id and
+                    library_iter_['type'] in sample_type_list and
+                    any(
+                        fastq_iter_['instrumentRunId'] == instrument_run_id
+                        for fastq_iter_ in self.fastqs_by_library_id[library_iter_['libraryId']]
+                    )
+                ),
+                self.libraries
+            )
+        ))
+
+    def get_sample_subject_id_list(
+            self,
+            profile_name_list: List[str],
+            subject_count: int,
+            instrument_run_id: Optional[str] = None,
+    ) -> List[str]:
+        """
+        Pick the newest subjects of the given profiles on an instrument run (the latest by default)
+        :param profile_name_list:
+        :param subject_count:
+        :param instrument_run_id:
+        :return:
+        """
+        if instrument_run_id is None:
+            instrument_run_id = self.get_latest_instrument_run_id()
+
+        subject_id_list = list(dict.fromkeys(map(
+            lambda library_iter_: library_iter_['subject']['subjectId'],
+            filter(
+                lambda library_iter_: (
+                    self.profile_by_subject_id[library_iter_['subject']['subjectId']] in profile_name_list and
+                    self.fastqs_by_library_id[library_iter_['libraryId']][0]['instrumentRunId'] == instrument_run_id
+                ),
+                reversed(self.libraries)
+            )
+        )))
+
+        return subject_id_list[:subject_count]
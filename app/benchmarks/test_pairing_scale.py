@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+
+"""
+Pairing benchmarks
+
+Drive the WGS, WTS and WGTS (post) make analysis events lambdas against synthetic catalogs of
+1k, 10k and 100k libraries, for a sample of subjects on the latest instrument run.
+
+For each lambda and catalog size we record
+  * the time per subject (each benchmark round is a cold invocation, the toolkit caches are cleared)
+  * the peak traced memory per subject
+  * the api calls made per subject
+
+The per-subject results feed the scaling budget checks in test_scaling_budget.py.
+"""
+
+# Standard imports
+import time
+import tracemalloc
+from typing import List, Dict, Any
+
+import pytest
+
+# Local imports
+from analysis_tool_kit.lambda_loader import load_lambda_module
+from conftest import LAMBDAS_DIR, clear_process_caches
+from scaling import record_scaling_result
+
+# Globals
+SUBJECTS_PER_BENCHMARK = 5
+BENCHMARK_ROUNDS = 3
+
+PAIRING_LAMBDAS_LIST = [
+    {
+        "lambdaName": "make_wgs_analysis_events_list",
+        "sampleTypeList": ["WGS"],
+        "profileNameList": ["wgts", "wgs", "wgsTumorOnly", "germline", "negativeControl"],
+    },
+    {
+        "lambdaName": "make_wts_analysis_events_list",
+        "sampleTypeList": ["WTS"],
+        "profileNameList": ["wgts", "wts"],
+    },
+    {
+        "lambdaName": "make_wgts_post_analysis_events_list",
+        "sampleTypeList": ["WGS", "WTS"],
+        "profileNameList": ["wgts", "wgs", "wts"],
+    },
+]
+
+
+def get_subject_events(catalog, pairing_lambda: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Get the events the step function would send the lambda, for a sample of subjects on the latest instrument run
+    :param catalog:
+    :param pairing_lambda:
+    :return:
+    """
+    instrument_run_id = catalog.get_latest_instrument_run_id()
+
+    return list(map(
+        lambda subject_id_iter_: {
+            "libraryIdList": catalog.get_subject_library_id_list_on_instrument_run(
+                subject_id=subject_id_iter_,
+                instrument_run_id=instrument_run_id,
+                sample_type_list=pairing_lambda['sampleTypeList'],
+            )
+        },
+        catalog.get_sample_subject_id_list(
+            profile_name_list=pairing_lambda['profileNameList'],
+            subject_count=SUBJECTS_PER_BENCHMARK,
+            instrument_run_id=instrument_run_id,
+        )
+    ))
+
+
+def get_peak_memory_bytes_per_subject(lambda_module, subject_events: List[Dict[str, Any]]) -> int:
+    """
+    Run each subject once (cold) under tracemalloc, and return the largest peak
+    :param lambda_module:
+    :param subject_events:
+    :return:
+    """
+    clear_process_caches()
+    peak_memory_bytes_list = []
+
+    tracemalloc.start()
+    try:
+        for subject_event in subject_events:
+            clear_process_caches()
+            baseline_bytes = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            lambda_module.handler(subject_event, None)
+            peak_memory_bytes_list.append(tracemalloc.get_traced_memory()[1] - baseline_bytes)
+    finally:
+        tracemalloc.stop()
+
+    return max(peak_memory_bytes_list)
+
+
+@pytest.mark.parametrize(
+    "pairing_lambda",
+    PAIRING_LAMBDAS_LIST,
+    ids=lambda pairing_lambda_iter_: pairing_lambda_iter_['lambdaName']
+)
+def test_pairing_scale(benchmark, catalog, api_call_counter, pairing_lambda):
+    lambda_module = load_lambda_module(LAMBDAS_DIR, pairing_lambda['lambdaName'])
+    subject_events = get_subject_events(catalog, pairing_lambda)
+    assert len(subject_events) > 0, "No subjects to benchmark on the latest instrument run"
+
+    # Api calls and memory, from a single traced pass
+    peak_memory_bytes_per_subject = get_peak_memory_bytes_per_subject(lambda_module, subject_events)
+    api_calls_per_subject = sum(api_call_counter.values()) / len(subject_events)
+
+    # Time, the fastest round for each subject
+    seconds_by_subject_index: Dict[int, List[float]] = {}
+
+    def run_subjects():
+        for subject_index, subject_event in enumerate(subject_events):
+            start = time.perf_counter()
+            lambda_module.handler(subject_event, None)
+            seconds_by_subject_index.setdefault(subject_index, []).append(time.perf_counter() - start)
+
+    benchmark.pedantic(run_subjects, setup=clear_process_caches, rounds=BENCHMARK_ROUNDS, iterations=1)
+
+    seconds_per_subject = sum(map(min, seconds_by_subject_index.values())) / len(subject_events)
+
+    result = {
+        "catalogSize": catalog.library_count,
+        "subjectCount": len(subject_events),
+        "secondsPerSubject": seconds_per_subject,
+        "peakMemoryBytesPerSubject": peak_memory_bytes_per_subject,
+        "apiCallsPerSubject": api_calls_per_subject,
+    }
+    benchmark.extra_info.update(result)
+    record_scaling_result(pairing_lambda['lambdaName'], catalog.library_count, result)
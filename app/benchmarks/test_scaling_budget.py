@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+
+"""
+Scaling budget checks
+
+Fail if the per-subject time or memory of a pairing lambda grows faster with the catalog than its budget allows,
+see scaling.py.
+
+These checks use the results of test_pairing_scale.py from the same session, and are skipped if it didn't run
+(or ran against a single catalog size).
+"""
+
+# Standard imports
+import pytest
+
+# Local imports
+from scaling import SCALING_RESULTS, METRIC_FLOORS, get_scaling_budgets, get_growth_exponent
+from test_pairing_scale import PAIRING_LAMBDAS_LIST
+
+
+@pytest.mark.parametrize(
+    "lambda_name",
+    list(map(lambda pairing_lambda_iter_: pairing_lambda_iter_['lambdaName'], PAIRING_LAMBDAS_LIST))
+)
+@pytest.mark.parametrize("metric", list(METRIC_FLOORS.keys()))
+def test_scaling_budget(lambda_name, metric):
+    if len(SCALING_RESULTS.get(lambda_name, {})) < 2:
+        pytest.skip(f"No pairing benchmarks for {lambda_name} across more than one catalog size")
+
+    budget = get_scaling_budgets()[lambda_name][metric]
+    growth_exponent = get_growth_exponent(lambda_name, metric)
+
+    assert growth_exponent <= budget, (
+        f"{lambda_name} {metric} grows with the catalog size to the power of {growth_exponent:.2f}, "
+        f"over the budget of {budget:.2f}: "
+        f"{ {size_iter_: result_iter_[metric] for size_iter_, result_iter_ in SCALING_RESULTS[lambda_name].items()} }"
+    )
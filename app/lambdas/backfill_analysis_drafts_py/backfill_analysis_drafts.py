@@ -0,0 +1,527 @@
+#!/usr/bin/env python3
+
+"""
+Backfill the analysis drafts of every subject in the library catalog, i.e. when a new workflow version is rolled out
+
+Inputs:
+  * backfillId, names the backfill's S3 prefix, invoke again with the same id to resume
+  * workflowNameList (optional), only keep the drafts of these workflows, i.e. ['sash']
+  * stageList (optional), the subject stages to evaluate, as per the dry run planner (default every subject stage)
+  * shardCount (optional, by default sized from the time the first invocation has left)
+  * workerCount (optional, default the number of cpus)
+
+Replaying each instrument run through the analysis builder step function re-evaluates every subject of every run,
+and each evaluation looks up the subject's history from the metadata service.
+
+Instead we
+  * stream the library catalog once into a snapshot,
+    the compact catalog serves each subject's history, and the libraries we evaluate are cached
+  * load the readset library index, and check which libraries have readsets once, as we stream the catalog,
+    only libraries with readsets are evaluated
+  * shard the subjects, by a hash of the subject orcabus id
+  * evaluate each shard in a worker process, forked from this one, so each worker inherits the snapshot,
+    the index, the stage handlers and their workflow objects
+
+Each of a subject's libraries (with readsets, of the stage's sample types) is evaluated on its own
+through the stage's make analysis events handler (this lambda is deployed with the source of every lambda),
+as though that library had just been sequenced, so it is paired with the subject's latest libraries
+as the analysis builder would pair it today. A subject's drafts are deduplicated by workflow and libraries.
+
+Handlers run in dry run mode, so drafts are never claimed in the draft ledger and no events are put on the bus,
+drafts with an existing workflow run are still dropped.
+
+Each shard's drafts are written to S3 as NDJSON (one draft event detail per line), for a controlled release,
+before the shard is added to the backfill's checkpoint. Shards in the checkpoint are skipped when we resume.
+We stop handing out shards once the lambda is running out of time and return with complete set to false,
+invoke again with the same backfillId to continue.
+
+Workers are processes with a pipe each rather than a multiprocessing pool,
+as lambda has no /dev/shm for the pool's semaphores.
+The workers share the OrcaBus API rate limits, each takes an even share.
+"""
+
+# Standard imports
+import json
+import logging
+import math
+import time
+import zlib
+from multiprocessing import get_context
+from multiprocessing.connection import Connection, wait
+from os import environ, cpu_count
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple, Set
+
+import boto3
+
+# Layer imports
+from analysis_tool_kit import trace_invocation
+from analysis_tool_kit.dry_run import enable_dry_run
+from analysis_tool_kit.compact_library import (
+    CompactLibrary,
+    set_compact_library_catalog_snapshot,
+    get_compact_library_catalog_snapshot,
+)
+from analysis_tool_kit.globals import API_RATE_LIMITS_ENV_VAR
+from analysis_tool_kit.http_client import get_api_rate_limits
+from analysis_tool_kit.lambda_loader import load_lambda_module
+from analysis_tool_kit.library_helpers import (
+    iter_all_libraries, add_libraries_to_library_cache, clear_library_cache
+)
+from analysis_tool_kit.readset_library_index import (
+    get_readset_library_index,
+    rebuild_readset_library_index,
+    library_has_readsets,
+)
+from analysis_tool_kit.warm_up import prefetch_workflows
+
+# Globals
+LAMBDAS_DIR = Path(__file__).parent.parent
+BACKFILL_BUCKET_NAME_ENV_VAR = "BACKFILL_BUCKET_NAME"
+BACKFILL_KEY_PREFIX_ENV_VAR = "BACKFILL_KEY_PREFIX"
+DEFAULT_BACKFILL_KEY_PREFIX = "backfills/"
+# Stop handing out shards once the lambda has less than this long left
+MIN_REMAINING_SECONDS_TO_DISPATCH = 180
+# Without a shardCount, shards are sized so a shard dispatched just before we stop still finishes,
+# and each worker gets through a few shards in the first invocation, from a rough estimate of a subject's evaluation
+ESTIMATED_SECONDS_PER_SUBJECT = 1
+MIN_SHARDS_PER_WORKER_PER_INVOCATION = 4
+# How long a worker is given to exit once it is told to stop, before it is terminated
+WORKER_JOIN_TIMEOUT_SECONDS = 30
+
+# Never claim drafts, or write to the draft ledger
+enable_dry_run()
+
+# Set logger
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def get_subject_stages_list(stage_list: Optional[List[str]]) -> List[Dict[str, Any]]:
+    """
+    Get the subject stages to evaluate, as per the dry run planner
+    :param stage_list:
+    :return:
+    """
+    subject_stages_list = load_lambda_module(LAMBDAS_DIR, 'plan_analysis_builder_run').SUBJECT_STAGES_LIST
+
+    if stage_list is None:
+        return subject_stages_list
+
+    unknown_stage_list = sorted(set(stage_list) - set(map(
+        lambda subject_stage_iter_: subject_stage_iter_['stage'],
+        subject_stages_list
+    )))
+    if len(unknown_stage_list) > 0:
+        raise ValueError(f"Unknown stages {', '.join(unknown_stage_list)}")
+
+    return list(filter(
+        lambda subject_stage_iter_: subject_stage_iter_['stage'] in stage_list,
+        subject_stages_list
+    ))
+
+
+def get_shard_index(subject_orcabus_id: str, shard_count: int) -> int:
+    # A stable hash, so a subject lands in the same shard on every invocation
+    return zlib.crc32(subject_orcabus_id.encode()) % shard_count
+
+
+def get_s3_location(backfill_id: str, *key_parts: str) -> Tuple[str, str]:
+    return (
+        environ[BACKFILL_BUCKET_NAME_ENV_VAR],
+        "/".join([
+            environ.get(BACKFILL_KEY_PREFIX_ENV_VAR, DEFAULT_BACKFILL_KEY_PREFIX).strip("/"),
+            backfill_id,
+            *key_parts
+        ])
+    )
+
+
+def load_checkpoint(backfill_id: str) -> Optional[Dict[str, Any]]:
+    bucket, key = get_s3_location(backfill_id, "checkpoint.json")
+    s3_client = boto3.client('s3')
+    try:
+        response = s3_client.get_object(Bucket=bucket, Key=key)
+    except s3_client.exceptions.NoSuchKey:
+        return None
+    return json.loads(response['Body'].read())
+
+
+def save_checkpoint(checkpoint: Dict[str, Any]):
+    bucket, key = get_s3_location(checkpoint['backfillId'], "checkpoint.json")
+    boto3.client('s3').put_object(
+        Bucket=bucket,
+        Key=key,
+        Body=json.dumps(checkpoint, indent=2).encode(),
+        ContentType="application/json",
+    )
+
+
+def save_shard_drafts(backfill_id: str, shard_index: int, event_detail_list: List[Dict[str, Any]]) -> str:
+    """
+    Write a shard's drafts to S3 as NDJSON
+    :param backfill_id:
+    :param shard_index:
+    :param event_detail_list:
+    :return: The drafts' S3 uri
+    """
+    bucket, key = get_s3_location(backfill_id, "drafts", f"shard-{shard_index:05d}.ndjson")
+    boto3.client('s3').put_object(
+        Bucket=bucket,
+        Key=key,
+        Body=b"".join(map(
+            lambda event_detail_iter_: json.dumps(event_detail_iter_, separators=(",", ":")).encode() + b"\n",
+            event_detail_list
+        )),
+        ContentType="application/x-ndjson",
+    )
+    return f"s3://{bucket}/{key}"
+
+
+def load_catalog_snapshot(subject_stages_list: List[Dict[str, Any]]) -> Set[str]:
+    """
+    Stream the library catalog once, into the compact catalog snapshot,
+    caching the libraries we'll evaluate (those of the stages' sample types, with readsets)
+    :param subject_stages_list:
+    :return: The ids of the libraries we'll evaluate
+    """
+    sample_type_set = set(
+        sample_type
+        for subject_stage in subject_stages_list
+        for sample_type in subject_stage['sampleTypeList']
+    )
+
+    # The snapshot's libraries are kept for the rest of this invocation (and only this invocation)
+    clear_library_cache()
+    compact_library_catalog: List[CompactLibrary] = []
+    readset_library_id_set: Set[str] = set()
+    for library_obj in iter_all_libraries():
+        compact_library_catalog.append(CompactLibrary.from_library(library_obj))
+        if library_obj.get('type', None) in sample_type_set and library_has_readsets(library_obj['libraryId']):
+            add_libraries_to_library_cache([library_obj], ttl_seconds=None)
+            readset_library_id_set.add(library_obj['libraryId'])
+
+    set_compact_library_catalog_snapshot(compact_library_catalog)
+
+    return readset_library_id_set
+
+
+def get_default_shard_count(subject_count: int, worker_count: int, remaining_seconds: float) -> int:
+    """
+    Size the shards from the time this invocation has left
+    :param subject_count:
+    :param worker_count:
+    :param remaining_seconds:
+    :return:
+    """
+    max_shard_seconds = min(
+        MIN_REMAINING_SECONDS_TO_DISPATCH,
+        remaining_seconds / MIN_SHARDS_PER_WORKER_PER_INVOCATION,
+    )
+    return max(
+        worker_count,
+        math.ceil(subject_count * ESTIMATED_SECONDS_PER_SUBJECT / max_shard_seconds),
+    )
+
+
+def get_subject_orcabus_id_list() -> List[str]:
+    return sorted(filter(
+        lambda subject_orcabus_id_iter_: subject_orcabus_id_iter_ is not None,
+        get_compact_library_catalog_snapshot().keys()
+    ))
+
+
+def get_shard_subject_orcabus_ids(shard_count: int) -> Dict[int, List[str]]:
+    shard_subject_orcabus_ids: Dict[int, List[str]] = {}
+    for subject_orcabus_id in get_subject_orcabus_id_list():
+        shard_subject_orcabus_ids.setdefault(get_shard_index(subject_orcabus_id, shard_count), []).append(
+            subject_orcabus_id
+        )
+    return shard_subject_orcabus_ids
+
+
+def get_draft_key(event_detail: Dict[str, Any]) -> Tuple[str, str, Tuple[str, ...]]:
+    return (
+        event_detail['workflow']['name'],
+        event_detail['workflow']['version'],
+        tuple(sorted(map(
+            lambda library_iter_: library_iter_['libraryId'],
+            event_detail['libraries']
+        ))),
+    )
+
+
+@trace_invocation
+def evaluate_subject(event: Dict[str, Any], context) -> List[Dict[str, Any]]:
+    """
+    Evaluate each of a subject's libraries on its own, for each stage
+    :param event: The subject, its libraries with readsets, the stages and the workflow names to keep
+    :param context:
+    :return: The subject's drafts, deduplicated
+    """
+    readset_library_id_set = set(event['readsetLibraryIdList'])
+    subject_libraries = sorted(
+        get_compact_library_catalog_snapshot().get(event['subjectOrcabusId'], []),
+        key=lambda library_iter_: library_iter_['orcabusId']
+    )
+
+    drafts_by_key: Dict[Tuple[str, str, Tuple[str, ...]], Dict[str, Any]] = {}
+    for subject_stage in event['subjectStagesList']:
+        make_events_module = load_lambda_module(LAMBDAS_DIR, subject_stage['lambdaName'])
+        for library in filter(
+            lambda library_iter_: (
+                library_iter_['type'] in subject_stage['sampleTypeList'] and
+                library_iter_['libraryId'] in readset_library_id_set
+            ),
+            subject_libraries
+        ):
+            make_events_response = make_events_module.handler(
+                {
+                    "subjectId": event['subjectId'],
+                    "libraryIdList": [library['libraryId']],
+                },
+                context
+            )
+            # Fail the shard (so it is evaluated again when we resume) rather than miss the subject's drafts
+            if make_events_response.get('skipped', None) is not None:
+                raise RuntimeError(
+                    f"{subject_stage['stage']} skipped {event['subjectId']}: {make_events_response['skipped']}"
+                )
+            for event_detail in make_events_response['eventDetailList']:
+                if (
+                    event['workflowNameList'] is not None and
+                    event_detail['workflow']['name'] not in event['workflowNameList']
+                ):
+                    continue
+                drafts_by_key.setdefault(get_draft_key(event_detail), event_detail)
+
+    return list(drafts_by_key.values())
+
+
+def run_worker(
+        connection: Connection,
+        subject_stages_list: List[Dict[str, Any]],
+        workflow_name_list: Optional[List[str]],
+        readset_library_id_set: Set[str],
+):
+    """
+    Evaluate each shard we're sent, until we're sent None
+    :param connection:
+    :param subject_stages_list:
+    :param workflow_name_list:
+    :param readset_library_id_set: The libraries with readsets, as found when we streamed the catalog
+    :return:
+    """
+    while (shard := connection.recv()) is not None:
+        shard_index, subject_orcabus_id_list = shard
+        start = time.perf_counter()
+        try:
+            event_detail_list = []
+            for subject_orcabus_id in subject_orcabus_id_list:
+                subject_library_id_list = list(map(
+                    lambda library_iter_: library_iter_.libraryId,
+                    get_compact_library_catalog_snapshot()[subject_orcabus_id]
+                ))
+                event_detail_list.extend(evaluate_subject(
+                    {
+                        "subjectOrcabusId": subject_orcabus_id,
+                        "subjectId": get_compact_library_catalog_snapshot()[subject_orcabus_id][0].subjectId,
+                        "libraryIdList": subject_library_id_list,
+                        "readsetLibraryIdList": list(filter(
+                            lambda library_id_iter_: library_id_iter_ in readset_library_id_set,
+                            subject_library_id_list
+                        )),
+                        "subjectStagesList": subject_stages_list,
+                        "workflowNameList": workflow_name_list,
+                    },
+                    None
+                ))
+            connection.send({
+                "shardIndex": shard_index,
+                "subjectCount": len(subject_orcabus_id_list),
+                "eventDetailList": event_detail_list,
+                "durationSeconds": round(time.perf_counter() - start, 3),
+            })
+        except Exception as e:
+            logger.exception(f"Shard {shard_index} failed")
+            connection.send({
+                "shardIndex": shard_index,
+                "error": repr(e),
+            })
+    connection.close()
+
+
+def share_api_rate_limits(worker_count: int):
+    """
+    Give each worker an even share of the OrcaBus API rate limits, workers build their token buckets from the env
+    :param worker_count:
+    :return:
+    """
+    environ[API_RATE_LIMITS_ENV_VAR] = json.dumps(dict(map(
+        lambda kv_iter_: (
+            kv_iter_[0],
+            {
+                "rate": kv_iter_[1]['rate'] / worker_count,
+                "burst": max(kv_iter_[1]['burst'] / worker_count, 1),
+            }
+        ),
+        get_api_rate_limits().items()
+    )))
+
+
+def get_remaining_seconds(context) -> float:
+    if context is None or not hasattr(context, "get_remaining_time_in_millis"):
+        return float("inf")
+    return context.get_remaining_time_in_millis() / 1000
+
+
+def handler(event, context):
+    """
+    Backfill the analysis drafts of every subject, resuming from the backfill's checkpoint
+    :param event:
+    :param context:
+    :return:
+    """
+    # Get inputs
+    backfill_id = event['backfillId']
+    workflow_name_list = event.get('workflowNameList', None)
+    shard_count = event.get('shardCount', None)
+    worker_count = event.get('workerCount', None) or cpu_count() or 1
+    subject_stages_list = get_subject_stages_list(event.get('stageList', None))
+    stage_list = list(map(lambda subject_stage_iter_: subject_stage_iter_['stage'], subject_stages_list))
+
+    # Resume from the checkpoint, the backfill's inputs can't change once it has started
+    checkpoint = load_checkpoint(backfill_id)
+    if checkpoint is not None and (
+        checkpoint['workflowNameList'] != workflow_name_list or
+        checkpoint['stageList'] != stage_list or
+        (shard_count is not None and checkpoint['shardCount'] != shard_count)
+    ):
+        raise ValueError(
+            f"Backfill {backfill_id} was started with different inputs, "
+            "resume with the same workflowNameList, stageList and shardCount, or start a new backfill"
+        )
+
+    # Load the stage handlers (and their workflow objects), the index and the catalog before we fork
+    for subject_stage in subject_stages_list:
+        prefetch_workflows(load_lambda_module(LAMBDAS_DIR, subject_stage['lambdaName']).WORKFLOW_OBJECTS_DICT)
+    # Every library missing from the index is checked with the fastq service, so build one if there is none
+    if get_readset_library_index() is None:
+        rebuild_readset_library_index()
+    readset_library_id_set = load_catalog_snapshot(subject_stages_list)
+
+    # The shard count is fixed when the backfill starts, a subject must land in the same shard when we resume
+    if checkpoint is None:
+        checkpoint = {
+            "backfillId": backfill_id,
+            "workflowNameList": workflow_name_list,
+            "stageList": stage_list,
+            "shardCount": shard_count or get_default_shard_count(
+                subject_count=len(get_subject_orcabus_id_list()),
+                worker_count=worker_count,
+                remaining_seconds=get_remaining_seconds(context),
+            ),
+            "completedShards": {},
+            "failedShards": {},
+        }
+        save_checkpoint(checkpoint)
+    shard_count = checkpoint['shardCount']
+
+    shard_subject_orcabus_ids = get_shard_subject_orcabus_ids(shard_count)
+    pending_shard_list = list(filter(
+        lambda shard_iter_: str(shard_iter_[0]) not in checkpoint['completedShards'],
+        sorted(shard_subject_orcabus_ids.items())
+    ))
+    logger.info(
+        f"Backfill {backfill_id}, {len(pending_shard_list)} of {len(shard_subject_orcabus_ids)} shards to evaluate"
+    )
+
+    # Start the workers
+    worker_count = min(worker_count, len(pending_shard_list))
+    share_api_rate_limits(max(worker_count, 1))
+    mp_context = get_context("fork")
+    workers: List[Tuple[Any, Connection]] = []
+    for _ in range(worker_count):
+        parent_connection, child_connection = mp_context.Pipe()
+        process = mp_context.Process(
+            target=run_worker,
+            args=(child_connection, subject_stages_list, workflow_name_list, readset_library_id_set),
+        )
+        process.start()
+        child_connection.close()
+        workers.append((process, parent_connection))
+
+    # The shard each worker is evaluating, so a worker that dies can have its shard marked as failed
+    shard_index_by_connection: Dict[Connection, int] = {}
+
+    def dispatch(connection_iter_: Connection) -> bool:
+        if len(pending_shard_list) == 0 or get_remaining_seconds(context) < MIN_REMAINING_SECONDS_TO_DISPATCH:
+            return False
+        shard = pending_shard_list.pop(0)
+        connection_iter_.send(shard)
+        shard_index_by_connection[connection_iter_] = shard[0]
+        return True
+
+    try:
+        busy_connection_list = list(filter(
+            dispatch,
+            map(lambda worker_iter_: worker_iter_[1], workers)
+        ))
+
+        # Save each shard as it finishes, and hand its worker the next
+        while len(busy_connection_list) > 0:
+            for connection in wait(busy_connection_list):
+                try:
+                    shard_result = connection.recv()
+                except (EOFError, OSError) as e:
+                    # The worker died mid shard (i.e. it was OOM killed), it can't be handed another
+                    shard_index_key = str(shard_index_by_connection[connection])
+                    logger.error(f"Worker evaluating shard {shard_index_key} exited without a result")
+                    checkpoint['failedShards'][shard_index_key] = f"Worker exited without a result: {e!r}"
+                    save_checkpoint(checkpoint)
+                    busy_connection_list.remove(connection)
+                    continue
+
+                shard_index_key = str(shard_result['shardIndex'])
+                if 'error' in shard_result:
+                    checkpoint['failedShards'][shard_index_key] = shard_result['error']
+                else:
+                    checkpoint['completedShards'][shard_index_key] = {
+                        "subjectCount": shard_result['subjectCount'],
+                        "draftCount": len(shard_result['eventDetailList']),
+                        "durationSeconds": shard_result['durationSeconds'],
+                        "draftsUri": save_shard_drafts(
+                            backfill_id, shard_result['shardIndex'], shard_result['eventDetailList']
+                        ),
+                    }
+                    checkpoint['failedShards'].pop(shard_index_key, None)
+                save_checkpoint(checkpoint)
+
+                if not dispatch(connection):
+                    busy_connection_list.remove(connection)
+    finally:
+        # Stop the workers, including any left running if we failed
+        for process, connection in workers:
+            try:
+                connection.send(None)
+            except OSError:
+                # The worker has already exited
+                pass
+            connection.close()
+            process.join(timeout=WORKER_JOIN_TIMEOUT_SECONDS)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+
+    return {
+        "backfillId": backfill_id,
+        "complete": len(checkpoint['completedShards']) == len(shard_subject_orcabus_ids),
+        "shardCount": len(shard_subject_orcabus_ids),
+        "completedShardCount": len(checkpoint['completedShards']),
+        "failedShards": checkpoint['failedShards'],
+        "draftCount": sum(map(
+            lambda completed_shard_iter_: completed_shard_iter_['draftCount'],
+            checkpoint['completedShards'].values()
+        )),
+        "checkpointUri": "s3://{}/{}".format(*get_s3_location(backfill_id, "checkpoint.json")),
+    }
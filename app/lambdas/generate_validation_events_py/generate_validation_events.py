@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+
+"""
+Generate the validation draft events for a NATA approved workflow
+
+Given the workflow key and the list of test sample configurations for that workflow,
+generate a draft event for each sample configuration.
+
+All NATA approved workflow objects are read from SSM in a single request when the lambda is initialised,
+so one warm lambda can serve every workflow.
+
+Libraries and their readsets are looked up once per invocation, no matter how many
+sample configurations they appear in, and the readsets of each library are looked up concurrently.
+"""
+
+# Standard imports
+import json
+from os import environ
+from typing import List, Dict, Literal, TypedDict
+import logging
+
+# Layer imports
+from orcabus_api_tools.metadata.models import Library
+from analysis_tool_kit.models import Payload, ReadSet
+from analysis_tool_kit.ssm_helpers import get_ssm_values
+from analysis_tool_kit.analysis_helpers import (
+    get_readsets_in_libraries,
+    get_workflow,
+    build_workflow_draft_event_detail,
+)
+from analysis_tool_kit import (
+    # Functions
+    get_libraries_list_from_library_id_list_chunked,
+    # Models
+    Workflow,
+    EventLibrary,
+)
+
+# Type hints
+WorkflowsList = Literal[
+    'DRAGEN_TSO500_CTDNA',
+    'DRAGEN_WGTS_DNA',
+    'ONCOANALYSER_WGTS_DNA',
+    'SASH',
+]
+
+
+class WorkflowDraftType(TypedDict):
+    libraryIdList: List[str]
+    payload: Payload
+
+
+# Globals
+WORKFLOW_VALIDATION_PREFIX = 'umccr--validation'
+WORKFLOW_KEYS_LIST: List[WorkflowsList] = [
+    'DRAGEN_TSO500_CTDNA',
+    'DRAGEN_WGTS_DNA',
+    'ONCOANALYSER_WGTS_DNA',
+    'SASH',
+]
+
+# Set logger
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def get_workflow_objects_dict() -> Dict[WorkflowsList, Workflow]:
+    """
+    Get the workflow object of every NATA approved workflow, in a single SSM request
+    :return:
+    """
+    ssm_parameter_name_by_workflow_key = dict(map(
+        lambda workflow_key_iter_: (
+            workflow_key_iter_,
+            environ[f'{workflow_key_iter_}_WORKFLOW_OBJECT_SSM_PARAMETER_NAME']
+        ),
+        WORKFLOW_KEYS_LIST
+    ))
+
+    parameter_value_by_name = get_ssm_values(list(ssm_parameter_name_by_workflow_key.values()))
+
+    return dict(map(
+        lambda kv_iter_: (kv_iter_[0], json.loads(parameter_value_by_name[kv_iter_[1]])),
+        ssm_parameter_name_by_workflow_key.items()
+    ))
+
+
+WORKFLOW_OBJECTS_DICT: Dict[WorkflowsList, Workflow] = get_workflow_objects_dict()
+
+
+def handler(event, context):
+    """
+    Generate the validation draft events for a workflow
+    :param event:
+    :param context:
+    :return:
+    """
+    # Get the workflow key and the sample configurations
+    workflow_key: WorkflowsList = event.get("workflowKey")
+    sample_configurations_list: List[WorkflowDraftType] = event.get("sampleConfigurationsList", [])
+
+    if workflow_key not in WORKFLOW_OBJECTS_DICT:
+        raise ValueError(
+            f"Unknown workflow key '{workflow_key}', expected one of {WORKFLOW_KEYS_LIST}"
+        )
+
+    # Get every library across all sample configurations in one lookup
+    libraries_by_library_id: Dict[str, Library] = dict(map(
+        lambda library_obj_iter_: (library_obj_iter_['libraryId'], library_obj_iter_),
+        get_libraries_list_from_library_id_list_chunked(
+            list(dict.fromkeys(
+                library_id_iter_
+                for sample_configuration_iter_ in sample_configurations_list
+                for library_id_iter_ in sample_configuration_iter_['libraryIdList']
+            ))
+        )
+    ))
+
+    # Get the readsets of each library once
+    readsets_by_library_id: Dict[str, List[ReadSet]] = get_readsets_in_libraries(
+        list(libraries_by_library_id.keys())
+    )
+
+    # Get the workflow object
+    workflow = get_workflow(**WORKFLOW_OBJECTS_DICT[workflow_key])
+
+    event_detail_list = []
+    for sample_configuration in sample_configurations_list:
+        event_libraries: List[EventLibrary] = list(filter(
+            lambda event_library_iter_: len(event_library_iter_['readsets']) > 0,
+            map(
+                lambda library_id_iter_: {
+                    "orcabusId": libraries_by_library_id[library_id_iter_]['orcabusId'],
+                    "libraryId": library_id_iter_,
+                    "readsets": readsets_by_library_id[library_id_iter_],
+                },
+                filter(
+                    lambda library_id_iter_: library_id_iter_ in libraries_by_library_id,
+                    sample_configuration['libraryIdList']
+                )
+            )
+        ))
+
+        event_detail_list.append(
+            build_workflow_draft_event_detail(
+                workflow=workflow,
+                event_libraries=event_libraries,
+                payload=sample_configuration['payload'],
+                workflow_run_prefix=WORKFLOW_VALIDATION_PREFIX,
+            )
+        )
+
+    return {
+        "eventDetailList": event_detail_list
+    }
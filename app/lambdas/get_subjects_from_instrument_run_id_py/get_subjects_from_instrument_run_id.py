@@ -5,25 +5,53 @@ Given an insturment run id, list the instrument run ids given a sample type
 
 Inputs:
   * sampleType
-  * instrumentRunId
+  * instrumentRunId, or instrumentRunIdList (batch mode)
+  * libraryIdList (optional)
 
+If libraryIdList is provided (i.e the libraries in the triggering FastqListRowsAdded event),
+we run in incremental mode and only return the subjects of those libraries,
+rather than enumerating every library on the instrument run.
+
+In batch mode the libraries of every instrument run are considered,
+so a subject on more than one of the runs is only returned once.
 """
 
 # Layer imports
-from orcabus_api_tools.sequence import get_libraries_from_instrument_run_id
-from orcabus_api_tools.metadata import get_libraries_list_from_library_id_list
+from analysis_tool_kit import (
+    get_libraries_list_from_library_id_list_chunked,
+    profile_slow_invocations,
+    skip_on_circuit_open,
+    trace_invocation,
+    warm_up_on_event,
+)
+from analysis_tool_kit.instrument_run_helpers import (
+    get_instrument_run_id_list,
+    get_library_id_list_from_instrument_run_id_list,
+)
 
 
+@warm_up_on_event()
+@profile_slow_invocations
+@trace_invocation
+@skip_on_circuit_open({"subjectIdList": []})
 def handler(event, context):
     # Get inputs
-    instrument_run_id = event['instrumentRunId']
+    instrument_run_id_list = get_instrument_run_id_list(event)
     sample_type_list = event['sampleTypeList']
+    library_id_list = event.get('libraryIdList', None)
+
+    if len(instrument_run_id_list) == 0:
+        raise ValueError("Expected an instrumentRunId or instrumentRunIdList")
+
+    # Not in incremental mode, consider every library on the instrument run(s)
+    if not library_id_list:
+        library_id_list = get_library_id_list_from_instrument_run_id_list(instrument_run_id_list)
 
     # Get libraries
     libraries = list(filter(
         lambda library_iter_: library_iter_['type'] in sample_type_list,
-        get_libraries_list_from_library_id_list(
-            list(set(get_libraries_from_instrument_run_id(instrument_run_id)))
+        get_libraries_list_from_library_id_list_chunked(
+            list(set(library_id_list))
         )
     ))
 
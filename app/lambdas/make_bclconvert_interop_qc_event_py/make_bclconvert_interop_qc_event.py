@@ -10,9 +10,6 @@ from typing import List, Dict, Any, Literal, Optional
 import logging
 
 # Layer imports
-from orcabus_api_tools.metadata import (
-    get_libraries_list_from_library_id_list,
-)
 from orcabus_api_tools.metadata.models import Library
 from orcabus_api_tools.utils.aws_helpers import get_ssm_value
 from orcabus_api_tools.sequence import (
@@ -20,11 +17,21 @@ from orcabus_api_tools.sequence import (
     get_library_id_list_in_sequence
 )
 from analysis_tool_kit.analysis_helpers import (
-    get_libraries_with_readsets,
-    get_existing_workflow_runs,
+    get_workflow,
+    get_run_event_libraries,
+    get_rgid_list_from_event_libraries,
+    build_workflow_draft_event_detail,
+    claim_workflow_draft,
+    release_workflow_draft,
 )
 from analysis_tool_kit import (
-    add_workflow_draft_event_detail,
+    EventLibrary,
+    get_libraries_list_from_library_id_list_chunked,
+    warm_up_on_event,
+    validate_draft_events,
+    skip_on_circuit_open,
+    profile_slow_invocations,
+    trace_invocation,
     Workflow,
 )
 
@@ -49,27 +56,19 @@ logger = logging.getLogger(__name__)
 def add_bclconvert_interop_qc_draft_event(
         instrument_run_id: str,
         libraries: List[Library],
+        event_libraries: List[EventLibrary],
 ):
     """
     Add the bclconvert interop qc draft event
+    :param instrument_run_id:
     :param libraries:
+    :param event_libraries: The libraries with their readsets on this instrument run
     :return:
     """
-
-    default_draft_event_detail = add_workflow_draft_event_detail(
-        libraries=libraries,
-        **WORKFLOW_OBJECT_DICT['BCLCONVERT_INTEROP_QC']
-    )
-
-    # Fix 'libraries' by filtering to only those readsets in the current instrument run id
-    default_draft_event_detail['libraries'] = get_libraries_with_readsets(
-        libraries,
-        instrument_run_id=instrument_run_id,
-    )
-
-    # Add payload data details
-    default_draft_event_detail.update({
-        "payload": {
+    return build_workflow_draft_event_detail(
+        workflow=get_workflow(**WORKFLOW_OBJECT_DICT['BCLCONVERT_INTEROP_QC']),
+        event_libraries=event_libraries,
+        payload={
             "version": PAYLOAD_VERSION_DICT['BCLCONVERT_INTEROP_QC'],
             "data": {
                 "tags": {
@@ -80,10 +79,8 @@ def add_bclconvert_interop_qc_draft_event(
                     ))
                 }
             }
-        }
-    })
-
-    return default_draft_event_detail
+        },
+    )
 
 
 def generate_bclconvert_interop_qc_draft(
@@ -97,26 +94,43 @@ def generate_bclconvert_interop_qc_draft(
             "BCLConvert InterOp QC event requires at least one library"
         )
 
-    # Check for existing runs
-    existing_workflow_runs = get_existing_workflow_runs(
+    # Get the readsets on this run once, for both the existence check and the draft
+    event_libraries = get_run_event_libraries(libraries, instrument_run_id=instrument_run_id)
+    rgid_list = get_rgid_list_from_event_libraries(event_libraries)
+
+    # Claim the draft, fails if we already have a draft or workflow run for these libraries
+    if not claim_workflow_draft(
         workflow_name=WORKFLOW_OBJECT_DICT['BCLCONVERT_INTEROP_QC']['name'],
         workflow_version=WORKFLOW_OBJECT_DICT['BCLCONVERT_INTEROP_QC']['version'],
-        libraries=libraries
-    )
-
-    if len(existing_workflow_runs) > 0:
+        libraries=libraries,
+        rgid_list=rgid_list,
+    ):
         logger.warning(
             "Existing BCLConvert InterOp QC workflow runs found for this run %s" % instrument_run_id
         )
         return None
 
-
-    return add_bclconvert_interop_qc_draft_event(
-        instrument_run_id=instrument_run_id,
-        libraries=libraries
-    )
+    try:
+        return add_bclconvert_interop_qc_draft_event(
+            instrument_run_id=instrument_run_id,
+            libraries=libraries,
+            event_libraries=event_libraries,
+        )
+    except Exception:
+        release_workflow_draft(
+            workflow_name=WORKFLOW_OBJECT_DICT['BCLCONVERT_INTEROP_QC']['name'],
+            workflow_version=WORKFLOW_OBJECT_DICT['BCLCONVERT_INTEROP_QC']['version'],
+            libraries=libraries,
+            rgid_list=rgid_list,
+        )
+        raise
 
 
+@warm_up_on_event(WORKFLOW_OBJECT_DICT)
+@profile_slow_invocations
+@trace_invocation
+@skip_on_circuit_open({"eventDetailList": []})
+@validate_draft_events
 def handler(event, context):
     """
     Get the library id list
@@ -135,7 +149,7 @@ def handler(event, context):
         )['orcabusId']
     )
 
-    libraries_list = get_libraries_list_from_library_id_list(
+    libraries_list = get_libraries_list_from_library_id_list_chunked(
         library_id_list=library_id_list
     )
 
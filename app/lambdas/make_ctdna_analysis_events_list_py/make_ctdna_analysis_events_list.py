@@ -13,21 +13,23 @@ We do not expect the case for there to be multiple tumors and multiple normals f
 # Standard imports
 import json
 from os import environ
-from typing import List, Dict, Literal, Optional, Union
+from typing import List, Dict, Literal
 import logging
 
 # Layer imports
-from orcabus_api_tools.metadata import (
-    get_libraries_list_from_library_id_list,
-)
 from orcabus_api_tools.metadata.models import Library
 from orcabus_api_tools.utils.aws_helpers import get_ssm_value
 from analysis_tool_kit import (
     # Functions
-    add_workflow_draft_event_detail,
-    get_existing_workflow_runs,
+    skip_on_circuit_open,
+    profile_slow_invocations,
+    warm_up_on_event,
+    validate_draft_events,
+    trace_invocation,
+    generate_workflow_drafts,
+    get_libraries_list_from_library_id_list_chunked,
     # Models
-    Workflow, EventLibrary
+    Workflow, DraftRequest,
 )
 
 # Type hints
@@ -39,54 +41,38 @@ WORKFLOW_OBJECTS_DICT: Dict[WorkflowsList, Workflow] = {
     "DRAGEN_TSO500_CTDNA": json.loads(get_ssm_value(environ['DRAGEN_TSO500_CTDNA_WORKFLOW_OBJECT_SSM_PARAMETER_NAME'])),
 }
 
-DRAFT_STATUS = "DRAFT"
-
 # Set logger
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
-def add_dragen_tso500_ctdna_draft_event(
+def get_ctdna_draft_requests(
         libraries: List[Library],
-) -> Optional[Dict[str, Union[str, Workflow, list[EventLibrary]]]]:
+) -> List[DraftRequest]:
     """
-    Add the dragen tso500 ctdna draft event
+    Get the ctDNA draft requests for a set of libraries
     :param libraries:
     :return:
     """
-    # Check that we have not had any other runs for this library and these readsets
+    # Each draft is for exactly one library
     if len(libraries) != 1:
         raise ValueError(
             "DRAGEN TSO500 ctDNA draft event requires exactly one library"
         )
 
-    # Check for existing runs
-    existing_workflow_runs = get_existing_workflow_runs(
-        workflow_name=WORKFLOW_OBJECTS_DICT['DRAGEN_TSO500_CTDNA']['name'],
-        workflow_version=WORKFLOW_OBJECTS_DICT['DRAGEN_TSO500_CTDNA']['version'],
-        libraries=libraries
-    )
-
-    if len(existing_workflow_runs) > 0:
-        logger.warning(
-            "Existing DRAGEN TSO500 ctDNA workflow runs found for library: %s" % libraries[0]['libraryId']
-        )
-        return None
-
-    return add_workflow_draft_event_detail(
-        libraries=libraries,
-        **WORKFLOW_OBJECTS_DICT['DRAGEN_TSO500_CTDNA'],
-    )
-
-
-def generate_ctdna_draft_lists(
-        libraries: List[Library],
-) -> List[Union[Dict[str, Union[str, Workflow, list[EventLibrary]]], None]]:
     return [
-        add_dragen_tso500_ctdna_draft_event(libraries),
+        {
+            "workflowKey": "DRAGEN_TSO500_CTDNA",
+            "libraries": libraries,
+        },
     ]
 
 
+@warm_up_on_event(WORKFLOW_OBJECTS_DICT)
+@profile_slow_invocations
+@trace_invocation
+@skip_on_circuit_open({"eventDetailList": []})
+@validate_draft_events
 def handler(event, context):
     """
     Get the library id list
@@ -98,7 +84,7 @@ def handler(event, context):
     library_id_list = event.get("libraryIdList", [])
 
     # Get the libraries as library objects
-    libraries_list: List[Library] = get_libraries_list_from_library_id_list(
+    libraries_list: List[Library] = get_libraries_list_from_library_id_list_chunked(
         library_id_list
     )
 
@@ -111,16 +97,16 @@ def handler(event, context):
         libraries_list
     ))
 
-    events_list = []
+    draft_request_list: List[DraftRequest] = []
     for library_iter in tumor_libraries:
         # Add the tso500 ctdna draft event
-        events_list.extend(
-            generate_ctdna_draft_lists([library_iter])
+        draft_request_list.extend(
+            get_ctdna_draft_requests([library_iter])
         )
 
     return {
         "eventDetailList": list(filter(
             lambda event_iter_: event_iter_ is not None,
-            events_list
+            generate_workflow_drafts(WORKFLOW_OBJECTS_DICT, draft_request_list)
         ))
     }
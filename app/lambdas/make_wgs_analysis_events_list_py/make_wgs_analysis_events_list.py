@@ -14,24 +14,31 @@ We do not expect the case for there to be multiple tumors and multiple normals f
 import json
 from copy import copy
 from os import environ
-from typing import List, Dict, Literal, Optional, Union
+from typing import List, Dict, Literal
 import logging
 
 # Layer imports
-from orcabus_api_tools.metadata import (
-    get_libraries_list_from_library_id_list,
-    get_all_libraries
-)
 from orcabus_api_tools.metadata.models import Library
 from orcabus_api_tools.utils.aws_helpers import get_ssm_value
 
 from analysis_tool_kit import (
+    skip_on_circuit_open,
+    profile_slow_invocations,
+    warm_up_on_event,
+    validate_draft_events,
+    trace_invocation,
     Workflow,
-    EventLibrary,
-    get_existing_workflow_runs,
-    add_workflow_draft_event_detail,
+    generate_workflow_drafts,
+    DraftRequest,
+    get_libraries_list_from_library_id_list_chunked,
+    get_compact_subject_libraries,
+)
+from analysis_tool_kit.readset_library_index import add_readset_library_ids, library_has_readsets
+from analysis_tool_kit.unpairable_subject_cache import (
+    is_subject_unpairable,
+    mark_subject_unpairable,
+    clear_subject_unpairable,
 )
-from analysis_tool_kit.analysis_helpers import get_libraries_with_readsets
 
 # Type hints
 WorkflowName = Literal['DRAGEN_WGTS_DNA', 'ONCOANALYSER_WGTS_DNA', 'SASH']
@@ -44,9 +51,6 @@ WORKFLOW_OBJECTS_DICT: Dict[WorkflowName, Workflow] = {
     "SASH": json.loads(get_ssm_value(environ['SASH_WORKFLOW_OBJECT_SSM_PARAMETER_NAME'])),
 }
 
-# Draft status
-DRAFT_STATUS = "DRAFT"
-
 # Germline only workflow names
 GERMLINE_ONLY_WORKFLOW_NAMES = [
     'control',
@@ -64,107 +68,43 @@ WGTS_WORKFLOW_NAMES = [
     'research'
 ]
 
+# Unpairable subject cache namespace
+UNPAIRABLE_SUBJECT_NAMESPACE = 'wgs'
+
 # Set logger
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
-def add_dragen_wgts_dna_draft_event(
-        libraries: List[Library],
-) -> Optional[Dict[str, Union[str, Workflow, list[EventLibrary]]]]:
-    """
-    Add the dragen wgts dna draft event
-    :param libraries:
-    :return:
-    """
-    # Check for existing runs
-    existing_workflow_runs = get_existing_workflow_runs(
-        workflow_name=WORKFLOW_OBJECTS_DICT['DRAGEN_WGTS_DNA']['name'],
-        workflow_version=WORKFLOW_OBJECTS_DICT['DRAGEN_WGTS_DNA']['version'],
-        libraries=libraries
-    )
-
-    if len(existing_workflow_runs) > 0:
-        logger.warning(
-            "Existing DRAGEN WGTS DNA workflow runs found for library: %s" % libraries[0]['libraryId']
-        )
-        return None
-
-    return add_workflow_draft_event_detail(
-        libraries=libraries,
-        **WORKFLOW_OBJECTS_DICT['DRAGEN_WGTS_DNA']
-    )
-
-
-def add_oncoanalyser_wgts_dna_draft_event(
-        libraries: List[Library],
-) -> Optional[Dict[str, Union[str, Workflow, list[EventLibrary]]]]:
-    """
-    Add the oncoanalyser wgts dna draft event
-    :param libraries:
-    :return:
-    """
-    # Check for existing runs
-    existing_workflow_runs = get_existing_workflow_runs(
-        workflow_name=WORKFLOW_OBJECTS_DICT['ONCOANALYSER_WGTS_DNA']['name'],
-        workflow_version=WORKFLOW_OBJECTS_DICT['ONCOANALYSER_WGTS_DNA']['version'],
-        libraries=libraries
-    )
-
-    if len(existing_workflow_runs) > 0:
-        logger.warning(
-            "Existing ONCOANALYSER WGTS DNA workflow runs found for library: %s" % libraries[0]['libraryId']
-        )
-        return None
-
-    return add_workflow_draft_event_detail(
-        libraries=libraries,
-        **WORKFLOW_OBJECTS_DICT['ONCOANALYSER_WGTS_DNA']
-    )
-
-
-def add_sash_wgts_dna_draft_event(
-        libraries: List[Library],
-) -> Optional[Dict[str, Union[str, Workflow, list[EventLibrary]]]]:
-    """
-    Add the sash wgts dna draft event
-    :param libraries:
-    :return:
-    """
-    # Check for existing runs
-    existing_workflow_runs = get_existing_workflow_runs(
-        workflow_name=WORKFLOW_OBJECTS_DICT['SASH']['name'],
-        workflow_version=WORKFLOW_OBJECTS_DICT['SASH']['version'],
-        libraries=libraries
-    )
-
-    if len(existing_workflow_runs) > 0:
-        logger.warning(
-            "Existing SASH workflow runs found for library: %s" % libraries[0]['libraryId']
-        )
-        return None
-
-    return add_workflow_draft_event_detail(
-        libraries=libraries,
-        **WORKFLOW_OBJECTS_DICT['SASH']
-    )
-
-
-def generate_wgs_draft_lists(
+def get_wgs_draft_requests(
         libraries: List[Library],
-) -> List[Union[Dict[str, Union[str, Workflow, list[EventLibrary]]], None]]:
+) -> List[DraftRequest]:
     """
-    Generate the WGS draft lists
+    Get the WGS draft requests for a set of libraries
     :param libraries:
     :return:
     """
     return [
-        add_dragen_wgts_dna_draft_event(libraries),
-        add_oncoanalyser_wgts_dna_draft_event(libraries),
-        add_sash_wgts_dna_draft_event(libraries),
+        {
+            "workflowKey": "DRAGEN_WGTS_DNA",
+            "libraries": libraries,
+        },
+        {
+            "workflowKey": "ONCOANALYSER_WGTS_DNA",
+            "libraries": libraries,
+        },
+        {
+            "workflowKey": "SASH",
+            "libraries": libraries,
+        },
     ]
 
 
+@warm_up_on_event(WORKFLOW_OBJECTS_DICT, readset_library_index=True)
+@profile_slow_invocations
+@trace_invocation
+@skip_on_circuit_open({"eventDetailList": []})
+@validate_draft_events
 def handler(event, context):
     """
     Get the library id list
@@ -172,14 +112,18 @@ def handler(event, context):
     :param context:
     :return:
     """
-    # Initialise the events list
-    events_list = []
+    # Initialise the draft request list, drafts are generated in bulk when we return
+    draft_request_list: List[DraftRequest] = []
 
     # Get the library id list
     library_id_list = event.get("libraryIdList", [])
 
+    # The libraries in the fastq event that triggered this run have fastqs.
+    # Not so every library on the instrument run (i.e. in batch mode), some may not have been demultiplexed yet
+    add_readset_library_ids(event.get("readsetLibraryIdList", []))
+
     # Get the libraries as library objects
-    libraries_list: List[Library] = get_libraries_list_from_library_id_list(
+    libraries_list: List[Library] = get_libraries_list_from_library_id_list_chunked(
         library_id_list
     )
 
@@ -201,7 +145,7 @@ def handler(event, context):
         return {
             "eventDetailList": list(filter(
                 lambda event_iter_: event_iter_ is not None,
-                events_list
+                generate_workflow_drafts(WORKFLOW_OBJECTS_DICT, draft_request_list)
             ))
         }
 
@@ -235,10 +179,11 @@ def handler(event, context):
     # Negative control libraries should only go through dragen
     if len(negative_control_libraries) > 0:
         for ntc_library in negative_control_libraries:
-            events_list.extend([
-                add_dragen_wgts_dna_draft_event(
-                    libraries=[ntc_library]
-                )
+            draft_request_list.extend([
+                {
+                    "workflowKey": "DRAGEN_WGTS_DNA",
+                    "libraries": [ntc_library],
+                }
             ])
 
     # If there are no tumor libraries and no normal libraries for this
@@ -247,7 +192,7 @@ def handler(event, context):
         return {
             "eventDetailList": list(filter(
                 lambda event_iter_: event_iter_ is not None,
-                events_list
+                generate_workflow_drafts(WORKFLOW_OBJECTS_DICT, draft_request_list)
             ))
         }
 
@@ -264,10 +209,11 @@ def handler(event, context):
         ):
             # Batch control libraries should only go through dragen component
             # Likewise, gen airspace libraries should only go through dragen component
-            events_list.extend([
-                add_dragen_wgts_dna_draft_event(
-                    libraries=[normal_library_iter],
-                )
+            draft_request_list.extend([
+                {
+                    "workflowKey": "DRAGEN_WGTS_DNA",
+                    "libraries": [normal_library_iter],
+                }
             ])
             # Remove from normal libraries list
             normal_libraries.remove(normal_library_iter)
@@ -278,7 +224,21 @@ def handler(event, context):
         return {
             "eventDetailList": list(filter(
                 lambda event_iter_: event_iter_ is not None,
-                events_list
+                generate_workflow_drafts(WORKFLOW_OBJECTS_DICT, draft_request_list)
+            ))
+        }
+
+    # Skip the catalog scan if this subject was unpairable as of a catalog version
+    # that already includes every library on this run
+    run_library_id_list = list(map(
+        lambda library_iter_: library_iter_['libraryId'],
+        tumor_libraries + normal_libraries
+    ))
+    if is_subject_unpairable(UNPAIRABLE_SUBJECT_NAMESPACE, subject_orcabus_id, run_library_id_list):
+        return {
+            "eventDetailList": list(filter(
+                lambda event_iter_: event_iter_ is not None,
+                generate_workflow_drafts(WORKFLOW_OBJECTS_DICT, draft_request_list)
             ))
         }
 
@@ -286,21 +246,24 @@ def handler(event, context):
     # We now need to check against all runs to see if there are other libraries for this subject
     # that are not on this run
 
-    # Get all subject libraries
+    # Get all subject libraries, as compact library records
+    # The catalog is filtered as it streams in, so we only ever hold this subject's libraries
     # We sort by orcabusId descending so that the latest library is first
     # This assumes that orcabusIds are assigned in increasing order over time
-    all_subject_libraries = list(filter(
-        lambda library_iter_: (
-                library_iter_['subject']['orcabusId'] == subject_orcabus_id and
+    subject_libraries = sorted(
+        get_compact_subject_libraries(
+            subject_orcabus_id,
+            predicate=lambda library_iter_: (
                 library_iter_['type'] == 'WGS' and
-                get_libraries_with_readsets([library_iter_]) and
                 library_iter_['workflow'] in WGTS_WORKFLOW_NAMES
+            )
         ),
-        sorted(
-            get_all_libraries(),
-            key=lambda library_iter__: library_iter__['orcabusId'],
-            reverse=True
-        )
+        key=lambda library_iter__: library_iter__['orcabusId'],
+        reverse=True
+    )
+    all_subject_libraries = list(filter(
+        lambda library_iter_: library_has_readsets(library_iter_['libraryId']),
+        subject_libraries
     ))
 
     # Confirm theres at least one one normal and one tumor library for the subject
@@ -318,13 +281,32 @@ def handler(event, context):
             ))) == 0
     )
     ):
+        # Record the subject as unpairable until it gains a library (or one of its libraries gains readsets)
+        mark_subject_unpairable(
+            UNPAIRABLE_SUBJECT_NAMESPACE,
+            subject_orcabus_id,
+            run_library_id_list + list(map(
+                lambda library_iter_: library_iter_['libraryId'],
+                all_subject_libraries
+            )),
+            library_id_without_readsets_list=list(map(
+                lambda library_iter_: library_iter_['libraryId'],
+                filter(
+                    lambda library_iter_: library_iter_ not in all_subject_libraries,
+                    subject_libraries
+                )
+            )),
+        )
         return {
             "eventDetailList": list(filter(
                 lambda event_iter_: event_iter_ is not None,
-                events_list
+                generate_workflow_drafts(WORKFLOW_OBJECTS_DICT, draft_request_list)
             ))
         }
 
+    # The subject is pairable, clear any unpairable record
+    clear_subject_unpairable(UNPAIRABLE_SUBJECT_NAMESPACE, subject_orcabus_id)
+
     # Let's go through the simple use cases first
     # No normal libraries, just tumors on this run
     if len(normal_libraries) == 0:
@@ -353,14 +335,14 @@ def handler(event, context):
             # Get library list
             library_list = [tumor_library_iter, normal_library]
             # Add the wgs dna draft event
-            events_list.extend(
-                generate_wgs_draft_lists(library_list)
+            draft_request_list.extend(
+                get_wgs_draft_requests(library_list)
             )
 
         return {
             "eventDetailList": list(filter(
                 lambda event_iter_: event_iter_ is not None,
-                events_list
+                generate_workflow_drafts(WORKFLOW_OBJECTS_DICT, draft_request_list)
             ))
         }
 
@@ -400,14 +382,14 @@ def handler(event, context):
         library_list = [tumor_library, normal_library]
 
         # Add the wgs dna draft event
-        events_list.extend(
-            generate_wgs_draft_lists(library_list)
+        draft_request_list.extend(
+            get_wgs_draft_requests(library_list)
         )
 
         return {
             "eventDetailList": list(filter(
                 lambda event_iter_: event_iter_ is not None,
-                events_list
+                generate_workflow_drafts(WORKFLOW_OBJECTS_DICT, draft_request_list)
             ))
         }
 
@@ -429,13 +411,13 @@ def handler(event, context):
         # Get library list
         library_list = [tumor_library_iter, normal_library]
         # Add the wgs dna draft event
-        events_list.extend(
-            generate_wgs_draft_lists(library_list)
+        draft_request_list.extend(
+            get_wgs_draft_requests(library_list)
         )
 
     return {
         "eventDetailList": list(filter(
             lambda event_iter_: event_iter_ is not None,
-            events_list
+            generate_workflow_drafts(WORKFLOW_OBJECTS_DICT, draft_request_list)
         ))
     }
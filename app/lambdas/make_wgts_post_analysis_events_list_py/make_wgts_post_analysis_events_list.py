@@ -13,24 +13,32 @@ We do not expect the case for there to be multiple tumors and multiple normals f
 # Standard imports
 import json
 from os import environ
-from typing import List, Dict, Literal, Optional, Union
+from typing import List, Dict, Literal
 import logging
 from copy import deepcopy
 
 # Layer imports
-from orcabus_api_tools.metadata import (
-    get_libraries_list_from_library_id_list,
-    get_all_libraries
-)
 from orcabus_api_tools.metadata.models import Library
 from orcabus_api_tools.utils.aws_helpers import get_ssm_value
 
 from analysis_tool_kit import (
-    add_workflow_draft_event_detail,
-    get_existing_workflow_runs,
-    Workflow, EventLibrary,
+    skip_on_circuit_open,
+    profile_slow_invocations,
+    warm_up_on_event,
+    validate_draft_events,
+    trace_invocation,
+    generate_workflow_drafts,
+    DraftRequest,
+    get_libraries_list_from_library_id_list_chunked,
+    get_compact_subject_libraries,
+    Workflow,
+)
+from analysis_tool_kit.readset_library_index import add_readset_library_ids, library_has_readsets
+from analysis_tool_kit.unpairable_subject_cache import (
+    is_subject_unpairable,
+    mark_subject_unpairable,
+    clear_subject_unpairable,
 )
-from analysis_tool_kit.analysis_helpers import get_libraries_with_readsets
 
 # Type hints
 WorkflowName = Literal['ONCOANALYSER_WGTS_DNA_RNA', 'RNASUM']
@@ -41,9 +49,6 @@ WORKFLOW_OBJECTS_DICT: Dict[WorkflowName, Workflow] = {
     "RNASUM": json.loads(get_ssm_value(environ['RNASUM_WORKFLOW_OBJECT_SSM_PARAMETER_NAME'])),
 }
 
-# Draft status
-DRAFT_STATUS = "DRAFT"
-
 # Only tumor libraries with a workflow value
 # should go through the wgts dna/rna pipeline
 WGTS_WORKFLOW_NAMES = [
@@ -51,75 +56,39 @@ WGTS_WORKFLOW_NAMES = [
     'research'
 ]
 
+# Unpairable subject cache namespace
+UNPAIRABLE_SUBJECT_NAMESPACE = 'wgts_post'
+
 # Set logger
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
-def add_oncoanalyser_wgts_dna_rna_draft_event(
+def get_wgts_post_processing_draft_requests(
         libraries: List[Library],
-) -> Optional[Dict[str, Union[str, Workflow, list[EventLibrary]]]]:
+) -> List[DraftRequest]:
     """
-    Add the oncoanalyser wgts dna draft event
+    Get the WGTS post processing draft requests for a set of libraries
     :param libraries:
     :return:
     """
-    # Check for existing runs
-    existing_workflow_runs = get_existing_workflow_runs(
-        workflow_name=WORKFLOW_OBJECTS_DICT['ONCOANALYSER_WGTS_DNA_RNA']['name'],
-        workflow_version=WORKFLOW_OBJECTS_DICT['ONCOANALYSER_WGTS_DNA_RNA']['version'],
-        libraries=libraries
-    )
-
-    if len(existing_workflow_runs) > 0:
-        logger.warning(
-            "Existing ONCOANALYSER WGTS DNA RNA workflow runs found for library: %s" % libraries[0]['libraryId']
-        )
-        return None
-
-    return add_workflow_draft_event_detail(
-        libraries=libraries,
-        **WORKFLOW_OBJECTS_DICT['ONCOANALYSER_WGTS_DNA_RNA'],
-    )
-
-
-def add_rnasum_draft_event(
-        libraries: List[Library],
-) -> Optional[Dict[str, Union[str, Workflow, list[EventLibrary]]]]:
-    """
-    Add the rnasum draft event
-    :param libraries:
-    :return:
-    """
-    # Check for existing runs
-    existing_workflow_runs = get_existing_workflow_runs(
-        workflow_name=WORKFLOW_OBJECTS_DICT['RNASUM']['name'],
-        workflow_version=WORKFLOW_OBJECTS_DICT['RNASUM']['version'],
-        libraries=libraries
-    )
-
-    if len(existing_workflow_runs) > 0:
-        logger.warning(
-            "Existing RNASUM workflow runs found for library: %s" % libraries[0]['libraryId']
-        )
-        return None
-
-
-    return add_workflow_draft_event_detail(
-        libraries=libraries,
-        **WORKFLOW_OBJECTS_DICT['RNASUM'],
-    )
-
-
-def generate_wgts_post_processing_draft_lists(
-        libraries: List[Library],
-) -> List[Union[Dict[str, Union[str, Workflow, list[EventLibrary]]], None]]:
     return [
-        add_oncoanalyser_wgts_dna_rna_draft_event(libraries),
-        add_rnasum_draft_event(libraries),
+        {
+            "workflowKey": "ONCOANALYSER_WGTS_DNA_RNA",
+            "libraries": libraries,
+        },
+        {
+            "workflowKey": "RNASUM",
+            "libraries": libraries,
+        },
     ]
 
 
+@warm_up_on_event(WORKFLOW_OBJECTS_DICT, readset_library_index=True)
+@profile_slow_invocations
+@trace_invocation
+@skip_on_circuit_open({"eventDetailList": []})
+@validate_draft_events
 def handler(event, context):
     """
     Get the library id list
@@ -127,14 +96,18 @@ def handler(event, context):
     :param context:
     :return:
     """
-    # Initialise the events list
-    events_list = []
+    # Initialise the draft request list, drafts are generated in bulk when we return
+    draft_request_list: List[DraftRequest] = []
 
     # Get the library id list
     library_id_list = event.get("libraryIdList", [])
 
+    # The libraries in the fastq event that triggered this run have fastqs.
+    # Not so every library on the instrument run (i.e. in batch mode), some may not have been demultiplexed yet
+    add_readset_library_ids(event.get("readsetLibraryIdList", []))
+
     # Get the libraries as library objects
-    libraries_list: List[Library] = get_libraries_list_from_library_id_list(
+    libraries_list: List[Library] = get_libraries_list_from_library_id_list_chunked(
         library_id_list
     )
 
@@ -147,7 +120,7 @@ def handler(event, context):
     # If there are no libraries, return an empty list
     if len(libraries_list) == 0:
         return {
-            "eventDetailList": events_list
+            "eventDetailList": generate_workflow_drafts(WORKFLOW_OBJECTS_DICT, draft_request_list)
         }
 
     # Get the subject orcabus id
@@ -207,7 +180,21 @@ def handler(event, context):
         return {
             "eventDetailList": list(filter(
                 lambda event_iter_: event_iter_ is not None,
-                events_list
+                generate_workflow_drafts(WORKFLOW_OBJECTS_DICT, draft_request_list)
+            ))
+        }
+
+    # Skip the catalog scan if this subject was unpairable as of a catalog version
+    # that already includes every library on this run
+    run_library_id_list = list(map(
+        lambda library_iter_: library_iter_['libraryId'],
+        tumor_dna_libraries + normal_dna_libraries + tumor_rna_libraries
+    ))
+    if is_subject_unpairable(UNPAIRABLE_SUBJECT_NAMESPACE, subject_orcabus_id, run_library_id_list):
+        return {
+            "eventDetailList": list(filter(
+                lambda event_iter_: event_iter_ is not None,
+                generate_workflow_drafts(WORKFLOW_OBJECTS_DICT, draft_request_list)
             ))
         }
 
@@ -215,22 +202,25 @@ def handler(event, context):
     # We now need to check against all runs to see if there are other libraries for this subject
     # that are not on this run
 
-    # Get all subject libraries
+    # Get all subject libraries, as compact library records
+    # The catalog is filtered as it streams in, so we only ever hold this subject's libraries
     # We sort by orcabusId descending so that the latest library is first
     # This assumes that orcabusIds are assigned in increasing order over time
-    all_subject_libraries = list(filter(
-        lambda library_iter_: (
-            library_iter_['subject']['orcabusId'] == subject_orcabus_id and
-            library_iter_['type'] in ['WGS', 'WTS'] and
-            library_iter_['phenotype'] in ['tumor', 'normal'] and
-            get_libraries_with_readsets([library_iter_]) and
-            library_iter_['workflow'] in WGTS_WORKFLOW_NAMES
+    subject_libraries = sorted(
+        get_compact_subject_libraries(
+            subject_orcabus_id,
+            predicate=lambda library_iter_: (
+                library_iter_['type'] in ['WGS', 'WTS'] and
+                library_iter_['phenotype'] in ['tumor', 'normal'] and
+                library_iter_['workflow'] in WGTS_WORKFLOW_NAMES
+            )
         ),
-        sorted(
-            get_all_libraries(),
-            key=lambda library_iter__: library_iter__['orcabusId'],
-            reverse=True
-        )
+        key=lambda library_iter__: library_iter__['orcabusId'],
+        reverse=True
+    )
+    all_subject_libraries = list(filter(
+        lambda library_iter_: library_has_readsets(library_iter_['libraryId']),
+        subject_libraries
     ))
 
     # Confirm theres at least one one normal WGS and one tumor WGS and one tumor WTS for the subject
@@ -262,13 +252,31 @@ def handler(event, context):
                     ))) == 0
             )
     ):
+        # Record the subject as unpairable until it gains a library (or one of its libraries gains readsets)
+        mark_subject_unpairable(
+            UNPAIRABLE_SUBJECT_NAMESPACE,
+            subject_orcabus_id,
+            run_library_id_list + list(map(
+                lambda library_iter_: library_iter_['libraryId'],
+                all_subject_libraries
+            )),
+            library_id_without_readsets_list=list(map(
+                lambda library_iter_: library_iter_['libraryId'],
+                filter(
+                    lambda library_iter_: library_iter_ not in all_subject_libraries,
+                    subject_libraries
+                )
+            )),
+        )
         return {
             "eventDetailList": list(filter(
                 lambda event_iter_: event_iter_ is not None,
-                events_list
+                generate_workflow_drafts(WORKFLOW_OBJECTS_DICT, draft_request_list)
             ))
         }
 
+    # The subject is pairable, clear any unpairable record
+    clear_subject_unpairable(UNPAIRABLE_SUBJECT_NAMESPACE, subject_orcabus_id)
 
     # Let's go through the simple use cases first
     # No WGS libraries on this run
@@ -317,14 +325,14 @@ def handler(event, context):
             library_list = [tumor_dna_library, normal_dna_library, tumor_rna_library_iter]
 
             # Add the wgs dna draft event
-            events_list.extend(
-                generate_wgts_post_processing_draft_lists(library_list)
+            draft_request_list.extend(
+                get_wgts_post_processing_draft_requests(library_list)
             )
 
         return {
             "eventDetailList": list(filter(
                 lambda event_iter_: event_iter_ is not None,
-                events_list
+                generate_workflow_drafts(WORKFLOW_OBJECTS_DICT, draft_request_list)
             ))
         }
 
@@ -381,14 +389,14 @@ def handler(event, context):
                 library_list = [tumor_dna_library_iter, normal_dna_library, tumor_rna_library]
 
                 # Add the wgs dna draft event
-                events_list.extend(
-                    generate_wgts_post_processing_draft_lists(library_list)
+                draft_request_list.extend(
+                    get_wgts_post_processing_draft_requests(library_list)
                 )
 
             return {
                 "eventDetailList": list(filter(
                     lambda event_iter_: event_iter_ is not None,
-                    events_list
+                    generate_workflow_drafts(WORKFLOW_OBJECTS_DICT, draft_request_list)
                 ))
             }
 
@@ -400,7 +408,7 @@ def handler(event, context):
                 return {
                     "eventDetailList": list(filter(
                         lambda event_iter_: event_iter_ is not None,
-                        events_list
+                        draft_request_list
                     ))
                 }
 
@@ -428,7 +436,7 @@ def handler(event, context):
                 return {
                     "eventDetailList": list(filter(
                         lambda event_iter_: event_iter_ is not None,
-                        events_list
+                        draft_request_list
                     ))
                 }
 
@@ -451,7 +459,7 @@ def handler(event, context):
                 return {
                     "eventDetailList": list(filter(
                         lambda event_iter_: event_iter_ is not None,
-                        events_list
+                        draft_request_list
                     ))
                 }
 
@@ -459,14 +467,14 @@ def handler(event, context):
             library_list = [tumor_dna_library, normal_dna_library, tumor_rna_library]
 
             # Add the wgs dna draft event
-            events_list.extend(
-                generate_wgts_post_processing_draft_lists(library_list)
+            draft_request_list.extend(
+                get_wgts_post_processing_draft_requests(library_list)
             )
 
             return {
                 "eventDetailList": list(filter(
                     lambda event_iter_: event_iter_ is not None,
-                    events_list
+                    generate_workflow_drafts(WORKFLOW_OBJECTS_DICT, draft_request_list)
                 ))
             }
 
@@ -479,7 +487,7 @@ def handler(event, context):
             return {
                 "eventDetailList": list(filter(
                     lambda event_iter_: event_iter_ is not None,
-                    events_list
+                    generate_workflow_drafts(WORKFLOW_OBJECTS_DICT, draft_request_list)
                 ))
             }
 
@@ -526,21 +534,21 @@ def handler(event, context):
                 return {
                     "eventDetailList": list(filter(
                         lambda event_iter_: event_iter_ is not None,
-                        events_list
+                        draft_request_list
                     ))
                 }
 
             # Get library list
             library_list = [tumor_dna_library_iter, normal_dna_library, tumor_rna_library]
             # Add the wgs dna draft event
-            events_list.extend(
-                generate_wgts_post_processing_draft_lists(library_list)
+            draft_request_list.extend(
+                get_wgts_post_processing_draft_requests(library_list)
             )
 
         return {
             "eventDetailList": list(filter(
                 lambda event_iter_: event_iter_ is not None,
-                events_list
+                generate_workflow_drafts(WORKFLOW_OBJECTS_DICT, draft_request_list)
             ))
         }
 
@@ -550,7 +558,7 @@ def handler(event, context):
         return {
             "eventDetailList": list(filter(
                 lambda event_iter_: event_iter_ is not None,
-                events_list
+                generate_workflow_drafts(WORKFLOW_OBJECTS_DICT, draft_request_list)
             ))
         }
     # Now iterate over the tumor wgs libraries
@@ -586,13 +594,13 @@ def handler(event, context):
             # Get library list
             library_list = [tumor_dna_library_iter, normal_dna_library, tumor_rna_library_iter]
             # Add the wgs dna draft event
-            events_list.extend(
-                generate_wgts_post_processing_draft_lists(library_list)
+            draft_request_list.extend(
+                get_wgts_post_processing_draft_requests(library_list)
             )
 
     return {
         "eventDetailList": list(filter(
             lambda event_iter_: event_iter_ is not None,
-            events_list
+            generate_workflow_drafts(WORKFLOW_OBJECTS_DICT, draft_request_list)
         ))
     }
@@ -5,18 +5,25 @@ Make WTS analysis events list
 """
 
 # Standard imports
-from typing import List, Dict, Any, Literal, Union, Optional
+from typing import List, Dict, Literal
 from os import environ
 import json
 import logging
 
 # Layer imports
 from orcabus_api_tools.utils.aws_helpers import get_ssm_value
-from orcabus_api_tools.metadata import (
-    get_libraries_list_from_library_id_list,
-)
 from orcabus_api_tools.metadata.models import Library
-from analysis_tool_kit import Workflow, add_workflow_draft_event_detail, get_existing_workflow_runs, EventLibrary
+from analysis_tool_kit import (
+    skip_on_circuit_open,
+    profile_slow_invocations,
+    warm_up_on_event,
+    validate_draft_events,
+    trace_invocation,
+    Workflow,
+    generate_workflow_drafts,
+    DraftRequest,
+    get_libraries_list_from_library_id_list_chunked,
+)
 
 # Typehints
 WorkflowName = Literal['DRAGEN_WGTS_RNA', 'ARRIBA_WGTS_RNA', 'ONCOANALYSER_WGTS_RNA']
@@ -28,9 +35,6 @@ WORKFLOW_OBJECTS_DICT: Dict[WorkflowName, Workflow] = {
     "ONCOANALYSER_WGTS_RNA": json.loads(get_ssm_value(environ['ONCOANALYSER_WGTS_RNA_WORKFLOW_OBJECT_SSM_PARAMETER_NAME'])),
 }
 
-# Draft status
-DRAFT_STATUS = "DRAFT"
-
 # Set logger
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -43,100 +47,35 @@ WGTS_WORKFLOW_NAMES = [
 ]
 
 
-def add_dragen_wgts_rna_draft_event(
-        libraries: List[Library],
-) -> Optional[Dict[str, Union[str, Workflow, list[EventLibrary]]]]:
-    """
-    Add the dragen wgts rna draft event
-    :param libraries:
-    :return:
-    """
-
-    # Check for existing runs
-    existing_workflow_runs = get_existing_workflow_runs(
-        workflow_name=WORKFLOW_OBJECTS_DICT['DRAGEN_WGTS_RNA']['name'],
-        workflow_version=WORKFLOW_OBJECTS_DICT['DRAGEN_WGTS_RNA']['version'],
-        libraries=libraries
-    )
-
-    if len(existing_workflow_runs) > 0:
-        logger.warning(
-            "Existing DRAGEN WGTS RNA workflow runs found for library: %s" % libraries[0]['libraryId']
-        )
-        return None
-
-
-    return add_workflow_draft_event_detail(
-        libraries=libraries,
-        **WORKFLOW_OBJECTS_DICT['DRAGEN_WGTS_RNA'],
-    )
-
-
-def add_arriba_wgts_rna_draft_event(
-        libraries: List[Library],
-) -> Optional[Dict[str, Union[str, Workflow, list[EventLibrary]]]]:
-    """
-    Add the sash wgts dna draft event
-    :param libraries:
-    :return:
-    """
-
-    # Check for existing runs
-    existing_workflow_runs = get_existing_workflow_runs(
-        workflow_name=WORKFLOW_OBJECTS_DICT['ARRIBA_WGTS_RNA']['name'],
-        workflow_version=WORKFLOW_OBJECTS_DICT['ARRIBA_WGTS_RNA']['version'],
-        libraries=libraries
-    )
-
-    if len(existing_workflow_runs) > 0:
-        logger.warning(
-            "Existing ARRIBA WGTS RNA workflow runs found for library: %s" % libraries[0]['libraryId']
-        )
-        return None
-
-    return add_workflow_draft_event_detail(
-        libraries=libraries,
-        **WORKFLOW_OBJECTS_DICT['ARRIBA_WGTS_RNA'],
-    )
-
-
-def add_oncoanalyser_wgts_rna_draft_event(
+def get_wts_draft_requests(
         libraries: List[Library],
-) -> Optional[Dict[str, Union[str, Workflow, list[EventLibrary]]]]:
+) -> List[DraftRequest]:
     """
-    Add the oncoanalyser wgts rna draft event
+    Get the WTS draft requests for a set of libraries
     :param libraries:
     :return:
     """
-    # Check for existing runs
-    existing_workflow_runs = get_existing_workflow_runs(
-        workflow_name=WORKFLOW_OBJECTS_DICT['ONCOANALYSER_WGTS_RNA']['name'],
-        workflow_version=WORKFLOW_OBJECTS_DICT['ONCOANALYSER_WGTS_RNA']['version'],
-        libraries=libraries
-    )
-
-    if len(existing_workflow_runs) > 0:
-        logger.warning(
-            "Existing ONCOANALYSER WGTS RNA workflow runs found for library: %s" % libraries[0]['libraryId']
-        )
-        return None
-
-    return add_workflow_draft_event_detail(
-        libraries=libraries,
-        **WORKFLOW_OBJECTS_DICT['ONCOANALYSER_WGTS_RNA'],
-    )
-
-
-def generate_wts_draft_lists(
-        libraries: List[Library],
-) -> List[Union[Dict[str, Union[str, Workflow, list[EventLibrary]]], None]]:
     return [
-        add_dragen_wgts_rna_draft_event(libraries),
-        add_arriba_wgts_rna_draft_event(libraries),
-        add_oncoanalyser_wgts_rna_draft_event(libraries),
+        {
+            "workflowKey": "DRAGEN_WGTS_RNA",
+            "libraries": libraries,
+        },
+        {
+            "workflowKey": "ARRIBA_WGTS_RNA",
+            "libraries": libraries,
+        },
+        {
+            "workflowKey": "ONCOANALYSER_WGTS_RNA",
+            "libraries": libraries,
+        },
     ]
 
 
+@warm_up_on_event(WORKFLOW_OBJECTS_DICT)
+@profile_slow_invocations
+@trace_invocation
+@skip_on_circuit_open({"eventDetailList": []})
+@validate_draft_events
 def handler(event, context):
     """
     Get the library id list
@@ -144,14 +83,14 @@ def handler(event, context):
     :param context:
     :return:
     """
-    # Initialise events list
-    events_list = []
+    # Initialise the draft request list, drafts are generated in bulk when we return
+    draft_request_list: List[DraftRequest] = []
 
     # Get the library id list
     library_id_list = event.get("libraryIdList", [])
 
     # Get the libraries as library objects
-    libraries_list: List[Library] = get_libraries_list_from_library_id_list(
+    libraries_list: List[Library] = get_libraries_list_from_library_id_list_chunked(
         library_id_list
     )
 
@@ -172,10 +111,11 @@ def handler(event, context):
     if len(negative_control_libraries) > 0:
         # Negative control libraries should only go through dragen
         for ntc_library in negative_control_libraries:
-            events_list.extend([
-                add_dragen_wgts_rna_draft_event(
-                    libraries=[ntc_library]
-                )
+            draft_request_list.extend([
+                {
+                    "workflowKey": "DRAGEN_WGTS_RNA",
+                    "libraries": [ntc_library],
+                }
             ])
 
     # We only need the one phenotype
@@ -192,13 +132,13 @@ def handler(event, context):
 
     for library_iter in tumor_libraries:
         # Add the wgs rna draft event
-        events_list.extend(
-            generate_wts_draft_lists([library_iter])
+        draft_request_list.extend(
+            get_wts_draft_requests([library_iter])
         )
 
     return {
         "eventDetailList": list(filter(
             lambda event_iter_: event_iter_ is not None,
-            events_list
+            generate_workflow_drafts(WORKFLOW_OBJECTS_DICT, draft_request_list)
         ))
     }
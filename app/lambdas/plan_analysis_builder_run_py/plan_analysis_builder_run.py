@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+
+"""
+Plan an analysis builder run for an instrument run, without emitting any events
+
+Inputs:
+  * instrumentRunId, or instrumentRunIdList (as per the analysis builder's batch mode)
+  * libraryIdList (optional, as per the analysis builder's incremental mode)
+
+We walk the same stages as the analysis builder step function,
+  * BCLConvert InterOp QC
+  * WGS, WTS and ctDNA
+  * WGTS (post) and ctDNA (post)
+
+calling the same lambda handlers (this lambda is deployed with the source of every lambda),
+but in dry run mode, so drafts are never claimed in the draft ledger and no events are put on the bus.
+
+Returns
+  * the drafts each stage would generate, by subject
+  * the OrcaBus API calls made by each stage (calls, bytes transferred, time spent in the api, wall time)
+
+Stages and subjects are planned one after another rather than in the step function's parallel branches,
+so each stage's wall time is an upper bound on what the step function would take.
+The stages stay serial as API calls are counted against a process-wide stage (see api_stats),
+so this lambda is deployed with the longest timeout a lambda can have rather than the stage lambdas' five minutes.
+
+In batch mode the BCLConvert InterOp QC stage is planned for each instrument run,
+and each subject stage once, across the libraries of every instrument run.
+"""
+
+# Standard imports
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+import logging
+
+# Layer imports
+from analysis_tool_kit.dry_run import enable_dry_run
+from analysis_tool_kit.api_stats import api_stats_stage, get_api_call_stats, reset_api_call_stats
+from analysis_tool_kit.lambda_loader import load_lambda_module
+from analysis_tool_kit.instrument_run_helpers import get_instrument_run_id_list, get_instrument_run_label
+
+# Globals
+LAMBDAS_DIR = Path(__file__).parent.parent
+WGS_SAMPLE_TYPE = 'WGS'
+WTS_SAMPLE_TYPE = 'WTS'
+CTDNA_SAMPLE_TYPE = 'ctDNA'
+
+BCLCONVERT_INTEROP_QC_STAGE = 'bclconvertInteropQc'
+SUBJECT_STAGES_LIST = [
+    # Primary
+    {
+        "stage": "wgs",
+        "sampleTypeList": [WGS_SAMPLE_TYPE],
+        "lambdaName": "make_wgs_analysis_events_list",
+    },
+    {
+        "stage": "wts",
+        "sampleTypeList": [WTS_SAMPLE_TYPE],
+        "lambdaName": "make_wts_analysis_events_list",
+    },
+    {
+        "stage": "ctdna",
+        "sampleTypeList": [CTDNA_SAMPLE_TYPE],
+        "lambdaName": "make_ctdna_analysis_events_list",
+    },
+    # Secondary
+    {
+        "stage": "wgtsPost",
+        "sampleTypeList": [WGS_SAMPLE_TYPE, WTS_SAMPLE_TYPE],
+        "lambdaName": "make_wgts_post_analysis_events_list",
+    },
+    {
+        "stage": "ctdnaPost",
+        "sampleTypeList": [CTDNA_SAMPLE_TYPE],
+        "lambdaName": "make_ctdna_post_analysis_events_list",
+    },
+]
+
+# Never claim drafts, or write to the draft ledger
+enable_dry_run()
+
+# Set logger
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def get_draft_summary(event_detail: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Summarise a draft event detail for the plan
+    :param event_detail:
+    :return:
+    """
+    return {
+        "workflowName": event_detail['workflow']['name'],
+        "workflowVersion": event_detail['workflow']['version'],
+        "workflowRunName": event_detail['workflowRunName'],
+        "libraryIdList": list(map(
+            lambda library_iter_: library_iter_['libraryId'],
+            event_detail.get("libraries", [])
+        )),
+        "readsetCount": sum(map(
+            lambda library_iter_: len(library_iter_['readsets']),
+            event_detail.get("libraries", [])
+        )),
+    }
+
+
+def plan_subject_stage(
+        instrument_run_id_list: List[str],
+        sample_type_list: List[str],
+        lambda_name: str,
+        library_id_list: Optional[List[str]],
+        context
+) -> List[Dict[str, Any]]:
+    """
+    Plan the drafts for each subject of the instrument run(s) for a given stage
+    :param instrument_run_id_list:
+    :param sample_type_list:
+    :param lambda_name: The make analysis events list lambda for this stage
+    :param library_id_list:
+    :param context:
+    :return:
+    """
+    get_subjects_module = load_lambda_module(LAMBDAS_DIR, 'get_subjects_from_instrument_run_id')
+    get_libraries_module = load_lambda_module(LAMBDAS_DIR, 'get_libraries_from_instrument_run_id_and_subject_id')
+    make_events_module = load_lambda_module(LAMBDAS_DIR, lambda_name)
+
+    subject_id_list = get_subjects_module.handler(
+        {
+            "instrumentRunIdList": instrument_run_id_list,
+            "sampleTypeList": sample_type_list,
+            "libraryIdList": library_id_list,
+        },
+        context
+    )['subjectIdList']
+
+    subject_plan_list = []
+    for subject_id in subject_id_list:
+        subject_library_id_list = get_libraries_module.handler(
+            {
+                "instrumentRunIdList": instrument_run_id_list,
+                "subjectId": subject_id,
+                "sampleTypeList": sample_type_list,
+                "libraryIdList": library_id_list,
+            },
+            context
+        )['libraryIdList']
+
+        make_events_response = make_events_module.handler(
+            {
+                "instrumentRunIdList": instrument_run_id_list,
+                "subjectId": subject_id,
+                "libraryIdList": subject_library_id_list,
+                "readsetLibraryIdList": library_id_list or [],
+            },
+            context
+        )
+
+        subject_plan_list.append(dict(filter(
+            lambda kv_iter_: kv_iter_[1] is not None,
+            {
+                "subjectId": subject_id,
+                "libraryIdList": subject_library_id_list,
+                "drafts": list(map(get_draft_summary, make_events_response['eventDetailList'])),
+                "skipped": make_events_response.get("skipped", None),
+            }.items()
+        )))
+
+    return subject_plan_list
+
+
+def handler(event, context):
+    """
+    Plan the analysis builder run for an instrument run, or a batch of instrument runs
+    :param event:
+    :param context:
+    :return:
+    """
+    # Get inputs
+    instrument_run_id_list = get_instrument_run_id_list(event)
+    instrument_run_label = get_instrument_run_label(event)
+    library_id_list = event.get('libraryIdList', None)
+
+    if len(instrument_run_id_list) == 0:
+        raise ValueError("Expected an instrumentRunId or instrumentRunIdList")
+
+    # Start from fresh stats on warm invocations
+    reset_api_call_stats()
+
+    plan = {}
+
+    # BCLConvert InterOp QC, for each instrument run
+    logger.info(f"Planning the {BCLCONVERT_INTEROP_QC_STAGE} stage for {instrument_run_label}")
+    with api_stats_stage(BCLCONVERT_INTEROP_QC_STAGE):
+        plan[BCLCONVERT_INTEROP_QC_STAGE] = list(map(
+            get_draft_summary,
+            [
+                event_detail
+                for instrument_run_id in instrument_run_id_list
+                for event_detail in load_lambda_module(LAMBDAS_DIR, 'make_bclconvert_interop_qc_event').handler(
+                    {
+                        "instrumentRunId": instrument_run_id,
+                    },
+                    context
+                )['eventDetailList']
+            ]
+        ))
+
+    # Subject stages, in the order the step function runs them
+    for subject_stage in SUBJECT_STAGES_LIST:
+        logger.info(f"Planning the {subject_stage['stage']} stage for {instrument_run_label}")
+        with api_stats_stage(subject_stage['stage']):
+            plan[subject_stage['stage']] = plan_subject_stage(
+                instrument_run_id_list=instrument_run_id_list,
+                sample_type_list=subject_stage['sampleTypeList'],
+                lambda_name=subject_stage['lambdaName'],
+                library_id_list=library_id_list,
+                context=context,
+            )
+
+    api_call_stats = get_api_call_stats()
+
+    return {
+        "instrumentRunIdList": instrument_run_id_list,
+        "plan": plan,
+        "apiCallStats": api_call_stats,
+        "totals": {
+            "draftCount": (
+                len(plan[BCLCONVERT_INTEROP_QC_STAGE]) +
+                sum(map(
+                    lambda subject_stage_iter_: sum(map(
+                        lambda subject_plan_iter_: len(subject_plan_iter_['drafts']),
+                        plan[subject_stage_iter_['stage']]
+                    )),
+                    SUBJECT_STAGES_LIST
+                ))
+            ),
+            "apiCalls": sum(map(
+                lambda stage_stats_iter_: stage_stats_iter_['apiCalls'],
+                api_call_stats.values()
+            )),
+            "bytesTransferred": sum(map(
+                lambda stage_stats_iter_: stage_stats_iter_['bytesTransferred'],
+                api_call_stats.values()
+            )),
+            "wallTimeSeconds": sum(map(
+                lambda stage_stats_iter_: stage_stats_iter_['wallTimeSeconds'],
+                api_call_stats.values()
+            )),
+        },
+    }
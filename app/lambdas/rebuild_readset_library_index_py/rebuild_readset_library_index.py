@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+
+"""
+Rebuild the readset library index, on a schedule
+
+The index (see analysis_tool_kit.readset_library_index) is built by streaming the whole fastq catalog,
+so it is built here, out of band, and shared with the pairing lambdas through S3,
+rather than by whichever pairing lambda first finds its copy stale.
+
+Inputs:
+  * none, the scheduled event is ignored
+"""
+
+# Standard imports
+import time
+
+# Layer imports
+from analysis_tool_kit.readset_library_index import rebuild_readset_library_index
+
+
+def handler(event, context):
+    """
+    Rebuild the readset library index
+    :param event:
+    :param context:
+    :return:
+    """
+    start = time.perf_counter()
+    readset_library_index = rebuild_readset_library_index()
+
+    return {
+        "builtAt": readset_library_index.built_at,
+        "bitCount": readset_library_index.bit_count,
+        "hashCount": readset_library_index.hash_count,
+        "durationSeconds": round(time.perf_counter() - start, 3),
+    }
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+
+"""
+Route an analysis builder action to its lambda handler
+
+Inputs:
+  * action, i.e. makeWgsAnalysisEventsList
+  * the rest of the handler's event
+
+This lambda is deployed with the source of every lambda, and the analysis builder step function
+invokes it for every task (each task's payload names its action), rather than invoking each lambda on its own.
+
+Each handler module is loaded the first time its action is routed, and stays loaded for the life of the sandbox,
+so the toolkit's process-wide caches (workflow objects, libraries, the readset library index, pooled connections)
+are shared across actions, and most of a run's invocations land on a sandbox that has already populated them.
+
+A warm up event without an action ({"warmUp": true}) loads and warms every handler.
+"""
+
+# Standard imports
+from pathlib import Path
+from typing import Dict, Any
+import logging
+
+# Layer imports
+from analysis_tool_kit import is_warm_up_event
+from analysis_tool_kit.lambda_loader import load_lambda_module
+
+# Globals
+LAMBDAS_DIR = Path(__file__).parent.parent
+ACTION_KEY = 'action'
+
+# Actions, by the lambda they were deployed as, to the lambda that handles them
+ACTION_LAMBDA_NAME_DICT: Dict[str, str] = {
+    # Metadata gatherers
+    "getSubjectsFromInstrumentRunId": "get_subjects_from_instrument_run_id",
+    "getLibrariesFromInstrumentRunIdAndSubjectId": "get_libraries_from_instrument_run_id_and_subject_id",
+    # Event Detail Makers
+    "makeBclconvertInteropQcEvent": "make_bclconvert_interop_qc_event",
+    "makeCtdnaAnalysisEventsList": "make_ctdna_analysis_events_list",
+    "makeWgsAnalysisEventsList": "make_wgs_analysis_events_list",
+    "makeWtsAnalysisEventsList": "make_wts_analysis_events_list",
+    # Post Event Detail Makers
+    "makeCtdnaPostAnalysisEventsList": "make_ctdna_post_analysis_events_list",
+    "makeWgtsPostAnalysisEventsList": "make_wgts_post_analysis_events_list",
+}
+
+# Set logger
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def warm_up_all_actions(event: Dict[str, Any], context) -> Dict[str, Any]:
+    """
+    Load every handler and pass it the warm up event
+    :param event:
+    :param context:
+    :return:
+    """
+    warm_up_summary_dict: Dict[str, Any] = {}
+    for action, lambda_name in ACTION_LAMBDA_NAME_DICT.items():
+        try:
+            warm_up_summary_dict[action] = load_lambda_module(LAMBDAS_DIR, lambda_name).handler(event, context)
+        except Exception as e:
+            logger.warning(f"Could not warm up {action}: {e}")
+            warm_up_summary_dict[action] = {"warmedUp": False, "error": str(e)}
+
+    return {
+        "warmedUp": all(map(
+            lambda warm_up_summary_iter_: warm_up_summary_iter_.get("warmedUp", False),
+            warm_up_summary_dict.values()
+        )),
+        "actions": warm_up_summary_dict,
+    }
+
+
+def handler(event, context):
+    """
+    Route the event to the handler of its action
+    :param event:
+    :param context:
+    :return:
+    """
+    # Get inputs
+    action = event.get(ACTION_KEY, None)
+
+    if action is None and is_warm_up_event(event):
+        return warm_up_all_actions(event, context)
+
+    if action not in ACTION_LAMBDA_NAME_DICT:
+        raise ValueError(
+            f"Unknown action '{action}', expected one of {', '.join(ACTION_LAMBDA_NAME_DICT.keys())}"
+        )
+
+    return load_lambda_module(LAMBDAS_DIR, ACTION_LAMBDA_NAME_DICT[action]).handler(
+        dict(filter(
+            lambda kv_iter_: kv_iter_[0] != ACTION_KEY,
+            event.items()
+        )),
+        context
+    )
@@ -3,6 +3,8 @@
 """
 Deploy status manager changes
 
+The validation draft event has only just been put when we are called,
+so we poll for the workflow run until it exists before adding our comments.
 """
 
 # Standard imports
@@ -11,14 +13,17 @@ from datetime import datetime
 
 # From layers
 from orcabus_api_tools.workflow import (
-    get_workflow_run_from_portal_run_id,
     add_comment_to_workflow_run
 )
 from orcabus_api_tools.deploy_status.models import StackEventResponseDict
+from analysis_tool_kit import wait_for_workflow_run_from_portal_run_id
 
 # Get workflow env vars as values
 COMMENT_AUTHOR = f"analysis-glue--validation-service"
 
+# Leave enough of the lambda timeout to add the comments once the workflow run exists
+COMMENT_TIME_MARGIN_SECONDS = 30
+
 
 def handler(event, context):
     """
@@ -36,12 +41,19 @@ def handler(event, context):
     current_timestamp: datetime = event["currentTimestamp"]
     portal_run_id: str = event["portalRunId"]
 
-    # Get the workflow run from the portal run id
-    workflow_run = get_workflow_run_from_portal_run_id(portal_run_id)
-
+    # Nothing to comment on, no need to wait for the workflow run
     if all([len(deleted) == 0, len(modified) == 0, len(added) == 0]):
         return
 
+    # Get the workflow run from the portal run id, waiting for the workflow manager to create it
+    workflow_run = wait_for_workflow_run_from_portal_run_id(
+        portal_run_id,
+        deadline_seconds=max(
+            context.get_remaining_time_in_millis() / 1000 - COMMENT_TIME_MARGIN_SECONDS,
+            0
+        )
+    )
+
     # Create a comment stating timestamps
     add_comment_to_workflow_run(
         workflow_run_orcabus_id=workflow_run['orcabusId'],
@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+
+"""
+Update the rgid workflow run index from a workflow run state change event
+
+Inputs:
+  * the event detail, with the workflow run's portalRunId, status, timestamp, workflow
+    and libraries (with their readsets)
+
+A workflow run is indexed under the rgid of each of its readsets, and removed from the index once it is deprecated.
+The run's draft claim in the draft ledger is confirmed, and released once the run is deprecated.
+An event older than the last event we have seen for the run is ignored.
+"""
+
+# Layer imports
+from analysis_tool_kit.rgid_workflow_run_index import index_workflow_run_state_change
+
+
+def handler(event, context):
+    """
+    Index the workflow run
+    :param event:
+    :param context:
+    :return:
+    """
+    return {
+        "indexed": index_workflow_run_state_change(event),
+    }
@@ -6,16 +6,46 @@ Handful of shared functions used by the analysis glue scripts
 
 # Global imports
 from .globals import DRAFT_STATUS
+from .http_client import install_request_hooks, get_connection_pool_stats, CircuitOpenError
+from .handler_decorators import skip_on_circuit_open
+from .slow_invocation_profiler import profile_slow_invocations
+from .tracing import trace_invocation, span, traced, set_span_attributes
+from .warm_up import warm_up_on_event, is_warm_up_event
+from .draft_validation import validate_draft_events, DraftValidationError
 from .analysis_helpers import (
     get_existing_workflow_runs,
+    any_existing_workflow_run,
     add_workflow_draft_event_detail,
+    add_new_workflow_draft_event_detail,
+    claim_workflow_draft,
+    release_workflow_draft,
+)
+from .draft_factory import (
+    generate_workflow_drafts,
+)
+from .library_helpers import (
+    get_libraries_list_from_library_id_list_chunked,
+    iter_all_libraries,
+)
+from .compact_library import (
+    CompactLibrary,
+    get_compact_library_catalog,
+    get_compact_subject_libraries,
+)
+from .workflow_run_helpers import (
+    WorkflowRunNotReadyError,
+    wait_for_workflow_run_from_portal_run_id,
 )
 from .models import (
     Workflow,
     ReadSet,
-    EventLibrary
+    EventLibrary,
+    DraftRequest,
 )
 
+# Rate limit, retry and pool the orcabus_api_tools calls made in this process
+install_request_hooks()
+
 
 __all__ = [
     # Globals
@@ -24,7 +54,33 @@ __all__ = [
     "Workflow",
     "ReadSet",
     "EventLibrary",
+    "DraftRequest",
+    "CompactLibrary",
+    # Exceptions
+    "CircuitOpenError",
+    "WorkflowRunNotReadyError",
+    "DraftValidationError",
     # Functions
     "add_workflow_draft_event_detail",
+    "add_new_workflow_draft_event_detail",
+    "claim_workflow_draft",
+    "release_workflow_draft",
     "get_existing_workflow_runs",
+    "any_existing_workflow_run",
+    "generate_workflow_drafts",
+    "get_libraries_list_from_library_id_list_chunked",
+    "iter_all_libraries",
+    "get_compact_library_catalog",
+    "get_compact_subject_libraries",
+    "wait_for_workflow_run_from_portal_run_id",
+    "get_connection_pool_stats",
+    "skip_on_circuit_open",
+    "profile_slow_invocations",
+    "trace_invocation",
+    "span",
+    "traced",
+    "set_span_attributes",
+    "warm_up_on_event",
+    "is_warm_up_event",
+    "validate_draft_events",
 ]
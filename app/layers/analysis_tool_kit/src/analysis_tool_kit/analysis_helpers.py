@@ -5,9 +5,12 @@ Helper functions for analysis workflows
 """
 
 # Standard imports
+import logging
+from concurrent.futures import ThreadPoolExecutor
 from functools import reduce
 from operator import concat
-from typing import List, Any, cast, Unpack, Literal, Optional
+from typing import List, Any, cast, Unpack, Literal, Optional, Dict, Tuple, Union
+from urllib.parse import urlencode
 
 # Layer imports
 from orcabus_api_tools.metadata.models import Library
@@ -26,19 +29,60 @@ from orcabus_api_tools.fastq import (
     get_fastqs_in_library,
     get_fastqs_in_libraries_and_instrument_run_id,
 )
+from orcabus_api_tools.utils.aws_helpers import get_orcabus_token, get_hostname
 
 # Local imports
-from .globals import DRAFT_STATUS, DEPRECATED_STATUS
+from .globals import (
+    DRAFT_STATUS,
+    DEPRECATED_STATUS,
+    WORKFLOW_SUBDOMAIN_NAME,
+    WORKFLOW_RUN_ENDPOINT,
+    WORKFLOW_RUN_WORKFLOW_NAME_QUERY_PARAMETER_NAME,
+    WORKFLOW_RUN_WORKFLOW_VERSION_QUERY_PARAMETER_NAME,
+    WORKFLOW_RUN_LIBRARY_ID_QUERY_PARAMETER_NAME,
+    WORKFLOW_RUN_RGID_QUERY_PARAMETER_NAME,
+    WORKFLOW_RUN_EXISTENCE_ROWS_PER_PAGE,
+    WORKFLOW_RUN_REQUEST_TIMEOUT_SECONDS,
+    MAX_WORKFLOW_RUN_QUERY_STRING_LENGTH,
+    MAX_LIBRARY_LOOKUP_WORKERS,
+)
+from .draft_ledger import get_draft_ledger, claim_draft, confirm_draft, release_draft
+from .rgid_workflow_run_index import get_indexed_workflow_run_ids, is_rgid_workflow_run_index_authoritative
 from .models import ReadSet, EventLibrary, Workflow, Payload
+from .library_helpers import chunk_library_id_list
+from .tracing import traced, set_span_attributes, bind_current_span
+from .draft_validation import validate_workflow_draft_event_detail
+from .http_client import get_session
 
 # Type hints
 WorkflowsList = Literal['DRAGEN_TSO500_CTDNA']
 
+# Globals
+WORKFLOW_CACHE: Dict[Tuple[Optional[str], ...], Dict[str, Any]] = {}
+
+# Set logger
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
 # Functions
 def flatten(list_of_lists: List[List[Any]]) -> List[Any]:
     return list(reduce(concat, list_of_lists, []))
 
 
+def fastq_to_readset(fastq_obj: Dict[str, Any]) -> ReadSet:
+    return cast(
+        ReadSet,
+        cast(object, {
+            "orcabusId": fastq_obj['id'],
+            "rgid": ".".join([
+                fastq_obj['index'], str(fastq_obj['lane']),
+                fastq_obj['instrumentRunId']
+            ]),
+        })
+    )
+
+
 def get_readsets_in_library(library_id: str, instrument_run_id: Optional[str] = None) -> List[ReadSet]:
     if instrument_run_id is None:
         fastq_obj_list = get_fastqs_in_library(
@@ -50,19 +94,31 @@ def get_readsets_in_library(library_id: str, instrument_run_id: Optional[str] =
             library_id_list=[library_id]
         )
 
-    return list(map(
-        lambda fastq_id_iter_: cast(
-            ReadSet,
-            cast(object, {
-                "orcabusId": fastq_id_iter_['id'],
-                "rgid": ".".join([
-                    fastq_id_iter_['index'], str(fastq_id_iter_['lane']),
-                    fastq_id_iter_['instrumentRunId']
-                ]),
-            })
-        ),
-        fastq_obj_list
-    ))
+    return list(map(fastq_to_readset, fastq_obj_list))
+
+
+@traced
+def get_readsets_in_libraries(library_id_list: List[str]) -> Dict[str, List[ReadSet]]:
+    """
+    Get the readsets of each library, one fastq call per library, made concurrently
+    :param library_id_list:
+    :return:
+    """
+    unique_library_id_list = list(dict.fromkeys(library_id_list))
+    set_span_attributes(libraryCount=len(unique_library_id_list))
+
+    if len(unique_library_id_list) <= 1:
+        readsets_list_by_library = list(map(get_readsets_in_library, unique_library_id_list))
+    else:
+        with ThreadPoolExecutor(
+            max_workers=min(MAX_LIBRARY_LOOKUP_WORKERS, len(unique_library_id_list))
+        ) as executor:
+            readsets_list_by_library = list(executor.map(
+                bind_current_span(get_readsets_in_library),
+                unique_library_id_list
+            ))
+
+    return dict(zip(unique_library_id_list, readsets_list_by_library))
 
 
 def library_to_event_library(library: Library, instrument_run_id: Optional[str] = None) -> EventLibrary:
@@ -76,6 +132,7 @@ def library_to_event_library(library: Library, instrument_run_id: Optional[str]
     }
 
 
+@traced
 def get_libraries_with_readsets(libraries: List[Library], instrument_run_id: Optional[str] = None) -> List[EventLibrary]:
     """
     Get the libraries that have readsets
@@ -101,18 +158,115 @@ def get_libraries_with_readsets(libraries: List[Library], instrument_run_id: Opt
     ))
 
 
+@traced
+def get_run_event_libraries(libraries: List[Library], instrument_run_id: str) -> List[EventLibrary]:
+    """
+    Get the libraries with readsets on an instrument run, with just the readsets from that run.
+    The run's fastqs are fetched with one call per url-safe chunk of library ids (concurrently),
+    then partitioned by library
+    :param libraries:
+    :param instrument_run_id:
+    :return:
+    """
+    set_span_attributes(instrumentRunId=instrument_run_id, libraryCount=len(libraries))
+
+    library_id_chunks = chunk_library_id_list(list(dict.fromkeys(map(
+        lambda library_obj_iter_: library_obj_iter_['libraryId'],
+        libraries
+    ))))
+
+    def get_fastqs_in_library_id_chunk(library_id_list: List[str]) -> List[Dict[str, Any]]:
+        return get_fastqs_in_libraries_and_instrument_run_id(
+            instrument_run_id=instrument_run_id,
+            library_id_list=library_id_list
+        )
+
+    if len(library_id_chunks) == 1:
+        fastqs_list_by_chunk = [get_fastqs_in_library_id_chunk(library_id_chunks[0])]
+    elif len(library_id_chunks) > 1:
+        with ThreadPoolExecutor(
+            max_workers=min(MAX_LIBRARY_LOOKUP_WORKERS, len(library_id_chunks))
+        ) as executor:
+            fastqs_list_by_chunk = list(executor.map(
+                bind_current_span(get_fastqs_in_library_id_chunk),
+                library_id_chunks
+            ))
+    else:
+        fastqs_list_by_chunk = []
+
+    readsets_by_library_id: Dict[str, List[ReadSet]] = {}
+    for fastq_obj in flatten(fastqs_list_by_chunk):
+        readsets_by_library_id.setdefault(fastq_obj['library']['libraryId'], []).append(
+            fastq_to_readset(fastq_obj)
+        )
+
+    # Drop libraries without readsets on this run
+    return list(map(
+        lambda library_obj_iter_: cast(EventLibrary, cast(object, {
+            "orcabusId": library_obj_iter_['orcabusId'],
+            "libraryId": library_obj_iter_['libraryId'],
+            "readsets": readsets_by_library_id[library_obj_iter_['libraryId']],
+        })),
+        filter(
+            lambda library_obj_iter_: library_obj_iter_['libraryId'] in readsets_by_library_id,
+            libraries
+        )
+    ))
+
+
+def get_rgid_list_from_event_libraries(event_libraries: List[EventLibrary]) -> List[str]:
+    """
+    Get the rgids of the readsets already resolved for a list of event libraries
+    :param event_libraries:
+    :return:
+    """
+    return list(map(
+        lambda readset_iter_: readset_iter_['rgid'],
+        flatten(list(map(
+            lambda event_library_iter_: event_library_iter_['readsets'],
+            event_libraries
+        )))
+    ))
+
+
+def get_rgid_list_from_libraries(libraries: List[Library]) -> List[str]:
+    """
+    Get the rgids of every readset (across all instrument runs) in a list of libraries
+    :param libraries:
+    :return:
+    """
+    return list(map(
+        lambda readset_iter_: readset_iter_['rgid'],
+        # Flatten the readsets from all libraries
+        flatten(
+            list(map(
+                lambda library_obj_iter_: get_readsets_in_library(library_obj_iter_['libraryId']),
+                libraries
+            ))
+        )
+    ))
+
+
+@traced
 def get_existing_workflow_runs(
     workflow_name: str,
     workflow_version: str,
     libraries: List[Library],
+    rgid_list: Optional[List[str]] = None,
 ) -> List[WorkflowRunDetail]:
     """
     Get the existing workflow runs for a given workflow name/version and library/readset list
     :param workflow_name:
     :param workflow_version:
     :param libraries:
+    :param rgid_list: The library rgids, if already known
     :return:
     """
+    set_span_attributes(workflowName=workflow_name, workflowVersion=workflow_version)
+
+    if rgid_list is None:
+        rgid_list = get_rgid_list_from_libraries(libraries)
+
     workflow_runs = get_workflow_runs_from_metadata(
         workflow_name=workflow_name,
         workflow_version=workflow_version,
@@ -120,16 +274,7 @@ def get_existing_workflow_runs(
             lambda library_obj_iter_: library_obj_iter_['libraryId'],
             libraries
         )),
-        rgid_list=list(map(
-            lambda readset_iter_: readset_iter_['rgid'],
-            # Flatten the readsets from all libraries
-            flatten(
-                list(map(
-                    lambda library_obj_iter_: get_readsets_in_library(library_obj_iter_['libraryId']),
-                    libraries
-                ))
-            )
-        ))
+        rgid_list=rgid_list
     )
 
     # Remove workflows with DEPRECATED status
@@ -139,41 +284,192 @@ def get_existing_workflow_runs(
     ))
 
 
-def add_workflow_draft_event_detail(
-        libraries: List[Library],
-        payload: Optional[Payload],
-        workflow_run_prefix: Optional[str] = None,
-        **kwargs: Unpack[Workflow]
-):
+def is_workflow_run_of_query(
+        workflow_run: Dict[str, Any],
+        workflow_name: str,
+        workflow_version: str,
+        library_id_list: List[str],
+) -> bool:
     """
-    Add the workflow draft event detail
+    Check a workflow run returned by the workflow manager could match our workflow run query,
+    a run of this workflow name/version with at least one of these libraries.
+    The workflow manager ignores query parameters it doesn't know,
+    so any other run means it didn't apply our filters
+    :param workflow_run:
+    :param workflow_name:
+    :param workflow_version:
+    :param library_id_list:
+    :return:
+    """
+    return (
+        workflow_run.get('workflow', {}).get('name', workflow_name) == workflow_name and
+        workflow_run.get('workflow', {}).get('version', workflow_version) == workflow_version and
+        (
+            'libraries' not in workflow_run or
+            not set(library_id_list).isdisjoint(map(
+                lambda library_iter_: library_iter_['libraryId'],
+                workflow_run['libraries']
+            ))
+        )
+    )
+
+
+def is_matching_workflow_run(
+        workflow_run: Dict[str, Any],
+        workflow_name: str,
+        workflow_version: str,
+        library_id_list: List[str],
+) -> bool:
+    """
+    Check a workflow run returned by the workflow manager is a non deprecated run
+    of this workflow name/version with every one of these libraries
+    :param workflow_run:
+    :param workflow_name:
+    :param workflow_version:
+    :param library_id_list:
+    :return:
+    """
+    return (
+        workflow_run['currentState']['status'] != DEPRECATED_STATUS and
+        workflow_run.get('workflow', {}).get('name', workflow_name) == workflow_name and
+        workflow_run.get('workflow', {}).get('version', workflow_version) == workflow_version and
+        set(library_id_list).issubset(map(
+            lambda library_iter_: library_iter_['libraryId'],
+            workflow_run.get('libraries', [])
+        ))
+    )
+
+
+@traced
+def any_existing_workflow_run(
+    workflow_name: str,
+    workflow_version: str,
+    libraries: List[Library],
+    rgid_list: Optional[List[str]] = None,
+) -> bool:
+    """
+    Check if there is any existing (non deprecated) workflow run for a given workflow name/version
+    and library/readset list.
+    Unlike get_existing_workflow_runs, runs are fetched a small page at a time, and we stop at the first match,
+    so libraries with a long run history don't pay for every run's full detail
+    :param workflow_name:
+    :param workflow_version:
     :param libraries:
-    :param payload
-    :param workflow_run_prefix:
-    :param kwargs:
+    :param rgid_list: The library rgids, if already known
     :return:
     """
-    # Get the workflow version from kwargs
-    workflow_name = kwargs['name']
-    workflow_version = kwargs['version']
+    set_span_attributes(workflowName=workflow_name, workflowVersion=workflow_version)
 
-    # Set the portal run id
-    portal_run_id = create_portal_run_id()
+    if rgid_list is None:
+        rgid_list = get_rgid_list_from_libraries(libraries)
 
-    # Workflow run name
-    workflow_run_name = create_workflow_run_name_from_workflow_name_workflow_version_and_portal_run_id(
-        workflow_name=workflow_name,
-        workflow_version=workflow_version,
-        portal_run_id=portal_run_id,
-        workflow_run_prefix=workflow_run_prefix,
+    library_id_list = list(map(
+        lambda library_obj_iter_: library_obj_iter_['libraryId'],
+        libraries
+    ))
+
+    params: Optional[Dict[str, Union[str, int, List[str]]]] = {
+        WORKFLOW_RUN_WORKFLOW_NAME_QUERY_PARAMETER_NAME: workflow_name,
+        WORKFLOW_RUN_WORKFLOW_VERSION_QUERY_PARAMETER_NAME: workflow_version,
+        WORKFLOW_RUN_LIBRARY_ID_QUERY_PARAMETER_NAME: library_id_list,
+        WORKFLOW_RUN_RGID_QUERY_PARAMETER_NAME: rgid_list,
+        "rowsPerPage": WORKFLOW_RUN_EXISTENCE_ROWS_PER_PAGE,
+    }
+
+    # A long readset history may not fit in a URL, fetch every matching run instead
+    if len(urlencode(params, doseq=True)) > MAX_WORKFLOW_RUN_QUERY_STRING_LENGTH:
+        set_span_attributes(fallback=True)
+        return len(get_existing_workflow_runs(
+            workflow_name=workflow_name,
+            workflow_version=workflow_version,
+            libraries=libraries,
+            rgid_list=rgid_list,
+        )) > 0
+
+    url: Optional[str] = f"https://{WORKFLOW_SUBDOMAIN_NAME}.{get_hostname()}/{WORKFLOW_RUN_ENDPOINT}"
+    headers = {"Authorization": f"Bearer {get_orcabus_token()}"}
+    page_count = 0
+
+    while url is not None:
+        response = get_session().get(
+            url,
+            params=params,
+            headers=headers,
+            timeout=WORKFLOW_RUN_REQUEST_TIMEOUT_SECONDS,
+        )
+        response.raise_for_status()
+        page = response.json()
+        page_count += 1
+
+        # Rather than page through every workflow run, fall back to the api tools' own query
+        if not all(map(
+            lambda workflow_run_iter_: is_workflow_run_of_query(
+                workflow_run_iter_,
+                workflow_name=workflow_name,
+                workflow_version=workflow_version,
+                library_id_list=library_id_list,
+            ),
+            page['results']
+        )):
+            logger.warning(
+                f"The workflow manager returned a workflow run outside our query for {workflow_name} "
+                f"{workflow_version} and libraries {library_id_list}, it may not support our filters "
+                f"({WORKFLOW_RUN_WORKFLOW_NAME_QUERY_PARAMETER_NAME}, "
+                f"{WORKFLOW_RUN_WORKFLOW_VERSION_QUERY_PARAMETER_NAME}, "
+                f"{WORKFLOW_RUN_LIBRARY_ID_QUERY_PARAMETER_NAME}), falling back to get_workflow_runs_from_metadata"
+            )
+            set_span_attributes(pageCount=page_count, filtersIgnored=True)
+            return len(get_existing_workflow_runs(
+                workflow_name=workflow_name,
+                workflow_version=workflow_version,
+                libraries=libraries,
+                rgid_list=rgid_list,
+            )) > 0
+
+        if any(map(
+            lambda workflow_run_iter_: is_matching_workflow_run(
+                workflow_run_iter_,
+                workflow_name=workflow_name,
+                workflow_version=workflow_version,
+                library_id_list=library_id_list,
+            ),
+            page['results']
+        )):
+            set_span_attributes(pageCount=page_count)
+            return True
+
+        # The next link carries the query parameters
+        url = page['links']['next']
+        params = None
+
+    set_span_attributes(pageCount=page_count)
+    return False
+
+
+def get_workflow(**kwargs: Unpack[Workflow]) -> Dict[str, Any]:
+    """
+    Get the workflow manager's workflow object for a workflow.
+    Workflow objects don't change once registered, so lookups are cached for the lifetime of the process.
+    :param kwargs:
+    :return:
+    """
+    workflow_cache_key = (
+        kwargs['name'],
+        kwargs['version'],
+        kwargs.get("codeVersion", None),
+        kwargs.get("executionEngine", None),
+        kwargs.get("executionEnginePipelineId", None),
+        kwargs.get("validationState", None),
     )
 
-    # Get the workflow object
+    if workflow_cache_key in WORKFLOW_CACHE:
+        return WORKFLOW_CACHE[workflow_cache_key]
+
     try:
         workflow = next(iter(
             list_workflows(
-                workflow_name=workflow_name,
-                workflow_version=workflow_version,
+                workflow_name=kwargs['name'],
+                workflow_version=kwargs['version'],
                 code_version=kwargs.get("codeVersion", None),
                 execution_engine=cast(Optional[ExecutionEngineType], kwargs.get("executionEngine", None)),
                 execution_engine_pipeline_id=kwargs.get("executionEnginePipelineId", None),
@@ -182,17 +478,251 @@ def add_workflow_draft_event_detail(
         ))
     except StopIteration:
         raise ValueError(
-            f"Workflow {workflow_name} version {workflow_version} not found"
+            f"Workflow {kwargs['name']} version {kwargs['version']} not found"
         )
 
-    return dict(filter(
+    WORKFLOW_CACHE[workflow_cache_key] = workflow
+    return workflow
+
+
+def build_workflow_draft_event_detail(
+        workflow: Dict[str, Any],
+        event_libraries: List[EventLibrary],
+        payload: Optional[Payload] = None,
+        workflow_run_prefix: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Build the workflow draft event detail from a workflow object and libraries with their readsets,
+    validated against the draft event detail schema
+    :param workflow: The workflow manager's workflow object
+    :param event_libraries:
+    :param payload:
+    :param workflow_run_prefix:
+    :return:
+    """
+    # Set the portal run id
+    portal_run_id = create_portal_run_id()
+
+    # Workflow run name
+    workflow_run_name = create_workflow_run_name_from_workflow_name_workflow_version_and_portal_run_id(
+        workflow_name=workflow['name'],
+        workflow_version=workflow['version'],
+        portal_run_id=portal_run_id,
+        workflow_run_prefix=workflow_run_prefix,
+    )
+
+    event_detail = dict(filter(
         lambda kv_iter_: kv_iter_[1] is not None,
         {
             "status": DRAFT_STATUS,
             "workflow": workflow,
             "workflowRunName": workflow_run_name,
             "portalRunId": portal_run_id,
-            "libraries": get_libraries_with_readsets(libraries),
+            "libraries": event_libraries,
             "payload": payload
         }.items()
     ))
+
+    # Fail while the draft's claim can still be released
+    validate_workflow_draft_event_detail(event_detail)
+
+    return event_detail
+
+
+@traced
+def add_workflow_draft_event_detail(
+        libraries: List[Library],
+        payload: Optional[Payload] = None,
+        workflow_run_prefix: Optional[str] = None,
+        **kwargs: Unpack[Workflow]
+):
+    """
+    Add the workflow draft event detail
+    :param libraries:
+    :param payload
+    :param workflow_run_prefix:
+    :param kwargs:
+    :return:
+    """
+    set_span_attributes(workflowName=kwargs['name'], workflowVersion=kwargs['version'])
+
+    return build_workflow_draft_event_detail(
+        workflow=get_workflow(**kwargs),
+        event_libraries=get_libraries_with_readsets(libraries),
+        payload=payload,
+        workflow_run_prefix=workflow_run_prefix,
+    )
+
+
+def has_existing_workflow_run(
+        workflow_name: str,
+        workflow_version: str,
+        libraries: List[Library],
+        rgid_list: List[str],
+) -> bool:
+    """
+    Check a draft for an existing (non deprecated) workflow run,
+    from the rgid workflow run index where we can, otherwise the workflow manager
+    :param workflow_name:
+    :param workflow_version:
+    :param libraries:
+    :param rgid_list:
+    :return:
+    """
+    # Once the index is authoritative, any run it has for every rgid is an existing run,
+    # and a draft without indexed runs has no existing runs.
+    # Until then, the workflow manager has the final say either way
+    indexed_workflow_run_ids = get_indexed_workflow_run_ids(workflow_name, workflow_version, rgid_list)
+    if indexed_workflow_run_ids is not None:
+        set_span_attributes(indexedWorkflowRunCount=len(indexed_workflow_run_ids))
+        if is_rgid_workflow_run_index_authoritative():
+            return len(indexed_workflow_run_ids) > 0
+
+    return any_existing_workflow_run(
+        workflow_name=workflow_name,
+        workflow_version=workflow_version,
+        libraries=libraries,
+        rgid_list=rgid_list,
+    )
+
+
+@traced
+def claim_workflow_draft(
+        workflow_name: str,
+        workflow_version: str,
+        libraries: List[Library],
+        rgid_list: Optional[List[str]] = None,
+) -> bool:
+    """
+    Claim a workflow draft for this workflow name/version and library/readset list.
+    Returns False if the draft is a duplicate.
+
+    If the draft ledger is configured, we atomically claim the draft in the ledger first,
+    so duplicate drafts (including those claimed by a concurrent execution) are rejected without
+    querying the workflow manager.
+    Only the first time the ledger sees a draft do we confirm there are no existing workflow runs
+    that predate the ledger.
+
+    If the draft already has a workflow run, the claim is confirmed, so later drafts are rejected by the ledger alone,
+    the claim is released once that run is deprecated (see rgid_workflow_run_index.py).
+    If we fail to check for a workflow run, the claim is released, so a retry doesn't see a duplicate.
+
+    :param workflow_name:
+    :param workflow_version:
+    :param libraries:
+    :param rgid_list: The library rgids, if already known
+    :return:
+    """
+    set_span_attributes(workflowName=workflow_name, workflowVersion=workflow_version)
+
+    if rgid_list is None:
+        rgid_list = get_rgid_list_from_libraries(libraries)
+
+    is_claimed = get_draft_ledger() is not None
+    if is_claimed and not claim_draft(
+        workflow_name=workflow_name,
+        workflow_version=workflow_version,
+        library_id_list=list(map(
+            lambda library_obj_iter_: library_obj_iter_['libraryId'],
+            libraries
+        )),
+        rgid_list=rgid_list,
+    ):
+        return False
+
+    try:
+        is_duplicate = has_existing_workflow_run(
+            workflow_name=workflow_name,
+            workflow_version=workflow_version,
+            libraries=libraries,
+            rgid_list=rgid_list,
+        )
+    except Exception:
+        if is_claimed:
+            release_workflow_draft(
+                workflow_name=workflow_name,
+                workflow_version=workflow_version,
+                libraries=libraries,
+                rgid_list=rgid_list,
+            )
+        raise
+
+    # Remember the existing run, so we don't check for it again
+    if is_duplicate and is_claimed:
+        confirm_draft(
+            workflow_name=workflow_name,
+            workflow_version=workflow_version,
+            library_id_list=list(map(
+                lambda library_obj_iter_: library_obj_iter_['libraryId'],
+                libraries
+            )),
+            rgid_list=rgid_list,
+        )
+
+    return not is_duplicate
+
+
+def release_workflow_draft(
+        workflow_name: str,
+        workflow_version: str,
+        libraries: List[Library],
+        rgid_list: Optional[List[str]] = None,
+):
+    """
+    Release a claimed workflow draft, a no-op if the draft ledger is not configured
+    :param workflow_name:
+    :param workflow_version:
+    :param libraries:
+    :param rgid_list: The library rgids, if already known
+    :return:
+    """
+    if get_draft_ledger() is None:
+        return
+
+    release_draft(
+        workflow_name=workflow_name,
+        workflow_version=workflow_version,
+        library_id_list=list(map(
+            lambda library_obj_iter_: library_obj_iter_['libraryId'],
+            libraries
+        )),
+        rgid_list=rgid_list if rgid_list is not None else get_rgid_list_from_libraries(libraries),
+    )
+
+
+def add_new_workflow_draft_event_detail(
+        libraries: List[Library],
+        payload: Optional[Payload] = None,
+        workflow_run_prefix: Optional[str] = None,
+        **kwargs: Unpack[Workflow]
+) -> Optional[Dict[str, Any]]:
+    """
+    Claim and add the workflow draft event detail, returns None if the draft is a duplicate
+    :param libraries:
+    :param payload:
+    :param workflow_run_prefix:
+    :param kwargs:
+    :return:
+    """
+    if not claim_workflow_draft(
+        workflow_name=kwargs['name'],
+        workflow_version=kwargs['version'],
+        libraries=libraries,
+    ):
+        return None
+
+    try:
+        return add_workflow_draft_event_detail(
+            libraries=libraries,
+            payload=payload,
+            workflow_run_prefix=workflow_run_prefix,
+            **kwargs
+        )
+    except Exception:
+        # Don't leave a claim behind for a draft we never generated
+        release_workflow_draft(
+            workflow_name=kwargs['name'],
+            workflow_version=kwargs['version'],
+            libraries=libraries,
+        )
+        raise
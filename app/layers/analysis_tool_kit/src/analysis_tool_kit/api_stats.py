@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+
+"""
+OrcaBus API call statistics
+
+Every API call made through the toolkit's request hook is counted against the current stage
+(set with api_stats_stage) and its endpoint family, so we can see what each stage of a run costs.
+
+The stage is process-wide rather than per-thread, since the toolkit fans API calls out over thread pools,
+so stages should be run one after another.
+"""
+
+# Standard imports
+import time
+from contextlib import contextmanager
+from copy import deepcopy
+from threading import Lock
+from typing import Dict, Any
+
+# Globals
+DEFAULT_API_STATS_STAGE = "default"
+API_STATS_STAGE = DEFAULT_API_STATS_STAGE
+API_CALL_STATS: Dict[str, Dict[str, Any]] = {}
+API_CALL_STATS_LOCK = Lock()
+
+
+def get_empty_stage_stats() -> Dict[str, Any]:
+    return {
+        "apiCalls": 0,
+        "bytesTransferred": 0,
+        "apiTimeSeconds": 0.0,
+        "wallTimeSeconds": 0.0,
+        "byEndpointFamily": {},
+    }
+
+
+def record_api_call(endpoint_family: str, bytes_transferred: int, elapsed_seconds: float):
+    """
+    Record an API call against the current stage
+    :param endpoint_family:
+    :param bytes_transferred: Request and response body sizes
+    :param elapsed_seconds:
+    :return:
+    """
+    with API_CALL_STATS_LOCK:
+        stage_stats = API_CALL_STATS.setdefault(API_STATS_STAGE, get_empty_stage_stats())
+        family_stats = stage_stats['byEndpointFamily'].setdefault(
+            endpoint_family,
+            {"apiCalls": 0, "bytesTransferred": 0, "apiTimeSeconds": 0.0}
+        )
+        for stats in [stage_stats, family_stats]:
+            stats['apiCalls'] += 1
+            stats['bytesTransferred'] += bytes_transferred
+            stats['apiTimeSeconds'] += elapsed_seconds
+
+
+@contextmanager
+def api_stats_stage(stage: str):
+    """
+    Count API calls made in this block against a stage, and record the stage's wall time
+    :param stage:
+    :return:
+    """
+    global API_STATS_STAGE
+
+    with API_CALL_STATS_LOCK:
+        previous_stage = API_STATS_STAGE
+        API_STATS_STAGE = stage
+        API_CALL_STATS.setdefault(stage, get_empty_stage_stats())
+
+    start = time.monotonic()
+    try:
+        yield
+    finally:
+        with API_CALL_STATS_LOCK:
+            API_CALL_STATS[stage]['wallTimeSeconds'] += time.monotonic() - start
+            API_STATS_STAGE = previous_stage
+
+
+def get_api_call_stats() -> Dict[str, Dict[str, Any]]:
+    with API_CALL_STATS_LOCK:
+        return deepcopy(API_CALL_STATS)
+
+
+def reset_api_call_stats():
+    with API_CALL_STATS_LOCK:
+        API_CALL_STATS.clear()
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+
+"""
+Compact library records
+
+The pairing lambdas scan the whole library catalog for a subject's other libraries,
+but only read a handful of fields from each library.
+
+A CompactLibrary holds just those fields in __slots__, with the low cardinality fields
+(type, phenotype, workflow) and the subject ids interned, so each value is stored once across the catalog.
+Records are built as the catalog is streamed, so the full library objects of only one page are held at a time.
+
+Compact libraries can be read like library objects (library['libraryId']),
+and library['subject'] returns the subject's ids, so they can be passed to the analysis helpers as is.
+
+A subject's libraries can be collected with get_compact_subject_libraries, which filters each page as it arrives,
+so the lookup only holds the subject's libraries (and one page) in memory.
+
+A process that looks up the libraries of many subjects (i.e. a backfill) can instead stream the catalog once,
+and set it as the catalog snapshot, subject lookups are then served from the snapshot rather than the metadata service.
+In snapshot mode the predicate is applied to the compact records,
+which only hold the fields above (these are all the pairing lambdas filter on).
+"""
+
+# Standard imports
+from sys import intern
+from typing import List, Dict, Optional, Any, Callable, Iterator
+
+# Layer imports
+from orcabus_api_tools.metadata.models import Library
+
+# Local imports
+from .globals import LIBRARY_SUBJECT_QUERY_PARAMETER_NAME
+from .library_helpers import iter_all_libraries
+
+# The catalog snapshot, compact libraries by subject orcabus id, served in place of the metadata service if set
+COMPACT_LIBRARY_CATALOG_SNAPSHOT: Optional[Dict[str, List['CompactLibrary']]] = None
+
+
+def intern_optional(value: Optional[str]) -> Optional[str]:
+    return intern(value) if value is not None else None
+
+
+class CompactLibrary:
+    __slots__ = (
+        'orcabusId',
+        'libraryId',
+        'type',
+        'phenotype',
+        'workflow',
+        'subjectOrcabusId',
+        'subjectId',
+    )
+
+    def __init__(
+            self,
+            orcabus_id: str,
+            library_id: str,
+            library_type: Optional[str],
+            phenotype: Optional[str],
+            workflow: Optional[str],
+            subject_orcabus_id: Optional[str],
+            subject_id: Optional[str],
+    ):
+        self.orcabusId = orcabus_id
+        self.libraryId = library_id
+        self.type = intern_optional(library_type)
+        self.phenotype = intern_optional(phenotype)
+        self.workflow = intern_optional(workflow)
+        self.subjectOrcabusId = intern_optional(subject_orcabus_id)
+        self.subjectId = intern_optional(subject_id)
+
+    @classmethod
+    def from_library(cls, library: Library) -> 'CompactLibrary':
+        subject = library.get('subject', None) or {}
+        return cls(
+            orcabus_id=library['orcabusId'],
+            library_id=library['libraryId'],
+            library_type=library.get('type', None),
+            phenotype=library.get('phenotype', None),
+            workflow=library.get('workflow', None),
+            subject_orcabus_id=subject.get('orcabusId', None),
+            subject_id=subject.get('subjectId', None),
+        )
+
+    def __getitem__(self, key: str) -> Any:
+        if key == 'subject':
+            return {
+                "orcabusId": self.subjectOrcabusId,
+                "subjectId": self.subjectId,
+            }
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __repr__(self) -> str:
+        return f"CompactLibrary(libraryId={self.libraryId!r}, orcabusId={self.orcabusId!r})"
+
+
+def iter_compact_libraries(
+        query_params: Optional[Dict[str, str]] = None,
+        predicate: Optional[Callable[[Library], bool]] = None,
+) -> Iterator[CompactLibrary]:
+    """
+    Stream the library catalog as compact library records, only libraries that pass the predicate are compacted
+    :param query_params: Server side filters
+    :param predicate: Client side filter, on the full library objects
+    :return:
+    """
+    return map(
+        CompactLibrary.from_library,
+        iter_all_libraries(query_params=query_params, predicate=predicate)
+    )
+
+
+def get_compact_library_catalog() -> List[CompactLibrary]:
+    """
+    Stream the library catalog into compact library records
+    :return:
+    """
+    return list(iter_compact_libraries())
+
+
+def set_compact_library_catalog_snapshot(compact_library_catalog: List[CompactLibrary]):
+    """
+    Serve subject library lookups from a snapshot of the compact library catalog
+    :param compact_library_catalog:
+    :return:
+    """
+    global COMPACT_LIBRARY_CATALOG_SNAPSHOT
+
+    compact_libraries_by_subject_orcabus_id: Dict[str, List[CompactLibrary]] = {}
+    for compact_library in compact_library_catalog:
+        compact_libraries_by_subject_orcabus_id.setdefault(compact_library.subjectOrcabusId, []).append(
+            compact_library
+        )
+
+    COMPACT_LIBRARY_CATALOG_SNAPSHOT = compact_libraries_by_subject_orcabus_id
+
+
+def get_compact_library_catalog_snapshot() -> Optional[Dict[str, List[CompactLibrary]]]:
+    return COMPACT_LIBRARY_CATALOG_SNAPSHOT
+
+
+def clear_compact_library_catalog_snapshot():
+    global COMPACT_LIBRARY_CATALOG_SNAPSHOT
+    COMPACT_LIBRARY_CATALOG_SNAPSHOT = None
+
+
+def get_compact_subject_libraries(
+        subject_orcabus_id: str,
+        predicate: Optional[Callable[[Library], bool]] = None,
+) -> List[CompactLibrary]:
+    """
+    Get a subject's libraries (across all instrument runs) as compact library records.
+    We ask the metadata service for just this subject's libraries,
+    and check each library's subject as it arrives, in case the service doesn't support the filter.
+    :param subject_orcabus_id:
+    :param predicate: Any additional client side filter, on the full library objects
+    :return:
+    """
+    # Served from the catalog snapshot, the predicate is applied to the compact records
+    if COMPACT_LIBRARY_CATALOG_SNAPSHOT is not None:
+        return list(filter(
+            lambda compact_library_iter_: predicate is None or predicate(compact_library_iter_),
+            COMPACT_LIBRARY_CATALOG_SNAPSHOT.get(subject_orcabus_id, [])
+        ))
+
+    return list(iter_compact_libraries(
+        query_params={LIBRARY_SUBJECT_QUERY_PARAMETER_NAME: subject_orcabus_id},
+        predicate=lambda library_iter_: (
+            (library_iter_.get('subject', None) or {}).get('orcabusId', None) == subject_orcabus_id and
+            (predicate is None or predicate(library_iter_))
+        )
+    ))
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+
+"""
+Draft factory
+
+Generate workflow drafts for a list of draft requests (a workflow key and a set of libraries) in bulk.
+
+Rather than evaluating each draft on its own, the factory
+  * resolves the readsets of every unique library once, no matter how many drafts it appears in
+  * looks up every unique workflow once
+  * runs the existence check (ledger claim / workflow run query) once per unique draft
+
+and runs each of these stages concurrently.
+
+Drafts are returned in the same order as the draft requests,
+with None in place of any draft that is a duplicate, either of an existing workflow run
+or of an earlier request in the same list.
+If any draft in the list can't be generated, the claims of every draft in the list are released.
+"""
+
+# Standard imports
+import logging
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import List, Dict, Any, Optional, Mapping
+
+# Layer imports
+from orcabus_api_tools.metadata.models import Library
+
+# Local imports
+from .analysis_helpers import (
+    get_readsets_in_library,
+    get_workflow,
+    build_workflow_draft_event_detail,
+    claim_workflow_draft,
+    release_workflow_draft,
+)
+from .draft_ledger import get_draft_key
+from .globals import MAX_DRAFT_FACTORY_WORKERS
+from .models import DraftRequest, EventLibrary, ReadSet, Workflow
+from .tracing import traced, bind_current_span
+
+# Set logger
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def get_library_id_list(libraries: List[Library]) -> List[str]:
+    return list(map(
+        lambda library_obj_iter_: library_obj_iter_['libraryId'],
+        libraries
+    ))
+
+
+@traced
+def generate_workflow_drafts(
+        workflow_objects_dict: Mapping[str, Workflow],
+        draft_request_list: List[DraftRequest],
+) -> List[Optional[Dict[str, Any]]]:
+    """
+    Generate the workflow draft event details for a list of draft requests
+    :param workflow_objects_dict: The workflow objects, keyed by workflow key
+    :param draft_request_list:
+    :return: The draft event details in the order of the draft requests, None for duplicate drafts
+    """
+    if len(draft_request_list) == 0:
+        return []
+
+    # Collect the unique libraries and workflows across all requests
+    libraries_by_library_id: Dict[str, Library] = {
+        library_obj_iter_['libraryId']: library_obj_iter_
+        for draft_request_iter_ in draft_request_list
+        for library_obj_iter_ in draft_request_iter_['libraries']
+    }
+    workflow_key_list = list(dict.fromkeys(map(
+        lambda draft_request_iter_: draft_request_iter_['workflowKey'],
+        draft_request_list
+    )))
+
+    with ThreadPoolExecutor(max_workers=MAX_DRAFT_FACTORY_WORKERS) as executor:
+        # Readsets, once per library
+        readsets_by_library_id: Dict[str, List[ReadSet]] = dict(zip(
+            libraries_by_library_id.keys(),
+            executor.map(bind_current_span(get_readsets_in_library), libraries_by_library_id.keys())
+        ))
+
+        # Workflows, once per workflow key
+        workflows_by_key: Dict[str, Dict[str, Any]] = dict(zip(
+            workflow_key_list,
+            executor.map(
+                bind_current_span(
+                    lambda workflow_key_iter_: get_workflow(**workflow_objects_dict[workflow_key_iter_])
+                ),
+                workflow_key_list
+            )
+        ))
+
+        # Get the workflow object, rgid list and draft key of each request
+        workflow_object_by_request: List[Workflow] = list(map(
+            lambda draft_request_iter_: workflow_objects_dict[draft_request_iter_['workflowKey']],
+            draft_request_list
+        ))
+        rgid_list_by_request = list(map(
+            lambda draft_request_iter_: list(map(
+                lambda readset_iter_: readset_iter_['rgid'],
+                [
+                    readset_iter_
+                    for library_obj_iter_ in draft_request_iter_['libraries']
+                    for readset_iter_ in readsets_by_library_id[library_obj_iter_['libraryId']]
+                ]
+            )),
+            draft_request_list
+        ))
+        draft_key_by_request: List[str] = []
+        for draft_request, workflow_object, rgid_list in zip(
+                draft_request_list, workflow_object_by_request, rgid_list_by_request
+        ):
+            draft_key_by_request.append(get_draft_key(
+                workflow_name=workflow_object['name'],
+                workflow_version=workflow_object['version'],
+                library_id_list=get_library_id_list(draft_request['libraries']),
+                rgid_list=rgid_list,
+            ))
+
+        # Existence checks, once per unique draft, the first request for each draft owns the claim
+        first_request_index_by_draft_key: Dict[str, int] = {}
+        for request_index, draft_key in enumerate(draft_key_by_request):
+            first_request_index_by_draft_key.setdefault(draft_key, request_index)
+
+        claim_futures: Dict[str, Future] = {}
+        for draft_key, request_index in first_request_index_by_draft_key.items():
+            workflow_object = workflow_object_by_request[request_index]
+            claim_futures[draft_key] = executor.submit(
+                bind_current_span(claim_workflow_draft),
+                workflow_name=workflow_object['name'],
+                workflow_version=workflow_object['version'],
+                libraries=draft_request_list[request_index]['libraries'],
+                rgid_list=rgid_list_by_request[request_index],
+            )
+
+    # Collect claims, we don't raise until we know which claims need releasing.
+    # A claim that raised has already been released by claim_workflow_draft (or was never made),
+    # and must not be released again here, as the draft may since have been claimed by a concurrent execution
+    claimed_by_draft_key: Dict[str, bool] = {}
+    claim_error: Optional[BaseException] = None
+    for draft_key, claim_future in claim_futures.items():
+        try:
+            claimed_by_draft_key[draft_key] = claim_future.result()
+        except Exception as e:
+            claimed_by_draft_key[draft_key] = False
+            claim_error = claim_error or e
+
+    # Build the drafts in request order
+    draft_event_detail_list: List[Optional[Dict[str, Any]]] = []
+    try:
+        if claim_error is not None:
+            raise claim_error
+
+        for request_index, draft_request in enumerate(draft_request_list):
+            workflow_object = workflow_object_by_request[request_index]
+            draft_key = draft_key_by_request[request_index]
+
+            if (
+                    first_request_index_by_draft_key[draft_key] != request_index or
+                    not claimed_by_draft_key[draft_key]
+            ):
+                logger.warning(
+                    f"Existing {workflow_object['name']} draft or workflow run found for libraries: "
+                    f"{get_library_id_list(draft_request['libraries'])}, skipping draft"
+                )
+                draft_event_detail_list.append(None)
+                continue
+
+            draft_event_detail_list.append(
+                build_workflow_draft_event_detail(
+                    workflow=workflows_by_key[draft_request['workflowKey']],
+                    event_libraries=list(filter(
+                        lambda event_library_iter_: len(event_library_iter_['readsets']) > 0,
+                        map(
+                            lambda library_obj_iter_: EventLibrary(
+                                orcabusId=library_obj_iter_['orcabusId'],
+                                libraryId=library_obj_iter_['libraryId'],
+                                readsets=readsets_by_library_id[library_obj_iter_['libraryId']],
+                            ),
+                            draft_request['libraries']
+                        )
+                    )),
+                    payload=draft_request.get("payload", None),
+                    workflow_run_prefix=draft_request.get("workflowRunPrefix", None),
+                )
+            )
+    except Exception:
+        # None of the batch's drafts are returned, so release every claim we made,
+        # including the claims of drafts we had already built
+        for draft_key, request_index in first_request_index_by_draft_key.items():
+            if not claimed_by_draft_key[draft_key]:
+                continue
+            workflow_object = workflow_object_by_request[request_index]
+            release_workflow_draft(
+                workflow_name=workflow_object['name'],
+                workflow_version=workflow_object['version'],
+                libraries=draft_request_list[request_index]['libraries'],
+                rgid_list=rgid_list_by_request[request_index],
+            )
+        raise
+
+    return draft_event_detail_list
@@ -0,0 +1,479 @@
+#!/usr/bin/env python3
+
+"""
+Draft ledger
+
+A record of every workflow draft the analysis glue has generated,
+keyed on the workflow name, workflow version, sorted library ids and sorted readset rgids.
+
+Claims are conditional writes, so two concurrent executions can never both claim the same draft.
+
+A claim is pending, with an expiresAt timestamp, until it is confirmed by the workflow run state change event
+of the draft (see rgid_workflow_run_index.py), or by finding the draft already has a workflow run,
+a pending claim that has expired can be claimed again.
+A confirmed claim is released once its workflow run is deprecated, so the draft can be generated again.
+
+Backends
+  * DynamoDB - set DRAFT_LEDGER_TABLE_NAME, claims use a conditional put (attribute_not_exists or expired)
+  * SQLite - set DRAFT_LEDGER_SQLITE_PATH, a local stand-in for tests, claims are an upsert on the primary key
+    that only replaces an expired claim
+
+If neither environment variable is set the ledger is disabled and get_draft_ledger returns None.
+
+The ledger can also hold short-lived records (i.e. the unpairable subject cache), these are written with put
+and given an expiresAt epoch timestamp, which is used as the DynamoDB TTL attribute
+and is checked on read since DynamoDB only deletes expired items eventually.
+
+Records written with put_if_newer carry a version, and are only replaced by a record of the same or a higher
+version (i.e. the last state of each workflow run, versioned by event time).
+
+The ledger can also hold string sets (i.e. the rgid workflow run index), values are added to and removed from
+a set atomically, so concurrent updates to the same set never lose a value.
+
+In dry run mode (see dry_run.py) the ledger is read only, claims only check if the draft has already been claimed.
+"""
+
+# Standard imports
+import json
+import sqlite3
+import typing
+import time
+from datetime import datetime, UTC
+from hashlib import sha256
+from os import environ
+from threading import Lock
+from typing import List, Dict, Optional, Union, Set
+
+import boto3
+
+# Local imports
+from .dry_run import is_dry_run
+from .globals import (
+    DRAFT_LEDGER_TABLE_NAME_ENV_VAR,
+    DRAFT_LEDGER_SQLITE_PATH_ENV_VAR,
+    DRAFT_LEDGER_PARTITION_KEY,
+    DRAFT_LEDGER_EXPIRES_AT_ATTRIBUTE,
+    DRAFT_LEDGER_VERSION_ATTRIBUTE,
+    DRAFT_LEDGER_BATCH_GET_MAX_KEYS,
+    DRAFT_LEDGER_CLAIM_TTL_SECONDS,
+)
+
+# Type check imports
+if typing.TYPE_CHECKING:
+    from mypy_boto3_dynamodb import DynamoDBClient
+
+# Globals
+DRAFT_LEDGER: Optional[Union['DynamoDbDraftLedger', 'SqliteDraftLedger']] = None
+DRAFT_LEDGER_LOCK = Lock()
+
+
+def get_draft_key(
+        workflow_name: str,
+        workflow_version: str,
+        library_id_list: List[str],
+        rgid_list: List[str],
+) -> str:
+    """
+    Get the ledger key for a draft.
+    The key is a hash as the rgid list of a long library history can exceed the DynamoDB key size limit.
+    :param workflow_name:
+    :param workflow_version:
+    :param library_id_list:
+    :param rgid_list:
+    :return:
+    """
+    return sha256(
+        json.dumps(
+            [
+                workflow_name,
+                workflow_version,
+                sorted(set(library_id_list)),
+                sorted(set(rgid_list)),
+            ],
+            separators=(',', ':')
+        ).encode()
+    ).hexdigest()
+
+
+def is_expired(attributes: Dict[str, str]) -> bool:
+    """
+    Check if a ledger record with an expiresAt attribute has expired
+    :param attributes:
+    :return:
+    """
+    return (
+        DRAFT_LEDGER_EXPIRES_AT_ATTRIBUTE in attributes and
+        int(attributes[DRAFT_LEDGER_EXPIRES_AT_ATTRIBUTE]) <= time.time()
+    )
+
+
+class DynamoDbDraftLedger:
+    def __init__(self, table_name: str):
+        self.table_name = table_name
+        self.client: 'DynamoDBClient' = boto3.client('dynamodb')
+
+    def claim(self, draft_key: str, attributes: Dict[str, str], ttl_seconds: int) -> bool:
+        now = int(time.time())
+        try:
+            self.client.put_item(
+                TableName=self.table_name,
+                Item={
+                    DRAFT_LEDGER_PARTITION_KEY: {'S': draft_key},
+                    DRAFT_LEDGER_EXPIRES_AT_ATTRIBUTE: {'N': str(now + ttl_seconds)},
+                    **{
+                        key: {'S': value}
+                        for key, value in attributes.items()
+                    }
+                },
+                # An expired pending claim may not have been deleted yet
+                ConditionExpression='attribute_not_exists(#pk) OR #expiresAt <= :now',
+                ExpressionAttributeNames={
+                    '#pk': DRAFT_LEDGER_PARTITION_KEY,
+                    '#expiresAt': DRAFT_LEDGER_EXPIRES_AT_ATTRIBUTE,
+                },
+                ExpressionAttributeValues={':now': {'N': str(now)}},
+            )
+        except self.client.exceptions.ConditionalCheckFailedException:
+            return False
+        return True
+
+    def confirm(self, draft_key: str) -> bool:
+        try:
+            self.client.update_item(
+                TableName=self.table_name,
+                Key={DRAFT_LEDGER_PARTITION_KEY: {'S': draft_key}},
+                UpdateExpression='REMOVE #expiresAt',
+                ConditionExpression='attribute_exists(#pk)',
+                ExpressionAttributeNames={
+                    '#pk': DRAFT_LEDGER_PARTITION_KEY,
+                    '#expiresAt': DRAFT_LEDGER_EXPIRES_AT_ATTRIBUTE,
+                },
+            )
+        except self.client.exceptions.ConditionalCheckFailedException:
+            return False
+        return True
+
+    def release(self, draft_key: str):
+        self.client.delete_item(
+            TableName=self.table_name,
+            Key={DRAFT_LEDGER_PARTITION_KEY: {'S': draft_key}},
+        )
+
+    def get(self, key: str) -> Optional[Dict[str, str]]:
+        item = self.client.get_item(
+            TableName=self.table_name,
+            Key={DRAFT_LEDGER_PARTITION_KEY: {'S': key}},
+            ConsistentRead=True,
+        ).get('Item')
+        if item is None:
+            return None
+        attributes = {
+            attribute_key: attribute_value[next(iter(attribute_value))]
+            for attribute_key, attribute_value in item.items()
+            if attribute_key != DRAFT_LEDGER_PARTITION_KEY
+        }
+        if is_expired(attributes):
+            return None
+        return attributes
+
+    def put(self, key: str, attributes: Dict[str, str], ttl_seconds: int):
+        self.client.put_item(
+            TableName=self.table_name,
+            Item={
+                DRAFT_LEDGER_PARTITION_KEY: {'S': key},
+                DRAFT_LEDGER_EXPIRES_AT_ATTRIBUTE: {'N': str(int(time.time()) + ttl_seconds)},
+                **{
+                    attribute_key: {'S': attribute_value}
+                    for attribute_key, attribute_value in attributes.items()
+                }
+            },
+        )
+
+    def put_if_newer(self, key: str, attributes: Dict[str, str], version: int, ttl_seconds: int) -> bool:
+        now = int(time.time())
+        try:
+            self.client.put_item(
+                TableName=self.table_name,
+                Item={
+                    DRAFT_LEDGER_PARTITION_KEY: {'S': key},
+                    DRAFT_LEDGER_EXPIRES_AT_ATTRIBUTE: {'N': str(now + ttl_seconds)},
+                    DRAFT_LEDGER_VERSION_ATTRIBUTE: {'N': str(version)},
+                    **{
+                        attribute_key: {'S': attribute_value}
+                        for attribute_key, attribute_value in attributes.items()
+                    }
+                },
+                ConditionExpression='attribute_not_exists(#pk) OR #version <= :version OR #expiresAt <= :now',
+                ExpressionAttributeNames={
+                    '#pk': DRAFT_LEDGER_PARTITION_KEY,
+                    '#version': DRAFT_LEDGER_VERSION_ATTRIBUTE,
+                    '#expiresAt': DRAFT_LEDGER_EXPIRES_AT_ATTRIBUTE,
+                },
+                ExpressionAttributeValues={
+                    ':version': {'N': str(version)},
+                    ':now': {'N': str(now)},
+                },
+            )
+        except self.client.exceptions.ConditionalCheckFailedException:
+            return False
+        return True
+
+    def add_to_set(self, key: str, attribute: str, values: List[str]):
+        self.client.update_item(
+            TableName=self.table_name,
+            Key={DRAFT_LEDGER_PARTITION_KEY: {'S': key}},
+            UpdateExpression='ADD #attribute :values',
+            ExpressionAttributeNames={'#attribute': attribute},
+            ExpressionAttributeValues={':values': {'SS': sorted(set(values))}},
+        )
+
+    def remove_from_set(self, key: str, attribute: str, values: List[str]):
+        self.client.update_item(
+            TableName=self.table_name,
+            Key={DRAFT_LEDGER_PARTITION_KEY: {'S': key}},
+            UpdateExpression='DELETE #attribute :values',
+            ExpressionAttributeNames={'#attribute': attribute},
+            ExpressionAttributeValues={':values': {'SS': sorted(set(values))}},
+        )
+
+    def get_sets(self, key_list: List[str], attribute: str) -> Dict[str, Set[str]]:
+        """
+        Get a set attribute of many records, records without the set are left out
+        :param key_list:
+        :param attribute:
+        :return:
+        """
+        sets_by_key: Dict[str, Set[str]] = {}
+        unique_key_list = sorted(set(key_list))
+        for chunk_start in range(0, len(unique_key_list), DRAFT_LEDGER_BATCH_GET_MAX_KEYS):
+            request_items = {
+                self.table_name: {
+                    'Keys': list(map(
+                        lambda key_iter_: {DRAFT_LEDGER_PARTITION_KEY: {'S': key_iter_}},
+                        unique_key_list[chunk_start:chunk_start + DRAFT_LEDGER_BATCH_GET_MAX_KEYS]
+                    )),
+                    'ProjectionExpression': '#pk, #attribute',
+                    'ExpressionAttributeNames': {'#pk': DRAFT_LEDGER_PARTITION_KEY, '#attribute': attribute},
+                }
+            }
+            while len(request_items) > 0:
+                response = self.client.batch_get_item(RequestItems=request_items)
+                for item in response['Responses'].get(self.table_name, []):
+                    if attribute in item:
+                        sets_by_key[item[DRAFT_LEDGER_PARTITION_KEY]['S']] = set(item[attribute]['SS'])
+                request_items = response.get('UnprocessedKeys', {})
+        return sets_by_key
+
+
+class SqliteDraftLedger:
+    def __init__(self, db_path: str):
+        self.connection = sqlite3.connect(db_path, isolation_level=None, check_same_thread=False)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS draft_ledger ("
+            f"{DRAFT_LEDGER_PARTITION_KEY} TEXT PRIMARY KEY, "
+            "attributes TEXT NOT NULL"
+            ")"
+        )
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS draft_ledger_sets ("
+            f"{DRAFT_LEDGER_PARTITION_KEY} TEXT NOT NULL, "
+            "attribute TEXT NOT NULL, "
+            "value TEXT NOT NULL, "
+            f"PRIMARY KEY ({DRAFT_LEDGER_PARTITION_KEY}, attribute, value)"
+            ")"
+        )
+
+    def claim(self, draft_key: str, attributes: Dict[str, str], ttl_seconds: int) -> bool:
+        now = int(time.time())
+        # Only replace an existing claim if it is pending and has expired
+        cursor = self.connection.execute(
+            f"INSERT INTO draft_ledger ({DRAFT_LEDGER_PARTITION_KEY}, attributes) VALUES (?, ?) "
+            f"ON CONFLICT ({DRAFT_LEDGER_PARTITION_KEY}) DO UPDATE SET attributes = excluded.attributes "
+            f"WHERE CAST(json_extract(draft_ledger.attributes, '$.{DRAFT_LEDGER_EXPIRES_AT_ATTRIBUTE}') AS INTEGER) <= ?",
+            (
+                draft_key,
+                json.dumps({
+                    DRAFT_LEDGER_EXPIRES_AT_ATTRIBUTE: str(now + ttl_seconds),
+                    **attributes
+                }),
+                now,
+            ),
+        )
+        return cursor.rowcount == 1
+
+    def confirm(self, draft_key: str) -> bool:
+        cursor = self.connection.execute(
+            f"UPDATE draft_ledger SET attributes = json_remove(attributes, '$.{DRAFT_LEDGER_EXPIRES_AT_ATTRIBUTE}') "
+            f"WHERE {DRAFT_LEDGER_PARTITION_KEY} = ?",
+            (draft_key,),
+        )
+        return cursor.rowcount == 1
+
+    def release(self, draft_key: str):
+        self.connection.execute(
+            f"DELETE FROM draft_ledger WHERE {DRAFT_LEDGER_PARTITION_KEY} = ?",
+            (draft_key,),
+        )
+
+    def get(self, key: str) -> Optional[Dict[str, str]]:
+        row = self.connection.execute(
+            f"SELECT attributes FROM draft_ledger WHERE {DRAFT_LEDGER_PARTITION_KEY} = ?",
+            (key,),
+        ).fetchone()
+        if row is None:
+            return None
+        attributes = json.loads(row[0])
+        if is_expired(attributes):
+            return None
+        return attributes
+
+    def put(self, key: str, attributes: Dict[str, str], ttl_seconds: int):
+        self.connection.execute(
+            f"INSERT OR REPLACE INTO draft_ledger ({DRAFT_LEDGER_PARTITION_KEY}, attributes) VALUES (?, ?)",
+            (
+                key,
+                json.dumps({
+                    DRAFT_LEDGER_EXPIRES_AT_ATTRIBUTE: str(int(time.time()) + ttl_seconds),
+                    **attributes
+                })
+            ),
+        )
+
+    def put_if_newer(self, key: str, attributes: Dict[str, str], version: int, ttl_seconds: int) -> bool:
+        now = int(time.time())
+        # Only replace an existing record of the same or a lower version, or that has expired
+        cursor = self.connection.execute(
+            f"INSERT INTO draft_ledger ({DRAFT_LEDGER_PARTITION_KEY}, attributes) VALUES (?, ?) "
+            f"ON CONFLICT ({DRAFT_LEDGER_PARTITION_KEY}) DO UPDATE SET attributes = excluded.attributes "
+            f"WHERE CAST(json_extract(draft_ledger.attributes, '$.{DRAFT_LEDGER_VERSION_ATTRIBUTE}') AS INTEGER) <= ? "
+            f"OR CAST(json_extract(draft_ledger.attributes, '$.{DRAFT_LEDGER_EXPIRES_AT_ATTRIBUTE}') AS INTEGER) <= ?",
+            (
+                key,
+                json.dumps({
+                    DRAFT_LEDGER_EXPIRES_AT_ATTRIBUTE: str(now + ttl_seconds),
+                    DRAFT_LEDGER_VERSION_ATTRIBUTE: str(version),
+                    **attributes
+                }),
+                version,
+                now,
+            ),
+        )
+        return cursor.rowcount == 1
+
+    def add_to_set(self, key: str, attribute: str, values: List[str]):
+        self.connection.executemany(
+            f"INSERT OR IGNORE INTO draft_ledger_sets ({DRAFT_LEDGER_PARTITION_KEY}, attribute, value) "
+            "VALUES (?, ?, ?)",
+            map(lambda value_iter_: (key, attribute, value_iter_), set(values)),
+        )
+
+    def remove_from_set(self, key: str, attribute: str, values: List[str]):
+        self.connection.executemany(
+            f"DELETE FROM draft_ledger_sets WHERE {DRAFT_LEDGER_PARTITION_KEY} = ? AND attribute = ? AND value = ?",
+            map(lambda value_iter_: (key, attribute, value_iter_), set(values)),
+        )
+
+    def get_sets(self, key_list: List[str], attribute: str) -> Dict[str, Set[str]]:
+        sets_by_key: Dict[str, Set[str]] = {}
+        for key in set(key_list):
+            for (value,) in self.connection.execute(
+                f"SELECT value FROM draft_ledger_sets WHERE {DRAFT_LEDGER_PARTITION_KEY} = ? AND attribute = ?",
+                (key, attribute),
+            ):
+                sets_by_key.setdefault(key, set()).add(value)
+        return sets_by_key
+
+
+def get_draft_ledger() -> Optional[Union[DynamoDbDraftLedger, SqliteDraftLedger]]:
+    """
+    Get the draft ledger for this process, None if the ledger is not configured
+    :return:
+    """
+    global DRAFT_LEDGER
+
+    with DRAFT_LEDGER_LOCK:
+        if DRAFT_LEDGER is not None:
+            return DRAFT_LEDGER
+        if environ.get(DRAFT_LEDGER_TABLE_NAME_ENV_VAR):
+            DRAFT_LEDGER = DynamoDbDraftLedger(environ[DRAFT_LEDGER_TABLE_NAME_ENV_VAR])
+        elif environ.get(DRAFT_LEDGER_SQLITE_PATH_ENV_VAR):
+            DRAFT_LEDGER = SqliteDraftLedger(environ[DRAFT_LEDGER_SQLITE_PATH_ENV_VAR])
+
+    return DRAFT_LEDGER
+
+
+def claim_draft(
+        workflow_name: str,
+        workflow_version: str,
+        library_id_list: List[str],
+        rgid_list: List[str],
+) -> bool:
+    """
+    Atomically claim a draft in the ledger, returns False if the draft has already been claimed.
+    The claim is pending until it is confirmed, and can be claimed again once it expires
+    :param workflow_name:
+    :param workflow_version:
+    :param library_id_list:
+    :param rgid_list:
+    :return:
+    """
+    draft_key = get_draft_key(workflow_name, workflow_version, library_id_list, rgid_list)
+
+    if is_dry_run():
+        return get_draft_ledger().get(draft_key) is None
+
+    return get_draft_ledger().claim(
+        draft_key,
+        {
+            "workflowName": workflow_name,
+            "workflowVersion": workflow_version,
+            "libraryIdList": ",".join(sorted(set(library_id_list))),
+            "claimedAt": datetime.now(UTC).isoformat(),
+        },
+        ttl_seconds=DRAFT_LEDGER_CLAIM_TTL_SECONDS,
+    )
+
+
+def confirm_draft(
+        workflow_name: str,
+        workflow_version: str,
+        library_id_list: List[str],
+        rgid_list: List[str],
+) -> bool:
+    """
+    Confirm a claimed draft, i.e. if we found it already has a workflow run that predates the ledger,
+    the claim is then kept until the run is deprecated
+    :param workflow_name:
+    :param workflow_version:
+    :param library_id_list:
+    :param rgid_list:
+    :return:
+    """
+    if is_dry_run():
+        return False
+
+    return get_draft_ledger().confirm(
+        get_draft_key(workflow_name, workflow_version, library_id_list, rgid_list)
+    )
+
+
+def release_draft(
+        workflow_name: str,
+        workflow_version: str,
+        library_id_list: List[str],
+        rgid_list: List[str],
+):
+    """
+    Release a claimed draft, i.e. if we failed to generate the draft after claiming it
+    :param workflow_name:
+    :param workflow_version:
+    :param library_id_list:
+    :param rgid_list:
+    :return:
+    """
+    if is_dry_run():
+        return
+
+    get_draft_ledger().release(
+        get_draft_key(workflow_name, workflow_version, library_id_list, rgid_list)
+    )
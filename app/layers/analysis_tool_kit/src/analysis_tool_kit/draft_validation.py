@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+
+"""
+Draft event validation
+
+The drafts a make analysis events handler returns are put on the bus by the step function,
+so a malformed draft would otherwise only fail once a downstream manager picks it up.
+
+Each draft is validated as it is built (see build_workflow_draft_event_detail) against the workflow draft
+event detail schema (schemas/workflow_draft_event_detail.schema.json), compiled once when the toolkit is imported.
+An invalid draft raises a DraftValidationError while its claim can still be released,
+so it is regenerated (once fixed) rather than rejected as a duplicate.
+
+The response itself is left to the lambda runtime to serialise, encoding it here as well would only add cost.
+A response over the step functions payload limit fails in the step function, the claims of its drafts
+are still pending and expire (see draft_ledger.py), so the drafts are generated again.
+
+Handlers decorated with validate_draft_events log the invocation's draft count and validation time,
+and add them to its trace.
+"""
+
+# Standard imports
+import json
+import logging
+import time
+from functools import wraps
+from pathlib import Path
+from threading import Lock
+from typing import Dict, Any, Optional
+
+import fastjsonschema
+
+# Local imports
+from .tracing import set_span_attributes
+
+# Globals
+WORKFLOW_DRAFT_EVENT_DETAIL_SCHEMA_PATH = Path(__file__).parent / "schemas" / "workflow_draft_event_detail.schema.json"
+WORKFLOW_DRAFT_EVENT_DETAIL_SCHEMA: Dict[str, Any] = json.loads(WORKFLOW_DRAFT_EVENT_DETAIL_SCHEMA_PATH.read_text())
+VALIDATE_WORKFLOW_DRAFT_EVENT_DETAIL = fastjsonschema.compile(WORKFLOW_DRAFT_EVENT_DETAIL_SCHEMA)
+
+# Drafts are built on the draft factory's worker threads, so validation times are summed under a lock
+VALIDATION_STATS = {"draftCount": 0, "validationSeconds": 0.0}
+VALIDATION_STATS_LOCK = Lock()
+
+# Set logger
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class DraftValidationError(ValueError):
+    """
+    A draft event detail does not match the schema
+    """
+    def __init__(self, message: str, workflow_run_name: Optional[str] = None):
+        self.workflow_run_name = workflow_run_name
+        super().__init__(
+            message if workflow_run_name is None
+            else f"Draft {workflow_run_name} is invalid: {message}"
+        )
+
+
+def validate_workflow_draft_event_detail(event_detail: Dict[str, Any]):
+    """
+    Validate a draft event detail against the schema
+    :param event_detail:
+    :return:
+    """
+    start = time.perf_counter()
+    try:
+        VALIDATE_WORKFLOW_DRAFT_EVENT_DETAIL(event_detail)
+    except fastjsonschema.JsonSchemaValueException as e:
+        raise DraftValidationError(
+            e.message,
+            workflow_run_name=event_detail.get('workflowRunName', 'unnamed'),
+        ) from e
+    finally:
+        with VALIDATION_STATS_LOCK:
+            VALIDATION_STATS['draftCount'] += 1
+            VALIDATION_STATS['validationSeconds'] += time.perf_counter() - start
+
+
+def reset_validation_stats():
+    with VALIDATION_STATS_LOCK:
+        VALIDATION_STATS['draftCount'] = 0
+        VALIDATION_STATS['validationSeconds'] = 0.0
+
+
+def validate_draft_events(handler):
+    """
+    Report the number of drafts a handler validated, and the time spent validating them
+    :param handler:
+    :return:
+    """
+    @wraps(handler)
+    def wrapped_handler(event, context):
+        reset_validation_stats()
+
+        response = handler(event, context)
+
+        with VALIDATION_STATS_LOCK:
+            draft_count = VALIDATION_STATS['draftCount']
+            validation_seconds = VALIDATION_STATS['validationSeconds']
+
+        draft_validation_stats = {
+            "draftCount": draft_count,
+            "validationMs": round(validation_seconds * 1000, 3),
+        }
+        set_span_attributes(**draft_validation_stats)
+        logger.info(json.dumps({"draftValidation": draft_validation_stats}))
+
+        return response
+
+    return wrapped_handler
@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+
+"""
+Dry run mode
+
+In dry run mode the toolkit never writes to the draft ledger,
+draft claims only check whether a draft has already been claimed (or has a workflow run),
+so we can plan the drafts for a run without claiming them.
+
+Enable for the process with enable_dry_run, or by setting ANALYSIS_GLUE_DRY_RUN=true.
+"""
+
+# Standard imports
+from os import environ
+
+# Local imports
+from .globals import DRY_RUN_ENV_VAR
+
+# Globals
+DRY_RUN = False
+
+
+def enable_dry_run():
+    global DRY_RUN
+    DRY_RUN = True
+
+
+def is_dry_run() -> bool:
+    return DRY_RUN or environ.get(DRY_RUN_ENV_VAR, "").lower() == "true"
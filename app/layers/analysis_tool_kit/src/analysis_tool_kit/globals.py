@@ -6,3 +6,182 @@ Globals used by the analysis helpers
 
 DRAFT_STATUS = "DRAFT"
 DEPRECATED_STATUS = "DEPRECATED"
+
+# Library lookups
+# The metadata service takes library ids as repeated query parameters, so we
+# keep each request's query string well under common URL length limits
+LIBRARY_ID_QUERY_PARAMETER_NAME = "libraryId[]"
+MAX_LIBRARY_ID_QUERY_STRING_LENGTH = 1500
+MAX_LIBRARY_LOOKUP_WORKERS = 8
+# Looked up libraries are reused by the invocations of a run's analysis glue (i.e. each subject's stage),
+# but are dropped after a few minutes so a metadata change is picked up by the next run
+LIBRARY_CACHE_TTL_SECONDS = 5 * 60
+
+# Instrument runs
+# The library ids on an instrument run are reused by every subject of the run,
+# but are dropped after a few minutes so a library added to the run (i.e. a late sample sheet fix) is picked up
+INSTRUMENT_RUN_LIBRARY_ID_CACHE_TTL_SECONDS = 5 * 60
+
+# SSM
+# GetParameters takes at most ten parameter names per request
+SSM_GET_PARAMETERS_MAX_NAMES = 10
+
+# Library catalog
+# The catalog is streamed from the metadata service a page at a time,
+# so only one page of full library objects is held in memory at once
+METADATA_SUBDOMAIN_NAME = "metadata"
+LIBRARY_ENDPOINT = "api/v1/library"
+LIBRARY_CATALOG_ROWS_PER_PAGE = 1000
+LIBRARY_CATALOG_REQUEST_TIMEOUT_SECONDS = 60
+# Server side filter for a subject's libraries (the subject's orcabus id),
+# results are always re-checked client side in case the filter is not supported
+LIBRARY_SUBJECT_QUERY_PARAMETER_NAME = "subject"
+
+# Readset library index
+# A bloom filter of the library ids with at least one fastq, built in bulk from the fastq service,
+# so the pairing lambdas never check a subject's libraries for readsets one at a time.
+# The index is rebuilt out of band (see the rebuild readset library index lambda) and shared through S3,
+# each sandbox keeps a copy in /tmp and reloads it from S3 once it is older than the TTL
+# (at most once per reload interval).
+# Libraries missing from the index (i.e. sequenced since it was built) are checked with the fastq service
+FASTQ_SUBDOMAIN_NAME = "fastq"
+FASTQ_ENDPOINT = "api/v1/fastq"
+FASTQ_CATALOG_ROWS_PER_PAGE = 1000
+FASTQ_CATALOG_REQUEST_TIMEOUT_SECONDS = 60
+READSET_LIBRARY_INDEX_LOCAL_PATH = "/tmp/readset_library_index.bin"
+READSET_LIBRARY_INDEX_BUCKET_NAME_ENV_VAR = "READSET_LIBRARY_INDEX_BUCKET_NAME"
+READSET_LIBRARY_INDEX_KEY_ENV_VAR = "READSET_LIBRARY_INDEX_KEY"
+READSET_LIBRARY_INDEX_TTL_SECONDS = 60 * 60
+READSET_LIBRARY_INDEX_RELOAD_SECONDS = 5 * 60
+# Sized for the fastq count at build time, an upper bound on the libraries with fastqs
+# (a library usually has a fastq per lane), which leaves room for incremental additions
+READSET_LIBRARY_INDEX_FALSE_POSITIVE_RATE = 1e-6
+READSET_LIBRARY_INDEX_MIN_CAPACITY = 10_000
+# Libraries the fastq service has no fastqs for are remembered for a short while, in the warm process and in /tmp,
+# so a library without readsets isn't checked again on every invocation, but is soon picked up once sequenced
+READSET_LIBRARY_MISS_CACHE_LOCAL_PATH = "/tmp/readset_library_miss_cache.json"
+READSET_LIBRARY_MISS_CACHE_TTL_SECONDS = 5 * 60
+
+# Workflow run existence checks
+# Only whether a draft has any (non deprecated) workflow run matters, so runs are fetched a small page at a time
+# and we stop at the first match. Results are re-checked client side (workflow and libraries).
+# The workflow manager ignores filters it doesn't know, so a run outside the query (another workflow, or none of
+# the libraries) falls back to get_workflow_runs_from_metadata, as do filters too long for a URL
+WORKFLOW_SUBDOMAIN_NAME = "workflow"
+WORKFLOW_RUN_ENDPOINT = "api/v1/workflowrun"
+WORKFLOW_RUN_WORKFLOW_NAME_QUERY_PARAMETER_NAME = "workflow__name"
+WORKFLOW_RUN_WORKFLOW_VERSION_QUERY_PARAMETER_NAME = "workflow__version"
+WORKFLOW_RUN_LIBRARY_ID_QUERY_PARAMETER_NAME = "libraries__libraryId"
+WORKFLOW_RUN_RGID_QUERY_PARAMETER_NAME = "readsets__rgid"
+WORKFLOW_RUN_EXISTENCE_ROWS_PER_PAGE = 10
+WORKFLOW_RUN_REQUEST_TIMEOUT_SECONDS = 30
+MAX_WORKFLOW_RUN_QUERY_STRING_LENGTH = 4000
+
+# Draft ledger
+DRAFT_LEDGER_TABLE_NAME_ENV_VAR = "DRAFT_LEDGER_TABLE_NAME"
+DRAFT_LEDGER_SQLITE_PATH_ENV_VAR = "DRAFT_LEDGER_SQLITE_PATH"
+DRAFT_LEDGER_PARTITION_KEY = "draftKey"
+DRAFT_LEDGER_EXPIRES_AT_ATTRIBUTE = "expiresAt"
+DRAFT_LEDGER_BATCH_GET_MAX_KEYS = 100
+# Records written with put_if_newer only replace a record of the same or a lower version
+DRAFT_LEDGER_VERSION_ATTRIBUTE = "version"
+# A claim is pending until the workflow manager's state change event for the draft confirms the draft was put,
+# a pending claim that is never confirmed (i.e. the step function failed to put the event) expires,
+# so the draft can be generated again
+DRAFT_LEDGER_CLAIM_TTL_SECONDS = 60 * 60
+
+# Draft factory
+MAX_DRAFT_FACTORY_WORKERS = 8
+
+# Workflow run readiness
+# Poll for a workflow run with exponential backoff until it exists or the deadline passes
+WORKFLOW_RUN_READINESS_INITIAL_INTERVAL_SECONDS = 1
+WORKFLOW_RUN_READINESS_MAX_INTERVAL_SECONDS = 16
+WORKFLOW_RUN_READINESS_BACKOFF_RATE = 2
+WORKFLOW_RUN_READINESS_DEADLINE_SECONDS = 240
+
+# OrcaBus API rate limiting and retries
+# Endpoint families are the first label of the API host name, i.e. 'metadata' for metadata.<domain>
+# Rates are requests per second, burst is the bucket size,
+# override with a JSON object in the ORCABUS_API_RATE_LIMITS environment variable
+# i.e. {"fastq": {"rate": 5, "burst": 10}}
+API_RATE_LIMITS_ENV_VAR = "ORCABUS_API_RATE_LIMITS"
+DEFAULT_API_RATE_LIMIT = {"rate": 20, "burst": 40}
+API_RATE_LIMITS_BY_ENDPOINT_FAMILY = {
+    "metadata": {"rate": 20, "burst": 40},
+    "sequence": {"rate": 20, "burst": 40},
+    "fastq": {"rate": 10, "burst": 20},
+    "workflow": {"rate": 10, "burst": 20},
+}
+API_RETRY_STATUS_CODES = [429, 500, 502, 503, 504]
+API_RETRY_IDEMPOTENT_METHODS = ["GET", "HEAD", "OPTIONS", "PUT", "DELETE"]
+API_RETRY_MAX_ATTEMPTS = 5
+API_RETRY_BASE_INTERVAL_SECONDS = 0.5
+API_RETRY_MAX_INTERVAL_SECONDS = 20
+
+# OrcaBus API connection pooling
+# One pool per API host, sized so every thread in a toolkit thread pool can hold a connection
+HTTP_POOL_CONNECTIONS = 8
+HTTP_POOL_MAXSIZE = 16
+
+# OrcaBus API circuit breaker
+# Open an endpoint family's circuit after this many consecutive failed (5xx, connection error) or slow calls,
+# then fail fast until the reset timeout has passed and a single trial call succeeds
+CIRCUIT_BREAKER_FAILURE_THRESHOLD = 5
+# A call is slow once it has taken most of its own timeout (i.e. a large catalog page with a long timeout
+# is not slow just because it takes longer than a single object lookup), calls without a timeout use the default
+CIRCUIT_BREAKER_SLOW_CALL_SECONDS = 10
+CIRCUIT_BREAKER_SLOW_CALL_TIMEOUT_FRACTION = 0.8
+CIRCUIT_BREAKER_RESET_TIMEOUT_SECONDS = 30
+
+# Unpairable subject cache
+# Subjects we could not pair (i.e. a tumor with no normal yet) are recorded in the draft ledger
+# so we can skip re-evaluating them until they gain a library.
+# The TTL bounds how long a metadata change that doesn't add a library (i.e. a phenotype fix) can go unnoticed
+UNPAIRABLE_SUBJECT_KEY_PREFIX = "unpairable"
+UNPAIRABLE_SUBJECT_CACHE_TTL_SECONDS = 24 * 60 * 60
+
+# Dry run
+DRY_RUN_ENV_VAR = "ANALYSIS_GLUE_DRY_RUN"
+
+# Slow invocation profiling
+# Switch on with ANALYSIS_GLUE_PROFILE_SLOW_INVOCATIONS=true, invocations over either threshold keep their profiles.
+# The latency threshold defaults to a fraction of the time the lambda had left when the invocation started
+SLOW_INVOCATION_PROFILING_ENV_VAR = "ANALYSIS_GLUE_PROFILE_SLOW_INVOCATIONS"
+SLOW_INVOCATION_PROFILES_BUCKET_NAME_ENV_VAR = "SLOW_INVOCATION_PROFILES_BUCKET_NAME"
+SLOW_INVOCATION_PROFILES_KEY_PREFIX_ENV_VAR = "SLOW_INVOCATION_PROFILES_KEY_PREFIX"
+SLOW_INVOCATION_SECONDS_ENV_VAR = "SLOW_INVOCATION_SECONDS"
+SLOW_INVOCATION_PEAK_MEMORY_MB_ENV_VAR = "SLOW_INVOCATION_PEAK_MEMORY_MB"
+DEFAULT_SLOW_INVOCATION_PROFILES_KEY_PREFIX = "slow-invocation-profiles"
+DEFAULT_SLOW_INVOCATION_TIMEOUT_FRACTION = 0.5
+DEFAULT_SLOW_INVOCATION_SECONDS = 30
+DEFAULT_SLOW_INVOCATION_PEAK_MEMORY_MB = 256
+SLOW_INVOCATION_PROFILE_TOP_COUNT = 50
+SLOW_INVOCATION_TRACEMALLOC_FRAMES = 1
+
+# Tracing
+# Each traced invocation is logged as a single record, set ANALYSIS_GLUE_TRACE_OTLP_FILE to also append it
+# to a file as OTLP/JSON. Spans past the maximum are counted but not kept
+TRACE_OTLP_FILE_ENV_VAR = "ANALYSIS_GLUE_TRACE_OTLP_FILE"
+TRACE_SERVICE_NAME = "analysis-glue"
+MAX_TRACE_SPANS = 2000
+
+# Warm up
+# Scheduled warm up events ({"warmUp": true}) initialise a handler's clients and caches rather than running it
+WARM_UP_EVENT_KEY = "warmUp"
+WARM_UP_REQUEST_TIMEOUT_SECONDS = 5
+
+# Rgid workflow run index
+# The (non deprecated) workflow runs of each workflow, by the rgids of their readsets, kept in the draft ledger
+# and updated from workflow run state change events.
+# The index only knows the runs it has seen events for, so until it covers every run that could be duplicated,
+# a draft it has no runs for is still checked against the workflow manager.
+# Set RGID_WORKFLOW_RUN_INDEX_AUTHORITATIVE=true once it does
+RGID_WORKFLOW_RUN_KEY_PREFIX = "rgid-workflow-run"
+RGID_WORKFLOW_RUN_INDEX_ATTRIBUTE = "portalRunIdSet"
+RGID_WORKFLOW_RUN_INDEX_AUTHORITATIVE_ENV_VAR = "RGID_WORKFLOW_RUN_INDEX_AUTHORITATIVE"
+# The last status and event time of each indexed workflow run, so an event that arrives after a later one
+# (i.e. a delayed READY after the run's DEPRECATED) is ignored rather than re-adding the run to the index.
+# Kept long enough to outlive any delayed delivery of the run's events
+WORKFLOW_RUN_STATE_KEY_PREFIX = "workflow-run-state"
+WORKFLOW_RUN_STATE_TTL_SECONDS = 60 * 60 * 24 * 30
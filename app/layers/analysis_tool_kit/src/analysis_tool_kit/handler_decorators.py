@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+
+"""
+Decorators for lambda handlers that use the toolkit
+"""
+
+# Standard imports
+import logging
+from copy import deepcopy
+from functools import wraps
+from typing import Dict, Any
+
+# Local imports
+from .http_client import CircuitOpenError
+from .instrument_run_helpers import get_instrument_run_label
+
+# Set logger
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def skip_on_circuit_open(empty_response: Dict[str, Any]):
+    """
+    If an api the handler depends on has an open circuit, skip this event rather than failing,
+    returning the empty response along with a 'skipped' report of what was skipped and why.
+    The analysis builder state machine collects the skipped reports of every subject into its execution output.
+    :param empty_response: The response for an event with nothing to do, i.e. {"eventDetailList": []}
+    :return:
+    """
+    def decorator(handler):
+        @wraps(handler)
+        def wrapped_handler(event, context):
+            try:
+                return handler(event, context)
+            except CircuitOpenError as e:
+                skipped = {
+                    "reason": "CircuitOpen",
+                    "endpointFamily": e.endpoint_family,
+                    "retryAfterSeconds": round(e.retry_after_seconds, 1),
+                    **dict(filter(
+                        lambda kv_iter_: kv_iter_[1] is not None,
+                        {
+                            "instrumentRunId": get_instrument_run_label(event),
+                            "subjectId": event.get("subjectId"),
+                            "libraryIdList": event.get("libraryIdList"),
+                        }.items()
+                    ))
+                }
+                logger.warning(f"Skipping event, {e}: {skipped}")
+                return {
+                    **deepcopy(empty_response),
+                    "skipped": skipped,
+                }
+        return wrapped_handler
+    return decorator
@@ -0,0 +1,484 @@
+#!/usr/bin/env python3
+
+"""
+HTTP client hooks for the OrcaBus API calls made through the toolkit
+
+The toolkit's OrcaBus API calls are made with an OrcaBusApiSession,
+a requests session (and only that session, other sessions in the process are left alone) on which every request
+  * takes a token from a process-wide token bucket for its endpoint family (the first label of the host name)
+  * is retried with jittered exponential backoff on 429 and 5xx responses, honouring any Retry-After header
+
+Each endpoint family also has a circuit breaker, once a family has had too many consecutive
+failed or slow calls (a call is slow once it has taken most of its own timeout),
+calls to it fail fast with a CircuitOpenError rather than waiting on a degraded service.
+
+Only 429 responses are retried for non-idempotent methods (i.e. POST),
+since a 5xx response doesn't tell us whether the request was applied.
+
+OrcaBusApiSession is pooled, one per process, so connections (and TLS sessions) to each API host are kept alive
+and reused across calls and warm invocations.
+orcabus_api_tools makes its calls with the module level requests api (requests.get, requests.post etc.),
+so rather than wrapping each api function, the requests module of each orcabus_api_tools module is swapped for
+PooledRequestsApi, which makes the same calls with the pooled session.
+The requests module itself, and so every other library in the process, is left alone.
+
+Every call attempt is also counted (calls, bytes and time) in the api call stats, see api_stats.py,
+and each call (with its retries) is timed as a span of the current invocation's trace, see tracing.py.
+
+A forked process (i.e. a backfill worker) starts with its own pooled session, token buckets and circuit breakers,
+so it never writes to the parent's pooled connections.
+"""
+
+# Standard imports
+import json
+import logging
+import random
+import sys
+import time
+from email.utils import parsedate_to_datetime
+from datetime import datetime, UTC
+from functools import wraps
+from os import environ, register_at_fork
+from threading import Lock
+from typing import Dict, Optional, Any
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Local imports
+from .api_stats import record_api_call
+from .tracing import span, SPAN_KIND_CLIENT
+from .globals import (
+    API_RATE_LIMITS_ENV_VAR,
+    DEFAULT_API_RATE_LIMIT,
+    API_RATE_LIMITS_BY_ENDPOINT_FAMILY,
+    API_RETRY_STATUS_CODES,
+    API_RETRY_IDEMPOTENT_METHODS,
+    API_RETRY_MAX_ATTEMPTS,
+    API_RETRY_BASE_INTERVAL_SECONDS,
+    API_RETRY_MAX_INTERVAL_SECONDS,
+    HTTP_POOL_CONNECTIONS,
+    HTTP_POOL_MAXSIZE,
+    CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+    CIRCUIT_BREAKER_SLOW_CALL_SECONDS,
+    CIRCUIT_BREAKER_SLOW_CALL_TIMEOUT_FRACTION,
+    CIRCUIT_BREAKER_RESET_TIMEOUT_SECONDS,
+)
+
+# Set logger
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Globals
+TOKEN_BUCKETS: Dict[str, 'TokenBucket'] = {}
+TOKEN_BUCKETS_LOCK = Lock()
+SESSION: Optional[requests.Session] = None
+SESSION_LOCK = Lock()
+CIRCUIT_BREAKERS: Dict[str, 'CircuitBreaker'] = {}
+CIRCUIT_BREAKERS_LOCK = Lock()
+
+# Circuit states
+CIRCUIT_CLOSED = "CLOSED"
+CIRCUIT_OPEN = "OPEN"
+CIRCUIT_HALF_OPEN = "HALF_OPEN"
+
+
+class CircuitOpenError(Exception):
+    """
+    The circuit for an endpoint family is open, the call was not made
+    """
+    def __init__(self, endpoint_family: str, retry_after_seconds: float):
+        self.endpoint_family = endpoint_family
+        self.retry_after_seconds = retry_after_seconds
+        super().__init__(
+            f"Circuit for the {endpoint_family} api is open, "
+            f"not calling it for another {retry_after_seconds:.1f} seconds"
+        )
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = Lock()
+
+    def acquire(self):
+        """
+        Take a token from the bucket, sleeping until one is available
+        :return:
+        """
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait_seconds = (1 - self.tokens) / self.rate
+            time.sleep(wait_seconds)
+
+
+class CircuitBreaker:
+    def __init__(
+            self,
+            endpoint_family: str,
+            failure_threshold: int = CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+            reset_timeout_seconds: float = CIRCUIT_BREAKER_RESET_TIMEOUT_SECONDS,
+    ):
+        self.endpoint_family = endpoint_family
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_seconds = reset_timeout_seconds
+        self.state = CIRCUIT_CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.trial_in_flight = False
+        self.lock = Lock()
+
+    def before_call(self):
+        """
+        Raise a CircuitOpenError if the call should not be made.
+        Once the reset timeout has passed we let a single trial call through.
+        :return:
+        """
+        with self.lock:
+            if self.state == CIRCUIT_OPEN:
+                open_seconds = time.monotonic() - self.opened_at
+                if open_seconds < self.reset_timeout_seconds:
+                    raise CircuitOpenError(self.endpoint_family, self.reset_timeout_seconds - open_seconds)
+                self.state = CIRCUIT_HALF_OPEN
+            if self.state == CIRCUIT_HALF_OPEN:
+                if self.trial_in_flight:
+                    raise CircuitOpenError(self.endpoint_family, 0)
+                self.trial_in_flight = True
+
+    def record_success(self):
+        with self.lock:
+            if self.state != CIRCUIT_CLOSED:
+                logger.info(f"Closing circuit for the {self.endpoint_family} api")
+            self.state = CIRCUIT_CLOSED
+            self.consecutive_failures = 0
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self.lock:
+            self.consecutive_failures += 1
+            self.trial_in_flight = False
+            if self.state == CIRCUIT_HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != CIRCUIT_OPEN:
+                    logger.warning(
+                        f"Opening circuit for the {self.endpoint_family} api "
+                        f"after {self.consecutive_failures} consecutive failed or slow calls"
+                    )
+                self.state = CIRCUIT_OPEN
+                self.opened_at = time.monotonic()
+
+
+def get_endpoint_family(url: str) -> str:
+    """
+    Get the endpoint family of a url, the first label of the host name
+    :param url:
+    :return:
+    """
+    return (urlparse(url).hostname or "").split(".")[0]
+
+
+def get_api_rate_limits() -> Dict[str, Dict[str, float]]:
+    """
+    Get the rate limits by endpoint family, with any overrides from the environment
+    :return:
+    """
+    return {
+        **API_RATE_LIMITS_BY_ENDPOINT_FAMILY,
+        **json.loads(environ.get(API_RATE_LIMITS_ENV_VAR, "{}")),
+    }
+
+
+def get_token_bucket(endpoint_family: str) -> TokenBucket:
+    with TOKEN_BUCKETS_LOCK:
+        if endpoint_family not in TOKEN_BUCKETS:
+            rate_limit = get_api_rate_limits().get(endpoint_family, DEFAULT_API_RATE_LIMIT)
+            TOKEN_BUCKETS[endpoint_family] = TokenBucket(
+                rate=rate_limit['rate'],
+                burst=rate_limit['burst'],
+            )
+        return TOKEN_BUCKETS[endpoint_family]
+
+
+def get_circuit_breaker(endpoint_family: str) -> CircuitBreaker:
+    with CIRCUIT_BREAKERS_LOCK:
+        if endpoint_family not in CIRCUIT_BREAKERS:
+            CIRCUIT_BREAKERS[endpoint_family] = CircuitBreaker(endpoint_family)
+        return CIRCUIT_BREAKERS[endpoint_family]
+
+
+def get_retry_after_seconds(response: requests.Response) -> Optional[float]:
+    """
+    Get the Retry-After header as seconds, the header may be either seconds or an HTTP date
+    :param response:
+    :return:
+    """
+    retry_after = response.headers.get("Retry-After")
+    if retry_after is None:
+        return None
+    try:
+        return max(float(retry_after), 0)
+    except ValueError:
+        pass
+    try:
+        return max((parsedate_to_datetime(retry_after) - datetime.now(UTC)).total_seconds(), 0)
+    except (TypeError, ValueError):
+        return None
+
+
+def get_bytes_transferred(response: requests.Response, stream: bool) -> int:
+    """
+    Get the request and response body sizes of a call, streamed response bodies are counted by their content length
+    :param response:
+    :param stream:
+    :return:
+    """
+    request_body = response.request.body if response.request is not None else None
+    request_bytes = len(request_body) if request_body is not None else 0
+
+    if stream:
+        return request_bytes + int(response.headers.get("Content-Length", 0))
+    return request_bytes + len(response.content)
+
+
+def get_backoff_seconds(attempt: int) -> float:
+    """
+    Full jitter exponential backoff
+    :param attempt: The attempt that just failed, starting at 1
+    :return:
+    """
+    return random.uniform(
+        0,
+        min(API_RETRY_BASE_INTERVAL_SECONDS * (2 ** (attempt - 1)), API_RETRY_MAX_INTERVAL_SECONDS)
+    )
+
+
+def get_slow_call_seconds(timeout: Optional[Any]) -> float:
+    """
+    Get how long a call can take before it counts as slow, from the call's own (read) timeout
+    :param timeout: The requests timeout, seconds or a (connect, read) tuple
+    :return:
+    """
+    if isinstance(timeout, tuple):
+        timeout = timeout[-1]
+    if timeout is None:
+        return CIRCUIT_BREAKER_SLOW_CALL_SECONDS
+    return max(CIRCUIT_BREAKER_SLOW_CALL_SECONDS, timeout * CIRCUIT_BREAKER_SLOW_CALL_TIMEOUT_FRACTION)
+
+
+def is_retryable_response(method: str, response: requests.Response) -> bool:
+    if response.status_code not in API_RETRY_STATUS_CODES:
+        return False
+    return response.status_code == 429 or method.upper() in API_RETRY_IDEMPOTENT_METHODS
+
+
+def with_rate_limit_and_retry(request_func):
+    """
+    Wrap requests.Session.request with the endpoint family circuit breaker, rate limiter and retry policy
+    :param request_func:
+    :return:
+    """
+    @wraps(request_func)
+    def rate_limited_request(session: requests.Session, method: str, url: str, *args, **kwargs):
+        endpoint_family = get_endpoint_family(url)
+        token_bucket = get_token_bucket(endpoint_family)
+        circuit_breaker = get_circuit_breaker(endpoint_family)
+        slow_call_seconds = get_slow_call_seconds(kwargs.get("timeout", None))
+
+        with span(
+                f"{method.upper()} {endpoint_family}",
+                kind=SPAN_KIND_CLIENT,
+                **{"http.method": method.upper(), "url.path": urlparse(url).path},
+        ) as call_span:
+            attempt = 0
+            while True:
+                attempt += 1
+                circuit_breaker.before_call()
+                token_bucket.acquire()
+
+                call_start = time.monotonic()
+                try:
+                    response = request_func(session, method, url, *args, **kwargs)
+                except (requests.ConnectionError, requests.Timeout):
+                    record_api_call(endpoint_family, 0, time.monotonic() - call_start)
+                    circuit_breaker.record_failure()
+                    if attempt >= API_RETRY_MAX_ATTEMPTS or method.upper() not in API_RETRY_IDEMPOTENT_METHODS:
+                        raise
+                    sleep_seconds = get_backoff_seconds(attempt)
+                    logger.warning(
+                        f"{endpoint_family} api connection failed on attempt {attempt}, "
+                        f"retrying in {sleep_seconds:.2f} seconds"
+                    )
+                    time.sleep(sleep_seconds)
+                    continue
+                except Exception:
+                    record_api_call(endpoint_family, 0, time.monotonic() - call_start)
+                    circuit_breaker.record_failure()
+                    raise
+
+                record_api_call(
+                    endpoint_family,
+                    get_bytes_transferred(response, stream=kwargs.get("stream", False) or False),
+                    time.monotonic() - call_start
+                )
+
+                # A 429 is the service protecting itself, not a sign that it is degraded
+                if (
+                        response.status_code >= 500 or
+                        time.monotonic() - call_start > slow_call_seconds
+                ):
+                    circuit_breaker.record_failure()
+                else:
+                    circuit_breaker.record_success()
+
+                if not is_retryable_response(method, response) or attempt >= API_RETRY_MAX_ATTEMPTS:
+                    if call_span is not None:
+                        call_span.attributes.update({"http.status_code": response.status_code, "attempts": attempt})
+                    return response
+
+                retry_after_seconds = get_retry_after_seconds(response)
+                sleep_seconds = (
+                    min(retry_after_seconds, API_RETRY_MAX_INTERVAL_SECONDS)
+                    if retry_after_seconds is not None
+                    else get_backoff_seconds(attempt)
+                )
+                logger.warning(
+                    f"{endpoint_family} api returned {response.status_code} on attempt {attempt}, "
+                    f"retrying in {sleep_seconds:.2f} seconds"
+                )
+                # Release the connection back to the pool before we sleep
+                response.close()
+                time.sleep(sleep_seconds)
+
+    return rate_limited_request
+
+
+class OrcaBusApiSession(requests.Session):
+    """
+    A requests session whose calls go through the endpoint family circuit breaker, rate limiter and retry policy
+    """
+    request = with_rate_limit_and_retry(requests.Session.request)
+
+
+def get_session() -> requests.Session:
+    """
+    Get the pooled session for this process
+    :return:
+    """
+    global SESSION
+
+    with SESSION_LOCK:
+        if SESSION is None:
+            SESSION = OrcaBusApiSession()
+            # Retries are handled by the session, not by urllib3
+            adapter = HTTPAdapter(
+                pool_connections=HTTP_POOL_CONNECTIONS,
+                pool_maxsize=HTTP_POOL_MAXSIZE,
+                max_retries=0,
+            )
+            SESSION.mount("https://", adapter)
+            SESSION.mount("http://", adapter)
+        return SESSION
+
+
+class PooledRequestsApi:
+    """
+    Stands in for the requests module in the orcabus_api_tools modules, so their module level calls
+    (requests.get etc.) are made with the pooled session. Everything else (i.e. requests.exceptions)
+    is the requests module's own.
+    """
+    def __getattr__(self, name: str) -> Any:
+        return getattr(requests, name)
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        return get_session().request(method=method, url=url, **kwargs)
+
+    def get(self, url: str, params: Optional[Any] = None, **kwargs) -> requests.Response:
+        return self.request("GET", url, params=params, **kwargs)
+
+    def options(self, url: str, **kwargs) -> requests.Response:
+        return self.request("OPTIONS", url, **kwargs)
+
+    def head(self, url: str, **kwargs) -> requests.Response:
+        kwargs.setdefault("allow_redirects", False)
+        return self.request("HEAD", url, **kwargs)
+
+    def post(self, url: str, data: Optional[Any] = None, json: Optional[Any] = None, **kwargs) -> requests.Response:
+        return self.request("POST", url, data=data, json=json, **kwargs)
+
+    def put(self, url: str, data: Optional[Any] = None, **kwargs) -> requests.Response:
+        return self.request("PUT", url, data=data, **kwargs)
+
+    def patch(self, url: str, data: Optional[Any] = None, **kwargs) -> requests.Response:
+        return self.request("PATCH", url, data=data, **kwargs)
+
+    def delete(self, url: str, **kwargs) -> requests.Response:
+        return self.request("DELETE", url, **kwargs)
+
+
+POOLED_REQUESTS_API = PooledRequestsApi()
+
+
+def get_connection_pool_stats() -> Dict[str, Dict[str, Any]]:
+    """
+    Get the connection reuse statistics of the pooled session, by host
+    :return:
+    """
+    if SESSION is None:
+        return {}
+
+    connection_pool_stats = {}
+    for adapter in set(SESSION.adapters.values()):
+        pools = adapter.poolmanager.pools
+        for pool_key in pools.keys():
+            pool = pools[pool_key]
+            if pool is None:
+                continue
+            connection_pool_stats[pool.host] = {
+                "requests": pool.num_requests,
+                "connectionsOpened": pool.num_connections,
+                "connectionsReused": max(pool.num_requests - pool.num_connections, 0),
+                "idleConnections": pool.pool.qsize() if pool.pool is not None else 0,
+            }
+
+    return connection_pool_stats
+
+
+def reset_after_fork():
+    """
+    Drop the pooled session, token buckets and circuit breakers inherited from the parent process,
+    along with their locks, which may have been held when we were forked
+    :return:
+    """
+    global SESSION, SESSION_LOCK, TOKEN_BUCKETS, TOKEN_BUCKETS_LOCK, CIRCUIT_BREAKERS, CIRCUIT_BREAKERS_LOCK
+
+    SESSION = None
+    SESSION_LOCK = Lock()
+    TOKEN_BUCKETS = {}
+    TOKEN_BUCKETS_LOCK = Lock()
+    CIRCUIT_BREAKERS = {}
+    CIRCUIT_BREAKERS_LOCK = Lock()
+
+
+register_at_fork(after_in_child=reset_after_fork)
+
+
+def install_request_hooks():
+    """
+    Route the calls of every imported orcabus_api_tools module through the pooled session.
+    Safe to call more than once.
+    :return:
+    """
+    for module_name, module in list(sys.modules.items()):
+        if module_name != "orcabus_api_tools" and not module_name.startswith("orcabus_api_tools."):
+            continue
+        if getattr(module, "requests", None) is requests:
+            setattr(module, "requests", POOLED_REQUESTS_API)
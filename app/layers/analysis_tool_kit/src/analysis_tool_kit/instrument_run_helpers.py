@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+
+"""
+Instrument run helpers
+
+The analysis builder runs for a single instrument run (instrumentRunId),
+or in batch mode for several (instrumentRunIdList), i.e. both flowcells of a NovaSeq X finishing within minutes.
+
+In batch mode the libraries of every instrument run are merged,
+so a subject sequenced on more than one of the runs is evaluated once, with the union of its new libraries,
+rather than once per run, each evaluation rebuilding the same subject history and workflow lookups.
+
+The library ids on each instrument run are cached in the (warm) lambda process for a few minutes,
+as every subject of a run would otherwise refetch them.
+"""
+
+# Standard imports
+from time import monotonic
+from typing import List, Dict, Any, Optional, Tuple
+
+# Layer imports
+from orcabus_api_tools.sequence import get_libraries_from_instrument_run_id
+
+# Local imports
+from .globals import INSTRUMENT_RUN_LIBRARY_ID_CACHE_TTL_SECONDS
+
+# Warm-process cache of the library ids on an instrument run, keyed by instrument run id
+# Each entry holds the monotonic time it expires at and the library ids
+INSTRUMENT_RUN_LIBRARY_ID_CACHE: Dict[str, Tuple[float, List[str]]] = {}
+
+
+def clear_instrument_run_library_id_cache():
+    INSTRUMENT_RUN_LIBRARY_ID_CACHE.clear()
+
+
+def get_instrument_run_id_list(event: Dict[str, Any]) -> List[str]:
+    """
+    Get the instrument run ids of an event, the instrumentRunIdList in batch mode, otherwise the instrumentRunId
+    :param event:
+    :return: The instrument run ids, deduplicated, in the order they were given
+    """
+    instrument_run_id_list = event.get('instrumentRunIdList', None)
+
+    if not instrument_run_id_list:
+        instrument_run_id_list = [event.get('instrumentRunId', None)]
+
+    return list(dict.fromkeys(filter(
+        lambda instrument_run_id_iter_: instrument_run_id_iter_ is not None,
+        instrument_run_id_list
+    )))
+
+
+def get_instrument_run_label(event: Dict[str, Any]) -> Optional[str]:
+    """
+    Label an invocation by its instrument run ids, joined with '+' in batch mode
+    :param event:
+    :return:
+    """
+    instrument_run_id_list = get_instrument_run_id_list(event)
+
+    if len(instrument_run_id_list) == 0:
+        return None
+
+    return "+".join(instrument_run_id_list)
+
+
+def get_library_id_list_from_instrument_run_id(instrument_run_id: str) -> List[str]:
+    """
+    Get the library ids on an instrument run, from the cache unless they have expired
+    :param instrument_run_id:
+    :return:
+    """
+    cached_library_id_list = INSTRUMENT_RUN_LIBRARY_ID_CACHE.get(instrument_run_id, None)
+    if cached_library_id_list is not None:
+        expires_at, library_id_list = cached_library_id_list
+        if expires_at > monotonic():
+            return library_id_list
+
+    library_id_list = get_libraries_from_instrument_run_id(instrument_run_id)
+    INSTRUMENT_RUN_LIBRARY_ID_CACHE[instrument_run_id] = (
+        monotonic() + INSTRUMENT_RUN_LIBRARY_ID_CACHE_TTL_SECONDS, library_id_list
+    )
+    return library_id_list
+
+
+def get_library_id_list_from_instrument_run_id_list(instrument_run_id_list: List[str]) -> List[str]:
+    """
+    Get the library ids on any of a list of instrument runs
+    :param instrument_run_id_list:
+    :return: The union of each run's library ids, sorted
+    """
+    return sorted(set(
+        library_id
+        for instrument_run_id in instrument_run_id_list
+        for library_id in get_library_id_list_from_instrument_run_id(instrument_run_id)
+    ))
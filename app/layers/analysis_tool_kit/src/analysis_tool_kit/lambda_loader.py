@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+
+"""
+Load the handler module of another lambda in this service
+
+Used by entry points that are deployed with every lambda's source (i.e. the dry run planner),
+each lambda lives in <lambdas_dir>/<lambda_name>_py/<lambda_name>.py
+"""
+
+# Standard imports
+import importlib.util
+import sys
+from pathlib import Path
+from types import ModuleType
+
+
+def load_lambda_module(lambdas_dir: Path, lambda_name: str) -> ModuleType:
+    """
+    Load (once) the handler module of a lambda
+    :param lambdas_dir: The directory containing every lambda's source
+    :param lambda_name: The snake case lambda name, i.e. make_wgs_analysis_events_list
+    :return:
+    """
+    if lambda_name in sys.modules:
+        return sys.modules[lambda_name]
+
+    lambda_path = Path(lambdas_dir) / f"{lambda_name}_py" / f"{lambda_name}.py"
+    if not lambda_path.is_file():
+        raise ValueError(f"Could not find lambda '{lambda_name}' at {lambda_path}")
+
+    spec = importlib.util.spec_from_file_location(lambda_name, lambda_path)
+    lambda_module = importlib.util.module_from_spec(spec)
+    sys.modules[lambda_name] = lambda_module
+    try:
+        spec.loader.exec_module(lambda_module)
+    except Exception:
+        del sys.modules[lambda_name]
+        raise
+
+    return lambda_module
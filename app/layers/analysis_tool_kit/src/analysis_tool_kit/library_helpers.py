@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+
+"""
+Bulk library lookups against the metadata service
+
+Large library id lists (i.e every library on a flowcell) are split into url-safe chunks,
+fetched concurrently, and cached in the (warm) lambda process for a few minutes.
+
+The whole library catalog can be streamed a page at a time with iter_all_libraries,
+following each page's next link, rather than loading every library object at once.
+Libraries can be filtered server side (query parameters) and client side (a predicate) as each page arrives.
+"""
+
+# Standard imports
+from concurrent.futures import ThreadPoolExecutor
+from time import monotonic
+from typing import List, Dict, Iterator, Optional, Callable, Union, Tuple
+from urllib.parse import quote
+
+# Layer imports
+from orcabus_api_tools.metadata import get_libraries_list_from_library_id_list
+from orcabus_api_tools.metadata.models import Library
+from orcabus_api_tools.utils.aws_helpers import get_orcabus_token, get_hostname
+
+# Local imports
+from .globals import (
+    LIBRARY_ID_QUERY_PARAMETER_NAME,
+    MAX_LIBRARY_ID_QUERY_STRING_LENGTH,
+    MAX_LIBRARY_LOOKUP_WORKERS,
+    LIBRARY_CACHE_TTL_SECONDS,
+    METADATA_SUBDOMAIN_NAME,
+    LIBRARY_ENDPOINT,
+    LIBRARY_CATALOG_ROWS_PER_PAGE,
+    LIBRARY_CATALOG_REQUEST_TIMEOUT_SECONDS,
+)
+from .http_client import get_session
+from .tracing import bind_current_span
+
+# Warm-process cache of library objects, keyed by library id
+# Each entry holds the monotonic time it expires at (None if it never expires) and the library object
+LIBRARY_CACHE: Dict[str, Tuple[Optional[float], Library]] = {}
+
+
+def clear_library_cache():
+    LIBRARY_CACHE.clear()
+
+
+def add_libraries_to_library_cache(
+        libraries: List[Library],
+        ttl_seconds: Optional[float] = LIBRARY_CACHE_TTL_SECONDS
+):
+    """
+    Cache library objects we already hold (i.e. streamed from the catalog), so they are not looked up
+    :param libraries:
+    :param ttl_seconds: None to keep the libraries until the cache is cleared
+    :return:
+    """
+    expires_at = monotonic() + ttl_seconds if ttl_seconds is not None else None
+    for library_obj in libraries:
+        LIBRARY_CACHE[library_obj['libraryId']] = (expires_at, library_obj)
+
+
+def get_cached_library(library_id: str) -> Optional[Library]:
+    """
+    Get a library from the cache, dropping it if it has expired
+    :param library_id:
+    :return:
+    """
+    cached_library = LIBRARY_CACHE.get(library_id, None)
+    if cached_library is None:
+        return None
+
+    expires_at, library_obj = cached_library
+    if expires_at is not None and expires_at <= monotonic():
+        LIBRARY_CACHE.pop(library_id, None)
+        return None
+
+    return library_obj
+
+
+def chunk_library_id_list(library_id_list: List[str]) -> List[List[str]]:
+    """
+    Split a library id list into chunks whose query string stays under the url length limit
+    :param library_id_list:
+    :return:
+    """
+    chunks: List[List[str]] = []
+    current_chunk: List[str] = []
+    current_length = 0
+
+    for library_id in library_id_list:
+        # Each library id is sent as '&libraryId[]=<library_id>'
+        query_param_length = len(quote(LIBRARY_ID_QUERY_PARAMETER_NAME)) + len(quote(library_id)) + 2
+        if len(current_chunk) > 0 and current_length + query_param_length > MAX_LIBRARY_ID_QUERY_STRING_LENGTH:
+            chunks.append(current_chunk)
+            current_chunk = []
+            current_length = 0
+        current_chunk.append(library_id)
+        current_length += query_param_length
+
+    if len(current_chunk) > 0:
+        chunks.append(current_chunk)
+
+    return chunks
+
+
+def get_libraries_list_from_library_id_list_chunked(library_id_list: List[str]) -> List[Library]:
+    """
+    Get the library objects for a list of library ids.
+
+    Library ids are deduplicated, uncached ids are fetched in concurrent url-safe chunks,
+    and the libraries are returned in the order they were first requested.
+    Library ids that the metadata service does not know about are dropped.
+
+    :param library_id_list:
+    :return:
+    """
+    # Deduplicate, keeping the input order
+    library_id_list = list(dict.fromkeys(library_id_list))
+
+    # Only fetch what we haven't recently seen in this process
+    library_by_id: Dict[str, Library] = {}
+    for library_id in library_id_list:
+        library_obj = get_cached_library(library_id)
+        if library_obj is not None:
+            library_by_id[library_id] = library_obj
+
+    uncached_library_id_chunks = chunk_library_id_list(list(filter(
+        lambda library_id_iter_: library_id_iter_ not in library_by_id,
+        library_id_list
+    )))
+
+    if len(uncached_library_id_chunks) == 1:
+        libraries_list_by_chunk = [
+            get_libraries_list_from_library_id_list(uncached_library_id_chunks[0])
+        ]
+    elif len(uncached_library_id_chunks) > 1:
+        with ThreadPoolExecutor(
+            max_workers=min(MAX_LIBRARY_LOOKUP_WORKERS, len(uncached_library_id_chunks))
+        ) as executor:
+            libraries_list_by_chunk = list(executor.map(
+                bind_current_span(get_libraries_list_from_library_id_list),
+                uncached_library_id_chunks
+            ))
+    else:
+        libraries_list_by_chunk = []
+
+    for libraries_list in libraries_list_by_chunk:
+        add_libraries_to_library_cache(libraries_list)
+        for library_obj in libraries_list:
+            library_by_id[library_obj['libraryId']] = library_obj
+
+    return list(map(
+        lambda library_id_iter_: library_by_id[library_id_iter_],
+        filter(
+            lambda library_id_iter_: library_id_iter_ in library_by_id,
+            library_id_list
+        )
+    ))
+
+
+def iter_all_libraries(
+        rows_per_page: int = LIBRARY_CATALOG_ROWS_PER_PAGE,
+        query_params: Optional[Dict[str, str]] = None,
+        predicate: Optional[Callable[[Library], bool]] = None,
+) -> Iterator[Library]:
+    """
+    Stream every library in the catalog, one page at a time
+    :param rows_per_page:
+    :param query_params: Server side filters
+    :param predicate: Client side filter, applied as each page arrives
+    :return:
+    """
+    url: Optional[str] = f"https://{METADATA_SUBDOMAIN_NAME}.{get_hostname()}/{LIBRARY_ENDPOINT}"
+    params: Optional[Dict[str, Union[str, int]]] = {
+        **(query_params or {}),
+        "rowsPerPage": rows_per_page,
+    }
+    headers = {"Authorization": f"Bearer {get_orcabus_token()}"}
+
+    while url is not None:
+        response = get_session().get(
+            url,
+            params=params,
+            headers=headers,
+            timeout=LIBRARY_CATALOG_REQUEST_TIMEOUT_SECONDS,
+        )
+        response.raise_for_status()
+        page = response.json()
+
+        # The next link carries the query parameters
+        url = page['links']['next']
+        params = None
+
+        yield from filter(predicate, page['results'])
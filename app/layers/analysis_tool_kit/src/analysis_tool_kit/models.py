@@ -4,7 +4,7 @@
 from typing import List, TypedDict, NotRequired, Dict, Any
 
 # Layer imports
-from orcabus_api_tools.metadata.models import LibraryBase
+from orcabus_api_tools.metadata.models import LibraryBase, Library
 
 
 class Workflow(TypedDict):
@@ -28,3 +28,10 @@ class EventLibrary(LibraryBase):
 class Payload(TypedDict):
     version: str
     data: Dict[str, Any]
+
+
+class DraftRequest(TypedDict):
+    workflowKey: str
+    libraries: List[Library]
+    payload: NotRequired[Payload]
+    workflowRunPrefix: NotRequired[str]
@@ -0,0 +1,449 @@
+#!/usr/bin/env python3
+
+"""
+Readset library index
+
+The pairing lambdas only consider a subject's libraries that have readsets (at least one fastq),
+checking each library used to cost a fastq api call per library.
+
+The index is a bloom filter of every library id with a fastq, built in bulk by streaming
+the fastq list endpoint a page at a time, so checking a library is a membership test.
+A bloom filter never gives a false negative, and is sized for a false positive rate of one in a million,
+so holding it costs a few bits per library rather than a string per library.
+
+The index is rebuilt from the fastq service out of band, on a schedule, by the rebuild readset library index lambda,
+and is loaded from (in order)
+  * the warm-process cache
+  * /tmp, shared by every invocation of the same lambda sandbox
+  * S3, if READSET_LIBRARY_INDEX_BUCKET_NAME is set, shared by every lambda
+A copy older than the TTL is reloaded from S3, but is still used if S3 has nothing newer.
+The pairing lambdas never rebuild the index themselves, so a cold or stale index never has every sandbox
+streaming the whole fastq catalog at once.
+
+The index only answers "has readsets" for certain. A library missing from it may have been sequenced since
+the index was built (or there is no index, i.e. outside prod), so a miss is checked with the fastq service,
+as is every library when there is no index at all.
+
+Between rebuilds the index is refreshed incrementally, the libraries in the fastq event that triggered
+the step function are known to have fastqs and are added with add_readset_library_ids,
+as are the libraries a fastq service check finds readsets for.
+
+A library the fastq service check finds no readsets for is remembered as a miss for a few minutes,
+in the warm process and in /tmp, so the same library isn't checked on every invocation.
+
+The index is never written to S3 in dry run mode.
+"""
+
+# Standard imports
+import json
+import logging
+import math
+import time
+import typing
+from hashlib import blake2b
+from io import BytesIO
+from os import environ
+from pathlib import Path
+from threading import Lock
+from typing import List, Dict, Iterator, Optional, Any, Tuple, BinaryIO
+
+import boto3
+
+# Layer imports
+from orcabus_api_tools.fastq import get_fastqs_in_library
+from orcabus_api_tools.utils.aws_helpers import get_orcabus_token, get_hostname
+
+# Local imports
+from .dry_run import is_dry_run
+from .globals import (
+    FASTQ_SUBDOMAIN_NAME,
+    FASTQ_ENDPOINT,
+    FASTQ_CATALOG_ROWS_PER_PAGE,
+    FASTQ_CATALOG_REQUEST_TIMEOUT_SECONDS,
+    READSET_LIBRARY_INDEX_LOCAL_PATH,
+    READSET_LIBRARY_INDEX_BUCKET_NAME_ENV_VAR,
+    READSET_LIBRARY_INDEX_KEY_ENV_VAR,
+    READSET_LIBRARY_INDEX_TTL_SECONDS,
+    READSET_LIBRARY_INDEX_RELOAD_SECONDS,
+    READSET_LIBRARY_INDEX_FALSE_POSITIVE_RATE,
+    READSET_LIBRARY_INDEX_MIN_CAPACITY,
+    READSET_LIBRARY_MISS_CACHE_LOCAL_PATH,
+    READSET_LIBRARY_MISS_CACHE_TTL_SECONDS,
+)
+from .http_client import get_session
+
+# Type check imports
+if typing.TYPE_CHECKING:
+    from mypy_boto3_s3 import S3Client
+
+# Globals
+DEFAULT_READSET_LIBRARY_INDEX_KEY = "readset-library-index/library-ids.bin"
+READSET_LIBRARY_INDEX: Optional['LibraryIdBloomFilter'] = None
+READSET_LIBRARY_INDEX_LOADED_AT: Optional[float] = None
+READSET_LIBRARY_INDEX_LOCK = Lock()
+# Library id to the time the miss expires
+READSET_LIBRARY_MISS_CACHE: Optional[Dict[str, float]] = None
+READSET_LIBRARY_MISS_CACHE_LOCK = Lock()
+
+# Set logger
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class LibraryIdBloomFilter:
+    """
+    A bloom filter of library ids, with the time it was built from the fastq service
+    """
+    def __init__(self, bit_count: int, hash_count: int, bits: bytearray, built_at: float):
+        self.bit_count = bit_count
+        self.hash_count = hash_count
+        self.bits = bits
+        self.built_at = built_at
+
+    @classmethod
+    def from_capacity(cls, capacity: int, built_at: float) -> 'LibraryIdBloomFilter':
+        capacity = max(capacity, READSET_LIBRARY_INDEX_MIN_CAPACITY)
+        bit_count = math.ceil(
+            -capacity * math.log(READSET_LIBRARY_INDEX_FALSE_POSITIVE_RATE) / (math.log(2) ** 2)
+        )
+        hash_count = max(1, round(bit_count / capacity * math.log(2)))
+        return cls(bit_count, hash_count, bytearray((bit_count + 7) // 8), built_at)
+
+    def get_bit_indexes(self, library_id: str) -> Iterator[int]:
+        # Double hashing, two 64 bit hashes from a single digest
+        digest = blake2b(library_id.encode(), digest_size=16).digest()
+        first_hash = int.from_bytes(digest[:8], 'little')
+        second_hash = int.from_bytes(digest[8:], 'little') | 1
+        return map(
+            lambda hash_index_iter_: (first_hash + hash_index_iter_ * second_hash) % self.bit_count,
+            range(self.hash_count)
+        )
+
+    def add(self, library_id: str):
+        for bit_index in self.get_bit_indexes(library_id):
+            self.bits[bit_index >> 3] |= 1 << (bit_index & 7)
+
+    def __contains__(self, library_id: str) -> bool:
+        return all(
+            self.bits[bit_index >> 3] & (1 << (bit_index & 7))
+            for bit_index in self.get_bit_indexes(library_id)
+        )
+
+    def is_stale(self) -> bool:
+        return time.time() - self.built_at > READSET_LIBRARY_INDEX_TTL_SECONDS
+
+    def to_bytes(self) -> bytes:
+        # A json header line, then the raw bits
+        return json.dumps({
+            "builtAt": self.built_at,
+            "bitCount": self.bit_count,
+            "hashCount": self.hash_count,
+        }).encode() + b"\n" + bytes(self.bits)
+
+    @classmethod
+    def from_file(cls, index_file: BinaryIO) -> 'LibraryIdBloomFilter':
+        header: Dict[str, Any] = json.loads(index_file.readline())
+        # Read the bits straight into the filter, so the index is only held in memory once
+        bits = bytearray((header['bitCount'] + 7) // 8)
+        if index_file.readinto(bits) != len(bits):
+            raise ValueError("The readset library index is truncated")
+        return cls(
+            bit_count=header['bitCount'],
+            hash_count=header['hashCount'],
+            bits=bits,
+            built_at=header['builtAt'],
+        )
+
+
+def get_s3_client() -> 'S3Client':
+    return boto3.client('s3')
+
+
+def get_index_s3_location() -> Optional[Tuple[str, str]]:
+    if READSET_LIBRARY_INDEX_BUCKET_NAME_ENV_VAR not in environ:
+        return None
+    return (
+        environ[READSET_LIBRARY_INDEX_BUCKET_NAME_ENV_VAR],
+        environ.get(READSET_LIBRARY_INDEX_KEY_ENV_VAR, DEFAULT_READSET_LIBRARY_INDEX_KEY),
+    )
+
+
+def iter_all_fastq_pages(rows_per_page: int = FASTQ_CATALOG_ROWS_PER_PAGE) -> Iterator[Dict[str, Any]]:
+    """
+    Stream every page of the fastq list endpoint
+    :param rows_per_page:
+    :return:
+    """
+    url: Optional[str] = f"https://{FASTQ_SUBDOMAIN_NAME}.{get_hostname()}/{FASTQ_ENDPOINT}"
+    params: Optional[Dict[str, int]] = {"rowsPerPage": rows_per_page}
+    headers = {"Authorization": f"Bearer {get_orcabus_token()}"}
+
+    while url is not None:
+        response = get_session().get(
+            url,
+            params=params,
+            headers=headers,
+            timeout=FASTQ_CATALOG_REQUEST_TIMEOUT_SECONDS,
+        )
+        response.raise_for_status()
+        page = response.json()
+
+        # The next link carries the query parameters
+        url = page['links']['next']
+        params = None
+
+        yield page
+
+
+def build_readset_library_index() -> LibraryIdBloomFilter:
+    """
+    Build the index from the fastq service.
+    The filter is sized from the fastq count on the first page (an upper bound on the libraries with fastqs),
+    and filled as each page arrives, so only one page of fastqs is held at a time
+    :return:
+    """
+    built_at = time.time()
+    readset_library_index: Optional[LibraryIdBloomFilter] = None
+
+    for page in iter_all_fastq_pages():
+        if readset_library_index is None:
+            readset_library_index = LibraryIdBloomFilter.from_capacity(page['pagination']['count'], built_at)
+        for fastq in page['results']:
+            readset_library_index.add(fastq['library']['libraryId'])
+
+    if readset_library_index is None:
+        readset_library_index = LibraryIdBloomFilter.from_capacity(0, built_at)
+
+    logger.info(
+        f"Built the readset library index, {readset_library_index.bit_count} bits "
+        f"and {readset_library_index.hash_count} hashes per library"
+    )
+    return readset_library_index
+
+
+def load_local_readset_library_index() -> Optional[LibraryIdBloomFilter]:
+    local_path = Path(READSET_LIBRARY_INDEX_LOCAL_PATH)
+    if not local_path.is_file():
+        return None
+    try:
+        with open(local_path, 'rb') as index_file:
+            return LibraryIdBloomFilter.from_file(index_file)
+    except (ValueError, KeyError) as e:
+        logger.warning(f"Ignoring the unreadable readset library index at {local_path}: {e}")
+        return None
+
+
+def save_local_readset_library_index(readset_library_index: LibraryIdBloomFilter):
+    # Write then rename, so a concurrent reader never sees a partial index
+    local_path = Path(READSET_LIBRARY_INDEX_LOCAL_PATH)
+    partial_path = local_path.with_suffix(".partial")
+    partial_path.write_bytes(readset_library_index.to_bytes())
+    partial_path.replace(local_path)
+
+
+def load_s3_readset_library_index() -> Optional[LibraryIdBloomFilter]:
+    s3_location = get_index_s3_location()
+    if s3_location is None:
+        return None
+    bucket, key = s3_location
+
+    s3_client = get_s3_client()
+    try:
+        response = s3_client.get_object(Bucket=bucket, Key=key)
+    except s3_client.exceptions.NoSuchKey:
+        return None
+    return LibraryIdBloomFilter.from_file(BytesIO(response['Body'].read()))
+
+
+def save_s3_readset_library_index(readset_library_index: LibraryIdBloomFilter):
+    s3_location = get_index_s3_location()
+    if s3_location is None or is_dry_run():
+        return
+    bucket, key = s3_location
+
+    get_s3_client().put_object(
+        Bucket=bucket,
+        Key=key,
+        Body=readset_library_index.to_bytes(),
+        ContentType="application/octet-stream",
+    )
+
+
+def get_readset_library_index() -> Optional[LibraryIdBloomFilter]:
+    """
+    Get the readset library index, the freshest of memory, /tmp and S3.
+    The index is never built here, see rebuild_readset_library_index
+    :return: None if there is no index
+    """
+    global READSET_LIBRARY_INDEX, READSET_LIBRARY_INDEX_LOADED_AT
+
+    with READSET_LIBRARY_INDEX_LOCK:
+        if READSET_LIBRARY_INDEX_LOADED_AT is not None and (
+            time.time() - READSET_LIBRARY_INDEX_LOADED_AT < READSET_LIBRARY_INDEX_RELOAD_SECONDS or
+            (READSET_LIBRARY_INDEX is not None and not READSET_LIBRARY_INDEX.is_stale())
+        ):
+            return READSET_LIBRARY_INDEX
+
+        readset_library_index = load_local_readset_library_index()
+        if readset_library_index is None or readset_library_index.is_stale():
+            s3_readset_library_index = load_s3_readset_library_index()
+            if s3_readset_library_index is not None and (
+                readset_library_index is None or
+                s3_readset_library_index.built_at > readset_library_index.built_at
+            ):
+                readset_library_index = s3_readset_library_index
+                save_local_readset_library_index(readset_library_index)
+
+        if readset_library_index is None:
+            logger.warning("There is no readset library index, libraries are checked with the fastq service")
+        elif readset_library_index.is_stale():
+            logger.warning(
+                f"The readset library index was built {time.time() - readset_library_index.built_at:.0f} seconds ago, "
+                "libraries missing from it are checked with the fastq service"
+            )
+
+        READSET_LIBRARY_INDEX = readset_library_index
+        READSET_LIBRARY_INDEX_LOADED_AT = time.time()
+        return READSET_LIBRARY_INDEX
+
+
+def rebuild_readset_library_index() -> LibraryIdBloomFilter:
+    """
+    Rebuild the readset library index from the fastq service, and share it through S3 and /tmp
+    :return:
+    """
+    global READSET_LIBRARY_INDEX, READSET_LIBRARY_INDEX_LOADED_AT
+
+    readset_library_index = build_readset_library_index()
+    save_s3_readset_library_index(readset_library_index)
+
+    with READSET_LIBRARY_INDEX_LOCK:
+        save_local_readset_library_index(readset_library_index)
+        READSET_LIBRARY_INDEX = readset_library_index
+        READSET_LIBRARY_INDEX_LOADED_AT = time.time()
+
+    return readset_library_index
+
+
+def load_local_readset_library_miss_cache() -> Dict[str, float]:
+    local_path = Path(READSET_LIBRARY_MISS_CACHE_LOCAL_PATH)
+    if not local_path.is_file():
+        return {}
+    try:
+        return json.loads(local_path.read_text())
+    except ValueError as e:
+        logger.warning(f"Ignoring the unreadable readset library miss cache at {local_path}: {e}")
+        return {}
+
+
+def save_local_readset_library_miss_cache(readset_library_miss_cache: Dict[str, float]):
+    # Write then rename, so a concurrent reader never sees a partial cache
+    local_path = Path(READSET_LIBRARY_MISS_CACHE_LOCAL_PATH)
+    partial_path = local_path.with_suffix(".partial")
+    partial_path.write_text(json.dumps(readset_library_miss_cache))
+    partial_path.replace(local_path)
+
+
+def update_readset_library_miss_cache(
+        added_library_id_list: List[str],
+        removed_library_id_list: List[str],
+):
+    """
+    Add libraries to (and remove libraries from) the miss cache, in the warm process and in /tmp.
+    The /tmp copy is merged in first, so misses recorded by other invocations of the sandbox are kept
+    :param added_library_id_list:
+    :param removed_library_id_list:
+    :return:
+    """
+    global READSET_LIBRARY_MISS_CACHE
+
+    now = time.time()
+    with READSET_LIBRARY_MISS_CACHE_LOCK:
+        readset_library_miss_cache = {
+            **load_local_readset_library_miss_cache(),
+            **(READSET_LIBRARY_MISS_CACHE or {}),
+            **dict.fromkeys(added_library_id_list, now + READSET_LIBRARY_MISS_CACHE_TTL_SECONDS),
+        }
+        READSET_LIBRARY_MISS_CACHE = dict(filter(
+            lambda miss_iter_: miss_iter_[1] > now and miss_iter_[0] not in removed_library_id_list,
+            readset_library_miss_cache.items()
+        ))
+        save_local_readset_library_miss_cache(READSET_LIBRARY_MISS_CACHE)
+
+
+def is_readset_library_miss(library_id: str) -> bool:
+    """
+    Whether the fastq service recently had no fastqs for this library
+    :param library_id:
+    :return:
+    """
+    global READSET_LIBRARY_MISS_CACHE
+
+    with READSET_LIBRARY_MISS_CACHE_LOCK:
+        if READSET_LIBRARY_MISS_CACHE is None:
+            READSET_LIBRARY_MISS_CACHE = load_local_readset_library_miss_cache()
+        return READSET_LIBRARY_MISS_CACHE.get(library_id, 0) > time.time()
+
+
+def add_readset_library_ids(library_id_list: List[str]):
+    """
+    Add libraries known to have fastqs (i.e. those on the current instrument run) to the index
+    :param library_id_list:
+    :return:
+    """
+    if len(library_id_list) == 0:
+        return
+
+    # A library remembered as a miss has since been sequenced
+    if any(map(is_readset_library_miss, library_id_list)):
+        update_readset_library_miss_cache([], library_id_list)
+
+    readset_library_index = get_readset_library_index()
+    if readset_library_index is None:
+        return
+
+    new_library_id_list = list(filter(
+        lambda library_id_iter_: library_id_iter_ not in readset_library_index,
+        library_id_list
+    ))
+    if len(new_library_id_list) == 0:
+        return
+
+    with READSET_LIBRARY_INDEX_LOCK:
+        for library_id in new_library_id_list:
+            readset_library_index.add(library_id)
+        save_local_readset_library_index(readset_library_index)
+
+
+def library_has_readsets(library_id: str) -> bool:
+    """
+    Check if a library has readsets, only calling the fastq service if the library is missing from the index,
+    and was not recently found to have no fastqs
+    :param library_id:
+    :return:
+    """
+    readset_library_index = get_readset_library_index()
+    if readset_library_index is not None and library_id in readset_library_index:
+        return True
+
+    if is_readset_library_miss(library_id):
+        return False
+
+    # The library may have been sequenced since the index was built
+    if len(get_fastqs_in_library(library_id=library_id)) == 0:
+        update_readset_library_miss_cache([library_id], [])
+        return False
+
+    add_readset_library_ids([library_id])
+    return True
+
+
+def clear_readset_library_index():
+    global READSET_LIBRARY_INDEX, READSET_LIBRARY_INDEX_LOADED_AT, READSET_LIBRARY_MISS_CACHE
+
+    with READSET_LIBRARY_INDEX_LOCK:
+        READSET_LIBRARY_INDEX = None
+        READSET_LIBRARY_INDEX_LOADED_AT = None
+
+    with READSET_LIBRARY_MISS_CACHE_LOCK:
+        READSET_LIBRARY_MISS_CACHE = None
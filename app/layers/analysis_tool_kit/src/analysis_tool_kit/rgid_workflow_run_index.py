@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+
+"""
+Rgid workflow run index
+
+Checking a draft for existing workflow runs sends the rgid of every readset its libraries have ever had
+to the workflow manager, and filters out deprecated runs once they're returned.
+
+The index holds, for each workflow name, version and rgid, the set of portal run ids of the workflow runs
+with a readset of that rgid. It is kept in the draft ledger and updated from workflow run state change events,
+a run is added on its first event and removed once it is deprecated, so deprecated runs are never indexed.
+
+An existing run for a draft is then a run in the set of every one of the draft's rgids,
+the intersection of those sets, fetched from the ledger in a single batch.
+
+Events can arrive out of order, so the last status and event time of each run is kept in the ledger too,
+and an event older than the run's last event is ignored (i.e. a delayed READY after the run's DEPRECATED
+would otherwise add the deprecated run back to the index for good).
+
+The same events settle the run's draft claim in the ledger (see draft_ledger.py),
+the pending claim is confirmed on the run's first event, and released once the run is deprecated,
+so the draft can be generated again.
+
+The index is disabled if the draft ledger is not configured, and is never written in dry run mode.
+"""
+
+# Standard imports
+import logging
+import time
+from datetime import datetime
+from functools import reduce
+from os import environ
+from typing import List, Dict, Any, Optional, Set
+
+# Local imports
+from .draft_ledger import get_draft_ledger, get_draft_key
+from .dry_run import is_dry_run
+from .globals import (
+    DEPRECATED_STATUS,
+    RGID_WORKFLOW_RUN_KEY_PREFIX,
+    RGID_WORKFLOW_RUN_INDEX_ATTRIBUTE,
+    RGID_WORKFLOW_RUN_INDEX_AUTHORITATIVE_ENV_VAR,
+    WORKFLOW_RUN_STATE_KEY_PREFIX,
+    WORKFLOW_RUN_STATE_TTL_SECONDS,
+)
+
+# Set logger
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def get_rgid_workflow_run_key(workflow_name: str, workflow_version: str, rgid: str) -> str:
+    return f"{RGID_WORKFLOW_RUN_KEY_PREFIX}#{workflow_name}#{workflow_version}#{rgid}"
+
+
+def get_workflow_run_state_key(portal_run_id: str) -> str:
+    return f"{WORKFLOW_RUN_STATE_KEY_PREFIX}#{portal_run_id}"
+
+
+def get_event_time_ms(event_detail: Dict[str, Any]) -> int:
+    """
+    Get the time of a workflow run state change event in epoch milliseconds,
+    events without a timestamp are ordered by when they arrive
+    :param event_detail:
+    :return:
+    """
+    if not event_detail.get('timestamp'):
+        return int(time.time() * 1000)
+    return int(datetime.fromisoformat(event_detail['timestamp']).timestamp() * 1000)
+
+
+def is_rgid_workflow_run_index_authoritative() -> bool:
+    """
+    Whether the index covers every workflow run, so a draft with no indexed runs has no existing runs
+    :return:
+    """
+    return (
+        get_draft_ledger() is not None and
+        environ.get(RGID_WORKFLOW_RUN_INDEX_AUTHORITATIVE_ENV_VAR, "false").lower() == "true"
+    )
+
+
+def get_indexed_workflow_run_ids(
+        workflow_name: str,
+        workflow_version: str,
+        rgid_list: List[str],
+) -> Optional[Set[str]]:
+    """
+    Get the portal run ids of the indexed workflow runs with a readset of every one of these rgids
+    :param workflow_name:
+    :param workflow_version:
+    :param rgid_list:
+    :return: None if the index is not configured
+    """
+    draft_ledger = get_draft_ledger()
+    if draft_ledger is None:
+        return None
+
+    if len(rgid_list) == 0:
+        return set()
+
+    key_list = list(map(
+        lambda rgid_iter_: get_rgid_workflow_run_key(workflow_name, workflow_version, rgid_iter_),
+        set(rgid_list)
+    ))
+    portal_run_id_sets_by_key = draft_ledger.get_sets(key_list, RGID_WORKFLOW_RUN_INDEX_ATTRIBUTE)
+
+    # An rgid without any runs means no run has every rgid
+    if len(portal_run_id_sets_by_key) < len(key_list):
+        return set()
+
+    return reduce(
+        lambda intersection_iter_, portal_run_id_set_iter_: intersection_iter_ & portal_run_id_set_iter_,
+        portal_run_id_sets_by_key.values()
+    )
+
+
+def index_workflow_run_state_change(event_detail: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Add a workflow run to (or, once deprecated, remove it from) the index, from a workflow run state change event,
+    and confirm (or, once deprecated, release) the run's draft claim
+    :param event_detail:
+    :return: A summary of the update, None if the index is not configured or the run has no readsets
+    """
+    draft_ledger = get_draft_ledger()
+    if draft_ledger is None or is_dry_run():
+        return None
+
+    rgid_list = sorted(set(map(
+        lambda readset_iter_: readset_iter_['rgid'],
+        (
+            readset
+            for library in (event_detail.get('libraries') or [])
+            for readset in (library.get('readsets') or [])
+        )
+    )))
+    if len(rgid_list) == 0:
+        return None
+
+    workflow_name = event_detail['workflow']['name']
+    workflow_version = event_detail['workflow']['version']
+    portal_run_id = event_detail['portalRunId']
+    is_deprecated = event_detail['status'] == DEPRECATED_STATUS
+    event_time_ms = get_event_time_ms(event_detail)
+
+    # Record the run's state, unless we have already seen a later event for the run.
+    # Events are ordered by their time, and a DEPRECATED event wins a tie
+    is_latest_event = draft_ledger.put_if_newer(
+        get_workflow_run_state_key(portal_run_id),
+        {
+            "status": event_detail['status'],
+            "eventTime": str(event_time_ms),
+        },
+        version=event_time_ms * 2 + int(is_deprecated),
+        ttl_seconds=WORKFLOW_RUN_STATE_TTL_SECONDS,
+    )
+    if not is_latest_event:
+        logger.info(
+            f"Ignoring stale {event_detail['status']} event for {workflow_name}/{workflow_version} run {portal_run_id}"
+        )
+        return {
+            "portalRunId": portal_run_id,
+            "workflowName": workflow_name,
+            "workflowVersion": workflow_version,
+            "rgidCount": len(rgid_list),
+            "stale": True,
+            "removed": False,
+            "claimConfirmed": False,
+        }
+
+    for rgid in rgid_list:
+        if is_deprecated:
+            draft_ledger.remove_from_set(
+                get_rgid_workflow_run_key(workflow_name, workflow_version, rgid),
+                RGID_WORKFLOW_RUN_INDEX_ATTRIBUTE,
+                [portal_run_id],
+            )
+        else:
+            draft_ledger.add_to_set(
+                get_rgid_workflow_run_key(workflow_name, workflow_version, rgid),
+                RGID_WORKFLOW_RUN_INDEX_ATTRIBUTE,
+                [portal_run_id],
+            )
+
+    draft_key = get_draft_key(
+        workflow_name=workflow_name,
+        workflow_version=workflow_version,
+        library_id_list=list(map(
+            lambda library_iter_: library_iter_['libraryId'],
+            event_detail.get('libraries') or []
+        )),
+        rgid_list=rgid_list,
+    )
+    if is_deprecated:
+        draft_ledger.release(draft_key)
+        is_claim_confirmed = False
+    else:
+        # Runs we did not draft have no claim to confirm
+        is_claim_confirmed = draft_ledger.confirm(draft_key)
+
+    logger.info(
+        f"{'Removed' if is_deprecated else 'Indexed'} {workflow_name}/{workflow_version} run {portal_run_id} "
+        f"{'from' if is_deprecated else 'for'} {len(rgid_list)} rgids"
+    )
+
+    return {
+        "portalRunId": portal_run_id,
+        "workflowName": workflow_name,
+        "workflowVersion": workflow_version,
+        "rgidCount": len(rgid_list),
+        "stale": False,
+        "removed": is_deprecated,
+        "claimConfirmed": is_claim_confirmed,
+    }
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+
+"""
+Slow invocation profiler
+
+When a make analysis events lambda nears its timeout, we have no record of where the time went.
+
+Handlers decorated with profile_slow_invocations can be profiled by setting ANALYSIS_GLUE_PROFILE_SLOW_INVOCATIONS=true.
+The invocation is then run under cProfile and tracemalloc, and if it exceeds the latency threshold
+(by default, half the time the lambda had left when the invocation started)
+or the peak memory threshold, we upload
+  * the cProfile stats (readable with pstats or snakeviz)
+  * the top allocations by line (still held when the handler returns, tracemalloc only keeps the peak size)
+to s3://<SLOW_INVOCATION_PROFILES_BUCKET_NAME>/<prefix>/<function name>/<instrument run id>/<subject id>/<request id>.*
+
+If no bucket is configured, a summary of the slowest functions and top allocations is logged instead.
+
+With profiling switched off the decorator is a single environment lookup per invocation.
+cProfile only profiles the calling thread, so time spent in toolkit thread pools is attributed to the waits on them.
+"""
+
+# Standard imports
+import cProfile
+import io
+import logging
+import marshal
+import pstats
+import time
+import tracemalloc
+import typing
+from functools import wraps
+from os import environ
+from typing import Dict, Any, Optional
+
+import boto3
+
+# Local imports
+from .globals import (
+    SLOW_INVOCATION_PROFILING_ENV_VAR,
+    SLOW_INVOCATION_PROFILES_BUCKET_NAME_ENV_VAR,
+    SLOW_INVOCATION_PROFILES_KEY_PREFIX_ENV_VAR,
+    SLOW_INVOCATION_SECONDS_ENV_VAR,
+    SLOW_INVOCATION_PEAK_MEMORY_MB_ENV_VAR,
+    DEFAULT_SLOW_INVOCATION_PROFILES_KEY_PREFIX,
+    DEFAULT_SLOW_INVOCATION_TIMEOUT_FRACTION,
+    DEFAULT_SLOW_INVOCATION_SECONDS,
+    DEFAULT_SLOW_INVOCATION_PEAK_MEMORY_MB,
+    SLOW_INVOCATION_PROFILE_TOP_COUNT,
+    SLOW_INVOCATION_TRACEMALLOC_FRAMES,
+)
+from .instrument_run_helpers import get_instrument_run_label
+
+# Type check imports
+if typing.TYPE_CHECKING:
+    from mypy_boto3_s3 import S3Client
+
+# Globals
+# Profilers can't be nested (i.e. when the dry run planner calls a decorated handler),
+# we also leave invocations alone if something else is already tracing allocations
+PROFILED_INVOCATION_ACTIVE = False
+
+# Set logger
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def get_s3_client() -> 'S3Client':
+    return boto3.client('s3')
+
+
+def is_profiling_enabled() -> bool:
+    return environ.get(SLOW_INVOCATION_PROFILING_ENV_VAR, "false").lower() == "true"
+
+
+def get_slow_invocation_seconds(context) -> float:
+    """
+    The latency threshold, from the environment, otherwise a fraction of the time the lambda has left
+    :param context:
+    :return:
+    """
+    if SLOW_INVOCATION_SECONDS_ENV_VAR in environ:
+        return float(environ[SLOW_INVOCATION_SECONDS_ENV_VAR])
+    if context is not None and hasattr(context, "get_remaining_time_in_millis"):
+        return context.get_remaining_time_in_millis() / 1000 * DEFAULT_SLOW_INVOCATION_TIMEOUT_FRACTION
+    return DEFAULT_SLOW_INVOCATION_SECONDS
+
+
+def get_slow_invocation_peak_memory_bytes() -> int:
+    return int(
+        float(environ.get(SLOW_INVOCATION_PEAK_MEMORY_MB_ENV_VAR, DEFAULT_SLOW_INVOCATION_PEAK_MEMORY_MB))
+        * 1024 * 1024
+    )
+
+
+def get_profile_key_prefix(event: Dict[str, Any], context) -> str:
+    """
+    The key prefix for an invocation's profiles, by function, instrument run and subject
+    :param event:
+    :param context:
+    :return:
+    """
+    return "/".join([
+        environ.get(
+            SLOW_INVOCATION_PROFILES_KEY_PREFIX_ENV_VAR,
+            DEFAULT_SLOW_INVOCATION_PROFILES_KEY_PREFIX
+        ).strip("/"),
+        getattr(context, "function_name", None) or "unknown-function",
+        get_instrument_run_label(event) or "unknown-instrument-run",
+        event.get("subjectId") or "unknown-subject",
+        getattr(context, "aws_request_id", None) or str(int(time.time() * 1000)),
+    ])
+
+
+def get_top_allocations(snapshot: tracemalloc.Snapshot) -> str:
+    return "\n".join(map(
+        str,
+        snapshot.statistics('lineno')[:SLOW_INVOCATION_PROFILE_TOP_COUNT]
+    ))
+
+
+def get_top_functions(profiler: cProfile.Profile) -> str:
+    stats_stream = io.StringIO()
+    pstats.Stats(profiler, stream=stats_stream).sort_stats('cumulative').print_stats(
+        SLOW_INVOCATION_PROFILE_TOP_COUNT
+    )
+    return stats_stream.getvalue()
+
+
+def save_profiles(
+        key_prefix: str,
+        profiler: cProfile.Profile,
+        snapshot: tracemalloc.Snapshot,
+        summary: Dict[str, Any],
+):
+    """
+    Upload the profiles of a slow invocation, or log them if no bucket is configured
+    :param key_prefix:
+    :param profiler:
+    :param snapshot:
+    :param summary:
+    :return:
+    """
+    if SLOW_INVOCATION_PROFILES_BUCKET_NAME_ENV_VAR not in environ:
+        logger.warning(
+            f"Slow invocation {summary}, top functions:\n{get_top_functions(profiler)}\n"
+            f"top allocations:\n{get_top_allocations(snapshot)}"
+        )
+        return
+
+    bucket = environ[SLOW_INVOCATION_PROFILES_BUCKET_NAME_ENV_VAR]
+    s3_client = get_s3_client()
+
+    profiler.create_stats()
+    s3_client.put_object(
+        Bucket=bucket,
+        Key=f"{key_prefix}.prof",
+        # As written by pstats.Stats.dump_stats
+        Body=marshal.dumps(profiler.stats),
+    )
+    s3_client.put_object(
+        Bucket=bucket,
+        Key=f"{key_prefix}.allocations.txt",
+        Body=get_top_allocations(snapshot).encode(),
+        ContentType="text/plain",
+    )
+    logger.warning(f"Slow invocation {summary}, profiles uploaded to s3://{bucket}/{key_prefix}.*")
+
+
+def profile_slow_invocations(handler):
+    """
+    Profile the handler if profiling is switched on, and keep the profiles of slow or memory hungry invocations
+    :param handler:
+    :return:
+    """
+    @wraps(handler)
+    def wrapped_handler(event, context):
+        global PROFILED_INVOCATION_ACTIVE
+
+        if not is_profiling_enabled() or PROFILED_INVOCATION_ACTIVE or tracemalloc.is_tracing():
+            return handler(event, context)
+
+        slow_invocation_seconds = get_slow_invocation_seconds(context)
+        slow_invocation_peak_memory_bytes = get_slow_invocation_peak_memory_bytes()
+
+        PROFILED_INVOCATION_ACTIVE = True
+        profiler = cProfile.Profile()
+        tracemalloc.start(SLOW_INVOCATION_TRACEMALLOC_FRAMES)
+        start = time.perf_counter()
+        profiler.enable()
+        try:
+            return handler(event, context)
+        finally:
+            profiler.disable()
+            elapsed_seconds = time.perf_counter() - start
+            peak_memory_bytes = tracemalloc.get_traced_memory()[1]
+            snapshot: Optional[tracemalloc.Snapshot] = None
+            if (
+                elapsed_seconds > slow_invocation_seconds or
+                peak_memory_bytes > slow_invocation_peak_memory_bytes
+            ):
+                snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+            PROFILED_INVOCATION_ACTIVE = False
+
+            if snapshot is not None:
+                # Never fail the invocation over its profiles
+                try:
+                    save_profiles(
+                        get_profile_key_prefix(event, context),
+                        profiler,
+                        snapshot,
+                        {
+                            "elapsedSeconds": round(elapsed_seconds, 3),
+                            "slowInvocationSeconds": round(slow_invocation_seconds, 3),
+                            "peakMemoryBytes": peak_memory_bytes,
+                            "slowInvocationPeakMemoryBytes": slow_invocation_peak_memory_bytes,
+                        },
+                    )
+                except Exception as e:
+                    logger.warning(f"Could not save the slow invocation profiles: {e}")
+
+    return wrapped_handler
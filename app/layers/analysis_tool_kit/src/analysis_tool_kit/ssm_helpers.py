@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+
+"""
+SSM helpers
+
+get_ssm_value reads one parameter per request, a lambda that reads several parameters when it is initialised
+reads them together with get_ssm_values, in as few GetParameters requests as SSM allows.
+"""
+
+# Standard imports
+import typing
+from typing import List, Dict
+
+import boto3
+
+# Local imports
+from .globals import SSM_GET_PARAMETERS_MAX_NAMES
+
+# Type check imports
+if typing.TYPE_CHECKING:
+    from mypy_boto3_ssm import SSMClient
+
+
+def get_ssm_client() -> 'SSMClient':
+    return boto3.client('ssm')
+
+
+def get_ssm_values(parameter_name_list: List[str]) -> Dict[str, str]:
+    """
+    Get the values of several SSM parameters, by parameter name
+    :param parameter_name_list:
+    :return:
+    """
+    ssm_client = get_ssm_client()
+    unique_parameter_name_list = list(dict.fromkeys(parameter_name_list))
+
+    parameter_value_by_name: Dict[str, str] = {}
+    invalid_parameter_name_list: List[str] = []
+    for chunk_start in range(0, len(unique_parameter_name_list), SSM_GET_PARAMETERS_MAX_NAMES):
+        response = ssm_client.get_parameters(
+            Names=unique_parameter_name_list[chunk_start:chunk_start + SSM_GET_PARAMETERS_MAX_NAMES]
+        )
+        invalid_parameter_name_list.extend(response['InvalidParameters'])
+        for parameter in response['Parameters']:
+            parameter_value_by_name[parameter['Name']] = parameter['Value']
+
+    if len(invalid_parameter_name_list) > 0:
+        raise ValueError(f"Could not find ssm parameters: {invalid_parameter_name_list}")
+
+    return parameter_value_by_name
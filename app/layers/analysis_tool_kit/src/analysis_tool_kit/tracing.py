@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+
+"""
+Lightweight invocation tracing
+
+Handlers decorated with trace_invocation record a tree of timed spans for each invocation,
+  * the handler itself (the root span, with the instrument run id and subject id as attributes)
+  * the toolkit helpers decorated with traced (i.e. get_existing_workflow_runs)
+  * every OrcaBus API call made through the toolkit's request hook
+and any span opened with the span context manager.
+
+When the handler returns, the whole trace is logged as a single structured (json) log record,
+along with its critical path, the chain of spans from the root that each finished last within their parent,
+so one slow subject can be broken down into exactly what it was waiting on.
+
+If ANALYSIS_GLUE_TRACE_OTLP_FILE is set, the trace is also appended to that file as an
+OTLP/JSON ExportTraceServiceRequest (one per line), as written by the OpenTelemetry collector's file exporter.
+
+The current span is held in a context variable, toolkit thread pools pass it on to their workers with bind_current_span.
+Outside a traced invocation, spans are a no-op.
+"""
+
+# Standard imports
+import json
+import logging
+import secrets
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from os import environ
+from threading import Lock
+from typing import List, Dict, Any, Optional, Iterator, Callable
+
+# Local imports
+from .globals import (
+    TRACE_OTLP_FILE_ENV_VAR,
+    TRACE_SERVICE_NAME,
+    MAX_TRACE_SPANS,
+)
+from .instrument_run_helpers import get_instrument_run_label
+
+# Globals
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_CLIENT = 3
+SPAN_STATUS_OK = "OK"
+SPAN_STATUS_ERROR = "ERROR"
+
+CURRENT_SPAN: ContextVar[Optional['Span']] = ContextVar("CURRENT_SPAN", default=None)
+ACTIVE_TRACE: Optional['Trace'] = None
+ACTIVE_TRACE_LOCK = Lock()
+
+# Set logger
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class Span:
+    __slots__ = (
+        'name',
+        'trace_id',
+        'span_id',
+        'parent_span_id',
+        'kind',
+        'start_time_ns',
+        'end_time_ns',
+        'attributes',
+        'status',
+    )
+
+    def __init__(
+            self,
+            name: str,
+            trace_id: str,
+            parent_span_id: Optional[str],
+            kind: int = SPAN_KIND_INTERNAL,
+            attributes: Optional[Dict[str, Any]] = None,
+    ):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_span_id = parent_span_id
+        self.kind = kind
+        self.start_time_ns = time.time_ns()
+        self.end_time_ns: Optional[int] = None
+        self.attributes: Dict[str, Any] = dict(filter(
+            lambda kv_iter_: kv_iter_[1] is not None,
+            (attributes or {}).items()
+        ))
+        self.status = SPAN_STATUS_OK
+
+    def end(self):
+        self.end_time_ns = time.time_ns()
+
+    def get_duration_ms(self) -> float:
+        return ((self.end_time_ns or time.time_ns()) - self.start_time_ns) / 1e6
+
+    def to_log_dict(self, trace_start_time_ns: int) -> Dict[str, Any]:
+        return dict(filter(
+            lambda kv_iter_: kv_iter_[1] is not None,
+            {
+                "name": self.name,
+                "spanId": self.span_id,
+                "parentSpanId": self.parent_span_id,
+                "startOffsetMs": round((self.start_time_ns - trace_start_time_ns) / 1e6, 3),
+                "durationMs": round(self.get_duration_ms(), 3),
+                "status": self.status if self.status != SPAN_STATUS_OK else None,
+                "attributes": self.attributes if len(self.attributes) > 0 else None,
+            }.items()
+        ))
+
+    def to_otlp_dict(self) -> Dict[str, Any]:
+        return dict(filter(
+            lambda kv_iter_: kv_iter_[1] is not None,
+            {
+                "traceId": self.trace_id,
+                "spanId": self.span_id,
+                "parentSpanId": self.parent_span_id,
+                "name": self.name,
+                "kind": self.kind,
+                "startTimeUnixNano": str(self.start_time_ns),
+                "endTimeUnixNano": str(self.end_time_ns or time.time_ns()),
+                "attributes": list(map(
+                    lambda kv_iter_: {"key": kv_iter_[0], "value": get_otlp_any_value(kv_iter_[1])},
+                    self.attributes.items()
+                )),
+                "status": {"code": 1 if self.status == SPAN_STATUS_OK else 2},
+            }.items()
+        ))
+
+
+class Trace:
+    """
+    The spans of a single invocation
+    """
+    def __init__(self, root_span_name: str, attributes: Dict[str, Any]):
+        self.trace_id = secrets.token_hex(16)
+        self.root_span = Span(root_span_name, self.trace_id, None, attributes=attributes)
+        self.spans: List[Span] = []
+        self.dropped_span_count = 0
+        self.lock = Lock()
+
+    def add_span(self, span: Span):
+        with self.lock:
+            if len(self.spans) >= MAX_TRACE_SPANS:
+                self.dropped_span_count += 1
+                return
+            self.spans.append(span)
+
+    def get_all_spans(self) -> List[Span]:
+        with self.lock:
+            return [self.root_span] + self.spans
+
+    def get_critical_path(self) -> List[Span]:
+        """
+        From the root, follow the child span that finished last, as that is the child its parent was waiting on
+        :return:
+        """
+        children_by_parent_span_id: Dict[str, List[Span]] = {}
+        for span in self.spans:
+            children_by_parent_span_id.setdefault(span.parent_span_id, []).append(span)
+
+        critical_path = [self.root_span]
+        while critical_path[-1].span_id in children_by_parent_span_id:
+            critical_path.append(max(
+                children_by_parent_span_id[critical_path[-1].span_id],
+                key=lambda span_iter_: span_iter_.end_time_ns or 0
+            ))
+        return critical_path
+
+
+def get_otlp_any_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def set_span_attributes(**attributes):
+    """
+    Add attributes to the current span, if we're in one
+    :param attributes:
+    :return:
+    """
+    current_span = CURRENT_SPAN.get()
+    if current_span is None:
+        return
+    current_span.attributes.update(dict(filter(
+        lambda kv_iter_: kv_iter_[1] is not None,
+        attributes.items()
+    )))
+
+
+@contextmanager
+def span(name: str, kind: int = SPAN_KIND_INTERNAL, **attributes) -> Iterator[Optional[Span]]:
+    """
+    Time a block as a child of the current span
+    :param name:
+    :param kind:
+    :param attributes:
+    :return:
+    """
+    trace = ACTIVE_TRACE
+    if trace is None:
+        yield None
+        return
+
+    parent_span = CURRENT_SPAN.get() or trace.root_span
+    child_span = Span(name, trace.trace_id, parent_span.span_id, kind=kind, attributes=attributes)
+    token = CURRENT_SPAN.set(child_span)
+    try:
+        yield child_span
+    except BaseException as e:
+        child_span.status = SPAN_STATUS_ERROR
+        child_span.attributes['exception.type'] = type(e).__name__
+        raise
+    finally:
+        child_span.end()
+        CURRENT_SPAN.reset(token)
+        trace.add_span(child_span)
+
+
+def traced(func: Callable) -> Callable:
+    """
+    Time every call to a function as a span named after the function
+    :param func:
+    :return:
+    """
+    @wraps(func)
+    def traced_func(*args, **kwargs):
+        if ACTIVE_TRACE is None:
+            return func(*args, **kwargs)
+        with span(func.__name__):
+            return func(*args, **kwargs)
+    return traced_func
+
+
+def bind_current_span(func: Callable) -> Callable:
+    """
+    Bind the current span to a function, so spans opened when it runs on a pool worker thread nest under it
+    :param func:
+    :return:
+    """
+    current_span = CURRENT_SPAN.get()
+
+    @wraps(func)
+    def bound_func(*args, **kwargs):
+        token = CURRENT_SPAN.set(current_span)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            CURRENT_SPAN.reset(token)
+    return bound_func
+
+
+def export_trace(trace: Trace):
+    """
+    Log the trace as a single record, and append it to the OTLP file if configured
+    :param trace:
+    :return:
+    """
+    all_spans = trace.get_all_spans()
+
+    logger.info(json.dumps({
+        "trace": {
+            "traceId": trace.trace_id,
+            "name": trace.root_span.name,
+            "durationMs": round(trace.root_span.get_duration_ms(), 3),
+            "attributes": trace.root_span.attributes,
+            "spanCount": len(all_spans),
+            "droppedSpanCount": trace.dropped_span_count,
+            "criticalPath": list(map(
+                lambda span_iter_: {
+                    "name": span_iter_.name,
+                    "durationMs": round(span_iter_.get_duration_ms(), 3),
+                },
+                trace.get_critical_path()
+            )),
+            "spans": list(map(
+                lambda span_iter_: span_iter_.to_log_dict(trace.root_span.start_time_ns),
+                all_spans
+            )),
+        }
+    }))
+
+    if TRACE_OTLP_FILE_ENV_VAR not in environ:
+        return
+
+    with open(environ[TRACE_OTLP_FILE_ENV_VAR], "a") as otlp_file:
+        otlp_file.write(json.dumps({
+            "resourceSpans": [
+                {
+                    "resource": {
+                        "attributes": [
+                            {"key": "service.name", "value": {"stringValue": TRACE_SERVICE_NAME}},
+                        ]
+                    },
+                    "scopeSpans": [
+                        {
+                            "scope": {"name": __name__},
+                            "spans": list(map(lambda span_iter_: span_iter_.to_otlp_dict(), all_spans)),
+                        }
+                    ],
+                }
+            ]
+        }) + "\n")
+
+
+def trace_invocation(handler):
+    """
+    Trace each invocation of a handler, and export the trace when it returns.
+    A handler invoked from within a traced invocation (i.e. by the dry run planner) is traced as a span instead.
+    :param handler:
+    :return:
+    """
+    @wraps(handler)
+    def wrapped_handler(event, context):
+        global ACTIVE_TRACE
+
+        attributes = {
+            "function": getattr(context, "function_name", None) or handler.__module__,
+            "instrumentRunId": get_instrument_run_label(event),
+            "subjectId": event.get("subjectId"),
+            "libraryCount": len(event.get("libraryIdList") or []),
+        }
+
+        with ACTIVE_TRACE_LOCK:
+            trace = None
+            if ACTIVE_TRACE is None:
+                trace = Trace("handler", attributes)
+                ACTIVE_TRACE = trace
+
+        if trace is None:
+            with span(f"handler {attributes['function']}", **attributes):
+                return handler(event, context)
+
+        token = CURRENT_SPAN.set(trace.root_span)
+        try:
+            return handler(event, context)
+        except BaseException as e:
+            trace.root_span.status = SPAN_STATUS_ERROR
+            trace.root_span.attributes['exception.type'] = type(e).__name__
+            raise
+        finally:
+            trace.root_span.end()
+            CURRENT_SPAN.reset(token)
+            with ACTIVE_TRACE_LOCK:
+                ACTIVE_TRACE = None
+            # Never fail the invocation over its trace
+            try:
+                export_trace(trace)
+            except Exception as e:
+                logger.warning(f"Could not export the invocation trace: {e}")
+
+    return wrapped_handler
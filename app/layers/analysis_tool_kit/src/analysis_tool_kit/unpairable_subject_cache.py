@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+
+"""
+Unpairable subject cache
+
+A subject that can't be paired yet (i.e. a tumor with no normal) is re-evaluated on every run
+that includes any of its libraries, and each evaluation scans the whole library catalog.
+
+Once we find a subject is unpairable, we record the subject's catalog version, the set of its libraries
+that we considered, in the draft ledger.
+On the next evaluation, if every library we've been asked to evaluate is already in that set,
+the subject hasn't gained a library and we can skip straight to the same (empty) result.
+
+The catalog version also covers the subject's readset state, the candidate libraries we passed over
+because they had no readsets are recorded too, and are checked again on the next evaluation,
+so a library sequenced on another run since doesn't leave the subject cached as unpairable.
+
+A subject that gains a library (or a library with readsets) misses the cache, is re-evaluated,
+and its record is either replaced (still unpairable) or cleared (now paired).
+
+The cache is disabled if the draft ledger is not configured, and is read only in dry run mode.
+"""
+
+# Standard imports
+import json
+import logging
+from hashlib import sha256
+from typing import List, Optional
+
+# Local imports
+from .draft_ledger import get_draft_ledger
+from .dry_run import is_dry_run
+from .readset_library_index import library_has_readsets
+from .globals import UNPAIRABLE_SUBJECT_KEY_PREFIX, UNPAIRABLE_SUBJECT_CACHE_TTL_SECONDS
+
+# Set logger
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def get_subject_catalog_version(library_id_list: List[str], library_id_without_readsets_list: List[str]) -> str:
+    """
+    The catalog version of a subject, a hash of the library ids we considered for it,
+    and of those we passed over as they had no readsets
+    :param library_id_list:
+    :param library_id_without_readsets_list:
+    :return:
+    """
+    return sha256(
+        json.dumps(
+            [sorted(set(library_id_list)), sorted(set(library_id_without_readsets_list))],
+            separators=(',', ':')
+        ).encode()
+    ).hexdigest()
+
+
+def get_unpairable_subject_key(namespace: str, subject_orcabus_id: str) -> str:
+    return f"{UNPAIRABLE_SUBJECT_KEY_PREFIX}#{namespace}#{subject_orcabus_id}"
+
+
+def is_subject_unpairable(namespace: str, subject_orcabus_id: str, library_id_list: List[str]) -> bool:
+    """
+    Check if a subject was unpairable, as of a catalog version that already includes all of these libraries
+    :param namespace: The pairing logic, i.e. 'wgs', since each has its own idea of what makes a subject pairable
+    :param subject_orcabus_id:
+    :param library_id_list: The subject libraries we've been asked to evaluate
+    :return:
+    """
+    draft_ledger = get_draft_ledger()
+    if draft_ledger is None:
+        return False
+
+    unpairable_record = draft_ledger.get(get_unpairable_subject_key(namespace, subject_orcabus_id))
+    if unpairable_record is None:
+        return False
+
+    if not set(library_id_list).issubset(unpairable_record['libraryIdList'].split(',')):
+        # The subject has gained a library since
+        return False
+
+    if any(map(
+        library_has_readsets,
+        filter(None, unpairable_record.get('libraryIdWithoutReadsetsList', '').split(','))
+    )):
+        # One of the subject's libraries has since been sequenced
+        return False
+
+    logger.info(
+        f"Subject {subject_orcabus_id} was unpairable ({namespace}) "
+        f"as of catalog version {unpairable_record['catalogVersion']}, skipping"
+    )
+    return True
+
+
+def mark_subject_unpairable(
+        namespace: str,
+        subject_orcabus_id: str,
+        library_id_list: List[str],
+        library_id_without_readsets_list: Optional[List[str]] = None,
+):
+    """
+    Record that a subject is unpairable as of the catalog version of these libraries
+    :param namespace:
+    :param subject_orcabus_id:
+    :param library_id_list: Every library we considered for the subject
+    :param library_id_without_readsets_list: The subject's libraries we passed over as they had no readsets
+    :return:
+    """
+    if library_id_without_readsets_list is None:
+        library_id_without_readsets_list = []
+
+    draft_ledger = get_draft_ledger()
+    if draft_ledger is None or is_dry_run():
+        return
+
+    draft_ledger.put(
+        get_unpairable_subject_key(namespace, subject_orcabus_id),
+        {
+            "catalogVersion": get_subject_catalog_version(library_id_list, library_id_without_readsets_list),
+            "libraryIdList": ",".join(sorted(set(library_id_list))),
+            "libraryIdWithoutReadsetsList": ",".join(sorted(set(library_id_without_readsets_list))),
+        },
+        ttl_seconds=UNPAIRABLE_SUBJECT_CACHE_TTL_SECONDS,
+    )
+
+
+def clear_subject_unpairable(namespace: str, subject_orcabus_id: str):
+    """
+    Clear the unpairable record of a subject, i.e. once it has been paired
+    :param namespace:
+    :param subject_orcabus_id:
+    :return:
+    """
+    draft_ledger = get_draft_ledger()
+    if draft_ledger is None or is_dry_run():
+        return
+
+    draft_ledger.release(get_unpairable_subject_key(namespace, subject_orcabus_id))
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+
+"""
+Warm up
+
+The analysis builder is bursty, nothing happens for hours, then a flowcell lands
+and dozens of lambdas cold start at once, each paying for its own initialisation.
+
+Handlers decorated with warm_up_on_event recognise a warm up event ({"warmUp": true}),
+sent on a schedule ahead of expected sequencing completions, and rather than running they
+  * load the handler's workflow objects from SSM (done at import, so any cold start on a warm up event)
+  * fetch the OrcaBus token
+  * open a pooled connection (and TLS session) to each OrcaBus API host
+  * prefetch the workflow manager's workflow object for each of the handler's workflows
+  * load the readset library index into the sandbox (from /tmp, or S3), if the handler uses it
+then return a summary of what was warmed and how long it took.
+
+Warming is best effort, a failed step is logged and reported but never fails the warm up.
+A warm up never rebuilds the readset library index, that is left to the scheduled rebuild lambda,
+it only copies the latest index into the sandbox's /tmp, so the burst's invocations don't each fetch it from S3.
+"""
+
+# Standard imports
+import logging
+import time
+from functools import wraps
+from typing import Dict, Any, Optional, Callable
+
+# Layer imports
+from orcabus_api_tools.utils.aws_helpers import get_orcabus_token, get_hostname
+
+# Local imports
+from .globals import (
+    WARM_UP_EVENT_KEY,
+    WARM_UP_REQUEST_TIMEOUT_SECONDS,
+    API_RATE_LIMITS_BY_ENDPOINT_FAMILY,
+)
+from .http_client import get_session
+from .analysis_helpers import get_workflow
+from .readset_library_index import get_readset_library_index
+from .models import Workflow
+
+# Set logger
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def is_warm_up_event(event: Dict[str, Any]) -> bool:
+    return isinstance(event, dict) and event.get(WARM_UP_EVENT_KEY, False) is True
+
+
+def run_warm_up_step(step_name: str, step_func: Callable[[], Any], warm_up_summary: Dict[str, Any]):
+    """
+    Run a warm up step, recording how long it took, or why it failed
+    :param step_name:
+    :param step_func:
+    :param warm_up_summary:
+    :return:
+    """
+    start = time.perf_counter()
+    try:
+        step_func()
+    except Exception as e:
+        logger.warning(f"Warm up step {step_name} failed: {e}")
+        warm_up_summary['failedSteps'][step_name] = str(e)
+    warm_up_summary['stepSeconds'][step_name] = round(time.perf_counter() - start, 3)
+
+
+def open_api_connections():
+    """
+    Open a pooled connection to each OrcaBus API host, the response itself doesn't matter
+    :return:
+    """
+    hostname = get_hostname()
+    for endpoint_family in API_RATE_LIMITS_BY_ENDPOINT_FAMILY.keys():
+        try:
+            get_session().head(
+                f"https://{endpoint_family}.{hostname}/",
+                timeout=WARM_UP_REQUEST_TIMEOUT_SECONDS,
+            ).close()
+        except Exception as e:
+            logger.warning(f"Could not open a connection to the {endpoint_family} api: {e}")
+
+
+def prefetch_workflows(workflow_objects_dict: Dict[str, Workflow]):
+    for workflow_object in workflow_objects_dict.values():
+        get_workflow(**workflow_object)
+
+
+def warm_up_on_event(
+        workflow_objects_dict: Optional[Dict[str, Workflow]] = None,
+        readset_library_index: bool = False,
+):
+    """
+    On a warm up event, initialise the handler's clients and caches and return, rather than running the handler
+    :param workflow_objects_dict: The handler's workflow objects, to prefetch from the workflow manager
+    :param readset_library_index: Whether the handler uses the readset library index
+    :return:
+    """
+    def decorator(handler):
+        @wraps(handler)
+        def wrapped_handler(event, context):
+            if not is_warm_up_event(event):
+                return handler(event, context)
+
+            start = time.perf_counter()
+            warm_up_summary: Dict[str, Any] = {
+                "stepSeconds": {},
+                "failedSteps": {},
+            }
+
+            run_warm_up_step("orcabusToken", get_orcabus_token, warm_up_summary)
+            run_warm_up_step("apiConnections", open_api_connections, warm_up_summary)
+            if workflow_objects_dict is not None:
+                run_warm_up_step(
+                    "workflows",
+                    lambda: prefetch_workflows(workflow_objects_dict),
+                    warm_up_summary
+                )
+            if readset_library_index:
+                run_warm_up_step("readsetLibraryIndex", get_readset_library_index, warm_up_summary)
+
+            warm_up_summary = {
+                "warmedUp": len(warm_up_summary['failedSteps']) == 0,
+                "durationSeconds": round(time.perf_counter() - start, 3),
+                **warm_up_summary,
+            }
+            logger.info(f"Warm up complete: {warm_up_summary}")
+            return warm_up_summary
+        return wrapped_handler
+    return decorator
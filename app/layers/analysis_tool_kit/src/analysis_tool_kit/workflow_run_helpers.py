@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+
+"""
+Helpers for workflow runs we have just drafted
+
+A workflow run is only created by the workflow manager some time after we put the DRAFT event,
+so rather than sleeping for a fixed period, we poll for the workflow run with exponential backoff
+and return as soon as it exists.
+"""
+
+# Standard imports
+import logging
+import time
+from typing import Optional
+
+# Layer imports
+from orcabus_api_tools.workflow import get_workflow_run_from_portal_run_id
+from orcabus_api_tools.workflow.errors import WorkflowRunNotFoundError
+from orcabus_api_tools.workflow.models import WorkflowRunDetail
+
+# Local imports
+from .globals import (
+    WORKFLOW_RUN_READINESS_INITIAL_INTERVAL_SECONDS,
+    WORKFLOW_RUN_READINESS_MAX_INTERVAL_SECONDS,
+    WORKFLOW_RUN_READINESS_BACKOFF_RATE,
+    WORKFLOW_RUN_READINESS_DEADLINE_SECONDS,
+)
+
+# Set logger
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class WorkflowRunNotReadyError(Exception):
+    """
+    The workflow run did not appear before the deadline
+    """
+    pass
+
+
+def wait_for_workflow_run_from_portal_run_id(
+        portal_run_id: str,
+        deadline_seconds: float = WORKFLOW_RUN_READINESS_DEADLINE_SECONDS,
+        initial_interval_seconds: float = WORKFLOW_RUN_READINESS_INITIAL_INTERVAL_SECONDS,
+        max_interval_seconds: float = WORKFLOW_RUN_READINESS_MAX_INTERVAL_SECONDS,
+        backoff_rate: float = WORKFLOW_RUN_READINESS_BACKOFF_RATE,
+) -> WorkflowRunDetail:
+    """
+    Get the workflow run for a portal run id, polling with exponential backoff until it exists.
+    Raises WorkflowRunNotReadyError if the workflow run has not appeared by the deadline,
+    any other error of the workflow run lookup is raised straight away.
+    :param portal_run_id:
+    :param deadline_seconds: The maximum time to wait for the workflow run
+    :param initial_interval_seconds:
+    :param max_interval_seconds:
+    :param backoff_rate:
+    :return:
+    """
+    deadline = time.monotonic() + deadline_seconds
+    interval_seconds = initial_interval_seconds
+    attempt = 0
+    last_error: Optional[Exception] = None
+
+    while True:
+        attempt += 1
+        try:
+            workflow_run = get_workflow_run_from_portal_run_id(portal_run_id)
+            if workflow_run is not None:
+                logger.info(f"Found workflow run for portal run id {portal_run_id} after {attempt} attempt(s)")
+                return workflow_run
+        except WorkflowRunNotFoundError as e:
+            # The workflow run does not exist (yet), anything else (i.e. an open circuit) is raised
+            last_error = e
+
+        # Don't sleep past the deadline
+        remaining_seconds = deadline - time.monotonic()
+        if remaining_seconds <= 0:
+            break
+        time.sleep(min(interval_seconds, remaining_seconds))
+        interval_seconds = min(interval_seconds * backoff_rate, max_interval_seconds)
+
+    raise WorkflowRunNotReadyError(
+        f"Workflow run for portal run id {portal_run_id} was not found "
+        f"after {attempt} attempt(s) over {deadline_seconds} seconds"
+    ) from last_error
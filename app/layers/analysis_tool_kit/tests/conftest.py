@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+
+"""
+Unit test fixtures
+
+The orcabus_api_tools clients are stubbed in sys.modules (see orcabus_api_tools_stubs) before the toolkit is imported,
+each stub raises unless a test patches in the behaviour it needs.
+
+The draft ledger uses the SQLite backend, in a fresh database for each test.
+"""
+
+# Standard imports
+import sys
+from pathlib import Path
+
+import pytest
+
+# Local imports
+from orcabus_api_tools_stubs import register_orcabus_api_tools_stubs
+
+# Globals
+ANALYSIS_TOOL_KIT_SRC_DIR = Path(__file__).parent.parent / "src"
+
+
+# Set up the stubs before anything imports the toolkit
+register_orcabus_api_tools_stubs()
+sys.path.insert(0, str(ANALYSIS_TOOL_KIT_SRC_DIR))
+
+
+@pytest.fixture
+def draft_ledger_path(tmp_path, monkeypatch) -> Path:
+    """
+    Point the draft ledger at a fresh SQLite database
+    :param tmp_path:
+    :param monkeypatch:
+    :return:
+    """
+    from analysis_tool_kit import draft_ledger, dry_run
+    from analysis_tool_kit.globals import (
+        DRAFT_LEDGER_TABLE_NAME_ENV_VAR,
+        DRAFT_LEDGER_SQLITE_PATH_ENV_VAR,
+        DRY_RUN_ENV_VAR,
+    )
+
+    db_path = tmp_path / "draft_ledger.sqlite"
+    monkeypatch.delenv(DRAFT_LEDGER_TABLE_NAME_ENV_VAR, raising=False)
+    monkeypatch.delenv(DRY_RUN_ENV_VAR, raising=False)
+    monkeypatch.setenv(DRAFT_LEDGER_SQLITE_PATH_ENV_VAR, str(db_path))
+    monkeypatch.setattr(dry_run, "DRY_RUN", False)
+    monkeypatch.setattr(draft_ledger, "DRAFT_LEDGER", None)
+    return db_path
+
+
+@pytest.fixture
+def draft_ledger(draft_ledger_path):
+    from analysis_tool_kit.draft_ledger import get_draft_ledger
+
+    return get_draft_ledger()
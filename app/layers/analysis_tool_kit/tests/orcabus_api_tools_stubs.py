@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+
+"""
+Stubbed orcabus_api_tools clients
+
+Shared by the toolkit's unit tests and the pairing benchmarks (app/benchmarks).
+
+orcabus_api_tools is installed in the lambda layer, not alongside the toolkit source,
+so its modules are registered in sys.modules before the toolkit (or a lambda) is imported.
+Each api function raises unless the caller registers the behaviour it needs.
+"""
+
+# Standard imports
+import sys
+from types import ModuleType
+from typing import TypedDict, List, Dict, Any, NotRequired, Callable
+
+# Globals
+SYNTHETIC_HOSTNAME = "synthetic.local"
+
+# The stubbed api functions of each orcabus_api_tools module
+API_FUNCTION_NAMES_BY_MODULE_NAME: Dict[str, List[str]] = {
+    "orcabus_api_tools.metadata": [
+        "get_libraries_list_from_library_id_list",
+    ],
+    "orcabus_api_tools.fastq": [
+        "get_fastqs_in_library",
+        "get_fastqs_in_libraries_and_instrument_run_id",
+    ],
+    "orcabus_api_tools.sequence": [
+        "get_libraries_from_instrument_run_id",
+    ],
+    "orcabus_api_tools.workflow": [
+        "create_portal_run_id",
+        "create_workflow_run_name_from_workflow_name_workflow_version_and_portal_run_id",
+        "list_workflows",
+        "get_workflow_runs_from_metadata",
+        "get_workflow_run_from_portal_run_id",
+    ],
+    "orcabus_api_tools.utils.aws_helpers": [
+        "get_ssm_value",
+        "get_orcabus_token",
+        "get_hostname",
+    ],
+}
+
+
+class LibraryBase(TypedDict):
+    orcabusId: str
+    libraryId: str
+
+
+class Library(LibraryBase):
+    phenotype: NotRequired[str]
+    workflow: NotRequired[str]
+    quality: NotRequired[str]
+    type: NotRequired[str]
+    assay: NotRequired[str]
+    coverage: NotRequired[float]
+    overrideCycles: NotRequired[str]
+    subject: NotRequired[Dict[str, str]]
+    projectSet: NotRequired[List[Dict[str, str]]]
+
+
+class WorkflowRunNotFoundError(Exception):
+    pass
+
+
+def not_stubbed(function_name: str):
+    def not_stubbed_func(*args, **kwargs):
+        raise NotImplementedError(f"{function_name} is not stubbed in this test")
+    not_stubbed_func.__name__ = function_name
+    return not_stubbed_func
+
+
+def get_orcabus_token() -> str:
+    return "synthetic-token"
+
+
+def get_hostname() -> str:
+    return SYNTHETIC_HOSTNAME
+
+
+def register_stub_module(module_name: str, **attributes) -> ModuleType:
+    module = ModuleType(module_name)
+    module.__dict__.update(attributes)
+    sys.modules[module_name] = module
+    return module
+
+
+def register_orcabus_api_tools_stubs(**api_functions: Callable):
+    """
+    Register the orcabus_api_tools modules, with the given api functions (by name),
+    the token and hostname are always synthetic and any other api function raises
+    :param api_functions:
+    :return:
+    """
+    unknown_function_names = set(api_functions.keys()) - {
+        function_name_iter_
+        for function_name_list_iter_ in API_FUNCTION_NAMES_BY_MODULE_NAME.values()
+        for function_name_iter_ in function_name_list_iter_
+    }
+    if len(unknown_function_names) > 0:
+        raise ValueError(f"Not an orcabus_api_tools function we stub: {sorted(unknown_function_names)}")
+
+    api_functions = {
+        "get_orcabus_token": get_orcabus_token,
+        "get_hostname": get_hostname,
+        **api_functions,
+    }
+
+    register_stub_module("orcabus_api_tools")
+    register_stub_module("orcabus_api_tools.utils")
+    for module_name, function_name_list in API_FUNCTION_NAMES_BY_MODULE_NAME.items():
+        register_stub_module(
+            module_name,
+            **dict(map(
+                lambda function_name_iter_: (
+                    function_name_iter_,
+                    api_functions.get(function_name_iter_, not_stubbed(function_name_iter_))
+                ),
+                function_name_list
+            ))
+        )
+    register_stub_module(
+        "orcabus_api_tools.metadata.models",
+        Library=Library,
+        LibraryBase=LibraryBase,
+    )
+    register_stub_module(
+        "orcabus_api_tools.workflow.errors",
+        WorkflowRunNotFoundError=WorkflowRunNotFoundError,
+    )
+    register_stub_module(
+        "orcabus_api_tools.workflow.models",
+        WorkflowRunDetail=Dict[str, Any],
+        ExecutionEngineType=str,
+        ValidationStateType=str,
+    )
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+
+"""
+Compact library records, and subject library lookups from the metadata service or the catalog snapshot
+"""
+
+# Standard imports
+import json
+from typing import List, Dict, Any, Iterator
+from urllib.parse import urlparse, parse_qs
+
+import pytest
+import requests
+from requests.adapters import BaseAdapter
+
+# Local imports
+from analysis_tool_kit import library_helpers
+from analysis_tool_kit.compact_library import (
+    CompactLibrary,
+    get_compact_subject_libraries,
+    set_compact_library_catalog_snapshot,
+    clear_compact_library_catalog_snapshot,
+)
+
+# Globals
+ROWS_PER_PAGE = 2
+
+
+def make_library(index: int, subject_index: int, phenotype: str = "tumor") -> Dict[str, Any]:
+    return {
+        "orcabusId": f"lib.{index:02d}",
+        "libraryId": f"L24{index:05d}",
+        "type": "WGS",
+        "phenotype": phenotype,
+        "workflow": "clinical",
+        "quality": "good",
+        "subject": {"orcabusId": f"sbj.{subject_index:02d}", "subjectId": f"SBJ{subject_index:05d}"},
+    }
+
+
+LIBRARIES = [
+    make_library(1, subject_index=1, phenotype="normal"),
+    make_library(2, subject_index=2),
+    make_library(3, subject_index=1),
+    make_library(4, subject_index=2),
+    make_library(5, subject_index=1),
+]
+
+
+class LibraryPageAdapter(BaseAdapter):
+    """
+    Serve the libraries a small page at a time, applying the subject filter unless told to ignore it,
+    and record the query of each request
+    """
+    def __init__(self, apply_subject_filter: bool):
+        super().__init__()
+        self.apply_subject_filter = apply_subject_filter
+        self.query_list: List[Dict[str, List[str]]] = []
+
+    def send(self, request, **kwargs):
+        query = parse_qs(urlparse(request.url).query)
+        self.query_list.append(query)
+
+        libraries = LIBRARIES
+        if self.apply_subject_filter and 'subject' in query:
+            libraries = list(filter(
+                lambda library_iter_: library_iter_['subject']['orcabusId'] == query['subject'][0],
+                LIBRARIES
+            ))
+        page = int(query.get('page', ['1'])[0])
+        has_next_page = page * ROWS_PER_PAGE < len(libraries)
+
+        response = requests.Response()
+        response.status_code = 200
+        response.url = request.url
+        response.request = request
+        response._content = json.dumps({
+            "links": {
+                "next": (
+                    f"{request.url.split('?')[0]}?subject={query['subject'][0]}"
+                    f"&page={page + 1}"
+                    if has_next_page else None
+                ),
+            },
+            "results": libraries[(page - 1) * ROWS_PER_PAGE:page * ROWS_PER_PAGE],
+        }).encode()
+        return response
+
+    def close(self):
+        pass
+
+
+@pytest.fixture(autouse=True)
+def no_catalog_snapshot() -> Iterator[None]:
+    clear_compact_library_catalog_snapshot()
+    yield
+    clear_compact_library_catalog_snapshot()
+
+
+def use_library_pages(monkeypatch, apply_subject_filter: bool) -> LibraryPageAdapter:
+    adapter = LibraryPageAdapter(apply_subject_filter)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    monkeypatch.setattr(library_helpers, "get_session", lambda: session)
+    return adapter
+
+
+def get_library_id_list(libraries) -> List[str]:
+    return list(map(lambda library_iter_: library_iter_['libraryId'], libraries))
+
+
+def test_compact_library_reads_like_a_library():
+    compact_library = CompactLibrary.from_library(LIBRARIES[0])
+
+    assert compact_library['libraryId'] == "L2400001"
+    assert compact_library['phenotype'] == "normal"
+    assert compact_library['subject'] == {"orcabusId": "sbj.01", "subjectId": "SBJ00001"}
+    assert compact_library.get('quality', 'unknown') == 'unknown'
+    with pytest.raises(KeyError):
+        _ = compact_library['quality']
+
+
+def test_compact_library_values_are_interned():
+    compact_library_list = list(map(CompactLibrary.from_library, json.loads(json.dumps(LIBRARIES))))
+
+    assert compact_library_list[1].type is compact_library_list[3].type
+    assert compact_library_list[0].subjectOrcabusId is compact_library_list[2].subjectOrcabusId
+
+
+def test_library_without_a_subject():
+    compact_library = CompactLibrary.from_library({"orcabusId": "lib.99", "libraryId": "L2499999"})
+
+    assert compact_library['subject'] == {"orcabusId": None, "subjectId": None}
+    assert compact_library['type'] is None
+
+
+@pytest.mark.parametrize("apply_subject_filter", [True, False], ids=["filtered", "filter_ignored"])
+def test_subject_libraries_from_the_metadata_service(monkeypatch, apply_subject_filter):
+    adapter = use_library_pages(monkeypatch, apply_subject_filter)
+
+    subject_libraries = get_compact_subject_libraries("sbj.01")
+
+    assert get_library_id_list(subject_libraries) == ["L2400001", "L2400003", "L2400005"]
+    assert all(map(lambda library_iter_: isinstance(library_iter_, CompactLibrary), subject_libraries))
+    assert all(map(lambda query_iter_: query_iter_['subject'] == ["sbj.01"], adapter.query_list))
+    assert len(adapter.query_list) == (2 if apply_subject_filter else 3)
+
+
+def test_subject_libraries_predicate(monkeypatch):
+    use_library_pages(monkeypatch, apply_subject_filter=True)
+
+    subject_libraries = get_compact_subject_libraries(
+        "sbj.01",
+        predicate=lambda library_iter_: library_iter_['phenotype'] == "tumor"
+    )
+
+    assert get_library_id_list(subject_libraries) == ["L2400003", "L2400005"]
+
+
+def test_subject_libraries_from_the_catalog_snapshot(monkeypatch):
+    adapter = use_library_pages(monkeypatch, apply_subject_filter=True)
+    set_compact_library_catalog_snapshot(list(map(CompactLibrary.from_library, LIBRARIES)))
+
+    assert get_library_id_list(get_compact_subject_libraries("sbj.02")) == ["L2400002", "L2400004"]
+    assert get_library_id_list(get_compact_subject_libraries(
+        "sbj.01",
+        predicate=lambda library_iter_: library_iter_['phenotype'] == "normal"
+    )) == ["L2400001"]
+    assert get_compact_subject_libraries("sbj.99") == []
+    assert adapter.query_list == []
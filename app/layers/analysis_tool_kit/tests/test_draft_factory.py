@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+
+"""
+Generating workflow drafts in bulk
+"""
+
+# Standard imports
+from typing import List, Dict, Any
+
+import pytest
+
+# Local imports
+from analysis_tool_kit import draft_factory
+from analysis_tool_kit.draft_factory import generate_workflow_drafts
+
+# Globals
+WORKFLOW_OBJECTS_DICT = {
+    "dragen": {"name": "dragen-wgts-dna", "version": "4.4.4"},
+}
+
+
+def make_draft_request(library_id: str) -> Dict[str, Any]:
+    return {
+        "workflowKey": "dragen",
+        "libraries": [{"orcabusId": f"lib.{library_id}", "libraryId": library_id}],
+    }
+
+
+@pytest.fixture
+def release_list(monkeypatch) -> List[List[str]]:
+    """
+    Every draft is claimed, and each released claim is recorded by its library ids
+    :param monkeypatch:
+    :return:
+    """
+    release_list = []
+
+    monkeypatch.setattr(
+        draft_factory, "get_readsets_in_library",
+        lambda library_id: [{"orcabusId": f"fqr.{library_id}", "rgid": f"{library_id}.1"}]
+    )
+    monkeypatch.setattr(draft_factory, "get_workflow", lambda **kwargs: {"orcabusId": "wfl.dragen", **kwargs})
+    monkeypatch.setattr(draft_factory, "claim_workflow_draft", lambda **kwargs: True)
+    monkeypatch.setattr(
+        draft_factory, "release_workflow_draft",
+        lambda libraries, **kwargs: release_list.append(draft_factory.get_library_id_list(libraries))
+    )
+    return release_list
+
+
+def test_duplicate_requests_are_generated_once(release_list, monkeypatch):
+    monkeypatch.setattr(
+        draft_factory, "build_workflow_draft_event_detail",
+        lambda event_libraries, **kwargs: {"libraries": event_libraries}
+    )
+
+    draft_event_detail_list = generate_workflow_drafts(
+        WORKFLOW_OBJECTS_DICT,
+        [make_draft_request("L2400001"), make_draft_request("L2400002"), make_draft_request("L2400001")]
+    )
+
+    assert list(map(lambda draft_iter_: draft_iter_ is not None, draft_event_detail_list)) == [True, True, False]
+    assert release_list == []
+
+
+def test_a_failed_draft_releases_every_claim_in_the_batch(release_list, monkeypatch):
+    def build_workflow_draft_event_detail(event_libraries, **kwargs):
+        if event_libraries[0]['libraryId'] == "L2400002":
+            raise ValueError("Could not build the draft")
+        return {"libraries": event_libraries}
+
+    monkeypatch.setattr(draft_factory, "build_workflow_draft_event_detail", build_workflow_draft_event_detail)
+
+    with pytest.raises(ValueError):
+        generate_workflow_drafts(
+            WORKFLOW_OBJECTS_DICT,
+            [make_draft_request("L2400001"), make_draft_request("L2400002"), make_draft_request("L2400003")]
+        )
+
+    # Including the draft built before the failure
+    assert sorted(release_list) == [["L2400001"], ["L2400002"], ["L2400003"]]
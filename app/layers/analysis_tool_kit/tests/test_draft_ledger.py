@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+
+"""
+Draft ledger claims, against the SQLite backend
+"""
+
+# Standard imports
+from concurrent.futures import ThreadPoolExecutor
+from threading import Barrier
+
+import pytest
+
+# Local imports
+from analysis_tool_kit import analysis_helpers
+from analysis_tool_kit.analysis_helpers import claim_workflow_draft
+from analysis_tool_kit.draft_ledger import SqliteDraftLedger, get_draft_key
+
+# Globals
+WORKFLOW_NAME = "dragen-wgts-dna"
+WORKFLOW_VERSION = "4.4.4"
+LIBRARIES = [{"orcabusId": "lib.L2400001", "libraryId": "L2400001"}]
+RGID_LIST = ["AAAAAAAA.CCCCCCCC.1.240101_A01052_0001_AHXXXXXXXX"]
+DRAFT_KEY = get_draft_key(WORKFLOW_NAME, WORKFLOW_VERSION, ["L2400001"], RGID_LIST)
+
+
+def claim(ledger: SqliteDraftLedger, ttl_seconds: int = 60) -> bool:
+    return ledger.claim(DRAFT_KEY, {"workflowName": WORKFLOW_NAME}, ttl_seconds=ttl_seconds)
+
+
+def test_only_one_concurrent_claim_wins(draft_ledger_path):
+    # One ledger per execution, all writing to the same database
+    ledger_list = [SqliteDraftLedger(str(draft_ledger_path)) for _ in range(8)]
+    barrier = Barrier(len(ledger_list))
+
+    def claim_at_once(ledger: SqliteDraftLedger) -> bool:
+        barrier.wait()
+        return claim(ledger)
+
+    with ThreadPoolExecutor(max_workers=len(ledger_list)) as executor:
+        claimed_list = list(executor.map(claim_at_once, ledger_list))
+
+    assert claimed_list.count(True) == 1
+
+
+def test_released_claim_can_be_claimed_again(draft_ledger):
+    assert claim(draft_ledger)
+    assert not claim(draft_ledger)
+
+    draft_ledger.release(DRAFT_KEY)
+
+    assert claim(draft_ledger)
+
+
+def test_expired_pending_claim_can_be_claimed_again(draft_ledger):
+    assert claim(draft_ledger, ttl_seconds=-1)
+    assert draft_ledger.get(DRAFT_KEY) is None
+
+    assert claim(draft_ledger)
+    assert not claim(draft_ledger)
+
+
+def test_confirmed_claim_never_expires(draft_ledger):
+    assert claim(draft_ledger, ttl_seconds=-1)
+    assert draft_ledger.confirm(DRAFT_KEY)
+
+    assert draft_ledger.get(DRAFT_KEY) is not None
+    assert not claim(draft_ledger)
+
+
+def test_confirm_without_a_claim(draft_ledger):
+    assert not draft_ledger.confirm(DRAFT_KEY)
+
+
+def test_put_if_newer_keeps_the_highest_version(draft_ledger):
+    assert draft_ledger.put_if_newer("state", {"status": "READY"}, version=2, ttl_seconds=60)
+    assert not draft_ledger.put_if_newer("state", {"status": "DRAFT"}, version=1, ttl_seconds=60)
+    assert draft_ledger.put_if_newer("state", {"status": "READY"}, version=2, ttl_seconds=60)
+
+    assert draft_ledger.get("state")['status'] == "READY"
+
+
+def test_claim_workflow_draft_claims_once(draft_ledger, monkeypatch):
+    monkeypatch.setattr(analysis_helpers, "any_existing_workflow_run", lambda **kwargs: False)
+
+    assert claim_workflow_draft(WORKFLOW_NAME, WORKFLOW_VERSION, LIBRARIES, RGID_LIST)
+    assert not claim_workflow_draft(WORKFLOW_NAME, WORKFLOW_VERSION, LIBRARIES, RGID_LIST)
+
+
+def test_claim_workflow_draft_confirms_the_claim_of_an_existing_run(draft_ledger, monkeypatch):
+    existing_run_check_list = []
+
+    def any_existing_workflow_run(**kwargs):
+        existing_run_check_list.append(kwargs)
+        return True
+
+    monkeypatch.setattr(analysis_helpers, "any_existing_workflow_run", any_existing_workflow_run)
+
+    assert not claim_workflow_draft(WORKFLOW_NAME, WORKFLOW_VERSION, LIBRARIES, RGID_LIST)
+    assert 'expiresAt' not in draft_ledger.get(DRAFT_KEY)
+
+    # The existing run is remembered, so the workflow manager is not asked again
+    assert not claim_workflow_draft(WORKFLOW_NAME, WORKFLOW_VERSION, LIBRARIES, RGID_LIST)
+    assert len(existing_run_check_list) == 1
+
+
+def test_claim_workflow_draft_releases_the_claim_if_the_existence_check_raises(draft_ledger, monkeypatch):
+    def raise_connection_error(**kwargs):
+        raise ConnectionError("workflow manager unavailable")
+
+    monkeypatch.setattr(analysis_helpers, "any_existing_workflow_run", raise_connection_error)
+
+    with pytest.raises(ConnectionError):
+        claim_workflow_draft(WORKFLOW_NAME, WORKFLOW_VERSION, LIBRARIES, RGID_LIST)
+
+    # The claim is not leaked, so a retry can draft it
+    assert draft_ledger.get(DRAFT_KEY) is None
+    monkeypatch.setattr(analysis_helpers, "any_existing_workflow_run", lambda **kwargs: False)
+    assert claim_workflow_draft(WORKFLOW_NAME, WORKFLOW_VERSION, LIBRARIES, RGID_LIST)
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+
+"""
+Draft event validation against the workflow draft event detail schema
+"""
+
+# Standard imports
+from copy import deepcopy
+from typing import Dict, Any, Callable
+
+import pytest
+
+# Local imports
+from analysis_tool_kit.draft_validation import (
+    DraftValidationError,
+    VALIDATION_STATS,
+    validate_draft_events,
+    validate_workflow_draft_event_detail,
+)
+
+# Globals
+WORKFLOW_RUN_NAME = "umccr--automated--dragen-wgts-dna--4-4-4--20260101abcd1234"
+EVENT_DETAIL = {
+    "status": "DRAFT",
+    "workflow": {"orcabusId": "wfl.01", "name": "dragen-wgts-dna", "version": "4.4.4"},
+    "workflowRunName": WORKFLOW_RUN_NAME,
+    "portalRunId": "20260101abcd1234",
+    "libraries": [
+        {
+            "orcabusId": "lib.01",
+            "libraryId": "L2400001",
+            "readsets": [{"orcabusId": "fqr.01", "rgid": "ACGT.1.240101_A01052_0001_SYNTHETIC"}],
+        }
+    ],
+    "payload": {"version": "2024.07.01", "data": {"tags": {"libraryId": "L2400001"}}},
+}
+
+
+def without_key(key: str) -> Callable[[Dict[str, Any]], None]:
+    return lambda event_detail_iter_: event_detail_iter_.pop(key)
+
+
+@pytest.mark.parametrize(
+    "event_detail",
+    [
+        EVENT_DETAIL,
+        {key: value for key, value in EVENT_DETAIL.items() if key != "payload"},
+    ],
+    ids=["with_payload", "without_payload"]
+)
+def test_valid_draft(event_detail):
+    validate_workflow_draft_event_detail(deepcopy(event_detail))
+
+
+@pytest.mark.parametrize(
+    "make_invalid",
+    [
+        without_key("status"),
+        without_key("workflow"),
+        without_key("portalRunId"),
+        without_key("libraries"),
+        lambda event_detail_iter_: event_detail_iter_.update(status="READY"),
+        lambda event_detail_iter_: event_detail_iter_['workflow'].update(version=""),
+        lambda event_detail_iter_: event_detail_iter_.update(portalRunId="2026-01-01"),
+        lambda event_detail_iter_: event_detail_iter_.update(libraries=[]),
+        lambda event_detail_iter_: event_detail_iter_['libraries'][0].pop("readsets"),
+        lambda event_detail_iter_: event_detail_iter_['libraries'][0]['readsets'][0].pop("rgid"),
+        lambda event_detail_iter_: event_detail_iter_['payload'].pop("version"),
+        lambda event_detail_iter_: event_detail_iter_['payload'].update(data=[]),
+    ],
+    ids=[
+        "no_status", "no_workflow", "no_portal_run_id", "no_libraries",
+        "not_a_draft", "empty_workflow_version", "malformed_portal_run_id", "empty_libraries",
+        "library_without_readsets", "readset_without_rgid", "payload_without_version", "payload_data_not_an_object",
+    ]
+)
+def test_invalid_draft_is_rejected(make_invalid):
+    event_detail = deepcopy(EVENT_DETAIL)
+    make_invalid(event_detail)
+
+    with pytest.raises(DraftValidationError, match=WORKFLOW_RUN_NAME) as exc_info:
+        validate_workflow_draft_event_detail(event_detail)
+    assert exc_info.value.workflow_run_name == WORKFLOW_RUN_NAME
+
+
+def test_unnamed_invalid_draft():
+    with pytest.raises(DraftValidationError) as exc_info:
+        validate_workflow_draft_event_detail({"status": "DRAFT"})
+    assert exc_info.value.workflow_run_name == "unnamed"
+
+
+def test_handler_drafts_are_counted_per_invocation():
+    @validate_draft_events
+    def handler(event, context):
+        for _ in range(event['draftCount']):
+            validate_workflow_draft_event_detail(deepcopy(EVENT_DETAIL))
+        return {"eventDetailList": []}
+
+    assert handler({"draftCount": 3}, None) == {"eventDetailList": []}
+    assert VALIDATION_STATS['draftCount'] == 3
+
+    handler({"draftCount": 1}, None)
+    assert VALIDATION_STATS['draftCount'] == 1
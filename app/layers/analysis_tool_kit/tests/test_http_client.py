@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+
+"""
+OrcaBus API request hooks, against a stubbed transport adapter and a fake clock
+"""
+
+# Standard imports
+import json
+import sys
+from types import ModuleType
+from typing import List, Dict, Optional, Tuple
+
+import pytest
+import requests
+from requests.adapters import BaseAdapter
+
+# Local imports
+from analysis_tool_kit import http_client
+from analysis_tool_kit.globals import API_RATE_LIMITS_ENV_VAR
+from analysis_tool_kit.http_client import (
+    TokenBucket,
+    CircuitBreaker,
+    CircuitOpenError,
+    CIRCUIT_CLOSED,
+    CIRCUIT_OPEN,
+    CIRCUIT_HALF_OPEN,
+)
+
+# Type hints
+ScriptedResponse = Tuple[int, Optional[Dict[str, str]]]
+
+# Globals
+METADATA_URL = "https://metadata.synthetic.local/api/v1/library"
+
+
+class FakeClock:
+    """
+    Stands in for the time module in http_client, sleeping advances the clock
+    """
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps: List[float] = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class ScriptedAdapter(BaseAdapter):
+    """
+    Serves a scripted list of (status code, headers) responses, one per request
+    """
+    def __init__(self, responses: List[ScriptedResponse]):
+        super().__init__()
+        self.responses = list(responses)
+        self.requests: List[requests.PreparedRequest] = []
+
+    def send(self, request, **kwargs):
+        self.requests.append(request)
+        status_code, headers = self.responses.pop(0)
+        response = requests.Response()
+        response.status_code = status_code
+        response.headers.update(headers or {})
+        response._content = b"{}"
+        response.request = request
+        response.url = request.url
+        return response
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def fake_clock(monkeypatch) -> FakeClock:
+    clock = FakeClock()
+    monkeypatch.setattr(http_client, "time", clock)
+    # Each test starts with fresh token buckets and circuit breakers
+    monkeypatch.setattr(http_client, "TOKEN_BUCKETS", {})
+    monkeypatch.setattr(http_client, "CIRCUIT_BREAKERS", {})
+    # Take the jitter out of the backoff
+    monkeypatch.setattr(http_client.random, "uniform", lambda low, high: high)
+    return clock
+
+
+def get_scripted_session(responses: List[ScriptedResponse]) -> Tuple[requests.Session, ScriptedAdapter]:
+    adapter = ScriptedAdapter(responses)
+    session = http_client.OrcaBusApiSession()
+    session.mount("https://", adapter)
+    return session, adapter
+
+
+def test_token_bucket_allows_a_burst_then_throttles(fake_clock):
+    token_bucket = TokenBucket(rate=2, burst=3)
+
+    for _ in range(3):
+        token_bucket.acquire()
+    assert fake_clock.sleeps == []
+
+    # The bucket is empty, the next token is half a second away at 2 tokens a second
+    token_bucket.acquire()
+    assert fake_clock.sleeps == [pytest.approx(0.5)]
+
+    # Tokens accrue while idle, but never past the burst
+    fake_clock.now += 60
+    for _ in range(3):
+        token_bucket.acquire()
+    assert len(fake_clock.sleeps) == 1
+
+
+def test_requests_are_throttled_by_endpoint_family(fake_clock, monkeypatch):
+    monkeypatch.setenv(API_RATE_LIMITS_ENV_VAR, json.dumps({"metadata": {"rate": 1, "burst": 2}}))
+    session, adapter = get_scripted_session([(200, None)] * 4)
+
+    for _ in range(4):
+        session.get(METADATA_URL)
+
+    assert len(adapter.requests) == 4
+    assert fake_clock.sleeps == [pytest.approx(1), pytest.approx(1)]
+
+
+def test_429_is_retried_after_the_retry_after_header(fake_clock):
+    session, adapter = get_scripted_session([(429, {"Retry-After": "3"}), (200, None)])
+
+    response = session.get(METADATA_URL)
+
+    assert response.status_code == 200
+    assert len(adapter.requests) == 2
+    assert fake_clock.sleeps == [3]
+
+
+def test_5xx_is_retried_with_backoff_until_the_last_attempt(fake_clock):
+    session, adapter = get_scripted_session([(503, None)] * http_client.API_RETRY_MAX_ATTEMPTS)
+
+    response = session.get(METADATA_URL)
+
+    assert response.status_code == 503
+    assert len(adapter.requests) == http_client.API_RETRY_MAX_ATTEMPTS
+    assert fake_clock.sleeps == [0.5, 1, 2, 4]
+
+
+def test_other_sessions_are_left_alone(fake_clock, monkeypatch):
+    monkeypatch.setenv(API_RATE_LIMITS_ENV_VAR, json.dumps({"metadata": {"rate": 1, "burst": 1}}))
+    adapter = ScriptedAdapter([(503, None), (503, None)])
+    session = requests.Session()
+    session.mount("https://", adapter)
+
+    assert session.get(METADATA_URL).status_code == 503
+    assert session.get(METADATA_URL).status_code == 503
+
+    # Neither throttled nor retried
+    assert len(adapter.requests) == 2
+    assert fake_clock.sleeps == []
+
+
+def test_5xx_is_not_retried_for_post(fake_clock):
+    session, adapter = get_scripted_session([(503, None), (200, None)])
+
+    response = session.post(METADATA_URL, json={})
+
+    assert response.status_code == 503
+    assert len(adapter.requests) == 1
+
+
+@pytest.fixture
+def pooled_session(fake_clock, monkeypatch) -> requests.Session:
+    """
+    A fresh pooled session, the inherited globals are restored after the test
+    :param fake_clock:
+    :param monkeypatch:
+    :return:
+    """
+    for global_name in ["SESSION_LOCK", "TOKEN_BUCKETS_LOCK", "CIRCUIT_BREAKERS_LOCK"]:
+        monkeypatch.setattr(http_client, global_name, getattr(http_client, global_name))
+    monkeypatch.setattr(http_client, "SESSION", None)
+    return http_client.get_session()
+
+
+def test_orcabus_api_tools_calls_use_the_pooled_session(pooled_session, monkeypatch):
+    requests_helpers = ModuleType("orcabus_api_tools.utils.requests_helpers")
+    requests_helpers.requests = requests
+    monkeypatch.setitem(sys.modules, requests_helpers.__name__, requests_helpers)
+    adapter = ScriptedAdapter([(200, None), (200, None)])
+    pooled_session.mount("https://", adapter)
+
+    http_client.install_request_hooks()
+    requests_helpers.requests.get(METADATA_URL, params={"libraryId": "L2400001"})
+    requests_helpers.requests.post(METADATA_URL, json={})
+
+    assert len(adapter.requests) == 2
+    assert adapter.requests[0].url == f"{METADATA_URL}?libraryId=L2400001"
+    assert http_client.get_session() is pooled_session
+    # The rest of the requests api is the requests module's own
+    assert requests_helpers.requests.HTTPError is requests.HTTPError
+
+
+def test_requests_module_is_left_alone(pooled_session):
+    http_client.install_request_hooks()
+
+    assert requests.get.__module__ == "requests.api"
+    assert requests.api.request.__module__ == "requests.api"
+    assert requests.request.__module__ == "requests.api"
+
+
+def test_pooled_session_does_not_retry_in_urllib3(pooled_session):
+    # Retries are ours, so urllib3 retrying too would multiply the attempts
+    assert pooled_session.get_adapter(METADATA_URL).max_retries.total == 0
+
+
+def test_forked_process_starts_with_its_own_session(pooled_session):
+    token_bucket = http_client.get_token_bucket("metadata")
+
+    http_client.reset_after_fork()
+
+    assert http_client.get_session() is not pooled_session
+    assert http_client.get_token_bucket("metadata") is not token_bucket
+
+
+def test_circuit_opens_after_consecutive_failures(fake_clock):
+    circuit_breaker = CircuitBreaker("metadata", failure_threshold=3, reset_timeout_seconds=30)
+
+    for _ in range(2):
+        circuit_breaker.before_call()
+        circuit_breaker.record_failure()
+    # A success resets the count
+    circuit_breaker.before_call()
+    circuit_breaker.record_success()
+    for _ in range(3):
+        circuit_breaker.before_call()
+        circuit_breaker.record_failure()
+
+    assert circuit_breaker.state == CIRCUIT_OPEN
+    with pytest.raises(CircuitOpenError) as circuit_open_error:
+        circuit_breaker.before_call()
+    assert circuit_open_error.value.retry_after_seconds == pytest.approx(30)
+
+
+def test_half_open_circuit_lets_a_single_trial_call_through(fake_clock):
+    circuit_breaker = CircuitBreaker("metadata", failure_threshold=1, reset_timeout_seconds=30)
+    circuit_breaker.before_call()
+    circuit_breaker.record_failure()
+
+    fake_clock.now += 30
+    circuit_breaker.before_call()
+    assert circuit_breaker.state == CIRCUIT_HALF_OPEN
+    # Concurrent calls fail fast while the trial is in flight
+    with pytest.raises(CircuitOpenError):
+        circuit_breaker.before_call()
+
+    circuit_breaker.record_success()
+    assert circuit_breaker.state == CIRCUIT_CLOSED
+    circuit_breaker.before_call()
+
+
+def test_failed_trial_call_reopens_the_circuit(fake_clock):
+    circuit_breaker = CircuitBreaker("metadata", failure_threshold=1, reset_timeout_seconds=30)
+    circuit_breaker.before_call()
+    circuit_breaker.record_failure()
+
+    fake_clock.now += 30
+    circuit_breaker.before_call()
+    circuit_breaker.record_failure()
+
+    assert circuit_breaker.state == CIRCUIT_OPEN
+    with pytest.raises(CircuitOpenError):
+        circuit_breaker.before_call()
+
+
+def test_open_circuit_fails_fast_without_calling_the_api(fake_clock, monkeypatch):
+    monkeypatch.setattr(http_client, "API_RETRY_MAX_ATTEMPTS", 1)
+    session, adapter = get_scripted_session(
+        [(503, None)] * http_client.CIRCUIT_BREAKER_FAILURE_THRESHOLD + [(200, None)]
+    )
+
+    for _ in range(http_client.CIRCUIT_BREAKER_FAILURE_THRESHOLD):
+        session.get(METADATA_URL)
+    with pytest.raises(CircuitOpenError):
+        session.get(METADATA_URL)
+    assert len(adapter.requests) == http_client.CIRCUIT_BREAKER_FAILURE_THRESHOLD
+
+    # Other endpoint families are unaffected
+    session.mount("https://", ScriptedAdapter([(200, None)]))
+    assert session.get("https://fastq.synthetic.local/api/v1/fastq").status_code == 200
+
+    # Once the reset timeout has passed, a successful trial closes the circuit
+    session.mount("https://", adapter)
+    fake_clock.now += http_client.CIRCUIT_BREAKER_RESET_TIMEOUT_SECONDS
+    assert session.get(METADATA_URL).status_code == 200
+    assert http_client.get_circuit_breaker("metadata").state == CIRCUIT_CLOSED
+
+
+class SlowAdapter(ScriptedAdapter):
+    """
+    Serves 200 responses, each taking the given number of seconds on the fake clock
+    """
+    def __init__(self, clock: FakeClock, call_seconds: float):
+        super().__init__([(200, None)] * http_client.CIRCUIT_BREAKER_FAILURE_THRESHOLD)
+        self.clock = clock
+        self.call_seconds = call_seconds
+
+    def send(self, request, **kwargs):
+        self.clock.now += self.call_seconds
+        return super().send(request, **kwargs)
+
+
+def test_slow_calls_open_the_circuit(fake_clock):
+    session = http_client.OrcaBusApiSession()
+    session.mount("https://", SlowAdapter(fake_clock, http_client.CIRCUIT_BREAKER_SLOW_CALL_SECONDS + 1))
+
+    for _ in range(http_client.CIRCUIT_BREAKER_FAILURE_THRESHOLD):
+        session.get(METADATA_URL)
+
+    assert http_client.get_circuit_breaker("metadata").state == CIRCUIT_OPEN
+
+
+def test_calls_within_their_own_timeout_are_not_slow(fake_clock):
+    # i.e. a large catalog page, with a timeout to match
+    session = http_client.OrcaBusApiSession()
+    session.mount("https://", SlowAdapter(fake_clock, 30))
+
+    for _ in range(http_client.CIRCUIT_BREAKER_FAILURE_THRESHOLD):
+        assert session.get(METADATA_URL, timeout=60).status_code == 200
+
+    assert http_client.get_circuit_breaker("metadata").state == CIRCUIT_CLOSED
+
+
+def test_429_does_not_open_the_circuit(fake_clock, monkeypatch):
+    monkeypatch.setattr(http_client, "API_RETRY_MAX_ATTEMPTS", 1)
+    session, adapter = get_scripted_session(
+        [(429, None)] * (http_client.CIRCUIT_BREAKER_FAILURE_THRESHOLD + 1)
+    )
+
+    for _ in range(http_client.CIRCUIT_BREAKER_FAILURE_THRESHOLD + 1):
+        assert session.get(METADATA_URL).status_code == 429
+
+    assert http_client.get_circuit_breaker("metadata").state == CIRCUIT_CLOSED
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+
+"""
+Instrument run ids of an event, in single and batch mode, and the cached library ids on each run
+"""
+
+# Standard imports
+from typing import List, Dict, Iterator
+
+import pytest
+
+# Local imports
+from analysis_tool_kit import instrument_run_helpers
+from analysis_tool_kit.globals import INSTRUMENT_RUN_LIBRARY_ID_CACHE_TTL_SECONDS
+from analysis_tool_kit.instrument_run_helpers import (
+    get_instrument_run_id_list,
+    get_instrument_run_label,
+    get_library_id_list_from_instrument_run_id_list,
+    clear_instrument_run_library_id_cache,
+)
+
+# Globals
+LIBRARY_ID_LIST_BY_INSTRUMENT_RUN_ID = {
+    "240101_A01052_0001_SYNTHETIC": ["L2400003", "L2400001"],
+    "240101_A01052_0002_SYNTHETIC": ["L2400002", "L2400003"],
+}
+
+
+@pytest.fixture
+def instrument_run_lookup_count(monkeypatch) -> Iterator[Dict[str, int]]:
+    """
+    Serve the library ids on each instrument run, counting the lookups of each run
+    :param monkeypatch:
+    :return:
+    """
+    instrument_run_lookup_count = {}
+
+    def get_libraries_from_instrument_run_id(instrument_run_id: str) -> List[str]:
+        instrument_run_lookup_count[instrument_run_id] = instrument_run_lookup_count.get(instrument_run_id, 0) + 1
+        return LIBRARY_ID_LIST_BY_INSTRUMENT_RUN_ID[instrument_run_id]
+
+    monkeypatch.setattr(
+        instrument_run_helpers, "get_libraries_from_instrument_run_id", get_libraries_from_instrument_run_id
+    )
+    clear_instrument_run_library_id_cache()
+    yield instrument_run_lookup_count
+    clear_instrument_run_library_id_cache()
+
+
+@pytest.mark.parametrize(
+    "event,instrument_run_id_list",
+    [
+        ({"instrumentRunId": "run1"}, ["run1"]),
+        ({"instrumentRunIdList": ["run1", "run2"]}, ["run1", "run2"]),
+        ({"instrumentRunIdList": ["run2", "run1", "run2", None]}, ["run2", "run1"]),
+        ({"instrumentRunIdList": [], "instrumentRunId": "run1"}, ["run1"]),
+        ({"instrumentRunIdList": ["run2"], "instrumentRunId": "run1"}, ["run2"]),
+        ({}, []),
+    ],
+    ids=["single", "batch", "batch_deduplicated", "empty_batch", "batch_over_single", "none"]
+)
+def test_instrument_run_id_list(event, instrument_run_id_list):
+    assert get_instrument_run_id_list(event) == instrument_run_id_list
+
+
+def test_instrument_run_label():
+    assert get_instrument_run_label({"instrumentRunId": "run1"}) == "run1"
+    assert get_instrument_run_label({"instrumentRunIdList": ["run1", "run2", "run1"]}) == "run1+run2"
+    assert get_instrument_run_label({}) is None
+
+
+def test_batch_libraries_are_the_sorted_union(instrument_run_lookup_count):
+    assert get_library_id_list_from_instrument_run_id_list(list(LIBRARY_ID_LIST_BY_INSTRUMENT_RUN_ID)) == [
+        "L2400001", "L2400002", "L2400003"
+    ]
+
+
+def test_instrument_run_libraries_are_cached(instrument_run_lookup_count):
+    instrument_run_id_list = list(LIBRARY_ID_LIST_BY_INSTRUMENT_RUN_ID)
+
+    get_library_id_list_from_instrument_run_id_list(instrument_run_id_list[:1])
+    get_library_id_list_from_instrument_run_id_list(instrument_run_id_list)
+
+    assert instrument_run_lookup_count == dict.fromkeys(instrument_run_id_list, 1)
+
+
+def test_expired_instrument_run_libraries_are_fetched_again(instrument_run_lookup_count, monkeypatch):
+    instrument_run_id = "240101_A01052_0001_SYNTHETIC"
+    clock = [1000.0]
+    monkeypatch.setattr(instrument_run_helpers, "monotonic", lambda: clock[0])
+
+    get_library_id_list_from_instrument_run_id_list([instrument_run_id])
+    clock[0] += INSTRUMENT_RUN_LIBRARY_ID_CACHE_TTL_SECONDS - 1
+    get_library_id_list_from_instrument_run_id_list([instrument_run_id])
+    assert instrument_run_lookup_count == {instrument_run_id: 1}
+
+    clock[0] += 1
+    get_library_id_list_from_instrument_run_id_list([instrument_run_id])
+    assert instrument_run_lookup_count == {instrument_run_id: 2}
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+
+"""
+Readset library index, the library id bloom filter and the library miss cache
+"""
+
+# Standard imports
+import math
+from io import BytesIO
+from typing import List, Iterator
+
+import pytest
+
+# Local imports
+from analysis_tool_kit import readset_library_index
+from analysis_tool_kit.globals import READSET_LIBRARY_INDEX_FALSE_POSITIVE_RATE
+from analysis_tool_kit.readset_library_index import (
+    LibraryIdBloomFilter,
+    add_readset_library_ids,
+    clear_readset_library_index,
+    library_has_readsets,
+)
+
+# Globals
+CAPACITY = 20_000
+BUILT_AT = 1_700_000_000.0
+
+
+def make_library_id_list(count: int, prefix: str = "L24") -> List[str]:
+    return list(map(
+        lambda index_iter_: f"{prefix}{str(index_iter_).zfill(6)}",
+        range(count)
+    ))
+
+
+@pytest.fixture
+def bloom_filter() -> LibraryIdBloomFilter:
+    bloom_filter = LibraryIdBloomFilter.from_capacity(CAPACITY, BUILT_AT)
+    for library_id in make_library_id_list(CAPACITY):
+        bloom_filter.add(library_id)
+    return bloom_filter
+
+
+@pytest.fixture
+def fastq_call_list(tmp_path, monkeypatch) -> Iterator[List[str]]:
+    """
+    Keep the index and miss cache in a temporary directory, without an index,
+    and record each fastq service call, none of the libraries have fastqs
+    :param tmp_path:
+    :param monkeypatch:
+    :return:
+    """
+    fastq_call_list = []
+
+    def get_fastqs_in_library(library_id: str):
+        fastq_call_list.append(library_id)
+        return []
+
+    monkeypatch.setattr(readset_library_index, "READSET_LIBRARY_INDEX_LOCAL_PATH", str(tmp_path / "index.bin"))
+    monkeypatch.setattr(readset_library_index, "READSET_LIBRARY_MISS_CACHE_LOCAL_PATH", str(tmp_path / "misses.json"))
+    monkeypatch.setattr(readset_library_index, "get_fastqs_in_library", get_fastqs_in_library)
+    clear_readset_library_index()
+    yield fastq_call_list
+    clear_readset_library_index()
+
+
+def test_bloom_filter_is_sized_for_the_false_positive_rate(bloom_filter):
+    # The optimal size, -n ln(p) / ln(2)^2 bits, and ln(2) m / n hashes
+    bits_per_library = bloom_filter.bit_count / CAPACITY
+    assert bits_per_library == pytest.approx(
+        -math.log(READSET_LIBRARY_INDEX_FALSE_POSITIVE_RATE) / math.log(2) ** 2,
+        rel=1e-3
+    )
+    assert bloom_filter.hash_count == round(bits_per_library * math.log(2))
+    assert len(bloom_filter.bits) == math.ceil(bloom_filter.bit_count / 8)
+
+
+def test_bloom_filter_has_no_false_negatives(bloom_filter):
+    assert all(map(lambda library_id_iter_: library_id_iter_ in bloom_filter, make_library_id_list(CAPACITY)))
+
+
+def test_bloom_filter_false_positive_rate(bloom_filter):
+    probe_count = 100_000
+    false_positive_count = sum(map(
+        lambda library_id_iter_: library_id_iter_ in bloom_filter,
+        make_library_id_list(probe_count, prefix="L99")
+    ))
+
+    # We expect 0.1 false positives at capacity, allow for a few
+    assert false_positive_count <= 3
+
+
+def test_bloom_filter_serialisation_round_trip(bloom_filter):
+    round_tripped_bloom_filter = LibraryIdBloomFilter.from_file(BytesIO(bloom_filter.to_bytes()))
+
+    assert round_tripped_bloom_filter.bit_count == bloom_filter.bit_count
+    assert round_tripped_bloom_filter.hash_count == bloom_filter.hash_count
+    assert round_tripped_bloom_filter.built_at == BUILT_AT
+    assert round_tripped_bloom_filter.bits == bloom_filter.bits
+
+
+def test_truncated_bloom_filter_is_rejected(bloom_filter):
+    with pytest.raises(ValueError):
+        LibraryIdBloomFilter.from_file(BytesIO(bloom_filter.to_bytes()[:-1]))
+
+
+def test_library_miss_is_remembered(fastq_call_list):
+    assert not library_has_readsets("L2400001")
+    assert not library_has_readsets("L2400001")
+    assert fastq_call_list == ["L2400001"]
+
+    # A new process in the same sandbox picks the miss up from /tmp
+    clear_readset_library_index()
+    assert not library_has_readsets("L2400001")
+    assert fastq_call_list == ["L2400001"]
+
+
+def test_library_miss_expires(fastq_call_list, monkeypatch):
+    monkeypatch.setattr(readset_library_index, "READSET_LIBRARY_MISS_CACHE_TTL_SECONDS", -1)
+
+    assert not library_has_readsets("L2400001")
+    assert not library_has_readsets("L2400001")
+    assert fastq_call_list == ["L2400001", "L2400001"]
+
+
+def test_library_miss_is_forgotten_once_the_library_has_fastqs(fastq_call_list):
+    assert not library_has_readsets("L2400001")
+
+    add_readset_library_ids(["L2400001"])
+    clear_readset_library_index()
+
+    assert not library_has_readsets("L2400001")
+    assert fastq_call_list == ["L2400001", "L2400001"]
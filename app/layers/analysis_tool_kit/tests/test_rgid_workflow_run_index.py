@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+
+"""
+Rgid workflow run index and draft claim settlement, against the SQLite draft ledger
+"""
+
+# Standard imports
+from typing import List, Dict, Any, Optional
+
+# Local imports
+from analysis_tool_kit import analysis_helpers
+from analysis_tool_kit.analysis_helpers import claim_workflow_draft, has_existing_workflow_run
+from analysis_tool_kit.draft_ledger import get_draft_key
+from analysis_tool_kit.globals import (
+    DRAFT_LEDGER_SQLITE_PATH_ENV_VAR,
+    RGID_WORKFLOW_RUN_INDEX_AUTHORITATIVE_ENV_VAR,
+)
+from analysis_tool_kit.rgid_workflow_run_index import (
+    get_indexed_workflow_run_ids,
+    index_workflow_run_state_change,
+)
+
+# Globals
+LIBRARIES = [
+    {"orcabusId": "lib.L2400001", "libraryId": "L2400001"},
+    {"orcabusId": "lib.L2400002", "libraryId": "L2400002"},
+]
+WORKFLOW_NAME = "dragen-wgts-dna"
+WORKFLOW_VERSION = "4.4.4"
+TUMOR_RGID = "AAAAAAAA.CCCCCCCC.1.240101_A01052_0001_AHXXXXXXXX"
+NORMAL_RGID = "GGGGGGGG.TTTTTTTT.1.240101_A01052_0001_AHXXXXXXXX"
+
+
+def make_event_library(library_id: str, rgid_list: List[str]) -> Dict[str, Any]:
+    return {
+        "orcabusId": f"lib.{library_id}",
+        "libraryId": library_id,
+        "readsets": list(map(
+            lambda rgid_iter_: {"orcabusId": f"fqr.{rgid_iter_}", "rgid": rgid_iter_},
+            rgid_list
+        )),
+    }
+
+
+def make_state_change_event_detail(
+        portal_run_id: str,
+        status: str,
+        timestamp: Optional[str] = None,
+) -> Dict[str, Any]:
+    return {
+        "portalRunId": portal_run_id,
+        "status": status,
+        "timestamp": timestamp,
+        "workflow": {"name": WORKFLOW_NAME, "version": WORKFLOW_VERSION},
+        "libraries": [
+            make_event_library("L2400001", [TUMOR_RGID]),
+            make_event_library("L2400002", [NORMAL_RGID]),
+        ],
+    }
+
+
+def get_run_ids(rgid_list: List[str]):
+    return get_indexed_workflow_run_ids(WORKFLOW_NAME, WORKFLOW_VERSION, rgid_list)
+
+
+def test_index_is_disabled_without_a_draft_ledger(monkeypatch, draft_ledger_path):
+    monkeypatch.delenv(DRAFT_LEDGER_SQLITE_PATH_ENV_VAR)
+
+    assert get_run_ids([TUMOR_RGID]) is None
+    assert index_workflow_run_state_change(make_state_change_event_detail("20240101abcd1234", "DRAFT")) is None
+
+
+def test_run_is_indexed_for_every_rgid(draft_ledger):
+    index_workflow_run_state_change(make_state_change_event_detail("20240101abcd1234", "DRAFT"))
+    index_workflow_run_state_change(make_state_change_event_detail("20240101abcd1234", "READY"))
+
+    assert get_run_ids([TUMOR_RGID, NORMAL_RGID]) == {"20240101abcd1234"}
+    assert get_run_ids([TUMOR_RGID]) == {"20240101abcd1234"}
+    # A run must have every one of the draft's rgids
+    assert get_run_ids([TUMOR_RGID, "CCCCCCCC.AAAAAAAA.2.240101_A01052_0001_AHXXXXXXXX"]) == set()
+
+
+def test_deprecated_run_is_removed(draft_ledger):
+    index_workflow_run_state_change(make_state_change_event_detail("20240101abcd1234", "DRAFT"))
+    index_workflow_run_state_change(make_state_change_event_detail("20240102abcd5678", "DRAFT"))
+
+    summary = index_workflow_run_state_change(make_state_change_event_detail("20240101abcd1234", "DEPRECATED"))
+
+    assert summary['removed']
+    assert get_run_ids([TUMOR_RGID, NORMAL_RGID]) == {"20240102abcd5678"}
+
+
+def test_run_events_settle_the_draft_claim(draft_ledger, monkeypatch):
+    monkeypatch.setenv(RGID_WORKFLOW_RUN_INDEX_AUTHORITATIVE_ENV_VAR, "true")
+    monkeypatch.setattr(analysis_helpers, "any_existing_workflow_run", lambda **kwargs: False)
+    libraries = LIBRARIES
+    draft_key = get_draft_key(WORKFLOW_NAME, WORKFLOW_VERSION, ["L2400001", "L2400002"], [TUMOR_RGID, NORMAL_RGID])
+
+    # Drafting claims the draft, the run's first event confirms the claim
+    assert claim_workflow_draft(WORKFLOW_NAME, WORKFLOW_VERSION, libraries, [TUMOR_RGID, NORMAL_RGID])
+    summary = index_workflow_run_state_change(make_state_change_event_detail("20240101abcd1234", "DRAFT"))
+    assert summary['claimConfirmed']
+    assert 'expiresAt' not in draft_ledger.get(draft_key)
+
+    # While the run is live the draft is a duplicate
+    assert not claim_workflow_draft(WORKFLOW_NAME, WORKFLOW_VERSION, libraries, [TUMOR_RGID, NORMAL_RGID])
+
+    # Once the run is deprecated, its claim is released, and the draft can be generated again
+    index_workflow_run_state_change(make_state_change_event_detail("20240101abcd1234", "DEPRECATED"))
+    assert draft_ledger.get(draft_key) is None
+    assert claim_workflow_draft(WORKFLOW_NAME, WORKFLOW_VERSION, libraries, [TUMOR_RGID, NORMAL_RGID])
+
+
+def test_runs_we_did_not_draft_have_no_claim_to_confirm(draft_ledger):
+    summary = index_workflow_run_state_change(make_state_change_event_detail("20240101abcd1234", "READY"))
+
+    assert not summary['claimConfirmed']
+    assert summary['rgidCount'] == 2
+
+
+def test_stale_events_are_ignored(draft_ledger):
+    index_workflow_run_state_change(
+        make_state_change_event_detail("20240101abcd1234", "DRAFT", "2024-01-01T00:00:00Z")
+    )
+    index_workflow_run_state_change(
+        make_state_change_event_detail("20240101abcd1234", "DEPRECATED", "2024-01-01T00:02:00Z")
+    )
+
+    # A READY event delayed until after the run was deprecated does not add the run back
+    summary = index_workflow_run_state_change(
+        make_state_change_event_detail("20240101abcd1234", "READY", "2024-01-01T00:01:00Z")
+    )
+
+    assert summary['stale']
+    assert get_run_ids([TUMOR_RGID, NORMAL_RGID]) == set()
+
+
+def test_deprecated_event_wins_a_tie(draft_ledger):
+    index_workflow_run_state_change(
+        make_state_change_event_detail("20240101abcd1234", "DEPRECATED", "2024-01-01T00:01:00Z")
+    )
+    summary = index_workflow_run_state_change(
+        make_state_change_event_detail("20240101abcd1234", "READY", "2024-01-01T00:01:00Z")
+    )
+
+    assert summary['stale']
+    assert get_run_ids([TUMOR_RGID, NORMAL_RGID]) == set()
+
+
+def test_redelivered_event_is_applied_again(draft_ledger):
+    event_detail = make_state_change_event_detail("20240101abcd1234", "READY", "2024-01-01T00:01:00Z")
+
+    index_workflow_run_state_change(event_detail)
+    summary = index_workflow_run_state_change(event_detail)
+
+    assert not summary['stale']
+    assert get_run_ids([TUMOR_RGID, NORMAL_RGID]) == {"20240101abcd1234"}
+
+
+def test_indexed_run_is_verified_until_the_index_is_authoritative(draft_ledger, monkeypatch):
+    index_workflow_run_state_change(make_state_change_event_detail("20240101abcd1234", "READY"))
+    monkeypatch.setattr(analysis_helpers, "any_existing_workflow_run", lambda **kwargs: False)
+
+    assert not has_existing_workflow_run(WORKFLOW_NAME, WORKFLOW_VERSION, LIBRARIES, [TUMOR_RGID, NORMAL_RGID])
+
+    monkeypatch.setenv(RGID_WORKFLOW_RUN_INDEX_AUTHORITATIVE_ENV_VAR, "true")
+    assert has_existing_workflow_run(WORKFLOW_NAME, WORKFLOW_VERSION, LIBRARIES, [TUMOR_RGID, NORMAL_RGID])
+
+
+def test_deprecated_event_releases_the_claim_of_a_run_that_predates_the_ledger(draft_ledger, monkeypatch):
+    monkeypatch.setattr(analysis_helpers, "any_existing_workflow_run", lambda **kwargs: True)
+    draft_key = get_draft_key(WORKFLOW_NAME, WORKFLOW_VERSION, ["L2400001", "L2400002"], [TUMOR_RGID, NORMAL_RGID])
+
+    assert not claim_workflow_draft(WORKFLOW_NAME, WORKFLOW_VERSION, LIBRARIES, [TUMOR_RGID, NORMAL_RGID])
+    assert draft_ledger.get(draft_key) is not None
+
+    index_workflow_run_state_change(make_state_change_event_detail("20230101abcd1234", "DEPRECATED"))
+
+    assert draft_ledger.get(draft_key) is None
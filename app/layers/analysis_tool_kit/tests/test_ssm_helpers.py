@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+
+"""
+Reading several SSM parameters together
+"""
+
+# Standard imports
+from typing import List, Dict, Any
+
+import pytest
+
+# Local imports
+from analysis_tool_kit import ssm_helpers
+from analysis_tool_kit.ssm_helpers import get_ssm_values
+
+
+class FakeSsmClient:
+    def __init__(self, parameter_value_by_name: Dict[str, str]):
+        self.parameter_value_by_name = parameter_value_by_name
+        self.request_list: List[List[str]] = []
+
+    def get_parameters(self, Names: List[str]) -> Dict[str, Any]:
+        self.request_list.append(Names)
+        return {
+            "Parameters": list(map(
+                lambda name_iter_: {"Name": name_iter_, "Value": self.parameter_value_by_name[name_iter_]},
+                filter(lambda name_iter_: name_iter_ in self.parameter_value_by_name, Names)
+            )),
+            "InvalidParameters": list(filter(lambda name_iter_: name_iter_ not in self.parameter_value_by_name, Names)),
+        }
+
+
+def use_fake_ssm_client(monkeypatch, parameter_value_by_name: Dict[str, str]) -> FakeSsmClient:
+    fake_ssm_client = FakeSsmClient(parameter_value_by_name)
+    monkeypatch.setattr(ssm_helpers, "get_ssm_client", lambda: fake_ssm_client)
+    return fake_ssm_client
+
+
+def test_parameters_are_read_in_as_few_requests_as_possible(monkeypatch):
+    parameter_value_by_name = {f"/orcabus/workflows/{index}": f"value-{index}" for index in range(12)}
+    fake_ssm_client = use_fake_ssm_client(monkeypatch, parameter_value_by_name)
+
+    assert get_ssm_values(list(parameter_value_by_name.keys())) == parameter_value_by_name
+    assert list(map(len, fake_ssm_client.request_list)) == [10, 2]
+
+
+def test_missing_parameters_raise(monkeypatch):
+    use_fake_ssm_client(monkeypatch, {"/orcabus/workflows/wgts": "value"})
+
+    with pytest.raises(ValueError, match="/orcabus/workflows/sash"):
+        get_ssm_values(["/orcabus/workflows/wgts", "/orcabus/workflows/sash"])
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+
+"""
+Invocation tracing, span nesting across pool worker threads and the critical path
+"""
+
+# Standard imports
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict
+
+import pytest
+
+# Local imports
+from analysis_tool_kit import tracing
+from analysis_tool_kit.tracing import (
+    Trace,
+    SPAN_STATUS_ERROR,
+    span,
+    traced,
+    bind_current_span,
+    trace_invocation,
+)
+
+
+@pytest.fixture
+def exported_trace_list(monkeypatch) -> List[Trace]:
+    exported_trace_list = []
+    monkeypatch.setattr(tracing, "export_trace", exported_trace_list.append)
+    return exported_trace_list
+
+
+def get_span_name_by_span_id(trace: Trace) -> Dict[str, str]:
+    return {span_iter_.span_id: span_iter_.name for span_iter_ in trace.get_all_spans()}
+
+
+def get_parent_span_name(trace: Trace, span_name: str) -> str:
+    span_name_by_span_id = get_span_name_by_span_id(trace)
+    return next(
+        span_name_by_span_id[span_iter_.parent_span_id]
+        for span_iter_ in trace.get_all_spans()
+        if span_iter_.name == span_name
+    )
+
+
+@traced
+def get_readsets(library_id: str) -> str:
+    return library_id
+
+
+def test_spans_on_pool_workers_nest_under_the_bound_span(exported_trace_list):
+    @trace_invocation
+    def handler(event, context):
+        with span("bound"):
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                list(executor.map(bind_current_span(get_readsets), ["L2400001", "L2400002"]))
+        with span("unbound"):
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                list(executor.map(get_readsets, ["L2400003"]))
+
+    handler({"subjectId": "SBJ00001"}, None)
+
+    trace = exported_trace_list[0]
+    parent_span_name_list = list(map(
+        lambda span_iter_: get_span_name_by_span_id(trace)[span_iter_.parent_span_id],
+        filter(lambda span_iter_: span_iter_.name == "get_readsets", trace.get_all_spans())
+    ))
+    # Without the binding, a worker thread's spans fall back to the root span
+    assert sorted(parent_span_name_list) == ["bound", "bound", "handler"]
+
+
+def test_bound_function_restores_the_worker_span(exported_trace_list):
+    @trace_invocation
+    def handler(event, context):
+        with span("bound"):
+            bound_func = bind_current_span(lambda: tracing.CURRENT_SPAN.get().name)
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            assert executor.submit(bound_func).result() == "bound"
+            assert executor.submit(tracing.CURRENT_SPAN.get).result() is None
+
+    handler({}, None)
+
+
+def test_spans_outside_an_invocation_are_a_no_op():
+    with span("untraced") as untraced_span:
+        assert untraced_span is None
+    assert bind_current_span(get_readsets)("L2400001") == "L2400001"
+
+
+def test_critical_path_follows_the_child_that_finished_last(exported_trace_list):
+    @trace_invocation
+    def handler(event, context):
+        with span("prefetch"):
+            pass
+        with span("pairing"):
+            with span("existence check"):
+                pass
+            with span("build drafts"):
+                # Finish measurably after the existence check
+                time.sleep(0.001)
+
+    handler({}, None)
+
+    assert list(map(
+        lambda span_iter_: span_iter_.name,
+        exported_trace_list[0].get_critical_path()
+    )) == ["handler", "pairing", "build drafts"]
+
+
+def test_failed_span_is_marked_as_an_error(exported_trace_list):
+    @trace_invocation
+    def handler(event, context):
+        with span("claim"):
+            raise ValueError("Could not claim the draft")
+
+    with pytest.raises(ValueError):
+        handler({}, None)
+
+    trace = exported_trace_list[0]
+    assert trace.root_span.status == SPAN_STATUS_ERROR
+    assert next(filter(lambda span_iter_: span_iter_.name == "claim", trace.spans)).attributes == {
+        "exception.type": "ValueError"
+    }
+
+
+def test_nested_handler_is_traced_as_a_span(exported_trace_list):
+    @trace_invocation
+    def stage_handler(event, context):
+        with span("pairing"):
+            pass
+
+    @trace_invocation
+    def planner_handler(event, context):
+        stage_handler({}, None)
+
+    planner_handler({}, None)
+
+    assert len(exported_trace_list) == 1
+    assert get_parent_span_name(exported_trace_list[0], "pairing").startswith("handler ")
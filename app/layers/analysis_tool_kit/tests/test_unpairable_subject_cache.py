@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+
+"""
+Unpairable subject cache, keyed by the subject's catalog version in the draft ledger
+"""
+
+# Standard imports
+from typing import Set
+
+import pytest
+
+# Local imports
+from analysis_tool_kit import unpairable_subject_cache, dry_run
+from analysis_tool_kit.unpairable_subject_cache import (
+    is_subject_unpairable,
+    mark_subject_unpairable,
+    clear_subject_unpairable,
+)
+
+# Globals
+NAMESPACE = "wgs"
+SUBJECT_ORCABUS_ID = "sbj.01"
+
+
+@pytest.fixture
+def readset_library_id_set(draft_ledger, monkeypatch) -> Set[str]:
+    """
+    The libraries with readsets, add to the set to sequence a library
+    :param draft_ledger:
+    :param monkeypatch:
+    :return:
+    """
+    readset_library_id_set = set()
+    monkeypatch.setattr(
+        unpairable_subject_cache, "library_has_readsets",
+        lambda library_id: library_id in readset_library_id_set
+    )
+    return readset_library_id_set
+
+
+def test_subject_is_unpairable_for_a_subset_of_its_libraries(readset_library_id_set):
+    mark_subject_unpairable(NAMESPACE, SUBJECT_ORCABUS_ID, ["L2400001", "L2400002"])
+
+    assert is_subject_unpairable(NAMESPACE, SUBJECT_ORCABUS_ID, ["L2400001"])
+    assert is_subject_unpairable(NAMESPACE, SUBJECT_ORCABUS_ID, ["L2400002", "L2400001"])
+
+
+def test_subject_that_gained_a_library_is_evaluated_again(readset_library_id_set):
+    mark_subject_unpairable(NAMESPACE, SUBJECT_ORCABUS_ID, ["L2400001", "L2400002"])
+
+    assert not is_subject_unpairable(NAMESPACE, SUBJECT_ORCABUS_ID, ["L2400001", "L2400003"])
+
+
+def test_subject_is_evaluated_again_once_a_library_without_readsets_is_sequenced(readset_library_id_set):
+    mark_subject_unpairable(
+        NAMESPACE, SUBJECT_ORCABUS_ID, ["L2400001"],
+        library_id_without_readsets_list=["L2400002"],
+    )
+    assert is_subject_unpairable(NAMESPACE, SUBJECT_ORCABUS_ID, ["L2400001"])
+
+    readset_library_id_set.add("L2400002")
+    assert not is_subject_unpairable(NAMESPACE, SUBJECT_ORCABUS_ID, ["L2400001"])
+
+
+def test_namespaces_are_separate(readset_library_id_set):
+    mark_subject_unpairable(NAMESPACE, SUBJECT_ORCABUS_ID, ["L2400001"])
+
+    assert not is_subject_unpairable("wgts_post", SUBJECT_ORCABUS_ID, ["L2400001"])
+
+
+def test_paired_subject_is_cleared(readset_library_id_set):
+    mark_subject_unpairable(NAMESPACE, SUBJECT_ORCABUS_ID, ["L2400001"])
+    clear_subject_unpairable(NAMESPACE, SUBJECT_ORCABUS_ID)
+
+    assert not is_subject_unpairable(NAMESPACE, SUBJECT_ORCABUS_ID, ["L2400001"])
+
+
+def test_dry_run_does_not_mark_subjects(readset_library_id_set, monkeypatch):
+    monkeypatch.setattr(dry_run, "DRY_RUN", True)
+    mark_subject_unpairable(NAMESPACE, SUBJECT_ORCABUS_ID, ["L2400001"])
+
+    assert not is_subject_unpairable(NAMESPACE, SUBJECT_ORCABUS_ID, ["L2400001"])
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+
+"""
+Workflow run existence checks, the query sent to the workflow manager and what we make of its results
+"""
+
+# Standard imports
+import json
+from typing import List, Dict, Any
+from urllib.parse import urlparse, parse_qs
+
+import pytest
+import requests
+from requests.adapters import BaseAdapter
+
+# Local imports
+from analysis_tool_kit import analysis_helpers
+from analysis_tool_kit.analysis_helpers import any_existing_workflow_run
+
+# Globals
+WORKFLOW_NAME = "dragen-wgts-dna"
+WORKFLOW_VERSION = "4.4.4"
+LIBRARIES = [
+    {"orcabusId": "lib.01", "libraryId": "L2400001"},
+    {"orcabusId": "lib.02", "libraryId": "L2400002"},
+]
+RGID_LIST = ["ACGT.1.240101_A01052_0001_SYNTHETIC", "TGCA.1.240101_A01052_0001_SYNTHETIC"]
+
+
+def make_workflow_run(workflow_name: str, library_id_list: List[str], status: str = "SUCCEEDED") -> Dict[str, Any]:
+    return {
+        "workflow": {"name": workflow_name, "version": WORKFLOW_VERSION},
+        "libraries": list(map(lambda library_id_iter_: {"libraryId": library_id_iter_}, library_id_list)),
+        "currentState": {"status": status},
+    }
+
+
+class WorkflowRunPageAdapter(BaseAdapter):
+    """
+    Serve a single page of workflow runs, and record the url of each request
+    """
+    def __init__(self, workflow_run_list: List[Dict[str, Any]]):
+        super().__init__()
+        self.workflow_run_list = workflow_run_list
+        self.url_list: List[str] = []
+
+    def send(self, request, **kwargs):
+        self.url_list.append(request.url)
+
+        response = requests.Response()
+        response.status_code = 200
+        response.url = request.url
+        response.request = request
+        response._content = json.dumps({
+            "links": {"next": None, "previous": None},
+            "results": self.workflow_run_list,
+        }).encode()
+        return response
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def fallback_call_list(monkeypatch) -> List[Dict[str, Any]]:
+    """
+    Record each fall back to the api tools' workflow run query, which finds no runs
+    :param monkeypatch:
+    :return:
+    """
+    fallback_call_list = []
+
+    def get_workflow_runs_from_metadata(**kwargs):
+        fallback_call_list.append(kwargs)
+        return []
+
+    monkeypatch.setattr(analysis_helpers, "get_workflow_runs_from_metadata", get_workflow_runs_from_metadata)
+    return fallback_call_list
+
+
+def use_workflow_run_page(monkeypatch, workflow_run_list: List[Dict[str, Any]]) -> WorkflowRunPageAdapter:
+    adapter = WorkflowRunPageAdapter(workflow_run_list)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    monkeypatch.setattr(analysis_helpers, "get_session", lambda: session)
+    return adapter
+
+
+def test_workflow_run_query(monkeypatch, fallback_call_list):
+    # The filter names are the workflow manager's workflow run filters, changing them changes what we ask for
+    adapter = use_workflow_run_page(monkeypatch, [])
+
+    assert not any_existing_workflow_run(WORKFLOW_NAME, WORKFLOW_VERSION, LIBRARIES, rgid_list=RGID_LIST)
+
+    assert len(adapter.url_list) == 1
+    url = urlparse(adapter.url_list[0])
+    assert f"{url.netloc}{url.path}" == "workflow.synthetic.local/api/v1/workflowrun"
+    assert parse_qs(url.query) == {
+        "workflow__name": [WORKFLOW_NAME],
+        "workflow__version": [WORKFLOW_VERSION],
+        "libraries__libraryId": ["L2400001", "L2400002"],
+        "readsets__rgid": RGID_LIST,
+        "rowsPerPage": ["10"],
+    }
+    assert fallback_call_list == []
+
+
+def test_matching_workflow_run_is_found(monkeypatch, fallback_call_list):
+    use_workflow_run_page(monkeypatch, [
+        make_workflow_run(WORKFLOW_NAME, ["L2400001"]),
+        make_workflow_run(WORKFLOW_NAME, ["L2400001", "L2400002"]),
+    ])
+
+    assert any_existing_workflow_run(WORKFLOW_NAME, WORKFLOW_VERSION, LIBRARIES, rgid_list=RGID_LIST)
+    assert fallback_call_list == []
+
+
+def test_deprecated_workflow_run_is_not_a_match(monkeypatch, fallback_call_list):
+    use_workflow_run_page(monkeypatch, [
+        make_workflow_run(WORKFLOW_NAME, ["L2400001", "L2400002"], status="DEPRECATED"),
+    ])
+
+    assert not any_existing_workflow_run(WORKFLOW_NAME, WORKFLOW_VERSION, LIBRARIES, rgid_list=RGID_LIST)
+    assert fallback_call_list == []
+
+
+@pytest.mark.parametrize(
+    "workflow_run",
+    [
+        make_workflow_run("oncoanalyser-wgts-dna", ["L2400001", "L2400002"]),
+        make_workflow_run(WORKFLOW_NAME, ["L2400003"]),
+    ],
+    ids=["other_workflow", "other_libraries"]
+)
+def test_ignored_filters_fall_back_to_the_api_tools_query(monkeypatch, fallback_call_list, workflow_run):
+    adapter = use_workflow_run_page(monkeypatch, [workflow_run])
+
+    assert not any_existing_workflow_run(WORKFLOW_NAME, WORKFLOW_VERSION, LIBRARIES, rgid_list=RGID_LIST)
+    assert len(adapter.url_list) == 1
+    assert fallback_call_list == [{
+        "workflow_name": WORKFLOW_NAME,
+        "workflow_version": WORKFLOW_VERSION,
+        "library_id_list": ["L2400001", "L2400002"],
+        "rgid_list": RGID_LIST,
+    }]
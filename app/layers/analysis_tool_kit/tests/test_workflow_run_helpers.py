@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+
+"""
+Workflow run readiness polling
+"""
+
+# Standard imports
+import pytest
+
+# Layer imports
+from orcabus_api_tools.workflow.errors import WorkflowRunNotFoundError
+
+# Local imports
+from analysis_tool_kit import workflow_run_helpers
+from analysis_tool_kit.http_client import CircuitOpenError
+from analysis_tool_kit.workflow_run_helpers import (
+    WorkflowRunNotReadyError,
+    wait_for_workflow_run_from_portal_run_id,
+)
+
+# Globals
+PORTAL_RUN_ID = "20240101abcd1234"
+
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    monkeypatch.setattr(workflow_run_helpers.time, "sleep", lambda seconds: None)
+
+
+def test_not_found_is_polled_until_the_run_exists(monkeypatch):
+    lookup_list = []
+
+    def get_workflow_run_from_portal_run_id(portal_run_id: str):
+        lookup_list.append(portal_run_id)
+        if len(lookup_list) < 3:
+            raise WorkflowRunNotFoundError(portal_run_id)
+        return {"portalRunId": portal_run_id}
+
+    monkeypatch.setattr(
+        workflow_run_helpers, "get_workflow_run_from_portal_run_id", get_workflow_run_from_portal_run_id
+    )
+
+    assert wait_for_workflow_run_from_portal_run_id(PORTAL_RUN_ID)['portalRunId'] == PORTAL_RUN_ID
+    assert len(lookup_list) == 3
+
+
+def test_not_found_past_the_deadline(monkeypatch):
+    def get_workflow_run_from_portal_run_id(portal_run_id: str):
+        raise WorkflowRunNotFoundError(portal_run_id)
+
+    monkeypatch.setattr(
+        workflow_run_helpers, "get_workflow_run_from_portal_run_id", get_workflow_run_from_portal_run_id
+    )
+
+    with pytest.raises(WorkflowRunNotReadyError):
+        wait_for_workflow_run_from_portal_run_id(PORTAL_RUN_ID, deadline_seconds=0)
+
+
+def test_other_errors_are_raised_straight_away(monkeypatch):
+    lookup_list = []
+
+    def get_workflow_run_from_portal_run_id(portal_run_id: str):
+        lookup_list.append(portal_run_id)
+        raise CircuitOpenError("workflow", 30)
+
+    monkeypatch.setattr(
+        workflow_run_helpers, "get_workflow_run_from_portal_run_id", get_workflow_run_from_portal_run_id
+    )
+
+    with pytest.raises(CircuitOpenError):
+        wait_for_workflow_run_from_portal_run_id(PORTAL_RUN_ID)
+    assert len(lookup_list) == 1
@@ -15,6 +15,7 @@ import {
   SSM_PARAMETER_PATH_S3_DEPLOYMENT_SNAPSHOT_PREFIX,
   PROD_CLOUDFORMATION_STACKS_TO_MONITOR,
   SSM_PARAMETER_PATH_GIT_STACK_LIST,
+  DRAFT_LEDGER_TABLE_NAME,
 } from './constants';
 import { StatefulApplicationStackConfig, StatelessApplicationStackConfig } from './interfaces';
 import { StageName } from '@orcabus/platform-cdk-constructs/shared-config/accounts';
@@ -74,6 +75,9 @@ export const getStatefulStackProps = (stage: StageName): StatefulApplicationStac
     // SSM Parameter Values
     ssmParameterValues: getSsmParameterValues(stage),
 
+    // Draft Ledger Table Name
+    draftLedgerTableName: DRAFT_LEDGER_TABLE_NAME,
+
     // StageName
     stageName: stage,
   };
@@ -96,6 +100,9 @@ export const getStatelessStackProps = (stage: StageName): StatelessApplicationSt
     // Event Bus Object
     eventBusName: EVENT_BUS_NAME,
 
+    // Draft Ledger Table Name
+    draftLedgerTableName: DRAFT_LEDGER_TABLE_NAME,
+
     // StageName
     stageName: stage,
   };
@@ -371,6 +371,8 @@ export const FASTQ_GLUE_FASTQ_SET_CREATED_EVENT_DETAIL_TYPE = 'FastqListRowsAdde
 export const SRM_EVENT_SOURCE = 'orcabus.sequencerunmanager';
 export const SRM_SAMPLE_SHEET_STATE_CHANGE_DETAIL_TYPE = 'SampleSheetStateChange';
 
+export const WORKFLOW_MANAGER_EVENT_SOURCE = 'orcabus.workflowmanager';
+
 /* SSM Parameter Paths */
 export const SSM_PARAMETER_PATH_PREFIX = path.join('/orcabus/analysis-glue/');
 // Workflow Parameters
@@ -389,6 +391,40 @@ export const ANALYSIS_GLUE_ARTEFACTS_BUCKET_NAME: Record<Extract<StageName, 'PRO
   PROD: `analysis-glue-artefacts-${ACCOUNT_ID_ALIAS.PROD}-${REGION}`,
 };
 export const DEPLOYMENT_SNAPSHOTS_S3_PREFIX = 'deployment-snapshots/';
+export const READSET_LIBRARY_INDEX_S3_KEY = 'readset-library-index/library-ids.bin';
+export const SLOW_INVOCATION_PROFILES_S3_PREFIX = 'slow-invocation-profiles/';
+export const BACKFILL_S3_PREFIX = 'backfills/';
+// Profile the make analysis events lambdas, keeping the profiles of invocations that near their timeout
+export const SLOW_INVOCATION_PROFILING_ENABLED = false;
+
+/* Planner */
+// The planner walks every stage of an analysis builder run one after another, so runs for as long as a lambda can
+export const PLANNER_LAMBDA_TIMEOUT_SECONDS = 900;
+
+/* Backfill */
+// The backfill runs for as long as a lambda can, with the memory (and so the cpus) for its worker processes
+export const PARALLEL_WORKERS_LAMBDA_TIMEOUT_SECONDS = 900;
+export const PARALLEL_WORKERS_LAMBDA_MEMORY_SIZE = 10240;
+
+/* Router */
+// Invoke every analysis builder task through the router lambda, so warm sandboxes (and their caches) are shared
+export const ANALYSIS_BUILDER_ROUTER_LAMBDA_ENABLED = true;
+
+/* Warm up */
+// Warm the analysis builder lambdas (and their caches) ahead of the overnight sequencing completions (UTC)
+export const ANALYSIS_BUILDER_WARM_UP_SCHEDULE_EXPRESSION = 'cron(0/10 10-23 ? * SUN-FRI *)';
+
+/* Readset library index */
+// Rebuilt out of band and shared through the artefacts bucket, well within the index TTL (an hour)
+export const READSET_LIBRARY_INDEX_REBUILD_SCHEDULE_EXPRESSION = 'rate(30 minutes)';
+
+/* Draft ledger */
+export const DRAFT_LEDGER_TABLE_NAME = 'AnalysisGlueDraftLedger';
+// Trust the rgid workflow run index to know every workflow run,
+// only once it has been indexing state change events for long enough to have seen every run that could be duplicated
+export const RGID_WORKFLOW_RUN_INDEX_AUTHORITATIVE = false;
+export const DRAFT_LEDGER_TABLE_PARTITION_KEY = 'draftKey';
+export const DRAFT_LEDGER_TABLE_TTL_ATTRIBUTE = 'expiresAt';
 
 // SSM PARAMATER PATHS FOR VALIDATION STUFF
 export const SSM_PARAMETER_PATH_S3_DEPLOYMENT_SNAPSHOT_PREFIX = path.join(
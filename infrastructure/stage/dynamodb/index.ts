@@ -0,0 +1,28 @@
+import * as dynamodb from 'aws-cdk-lib/aws-dynamodb';
+import { Construct } from 'constructs';
+import { RemovalPolicy } from 'aws-cdk-lib';
+import { DRAFT_LEDGER_TABLE_PARTITION_KEY, DRAFT_LEDGER_TABLE_TTL_ATTRIBUTE } from '../constants';
+
+function createDraftLedgerTable(scope: Construct, tableName: string): dynamodb.TableV2 {
+  // Create the draft ledger table
+  // Each item is a claimed workflow draft, keyed on a hash of the
+  // workflow name, version, library ids and readset rgids
+  // Short-lived records (i.e. unpairable subjects) carry an expiry timestamp
+  return new dynamodb.TableV2(scope, 'analysis-glue-draft-ledger-table', {
+    tableName: tableName,
+    partitionKey: {
+      name: DRAFT_LEDGER_TABLE_PARTITION_KEY,
+      type: dynamodb.AttributeType.STRING,
+    },
+    timeToLiveAttribute: DRAFT_LEDGER_TABLE_TTL_ATTRIBUTE,
+    billing: dynamodb.Billing.onDemand(),
+    pointInTimeRecoverySpecification: {
+      pointInTimeRecoveryEnabled: true,
+    },
+    removalPolicy: RemovalPolicy.RETAIN,
+  });
+}
+
+export function buildDraftLedgerTable(scope: Construct, tableName: string): dynamodb.TableV2 {
+  return createDraftLedgerTable(scope, tableName);
+}
@@ -15,6 +15,8 @@ import {
   SRM_EVENT_SOURCE,
   SRM_SAMPLE_SHEET_STATE_CHANGE_DETAIL_TYPE,
   STACK_PREFIX,
+  WORKFLOW_MANAGER_EVENT_SOURCE,
+  WORKFLOW_RUN_STATE_CHANGE_DETAIL_TYPE,
 } from '../constants';
 
 /*
@@ -31,6 +33,16 @@ function buildFastqSetCreatedEventPattern(): EventPattern {
   };
 }
 
+function buildWorkflowRunStateChangeEventPattern(): EventPattern {
+  return {
+    detailType: [WORKFLOW_RUN_STATE_CHANGE_DETAIL_TYPE],
+    source: [WORKFLOW_MANAGER_EVENT_SOURCE],
+    detail: {
+      portalRunId: [{ exists: true }],
+    },
+  };
+}
+
 function buildSrmSampleSheetStateChangeEventPattern(): EventPattern {
   return {
     detailType: [SRM_SAMPLE_SHEET_STATE_CHANGE_DETAIL_TYPE],
@@ -73,6 +85,17 @@ export function buildAllEventRules(
         });
         break;
       }
+      case 'workflowManagerWorkflowRunStateChange': {
+        eventBridgeRuleObjects.push({
+          ruleName: ruleName,
+          ruleObject: buildEventRule(scope, {
+            ruleName: ruleName,
+            eventPattern: buildWorkflowRunStateChangeEventPattern(),
+            eventBus: props.eventBus,
+          }),
+        });
+        break;
+      }
       case 'SrmSampleSheetStateChange': {
         if (props.prodOnly) {
           eventBridgeRuleObjects.push({
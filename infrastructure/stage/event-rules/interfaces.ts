@@ -7,13 +7,17 @@ export type EventBridgeRuleName =
   // SRM SampleSheet Change
   | 'SrmSampleSheetStateChange'
   // Post-fastq sets created
-  | 'fastqGlueFastqSetCreated';
+  | 'fastqGlueFastqSetCreated'
+  // Workflow run state changes, for the rgid workflow run index
+  | 'workflowManagerWorkflowRunStateChange';
 
 export const eventBridgeRuleNameList: EventBridgeRuleName[] = [
   // SRM updated, run validations
   'SrmSampleSheetStateChange',
   // Post-fastq sets created
   'fastqGlueFastqSetCreated',
+  // Workflow run state changes, for the rgid workflow run index
+  'workflowManagerWorkflowRunStateChange',
 ];
 
 export interface EventBridgeRuleProps {
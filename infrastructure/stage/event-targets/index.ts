@@ -1,4 +1,5 @@
 import {
+  AddLambdaAsEventBridgeTargetProps,
   AddSfnAsEventBridgeTargetProps,
   eventBridgeTargetsNameList,
   EventBridgeTargetsProps,
@@ -16,6 +17,15 @@ function ruleToSfnTarget(props: AddSfnAsEventBridgeTargetProps) {
   );
 }
 
+function ruleToLambdaTarget(props: AddLambdaAsEventBridgeTargetProps) {
+  // Return the entire detail to the lambda function
+  props.eventBridgeRuleObj.addTarget(
+    new eventsTargets.LambdaFunction(props.lambdaFunctionObj, {
+      input: events.RuleTargetInput.fromEventPath('$.detail'),
+    })
+  );
+}
+
 export function buildAllEventBridgeTargets(props: EventBridgeTargetsProps) {
   for (const eventBridgeTargetsName of eventBridgeTargetsNameList) {
     switch (eventBridgeTargetsName) {
@@ -43,6 +53,18 @@ export function buildAllEventBridgeTargets(props: EventBridgeTargetsProps) {
         }
         break;
       }
+      case 'workflowRunStateChangeToRgidWorkflowRunIndexLambdaTarget': {
+        ruleToLambdaTarget(<AddLambdaAsEventBridgeTargetProps>{
+          eventBridgeRuleObj: props.eventBridgeRuleObjects.find(
+            (eventBridgeObject) =>
+              eventBridgeObject.ruleName === 'workflowManagerWorkflowRunStateChange'
+          )?.ruleObject,
+          lambdaFunctionObj: props.lambdaObjects.find(
+            (lambdaObject) => lambdaObject.lambdaName === 'updateRgidWorkflowRunIndex'
+          )?.lambdaFunction,
+        });
+        break;
+      }
     }
   }
 }
@@ -2,18 +2,23 @@ import { StateMachine } from 'aws-cdk-lib/aws-stepfunctions';
 import { Rule } from 'aws-cdk-lib/aws-events';
 import { EventBridgeRuleObject } from '../event-rules/interfaces';
 import { StepFunctionObject } from '../step-functions/interfaces';
+import { LambdaObject } from '../lambdas/interfaces';
+import { IFunction } from 'aws-cdk-lib/aws-lambda';
 
 /**
  * EventBridge Target Interfaces
  */
 export type EventBridgeTargetName =
   // Event Rules
-  'readSetAddedToAnalysisBuilderSfnTarget' | 'srmSampleSheetChangeToPreFlightValidationSfnTarget';
+  | 'readSetAddedToAnalysisBuilderSfnTarget'
+  | 'srmSampleSheetChangeToPreFlightValidationSfnTarget'
+  | 'workflowRunStateChangeToRgidWorkflowRunIndexLambdaTarget';
 
 export const eventBridgeTargetsNameList: EventBridgeTargetName[] = [
   // Event Rules
   'readSetAddedToAnalysisBuilderSfnTarget',
   'srmSampleSheetChangeToPreFlightValidationSfnTarget',
+  'workflowRunStateChangeToRgidWorkflowRunIndexLambdaTarget',
 ];
 
 export interface AddSfnAsEventBridgeTargetProps {
@@ -21,8 +26,14 @@ export interface AddSfnAsEventBridgeTargetProps {
   eventBridgeRuleObj: Rule;
 }
 
+export interface AddLambdaAsEventBridgeTargetProps {
+  lambdaFunctionObj: IFunction;
+  eventBridgeRuleObj: Rule;
+}
+
 export interface EventBridgeTargetsProps {
   eventBridgeRuleObjects: EventBridgeRuleObject[];
   stepFunctionObjects: StepFunctionObject[];
+  lambdaObjects: LambdaObject[];
   prodOnly: boolean;
 }
@@ -17,6 +17,9 @@ export interface StatefulApplicationStackConfig {
 
   // S3 Bucket Name
   analysisGlueArtefactsBucketName?: string;
+
+  // Draft Ledger Table Name
+  draftLedgerTableName: string;
 }
 
 /**
@@ -34,6 +37,9 @@ export interface StatelessApplicationStackConfig {
 
   // S3 Bucket Name
   analysisGlueArtefactsBucketName?: string;
+
+  // Draft Ledger Table Name
+  draftLedgerTableName: string;
 }
 
 export type SampleType = 'ctDNA' | 'DNA' | 'RNA';
@@ -10,7 +10,21 @@ import {
   lambdaRequirementsMap,
 } from './interfaces';
 import { getPythonUvDockerImage, PythonUvFunction } from '@orcabus/platform-cdk-constructs/lambda';
-import { DEPLOYMENT_SNAPSHOTS_S3_PREFIX, LAMBDA_DIR, LAYERS_DIR } from '../constants';
+import {
+  ANALYSIS_BUILDER_WARM_UP_SCHEDULE_EXPRESSION,
+  BACKFILL_S3_PREFIX,
+  DEPLOYMENT_SNAPSHOTS_S3_PREFIX,
+  LAMBDA_DIR,
+  LAYERS_DIR,
+  PARALLEL_WORKERS_LAMBDA_MEMORY_SIZE,
+  PARALLEL_WORKERS_LAMBDA_TIMEOUT_SECONDS,
+  PLANNER_LAMBDA_TIMEOUT_SECONDS,
+  READSET_LIBRARY_INDEX_REBUILD_SCHEDULE_EXPRESSION,
+  READSET_LIBRARY_INDEX_S3_KEY,
+  RGID_WORKFLOW_RUN_INDEX_AUTHORITATIVE,
+  SLOW_INVOCATION_PROFILES_S3_PREFIX,
+  SLOW_INVOCATION_PROFILING_ENABLED,
+} from '../constants';
 import * as lambda from 'aws-cdk-lib/aws-lambda';
 import { Duration } from 'aws-cdk-lib';
 import { NagSuppressions } from 'cdk-nag';
@@ -19,6 +33,8 @@ import { camelCaseToKebabCase, camelCaseToSnakeCase } from '../utils';
 import * as cdk from 'aws-cdk-lib';
 import * as path from 'path';
 import * as iam from 'aws-cdk-lib/aws-iam';
+import * as events from 'aws-cdk-lib/aws-events';
+import * as eventsTargets from 'aws-cdk-lib/aws-events-targets';
 import { WorkflowNameType } from '../interfaces';
 import { PythonLayerVersion } from '@aws-cdk/aws-lambda-python-alpha';
 import { IBucket } from 'aws-cdk-lib/aws-s3';
@@ -67,15 +83,30 @@ function buildLambda(scope: Construct, props: BuildLambdaProps): LambdaObject |
   }
 
   // Create the lambda function
+  // Lambdas that call the handlers of other lambdas are bundled with the source of every lambda
   const lambdaFunction = new PythonUvFunction(scope, props.lambdaName, {
-    entry: path.join(LAMBDA_DIR, lambdaNameToSnakeCase + '_py'),
+    entry: lambdaRequirements.needsAllLambdaSources
+      ? LAMBDA_DIR
+      : path.join(LAMBDA_DIR, lambdaNameToSnakeCase + '_py'),
     runtime: lambda.Runtime.PYTHON_3_14,
     architecture: lambda.Architecture.ARM_64,
-    index: lambdaNameToSnakeCase + '.py',
+    index: lambdaRequirements.needsAllLambdaSources
+      ? path.join(lambdaNameToSnakeCase + '_py', lambdaNameToSnakeCase + '.py')
+      : lambdaNameToSnakeCase + '.py',
     handler: 'handler',
-    timeout: lambdaRequirements.needsLongerTimeout ? Duration.seconds(300) : Duration.seconds(60),
+    timeout: lambdaRequirements.needsParallelWorkers
+      ? Duration.seconds(PARALLEL_WORKERS_LAMBDA_TIMEOUT_SECONDS)
+      : lambdaRequirements.needsPlannerTimeout
+        ? Duration.seconds(PLANNER_LAMBDA_TIMEOUT_SECONDS)
+        : lambdaRequirements.needsLongerTimeout
+          ? Duration.seconds(300)
+          : Duration.seconds(60),
     includeOrcabusApiToolsLayer: lambdaRequirements.needsOrcabusApiTools,
-    memorySize: lambdaRequirements.needsMoreMemory ? 2048 : 512,
+    memorySize: lambdaRequirements.needsParallelWorkers
+      ? PARALLEL_WORKERS_LAMBDA_MEMORY_SIZE
+      : lambdaRequirements.needsMoreMemory
+        ? 2048
+        : 512,
   });
 
   // AwsSolutions-IAM4 - We need to add this for the lambda to work
@@ -96,7 +127,7 @@ function buildLambda(scope: Construct, props: BuildLambdaProps): LambdaObject |
   if (lambdaRequirements.needsSsmParameterAccess) {
     lambdaFunction.addToRolePolicy(
       new iam.PolicyStatement({
-        actions: ['ssm:GetParameter'],
+        actions: ['ssm:GetParameter', 'ssm:GetParameters'],
         resources: [
           `arn:aws:ssm:${cdk.Aws.REGION}:${cdk.Aws.ACCOUNT_ID}:parameter${path.join(props.ssmParameterPaths.rootPrefix, '/*')}`,
         ],
@@ -122,8 +153,118 @@ function buildLambda(scope: Construct, props: BuildLambdaProps): LambdaObject |
     lambdaFunction.addLayers(props.analysisToolsLayer);
   }
 
+  // Needs Draft Ledger
+  if (lambdaRequirements.needsDraftLedgerAccess) {
+    /* Claim drafts with conditional writes to the draft ledger table */
+    props.draftLedgerTable.grantReadWriteData(lambdaFunction);
+    lambdaFunction.addEnvironment('DRAFT_LEDGER_TABLE_NAME', props.draftLedgerTable.tableName);
+    lambdaFunction.addEnvironment(
+      'RGID_WORKFLOW_RUN_INDEX_AUTHORITATIVE',
+      RGID_WORKFLOW_RUN_INDEX_AUTHORITATIVE ? 'true' : 'false'
+    );
+  }
+  if (lambdaRequirements.needsDraftLedgerReadOnlyAccess) {
+    /* Dry runs only check the draft ledger for existing claims */
+    props.draftLedgerTable.grantReadData(lambdaFunction);
+    lambdaFunction.addEnvironment('DRAFT_LEDGER_TABLE_NAME', props.draftLedgerTable.tableName);
+    lambdaFunction.addEnvironment('ANALYSIS_GLUE_DRY_RUN', 'true');
+    lambdaFunction.addEnvironment(
+      'RGID_WORKFLOW_RUN_INDEX_AUTHORITATIVE',
+      RGID_WORKFLOW_RUN_INDEX_AUTHORITATIVE ? 'true' : 'false'
+    );
+  }
+
+  // Readset library index
+  // Rebuilt on a schedule and shared through the artefacts bucket where we have one (prod),
+  // otherwise there is no index, and libraries are checked with the fastq service
+  if (lambdaRequirements.needsReadsetLibraryIndexAccess && props.s3ArtefactsBucket) {
+    if (lambdaRequirements.needsScheduledReadsetLibraryIndexRebuild) {
+      props.s3ArtefactsBucket.grantReadWrite(lambdaFunction, READSET_LIBRARY_INDEX_S3_KEY);
+    } else {
+      /* Only the rebuild lambda writes the index */
+      props.s3ArtefactsBucket.grantRead(lambdaFunction, READSET_LIBRARY_INDEX_S3_KEY);
+    }
+    lambdaFunction.addEnvironment(
+      'READSET_LIBRARY_INDEX_BUCKET_NAME',
+      props.s3ArtefactsBucket.bucketName
+    );
+    lambdaFunction.addEnvironment('READSET_LIBRARY_INDEX_KEY', READSET_LIBRARY_INDEX_S3_KEY);
+  }
+
+  // Slow invocation profiling
+  // Profiles are uploaded to the artefacts bucket where we have one (prod), otherwise they are logged
+  if (lambdaRequirements.needsSlowInvocationProfiling) {
+    lambdaFunction.addEnvironment(
+      'ANALYSIS_GLUE_PROFILE_SLOW_INVOCATIONS',
+      SLOW_INVOCATION_PROFILING_ENABLED ? 'true' : 'false'
+    );
+    if (props.s3ArtefactsBucket) {
+      props.s3ArtefactsBucket.grantPut(lambdaFunction, `${SLOW_INVOCATION_PROFILES_S3_PREFIX}*`);
+      lambdaFunction.addEnvironment(
+        'SLOW_INVOCATION_PROFILES_BUCKET_NAME',
+        props.s3ArtefactsBucket.bucketName
+      );
+      lambdaFunction.addEnvironment(
+        'SLOW_INVOCATION_PROFILES_KEY_PREFIX',
+        SLOW_INVOCATION_PROFILES_S3_PREFIX
+      );
+      NagSuppressions.addResourceSuppressions(
+        lambdaFunction,
+        [
+          {
+            id: 'AwsSolutions-IAM5',
+            reason: `We need to give the lambda write access to the bucket under ${SLOW_INVOCATION_PROFILES_S3_PREFIX}`,
+          },
+        ],
+        true
+      );
+    }
+  }
+
+  // Backfill drafts and checkpoints, written to the artefacts bucket
+  if (lambdaRequirements.needsBackfillBucketAccess && props.s3ArtefactsBucket) {
+    props.s3ArtefactsBucket.grantReadWrite(lambdaFunction, `${BACKFILL_S3_PREFIX}*`);
+    lambdaFunction.addEnvironment('BACKFILL_BUCKET_NAME', props.s3ArtefactsBucket.bucketName);
+    lambdaFunction.addEnvironment('BACKFILL_KEY_PREFIX', BACKFILL_S3_PREFIX);
+    NagSuppressions.addResourceSuppressions(
+      lambdaFunction,
+      [
+        {
+          id: 'AwsSolutions-IAM5',
+          reason: `We need to give the lambda read/write access to the bucket under ${BACKFILL_S3_PREFIX}`,
+        },
+      ],
+      true
+    );
+  }
+
+  // Scheduled warm up
+  // One rule per lambda, a rule can only have five targets
+  if (lambdaRequirements.needsScheduledWarmUp) {
+    new events.Rule(scope, `${props.lambdaName}WarmUpRule`, {
+      schedule: events.Schedule.expression(ANALYSIS_BUILDER_WARM_UP_SCHEDULE_EXPRESSION),
+      targets: [
+        new eventsTargets.LambdaFunction(lambdaFunction, {
+          input: events.RuleTargetInput.fromObject({ warmUp: true }),
+        }),
+      ],
+    });
+  }
+
+  // Scheduled readset library index rebuild
+  if (lambdaRequirements.needsScheduledReadsetLibraryIndexRebuild) {
+    new events.Rule(scope, `${props.lambdaName}Rule`, {
+      schedule: events.Schedule.expression(READSET_LIBRARY_INDEX_REBUILD_SCHEDULE_EXPRESSION),
+      targets: [new eventsTargets.LambdaFunction(lambdaFunction)],
+    });
+  }
+
   // BCLConvert Interop QC
-  if (props.lambdaName === 'makeBclconvertInteropQcEvent') {
+  if (
+    props.lambdaName === 'makeBclconvertInteropQcEvent' ||
+    props.lambdaName === 'planAnalysisBuilderRun' ||
+    props.lambdaName === 'routeAnalysisBuilderAction'
+  ) {
     lambdaFunction.addEnvironment(
       'BCLCONVERT_INTEROP_QC_WORKFLOW_OBJECT_SSM_PARAMETER_NAME',
       path.join(
@@ -144,7 +285,10 @@ function buildLambda(scope: Construct, props: BuildLambdaProps): LambdaObject |
   // ctDNA
   if (
     props.lambdaName === 'makeCtdnaAnalysisEventsList' ||
-    props.lambdaName === 'generateCtdnaValidationEvent'
+    props.lambdaName === 'generateValidationEvents' ||
+    props.lambdaName === 'planAnalysisBuilderRun' ||
+    props.lambdaName === 'routeAnalysisBuilderAction' ||
+    props.lambdaName === 'backfillAnalysisDrafts'
   ) {
     lambdaFunction.addEnvironment(
       'DRAGEN_TSO500_CTDNA_WORKFLOW_OBJECT_SSM_PARAMETER_NAME',
@@ -154,7 +298,12 @@ function buildLambda(scope: Construct, props: BuildLambdaProps): LambdaObject |
       )
     );
   }
-  if (props.lambdaName === 'makeCtdnaPostAnalysisEventsList') {
+  if (
+    props.lambdaName === 'makeCtdnaPostAnalysisEventsList' ||
+    props.lambdaName === 'planAnalysisBuilderRun' ||
+    props.lambdaName === 'routeAnalysisBuilderAction' ||
+    props.lambdaName === 'backfillAnalysisDrafts'
+  ) {
     lambdaFunction.addEnvironment(
       'PIERIANDX_TSO500_CTDNA_WORKFLOW_OBJECT_SSM_PARAMETER_NAME',
       path.join(
@@ -167,9 +316,10 @@ function buildLambda(scope: Construct, props: BuildLambdaProps): LambdaObject |
   // DNA
   if (
     props.lambdaName === 'makeWgsAnalysisEventsList' ||
-    props.lambdaName === 'generateDragenWgtsDnaValidationEvent' ||
-    props.lambdaName === 'generateOncoanalyserWgtsDnaValidationEvent' ||
-    props.lambdaName === 'generateSashValidationEvent'
+    props.lambdaName === 'generateValidationEvents' ||
+    props.lambdaName === 'planAnalysisBuilderRun' ||
+    props.lambdaName === 'routeAnalysisBuilderAction' ||
+    props.lambdaName === 'backfillAnalysisDrafts'
   ) {
     lambdaFunction.addEnvironment(
       'DRAGEN_WGTS_DNA_WORKFLOW_OBJECT_SSM_PARAMETER_NAME',
@@ -195,7 +345,12 @@ function buildLambda(scope: Construct, props: BuildLambdaProps): LambdaObject |
   }
 
   // RNA
-  if (props.lambdaName === 'makeWtsAnalysisEventsList') {
+  if (
+    props.lambdaName === 'makeWtsAnalysisEventsList' ||
+    props.lambdaName === 'planAnalysisBuilderRun' ||
+    props.lambdaName === 'routeAnalysisBuilderAction' ||
+    props.lambdaName === 'backfillAnalysisDrafts'
+  ) {
     lambdaFunction.addEnvironment(
       'DRAGEN_WGTS_RNA_WORKFLOW_OBJECT_SSM_PARAMETER_NAME',
       path.join(
@@ -220,7 +375,12 @@ function buildLambda(scope: Construct, props: BuildLambdaProps): LambdaObject |
   }
 
   // DNA/RNA
-  if (props.lambdaName === 'makeWgtsPostAnalysisEventsList') {
+  if (
+    props.lambdaName === 'makeWgtsPostAnalysisEventsList' ||
+    props.lambdaName === 'planAnalysisBuilderRun' ||
+    props.lambdaName === 'routeAnalysisBuilderAction' ||
+    props.lambdaName === 'backfillAnalysisDrafts'
+  ) {
     lambdaFunction.addEnvironment(
       'ONCOANALYSER_WGTS_DNA_RNA_WORKFLOW_OBJECT_SSM_PARAMETER_NAME',
       path.join(
@@ -6,6 +6,8 @@ import { PythonUvFunction } from '@orcabus/platform-cdk-constructs/lambda';
 import { SsmParameterPaths } from '../ssm/interfaces';
 import { PythonLayerVersion } from '@aws-cdk/aws-lambda-python-alpha';
 import { IBucket } from 'aws-cdk-lib/aws-s3';
+import { ITableV2 } from 'aws-cdk-lib/aws-dynamodb';
+import { ANALYSIS_BUILDER_ROUTER_LAMBDA_ENABLED } from '../constants';
 
 export type LambdaName =
   // Metadata gatherers
@@ -21,11 +23,17 @@ export type LambdaName =
   | 'makeWgtsPostAnalysisEventsList'
   // Validation Makers
   | 'getDeploymentStatusManagerState'
-  | 'generateCtdnaValidationEvent'
-  | 'generateDragenWgtsDnaValidationEvent'
-  | 'generateOncoanalyserWgtsDnaValidationEvent'
-  | 'generateSashValidationEvent'
-  | 'summariseDeployStatusManagerChanges';
+  | 'generateValidationEvents'
+  | 'summariseDeployStatusManagerChanges'
+  // Planning
+  | 'planAnalysisBuilderRun'
+  // Routing
+  | 'routeAnalysisBuilderAction'
+  // Indexing
+  | 'updateRgidWorkflowRunIndex'
+  | 'rebuildReadsetLibraryIndex'
+  // Backfill
+  | 'backfillAnalysisDrafts';
 
 export const lambdaNameList: LambdaName[] = [
   // Metadata gatherers
@@ -41,11 +49,17 @@ export const lambdaNameList: LambdaName[] = [
   'makeWgtsPostAnalysisEventsList',
   // Validation Makers
   'getDeploymentStatusManagerState',
-  'generateCtdnaValidationEvent',
-  'generateDragenWgtsDnaValidationEvent',
-  'generateOncoanalyserWgtsDnaValidationEvent',
-  'generateSashValidationEvent',
+  'generateValidationEvents',
   'summariseDeployStatusManagerChanges',
+  // Planning
+  'planAnalysisBuilderRun',
+  // Routing
+  'routeAnalysisBuilderAction',
+  // Indexing
+  'updateRgidWorkflowRunIndex',
+  'rebuildReadsetLibraryIndex',
+  // Backfill
+  'backfillAnalysisDrafts',
 ];
 
 // Requirements interface for Lambda functions
@@ -54,21 +68,40 @@ export interface LambdaRequirements {
   needsSsmParameterAccess?: boolean;
   needsAnalysisToolsLayer?: boolean;
   needsLongerTimeout?: boolean;
+  needsPlannerTimeout?: boolean;
   needsMoreMemory?: boolean;
   needsS3Permissions?: boolean;
+  needsDraftLedgerAccess?: boolean;
+  needsDraftLedgerReadOnlyAccess?: boolean;
+  needsReadsetLibraryIndexAccess?: boolean;
+  needsScheduledReadsetLibraryIndexRebuild?: boolean;
+  needsSlowInvocationProfiling?: boolean;
+  needsScheduledWarmUp?: boolean;
+  needsAllLambdaSources?: boolean;
+  needsParallelWorkers?: boolean;
+  needsBackfillBucketAccess?: boolean;
   prodOnly?: boolean;
 }
 
+// With the router lambda enabled, the analysis builder only invokes the router, so only the router is warmed.
+// The per-stage lambdas are still deployed (so executions that invoked them can be redriven) but left cold
+const warmUpRouterLambda = ANALYSIS_BUILDER_ROUTER_LAMBDA_ENABLED;
+const warmUpPerStageLambdas = !ANALYSIS_BUILDER_ROUTER_LAMBDA_ENABLED;
+
 // Lambda requirements mapping
 export const lambdaRequirementsMap: Record<LambdaName, LambdaRequirements> = {
   // Metadata gatherers
   getLibrariesFromInstrumentRunIdAndSubjectId: {
     needsOrcabusApiTools: true,
     needsSsmParameterAccess: true,
+    needsAnalysisToolsLayer: true,
+    needsScheduledWarmUp: warmUpPerStageLambdas,
   },
   getSubjectsFromInstrumentRunId: {
     needsOrcabusApiTools: true,
     needsSsmParameterAccess: true,
+    needsAnalysisToolsLayer: true,
+    needsScheduledWarmUp: warmUpPerStageLambdas,
   },
   // Event Detail Makers
   makeBclconvertInteropQcEvent: {
@@ -77,11 +110,16 @@ export const lambdaRequirementsMap: Record<LambdaName, LambdaRequirements> = {
     needsAnalysisToolsLayer: true,
     needsLongerTimeout: true,
     needsMoreMemory: true,
+    needsDraftLedgerAccess: true,
+    needsScheduledWarmUp: warmUpPerStageLambdas,
   },
   makeCtdnaAnalysisEventsList: {
     needsOrcabusApiTools: true,
     needsSsmParameterAccess: true,
     needsAnalysisToolsLayer: true,
+    needsDraftLedgerAccess: true,
+    needsSlowInvocationProfiling: true,
+    needsScheduledWarmUp: warmUpPerStageLambdas,
   },
   makeWgsAnalysisEventsList: {
     needsOrcabusApiTools: true,
@@ -89,17 +127,27 @@ export const lambdaRequirementsMap: Record<LambdaName, LambdaRequirements> = {
     needsAnalysisToolsLayer: true,
     needsLongerTimeout: true,
     needsMoreMemory: true,
+    needsDraftLedgerAccess: true,
+    needsSlowInvocationProfiling: true,
+    needsReadsetLibraryIndexAccess: true,
+    needsScheduledWarmUp: warmUpPerStageLambdas,
   },
   makeWtsAnalysisEventsList: {
     needsOrcabusApiTools: true,
     needsSsmParameterAccess: true,
     needsAnalysisToolsLayer: true,
+    needsDraftLedgerAccess: true,
+    needsSlowInvocationProfiling: true,
+    needsScheduledWarmUp: warmUpPerStageLambdas,
   },
   // Post Event Detail Makers
   makeCtdnaPostAnalysisEventsList: {
     needsOrcabusApiTools: true,
     needsSsmParameterAccess: true,
     needsAnalysisToolsLayer: true,
+    needsDraftLedgerAccess: true,
+    needsSlowInvocationProfiling: true,
+    needsScheduledWarmUp: warmUpPerStageLambdas,
   },
   makeWgtsPostAnalysisEventsList: {
     needsOrcabusApiTools: true,
@@ -107,6 +155,10 @@ export const lambdaRequirementsMap: Record<LambdaName, LambdaRequirements> = {
     needsAnalysisToolsLayer: true,
     needsLongerTimeout: true,
     needsMoreMemory: true,
+    needsDraftLedgerAccess: true,
+    needsSlowInvocationProfiling: true,
+    needsReadsetLibraryIndexAccess: true,
+    needsScheduledWarmUp: warmUpPerStageLambdas,
   },
   // Validation Events
   getDeploymentStatusManagerState: {
@@ -115,32 +167,68 @@ export const lambdaRequirementsMap: Record<LambdaName, LambdaRequirements> = {
     needsS3Permissions: true,
     prodOnly: true,
   },
-  generateCtdnaValidationEvent: {
+  generateValidationEvents: {
     needsOrcabusApiTools: true,
     needsAnalysisToolsLayer: true,
     needsSsmParameterAccess: true,
+    needsLongerTimeout: true,
     prodOnly: true,
   },
-  generateDragenWgtsDnaValidationEvent: {
+  summariseDeployStatusManagerChanges: {
     needsOrcabusApiTools: true,
     needsAnalysisToolsLayer: true,
-    needsSsmParameterAccess: true,
+    needsLongerTimeout: true,
     prodOnly: true,
   },
-  generateOncoanalyserWgtsDnaValidationEvent: {
+  // Planning
+  planAnalysisBuilderRun: {
     needsOrcabusApiTools: true,
+    needsSsmParameterAccess: true,
     needsAnalysisToolsLayer: true,
+    needsPlannerTimeout: true,
+    needsMoreMemory: true,
+    needsDraftLedgerReadOnlyAccess: true,
+    needsReadsetLibraryIndexAccess: true,
+    needsAllLambdaSources: true,
+  },
+  // Routing
+  routeAnalysisBuilderAction: {
+    needsOrcabusApiTools: true,
     needsSsmParameterAccess: true,
-    prodOnly: true,
+    needsAnalysisToolsLayer: true,
+    needsLongerTimeout: true,
+    needsMoreMemory: true,
+    needsDraftLedgerAccess: true,
+    needsReadsetLibraryIndexAccess: true,
+    needsSlowInvocationProfiling: true,
+    needsScheduledWarmUp: warmUpRouterLambda,
+    needsAllLambdaSources: true,
   },
-  generateSashValidationEvent: {
+  // Indexing
+  updateRgidWorkflowRunIndex: {
     needsOrcabusApiTools: true,
     needsAnalysisToolsLayer: true,
-    needsSsmParameterAccess: true,
+    needsDraftLedgerAccess: true,
+  },
+  rebuildReadsetLibraryIndex: {
+    needsOrcabusApiTools: true,
+    needsAnalysisToolsLayer: true,
+    needsLongerTimeout: true,
+    needsMoreMemory: true,
+    needsReadsetLibraryIndexAccess: true,
+    needsScheduledReadsetLibraryIndexRebuild: true,
     prodOnly: true,
   },
-  summariseDeployStatusManagerChanges: {
+  // Backfill
+  backfillAnalysisDrafts: {
     needsOrcabusApiTools: true,
+    needsSsmParameterAccess: true,
+    needsAnalysisToolsLayer: true,
+    needsParallelWorkers: true,
+    needsDraftLedgerReadOnlyAccess: true,
+    needsReadsetLibraryIndexAccess: true,
+    needsBackfillBucketAccess: true,
+    needsAllLambdaSources: true,
     prodOnly: true,
   },
 };
@@ -152,6 +240,8 @@ export interface BuildAllLambdasProps {
   ssmParameterPaths: SsmParameterPaths;
   /* S3 Bucket */
   s3ArtefactsBucket?: IBucket;
+  /* Draft Ledger Table */
+  draftLedgerTable: ITableV2;
   /* Is Prod Account */
   isProdAccount: boolean;
 }
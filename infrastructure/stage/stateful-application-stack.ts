@@ -4,6 +4,7 @@ import { GitStack } from '@orcabus/platform-cdk-constructs/deployment-stack-pipe
 import { StatefulApplicationStackConfig } from './interfaces';
 import { buildSsmParameters } from './ssm';
 import { buildAnalysisGlueArtifactsBucket } from './s3';
+import { buildDraftLedgerTable } from './dynamodb';
 
 export type StatefulApplicationStackProps = StatefulApplicationStackConfig & cdk.StackProps;
 
@@ -17,6 +18,9 @@ export class StatefulApplicationStack extends GitStack {
       ssmParameterValues: props.ssmParameterValues,
     });
 
+    // Build the draft ledger table
+    buildDraftLedgerTable(this, props.draftLedgerTableName);
+
     // Only if stageName is prod
     if (props.stageName === 'PROD') {
       // S3 Bucket
@@ -2,6 +2,7 @@ import * as cdk from 'aws-cdk-lib';
 import * as s3 from 'aws-cdk-lib/aws-s3';
 import { Construct } from 'constructs';
 import * as events from 'aws-cdk-lib/aws-events';
+import * as dynamodb from 'aws-cdk-lib/aws-dynamodb';
 import { GitStack } from '@orcabus/platform-cdk-constructs/deployment-stack-pipeline';
 import { buildAllStepFunctions } from './step-functions';
 import { StatelessApplicationStackConfig } from './interfaces';
@@ -34,6 +35,13 @@ export class StatelessApplicationStack extends GitStack {
         )
       : undefined;
 
+    // Get the draft ledger table
+    const draftLedgerTable = dynamodb.TableV2.fromTableName(
+      this,
+      'DraftLedgerTable',
+      props.draftLedgerTableName
+    );
+
     // Build analysis Tools Layer
     const analysisToolsLayer = buildAnalysisToolsLayer(this);
 
@@ -42,6 +50,7 @@ export class StatelessApplicationStack extends GitStack {
       analysisToolsLayer: analysisToolsLayer,
       ssmParameterPaths: props.ssmParameterPaths,
       s3ArtefactsBucket: analysisGlueArtifactsBucket,
+      draftLedgerTable: draftLedgerTable,
       isProdAccount: props.stageName === 'PROD',
     });
 
@@ -63,6 +72,7 @@ export class StatelessApplicationStack extends GitStack {
     buildAllEventBridgeTargets({
       eventBridgeRuleObjects: eventRules,
       stepFunctionObjects: stateMachines,
+      lambdaObjects: lambdas,
       prodOnly: props.stageName === 'PROD',
     });
   }
@@ -44,6 +44,18 @@ function createStateMachineDefinitionSubstitutions(props: BuildStepFunctionProps
       lambdaObject.lambdaFunction.latestVersion.functionArn;
   }
 
+  /* Route every task through the router lambda, each task's payload names its action */
+  const routerLambdaObject = lambdaFunctions.find(
+    (lambdaObject) => lambdaObject.lambdaName === 'routeAnalysisBuilderAction'
+  );
+  if (sfnRequirements.routesThroughRouterLambda && routerLambdaObject) {
+    for (const lambdaObject of lambdaFunctions) {
+      const sfnSubtitutionKey = `__${camelCaseToSnakeCase(lambdaObject.lambdaName)}_lambda_function_arn__`;
+      definitionSubstitutions[sfnSubtitutionKey] =
+        routerLambdaObject.lambdaFunction.latestVersion.functionArn;
+    }
+  }
+
   /* Some standard substitutions */
   definitionSubstitutions['__wgs_sample_type__'] = MetadataSampleTypeBySampleType['DNA'];
   definitionSubstitutions['__wts_sample_type__'] = MetadataSampleTypeBySampleType['RNA'];
@@ -3,6 +3,7 @@ import { StateMachine } from 'aws-cdk-lib/aws-stepfunctions';
 
 import { SsmParameterPaths } from '../ssm/interfaces';
 import { LambdaName, LambdaObject } from '../lambdas/interfaces';
+import { ANALYSIS_BUILDER_ROUTER_LAMBDA_ENABLED } from '../constants';
 
 /**
  * Step Function Interfaces
@@ -28,6 +29,8 @@ export interface StepFunctionRequirements {
   needsEventPutPermission?: boolean;
   // SSM Stuff
   needsSsmParameterAccess?: boolean;
+  // Lambda stuff
+  routesThroughRouterLambda?: boolean;
   // SFN Account Specific?
   prodOnly?: boolean;
 }
@@ -55,6 +58,7 @@ export const stepFunctionsRequirementsMap: Record<StateMachineName, StepFunction
   analysisBuilder: {
     needsEventPutPermission: true,
     needsDistributedMapPermission: true,
+    routesThroughRouterLambda: ANALYSIS_BUILDER_ROUTER_LAMBDA_ENABLED,
   },
   runNataPreflightChecks: {
     needsEventPutPermission: true,
@@ -76,15 +80,14 @@ export const stepFunctionToLambdasMap: Record<StateMachineName, LambdaName[]> =
     // Post Event Detail Makers
     'makeCtdnaPostAnalysisEventsList',
     'makeWgtsPostAnalysisEventsList',
+    // Router
+    'routeAnalysisBuilderAction',
   ],
   runNataPreflightChecks: [
     // Build up the current status manager state
     'getDeploymentStatusManagerState',
     // Generate the validation event drafts
-    'generateCtdnaValidationEvent',
-    'generateDragenWgtsDnaValidationEvent',
-    'generateOncoanalyserWgtsDnaValidationEvent',
-    'generateSashValidationEvent',
+    'generateValidationEvents',
     // Summarise the changes in comments to the workflow manager
     'summariseDeployStatusManagerChanges',
   ],